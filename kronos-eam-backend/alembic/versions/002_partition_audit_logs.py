@@ -0,0 +1,215 @@
+"""Partition audit_logs by month and add the audit archive manifest
+
+Revision ID: 002_partition_audit_logs
+Revises: 001_complete_initial
+Create Date: 2026-10-19 10:00:00
+
+- audit_logs becomes a table range-partitioned on created_at, one partition
+  per month plus a default partition catching out-of-range rows
+- The primary key becomes (id, created_at) as required for partitioned tables
+- Composite indexes matching the report/search access paths are created on
+  the parent and cascade to every partition
+- audit_log_archives tracks months moved to Parquet files by
+  AuditArchiveService
+- Existing rows are copied into the new layout (legacy column names are mapped)
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '002_partition_audit_logs'
+down_revision = '001_complete_initial'
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+
+# Target column -> legacy column (from 001) used when the target is missing
+LEGACY_COLUMNS = {
+    'utente_id': 'user_id',
+    'entity_type': 'resource_type',
+    'entity_id': 'resource_id',
+    'new_values': 'changes',
+}
+
+AUDIT_COLUMNS = [
+    'id', 'tenant_id', 'entity_type', 'entity_id', 'tipo_modifica',
+    'dettaglio_modifica', 'utente_id', 'ip_address', 'user_agent',
+    'session_id', 'request_id', 'old_values', 'new_values',
+    'changed_fields', 'note', 'automatic', 'created_at'
+]
+
+AUDIT_VIEW = """
+    CREATE VIEW audit_log_view AS
+    SELECT
+        al.*,
+        u.email as user_email,
+        u.name as user_name
+    FROM audit_logs al
+    LEFT JOIN users u ON al.utente_id = u.id
+"""
+
+
+def _add_months(value: datetime, months: int) -> datetime:
+    index = value.year * 12 + value.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def _create_audit_indexes() -> None:
+    op.create_index('ix_audit_logs_tenant_created', 'audit_logs', ['tenant_id', 'created_at'])
+    op.create_index('ix_audit_logs_tenant_entity', 'audit_logs',
+                    ['tenant_id', 'entity_type', 'entity_id', 'created_at'])
+    op.create_index('ix_audit_logs_tenant_user', 'audit_logs', ['tenant_id', 'utente_id', 'created_at'])
+
+
+def _copy_rows(source: str, target: str) -> None:
+    bind = op.get_bind()
+    existing = {
+        row[0] for row in bind.execute(sa.text(
+            "SELECT column_name FROM information_schema.columns WHERE table_name = :table"
+        ), {"table": source})
+    }
+
+    targets, sources = [], []
+    for column in AUDIT_COLUMNS:
+        if column in existing:
+            targets.append(column)
+            sources.append(column)
+        elif LEGACY_COLUMNS.get(column) in existing:
+            targets.append(column)
+            sources.append(LEGACY_COLUMNS[column])
+
+    if 'tipo_modifica' not in targets:
+        targets.append('tipo_modifica')
+        sources.append("'AGGIORNAMENTO'::tipomodificaenum")
+    if 'entity_id' in targets:
+        sources[targets.index('entity_id')] = f"COALESCE({sources[targets.index('entity_id')]}, 0)"
+
+    op.execute(
+        f"INSERT INTO {target} ({', '.join(targets)}) "
+        f"SELECT {', '.join(sources)} FROM {source}"
+    )
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+
+    op.execute("DROP VIEW IF EXISTS audit_log_view")
+    op.execute("ALTER TABLE audit_logs RENAME TO audit_logs_legacy")
+    for index in ('ix_audit_logs_tenant_id', 'ix_audit_logs_created_at', 'ix_audit_logs_id'):
+        op.execute(f"DROP INDEX IF EXISTS {index}")
+
+    op.execute("""
+        DO $$ BEGIN
+            CREATE TYPE tipomodificaenum AS ENUM
+                ('CREAZIONE', 'AGGIORNAMENTO', 'STATO_CAMBIO', 'RESPONSABILE_CAMBIO', 'ELIMINAZIONE');
+        EXCEPTION WHEN duplicate_object THEN NULL;
+        END $$;
+    """)
+    op.execute("CREATE SEQUENCE IF NOT EXISTS audit_logs_part_id_seq")
+
+    op.execute("""
+        CREATE TABLE audit_logs (
+            id BIGINT NOT NULL DEFAULT nextval('audit_logs_part_id_seq'),
+            tenant_id VARCHAR(50) NOT NULL REFERENCES tenants(id),
+            entity_type VARCHAR(50) NOT NULL,
+            entity_id INTEGER NOT NULL,
+            tipo_modifica tipomodificaenum NOT NULL,
+            dettaglio_modifica JSON,
+            utente_id INTEGER REFERENCES users(id),
+            ip_address VARCHAR(45),
+            user_agent VARCHAR(500),
+            session_id VARCHAR(100),
+            request_id VARCHAR(100),
+            old_values JSON,
+            new_values JSON,
+            changed_fields JSON,
+            note TEXT,
+            automatic INTEGER DEFAULT 0,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.execute("ALTER SEQUENCE audit_logs_part_id_seq OWNED BY audit_logs.id")
+    op.execute("CREATE TABLE audit_logs_default PARTITION OF audit_logs DEFAULT")
+
+    # One partition per month from the oldest existing row to MONTHS_AHEAD ahead
+    oldest = bind.execute(sa.text("SELECT min(created_at) FROM audit_logs_legacy")).scalar()
+    now = datetime.utcnow()
+    period = datetime((oldest or now).year, (oldest or now).month, 1)
+    last = _add_months(datetime(now.year, now.month, 1), MONTHS_AHEAD)
+    while period <= last:
+        op.execute(
+            f"CREATE TABLE audit_logs_y{period:%Y}m{period:%m} PARTITION OF audit_logs "
+            f"FOR VALUES FROM ('{period:%Y-%m-%d}') TO ('{_add_months(period, 1):%Y-%m-%d}')"
+        )
+        period = _add_months(period, 1)
+
+    _create_audit_indexes()
+
+    _copy_rows('audit_logs_legacy', 'audit_logs')
+    op.execute(
+        "SELECT setval('audit_logs_part_id_seq', "
+        "COALESCE((SELECT max(id) FROM audit_logs), 0) + 1, false)"
+    )
+    op.execute("DROP TABLE audit_logs_legacy")
+
+    op.create_table('audit_log_archives',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('period_start', sa.DateTime(), nullable=False),
+        sa.Column('period_end', sa.DateTime(), nullable=False),
+        sa.Column('file_path', sa.String(500), nullable=False),
+        sa.Column('file_format', sa.String(20), nullable=False, server_default='parquet'),
+        sa.Column('compression', sa.String(20), nullable=False, server_default='zstd'),
+        sa.Column('checksum', sa.String(64), nullable=False),
+        sa.Column('size_bytes', sa.BigInteger(), nullable=False),
+        sa.Column('row_count', sa.Integer(), nullable=False),
+        sa.Column('archived_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('period_start')
+    )
+    op.create_index('ix_audit_log_archives_id', 'audit_log_archives', ['id'])
+
+    op.execute(AUDIT_VIEW)
+
+
+def downgrade() -> None:
+    op.execute("DROP VIEW IF EXISTS audit_log_view")
+    op.drop_index('ix_audit_log_archives_id', table_name='audit_log_archives')
+    op.drop_table('audit_log_archives')
+
+    # Archived months are not restored; re-import them from the Parquet files if needed
+    op.execute("ALTER TABLE audit_logs RENAME TO audit_logs_partitioned")
+    op.execute("""
+        CREATE TABLE audit_logs (
+            id SERIAL PRIMARY KEY,
+            tenant_id VARCHAR(50) NOT NULL REFERENCES tenants(id),
+            entity_type VARCHAR(50) NOT NULL,
+            entity_id INTEGER NOT NULL,
+            tipo_modifica tipomodificaenum NOT NULL,
+            dettaglio_modifica JSON,
+            utente_id INTEGER REFERENCES users(id),
+            ip_address VARCHAR(45),
+            user_agent VARCHAR(500),
+            session_id VARCHAR(100),
+            request_id VARCHAR(100),
+            old_values JSON,
+            new_values JSON,
+            changed_fields JSON,
+            note TEXT,
+            automatic INTEGER DEFAULT 0,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL
+        )
+    """)
+    _copy_rows('audit_logs_partitioned', 'audit_logs')
+    op.execute(
+        "SELECT setval('audit_logs_id_seq', "
+        "COALESCE((SELECT max(id) FROM audit_logs), 0) + 1, false)"
+    )
+    op.execute("DROP TABLE audit_logs_partitioned CASCADE")
+
+    op.create_index('ix_audit_logs_tenant_id', 'audit_logs', ['tenant_id'])
+    op.create_index('ix_audit_logs_created_at', 'audit_logs', ['created_at'])
+    op.execute(AUDIT_VIEW)
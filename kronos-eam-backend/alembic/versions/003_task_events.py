@@ -0,0 +1,94 @@
+"""Add task_events timeline projection
+
+Revision ID: 003_task_events
+Revises: 002_partition_audit_logs
+Create Date: 2026-10-19 12:00:00
+
+task_events is written by AuditService together with the task audit entries
+and read by the task timeline endpoint with one range query on
+(task_id, timestamp). Existing history is backfilled from audit_logs
+(created, deleted, status, assignment and document events).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '003_task_events'
+down_revision = '002_partition_audit_logs'
+branch_labels = None
+depends_on = None
+
+BACKFILL_SOURCE = """
+    FROM audit_logs al
+    JOIN workflow_tasks t ON t.id = al.entity_id
+    LEFT JOIN users u ON u.id = al.utente_id
+    WHERE al.entity_type = 'task'
+"""
+
+BACKFILL_COLUMNS = "tenant_id, task_id, event_type, actor_id, actor_email, old_value, new_value, details, timestamp"
+
+
+def upgrade() -> None:
+    op.create_table('task_events',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tenant_id', sa.String(50), nullable=False),
+        sa.Column('task_id', sa.Integer(), nullable=False),
+        sa.Column('event_type', sa.String(50), nullable=False),
+        sa.Column('actor_id', sa.Integer(), nullable=True),
+        sa.Column('actor_email', sa.String(255), nullable=True),
+        sa.Column('old_value', sa.JSON(), nullable=True),
+        sa.Column('new_value', sa.JSON(), nullable=True),
+        sa.Column('details', sa.String(500), nullable=True),
+        sa.Column('timestamp', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['task_id'], ['workflow_tasks.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['actor_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_task_events_tenant_id', 'task_events', ['tenant_id'])
+    op.create_index('ix_task_events_task_timestamp', 'task_events', ['task_id', 'timestamp'])
+
+    # Backfill from the audit trail
+    op.execute(f"""
+        INSERT INTO task_events ({BACKFILL_COLUMNS})
+        SELECT al.tenant_id, al.entity_id,
+               CASE al.tipo_modifica WHEN 'CREAZIONE' THEN 'created' ELSE 'deleted' END,
+               al.utente_id, u.email, NULL, NULL,
+               CASE al.tipo_modifica WHEN 'CREAZIONE' THEN 'Task created' ELSE 'Task deleted' END,
+               al.created_at
+        {BACKFILL_SOURCE}
+          AND al.tipo_modifica IN ('CREAZIONE', 'ELIMINAZIONE')
+    """)
+    op.execute(f"""
+        INSERT INTO task_events ({BACKFILL_COLUMNS})
+        SELECT al.tenant_id, al.entity_id, 'assignment_change', al.utente_id, u.email,
+               al.dettaglio_modifica -> 'old_assignee', al.dettaglio_modifica -> 'new_assignee',
+               'Assigned from ' || COALESCE(al.dettaglio_modifica ->> 'old_assignee', 'Unassigned')
+                   || ' to ' || COALESCE(al.dettaglio_modifica ->> 'new_assignee', 'None'),
+               al.created_at
+        {BACKFILL_SOURCE}
+          AND al.tipo_modifica = 'RESPONSABILE_CAMBIO'
+    """)
+    op.execute(f"""
+        INSERT INTO task_events ({BACKFILL_COLUMNS})
+        SELECT al.tenant_id, al.entity_id, 'status_change', al.utente_id, u.email,
+               al.old_values -> 'status', al.new_values -> 'status',
+               'Status changed from ' || COALESCE(al.old_values ->> 'status', 'None')
+                   || ' to ' || COALESCE(al.new_values ->> 'status', 'None'),
+               al.created_at
+        {BACKFILL_SOURCE}
+          AND (al.tipo_modifica = 'STATO_CAMBIO' OR COALESCE(al.changed_fields::jsonb, '[]') ? 'status')
+          AND (al.old_values ->> 'status') IS DISTINCT FROM (al.new_values ->> 'status')
+    """)
+    op.execute(f"""
+        INSERT INTO task_events ({BACKFILL_COLUMNS})
+        SELECT al.tenant_id, al.entity_id, 'document_update', al.utente_id, u.email,
+               NULL, NULL, 'Documents updated', al.created_at
+        {BACKFILL_SOURCE}
+          AND COALESCE(al.changed_fields::jsonb, '[]') ?| ARRAY['documenti_associati', 'associated_documents']
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_task_events_task_timestamp', table_name='task_events')
+    op.drop_index('ix_task_events_tenant_id', table_name='task_events')
+    op.drop_table('task_events')
@@ -0,0 +1,56 @@
+"""Add per-assignee task inbox counters
+
+Revision ID: 004_task_inbox_counters
+Revises: 003_task_events
+Create Date: 2026-10-19 14:00:00
+
+task_inbox_counters holds one row per (tenant, assignee, status, priority)
+bucket maintained by TaskInboxService; it is filled here from the current
+tasks. The (assignee, status, due_date) index backs the "my tasks" list.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '004_task_inbox_counters'
+down_revision = '003_task_events'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('task_inbox_counters',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tenant_id', sa.String(50), nullable=False),
+        sa.Column('assignee', sa.String(255), nullable=False),
+        sa.Column('status', sa.String(50), nullable=False, server_default=''),
+        sa.Column('priority', sa.String(50), nullable=False, server_default=''),
+        sa.Column('task_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('estimated_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('estimated_hours_sum', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('actual_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('actual_hours_sum', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('tenant_id', 'assignee', 'status', 'priority', name='uq_task_inbox_bucket')
+    )
+    op.create_index('ix_task_inbox_counters_tenant_id', 'task_inbox_counters', ['tenant_id'])
+    op.create_index('ix_workflow_tasks_inbox', 'workflow_tasks', ['assignee', 'status', 'due_date'])
+
+    op.execute("""
+        INSERT INTO task_inbox_counters
+            (tenant_id, assignee, status, priority, task_count, estimated_count,
+             estimated_hours_sum, actual_count, actual_hours_sum, updated_at)
+        SELECT tenant_id, assignee, COALESCE(status::text, ''), COALESCE(priority::text, ''),
+               count(id), count(estimated_hours), COALESCE(sum(estimated_hours), 0),
+               count(actual_hours), COALESCE(sum(actual_hours), 0), now()
+        FROM workflow_tasks
+        WHERE assignee IS NOT NULL
+        GROUP BY tenant_id, assignee, status, priority
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_workflow_tasks_inbox', table_name='workflow_tasks')
+    op.drop_index('ix_task_inbox_counters_tenant_id', table_name='task_inbox_counters')
+    op.drop_table('task_inbox_counters')
@@ -0,0 +1,42 @@
+"""Add deadline reminder ledger
+
+Revision ID: 005_reminder_ledger
+Revises: 004_task_inbox_counters
+Create Date: 2026-10-19 15:00:00
+
+One row per (task, threshold) reminder sent by DeadlineReminderScheduler;
+the unique constraint is what keeps overlapping sweeps from sending
+duplicates.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '005_reminder_ledger'
+down_revision = '004_task_inbox_counters'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('reminder_ledger',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tenant_id', sa.String(50), nullable=False),
+        sa.Column('task_id', sa.Integer(), nullable=False),
+        sa.Column('threshold', sa.String(20), nullable=False),
+        sa.Column('due_date', sa.DateTime(), nullable=True),
+        sa.Column('notification_id', sa.Integer(), nullable=True),
+        sa.Column('sent_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['task_id'], ['workflow_tasks.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['notification_id'], ['notifications.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('task_id', 'threshold', name='uq_reminder_ledger_task_threshold')
+    )
+    op.create_index('ix_reminder_ledger_tenant_id', 'reminder_ledger', ['tenant_id'])
+    op.create_index('ix_workflow_tasks_due_date', 'workflow_tasks', ['due_date'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_workflow_tasks_due_date', table_name='workflow_tasks')
+    op.drop_index('ix_reminder_ledger_tenant_id', table_name='reminder_ledger')
+    op.drop_table('reminder_ledger')
@@ -0,0 +1,25 @@
+"""Index notification_queue for batch claiming
+
+Revision ID: 006_notification_queue_claim
+Revises: 005_reminder_ledger
+Create Date: 2026-10-19 16:00:00
+
+Delivery workers claim due rows with
+SELECT ... WHERE stato IN ('pending', 'sending') AND programmata_per <= now
+ORDER BY programmata_per FOR UPDATE SKIP LOCKED.
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '006_notification_queue_claim'
+down_revision = '005_reminder_ledger'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_notification_queue_claim', 'notification_queue', ['stato', 'programmata_per'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_notification_queue_claim', table_name='notification_queue')
@@ -0,0 +1,38 @@
+"""Add notification digest columns
+
+Revision ID: 007_notification_digests
+Revises: 006_notification_queue_claim
+Create Date: 2026-10-19 17:00:00
+
+Queue rows of users in hourly/daily digest mode are held (stato 'digest')
+until their window closes, then coalesced into one digest row per user and
+channel that carries its own rendered titolo/messaggio and no notification.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '007_notification_digests'
+down_revision = '006_notification_queue_claim'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('notification_queue', sa.Column('titolo', sa.String(200), nullable=True))
+    op.add_column('notification_queue', sa.Column('messaggio', sa.Text(), nullable=True))
+    op.add_column('notification_queue', sa.Column('digest_id', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'fk_notification_queue_digest_id', 'notification_queue', 'notification_queue',
+        ['digest_id'], ['id']
+    )
+    op.alter_column('notification_queue', 'notification_id', existing_type=sa.Integer(), nullable=True)
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM notification_queue WHERE notification_id IS NULL")
+    op.alter_column('notification_queue', 'notification_id', existing_type=sa.Integer(), nullable=False)
+    op.drop_constraint('fk_notification_queue_digest_id', 'notification_queue', type_='foreignkey')
+    op.drop_column('notification_queue', 'digest_id')
+    op.drop_column('notification_queue', 'messaggio')
+    op.drop_column('notification_queue', 'titolo')
@@ -0,0 +1,42 @@
+"""Add change feed events
+
+Revision ID: 008_change_events
+Revises: 007_notification_digests
+Create Date: 2026-10-19 18:00:00
+
+Per-tenant stream of domain events (task status, workflow progress,
+documents, notifications). Clients resume from the last event ID they saw.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '008_change_events'
+down_revision = '007_notification_digests'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('change_events',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tenant_id', sa.String(50), nullable=False),
+        sa.Column('event_type', sa.String(50), nullable=False),
+        sa.Column('entity_type', sa.String(50), nullable=True),
+        sa.Column('entity_id', sa.Integer(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('data', sa.JSON(), nullable=True),
+        sa.Column('widgets', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_change_events_tenant_id', 'change_events', ['tenant_id'])
+    op.create_index('ix_change_events_tenant_offset', 'change_events', ['tenant_id', 'id'])
+    op.create_index('ix_change_events_created_at', 'change_events', ['created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_change_events_created_at', table_name='change_events')
+    op.drop_index('ix_change_events_tenant_offset', table_name='change_events')
+    op.drop_index('ix_change_events_tenant_id', table_name='change_events')
+    op.drop_table('change_events')
@@ -0,0 +1,47 @@
+"""Add content-addressed document blobs
+
+Revision ID: 009_document_blobs
+Revises: 008_change_events
+Create Date: 2026-10-19 20:00:00
+
+Document content stored once per tenant by SHA256, with reference counts
+from documents and versions. Existing files are moved in by
+scripts/migrate_document_blobs.py.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '009_document_blobs'
+down_revision = '008_change_events'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('document_blobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tenant_id', sa.String(50), nullable=False),
+        sa.Column('checksum', sa.String(64), nullable=False),
+        sa.Column('file_path', sa.String(500), nullable=False),
+        sa.Column('file_size', sa.Integer(), nullable=True),
+        sa.Column('ref_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('last_used_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('tenant_id', 'checksum', name='uq_document_blob_checksum'),
+        sa.UniqueConstraint('file_path', name='uq_document_blobs_file_path')
+    )
+    op.create_index('ix_document_blobs_tenant_id', 'document_blobs', ['tenant_id'])
+    op.create_index('ix_document_blobs_gc', 'document_blobs', ['ref_count', 'last_used_at'])
+    # Reference counting looks rows up by the path they point at
+    op.create_index('ix_documents_file_path', 'documents', ['file_path'])
+    op.create_index('ix_document_versions_file_path', 'document_versions', ['file_path'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_document_versions_file_path', table_name='document_versions')
+    op.drop_index('ix_documents_file_path', table_name='documents')
+    op.drop_index('ix_document_blobs_gc', table_name='document_blobs')
+    op.drop_index('ix_document_blobs_tenant_id', table_name='document_blobs')
+    op.drop_table('document_blobs')
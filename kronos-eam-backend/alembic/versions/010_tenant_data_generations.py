@@ -0,0 +1,31 @@
+"""Add per-tenant data generations
+
+Revision ID: 010_tenant_data_generations
+Revises: 009_document_blobs
+Create Date: 2026-10-20 09:00:00
+
+Counter bumped after every commit that changes plants, maintenances,
+performance, compliance checklists, documents, workflows or tasks; the
+semantic cache of agent answers is scoped to it.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '010_tenant_data_generations'
+down_revision = '009_document_blobs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('tenant_data_generations',
+        sa.Column('tenant_id', sa.String(50), nullable=False),
+        sa.Column('generation', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('tenant_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('tenant_data_generations')
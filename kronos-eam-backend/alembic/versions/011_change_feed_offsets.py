@@ -0,0 +1,53 @@
+"""Assign change feed offsets per tenant at commit
+
+Revision ID: 011_change_feed_offsets
+Revises: 010_tenant_data_generations
+Create Date: 2026-10-20 12:00:00
+
+Event IDs are assigned at flush, so a slower transaction could commit an
+event below an offset a client had already resumed from. Events now get a
+contiguous per-tenant stream offset from a counter row updated in the
+committing transaction.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '011_change_feed_offsets'
+down_revision = '010_tenant_data_generations'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('change_feed_streams',
+        sa.Column('tenant_id', sa.String(50), nullable=False),
+        sa.Column('last_offset', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('tenant_id')
+    )
+    op.add_column('change_events', sa.Column('stream_offset', sa.Integer(), nullable=True))
+
+    # Existing events keep their order
+    op.execute("""
+        UPDATE change_events SET stream_offset = numbered.stream_offset
+        FROM (
+            SELECT id, ROW_NUMBER() OVER (PARTITION BY tenant_id ORDER BY id) AS stream_offset
+            FROM change_events
+        ) AS numbered
+        WHERE change_events.id = numbered.id
+    """)
+    op.execute("""
+        INSERT INTO change_feed_streams (tenant_id, last_offset, updated_at)
+        SELECT tenant_id, MAX(stream_offset), NOW() FROM change_events GROUP BY tenant_id
+    """)
+
+    op.drop_index('ix_change_events_tenant_offset', table_name='change_events')
+    op.create_index('ix_change_events_tenant_offset', 'change_events', ['tenant_id', 'stream_offset'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_change_events_tenant_offset', table_name='change_events')
+    op.create_index('ix_change_events_tenant_offset', 'change_events', ['tenant_id', 'id'])
+    op.drop_column('change_events', 'stream_offset')
+    op.drop_table('change_feed_streams')
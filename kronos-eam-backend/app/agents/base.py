@@ -2,9 +2,11 @@
 Base Agent class for LangGraph agents
 """
 
-from typing import Dict, Any, Optional, List, TypedDict, Annotated
+from typing import Dict, Any, Optional, List, TypedDict, Annotated, AsyncIterator
 from abc import ABC, abstractmethod
 import logging
+import threading
+import uuid
 from datetime import datetime
 from enum import Enum
 
@@ -12,13 +14,24 @@ from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, System
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langgraph.graph import StateGraph, END
 from langgraph.prebuilt import ToolNode
-from langgraph.checkpoint.memory import MemorySaver
 
 from app.core.config import get_settings
+from app.core.agent_memory import get_agent_checkpointer
+from app.core.singleflight import CoalescingLLM
+from app.services.context_assembler import (
+    ContextAssembler, generation_input, message_tokens, prompt_size_stats, truncate_to_tokens
+)
+from app.services.agent_streaming import stream_graph_events
+from app.services.plant_context import agent_turn
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# Process-wide objects shared by every agent instance
+_shared_llms: Dict[tuple, Any] = {}
+_compiled_graphs: Dict[type, Any] = {}
+_shared_lock = threading.Lock()
+
 
 class AgentState(TypedDict):
     """Base state for all agents"""
@@ -32,23 +45,43 @@ class AgentState(TypedDict):
 
 
 class BaseAgent(ABC):
-    """Base class for all LangGraph agents"""
+    """
+    Base class for all LangGraph agents
+    
+    Instances are lightweight handles bound to a tenant/user. The LLM client
+    and the compiled graph are built once per process (per agent class) and
+    shared; conversation state lives in the process-wide bounded
+    checkpointer. Graph nodes therefore must read tenant and user from the
+    state, never from self.
+    """
     
     def __init__(self, tenant_id: str, user_id: Optional[str] = None):
         self.tenant_id = tenant_id
         self.user_id = user_id
         self.settings = get_settings()
         
-        # Initialize Gemini model
-        self.llm = self._create_llm()
-        
-        # Initialize memory
-        self.memory = MemorySaver()
-        
-        # Build the graph
-        self.graph = self._build_graph()
-        self.app = self.graph.compile(checkpointer=self.memory)
-        
+        # Identical concurrent prompts of a tenant share one model call
+        self.llm = CoalescingLLM(self._shared_llm())
+        self.memory = get_agent_checkpointer()
+        self.app = self._compiled_graph()
+        self.context_assembler = ContextAssembler()
+    
+    def _shared_llm(self):
+        """Gemini client shared by all agents with the same model settings"""
+        key = (self.settings.GEMINI_MODEL, self.settings.GOOGLE_API_KEY)
+        with _shared_lock:
+            if key not in _shared_llms:
+                _shared_llms[key] = self._create_llm()
+            return _shared_llms[key]
+    
+    def _compiled_graph(self):
+        """Graph of this agent class, compiled on first use"""
+        agent_class = type(self)
+        with _shared_lock:
+            if agent_class not in _compiled_graphs:
+                _compiled_graphs[agent_class] = self._build_graph().compile(checkpointer=self.memory)
+            return _compiled_graphs[agent_class]
+    
     def _create_llm(self):
         """Create Gemini LLM instance"""
         model_name = self.settings.GEMINI_MODEL or "gemini-1.5-pro"
@@ -82,46 +115,30 @@ Your role is to help users with energy asset management tasks.
 Always be helpful, accurate, and provide actionable insights.
 """
     
-    async def invoke(self, message: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        """Main entry point for agent invocation"""
+    async def invoke(
+        self,
+        message: str,
+        context: Optional[Dict[str, Any]] = None,
+        conversation_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Main entry point for agent invocation
+        
+        Args:
+            message: User message
+            context: Extra context for the graph
+            conversation_id: Resume this conversation's memory (a new
+                conversation per call when omitted)
+        """
         try:
-            # Prepare initial state
-            initial_state: AgentState = {
-                "messages": [
-                    SystemMessage(content=self._get_system_prompt()),
-                    HumanMessage(content=message)
-                ],
-                "tenant_id": self.tenant_id,
-                "user_id": self.user_id,
-                "context": context or {},
-                "current_step": "start",
-                "error": None,
-                "result": None
-            }
+            config = self._run_config(conversation_id)
+            initial_state = await self._initial_state(message, context, config)
             
-            # Create config with thread ID for memory
-            config = {
-                "configurable": {
-                    "thread_id": f"{self.tenant_id}_{self.user_id}_{datetime.utcnow().timestamp()}"
-                }
-            }
-            
-            # Run the graph
-            final_state = await self.app.ainvoke(initial_state, config)
+            # Run the graph; its tools share the plant snapshots of the turn
+            with agent_turn(self.tenant_id):
+                final_state = await self.app.ainvoke(initial_state, config)
             
-            # Extract result
-            if final_state.get("error"):
-                return {
-                    "success": False,
-                    "error": final_state["error"],
-                    "messages": final_state.get("messages", [])
-                }
-            
-            return {
-                "success": True,
-                "result": final_state.get("result", {}),
-                "messages": final_state.get("messages", [])
-            }
+            return self._final_result(final_state)
             
         except Exception as e:
             logger.error(f"Agent error: {str(e)}", exc_info=True)
@@ -131,6 +148,120 @@ Always be helpful, accurate, and provide actionable insights.
                 "messages": []
             }
     
+    async def astream(
+        self,
+        message: str,
+        context: Optional[Dict[str, Any]] = None,
+        conversation_id: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of invoke
+        
+        Yields node, token and tool events as the graph runs (see
+        stream_graph_events), then one "result" event shaped like the
+        return value of invoke (without messages).
+        """
+        try:
+            config = self._run_config(conversation_id)
+            initial_state = await self._initial_state(message, context, config)
+            with agent_turn(self.tenant_id):
+                async for event in stream_graph_events(self.app, initial_state, config):
+                    if event["type"] == "final":
+                        result = self._final_result(event["state"])
+                        result.pop("messages", None)
+                        yield {"type": "result", **result}
+                    else:
+                        yield event
+        except Exception as e:
+            logger.error(f"Agent error: {str(e)}", exc_info=True)
+            yield {"type": "result", "success": False, "error": str(e)}
+    
+    async def _initial_state(
+        self,
+        message: str,
+        context: Optional[Dict[str, Any]],
+        config: Dict[str, Any]
+    ) -> AgentState:
+        """Input of a turn: the conversation so far fitted to the token budget, plus the new message"""
+        previous = await self.app.aget_state(config)
+        assembled = self.context_assembler.assemble(
+            self._get_system_prompt(),
+            previous.values.get("messages", []) if previous else [],
+            HumanMessage(content=message)
+        )
+        return {
+            "messages": assembled.messages,
+            "tenant_id": self.tenant_id,
+            "user_id": self.user_id,
+            "context": context or {},
+            "current_step": "start",
+            "error": None,
+            "result": None
+        }
+    
+    def _run_config(self, conversation_id: Optional[str]) -> Dict[str, Any]:
+        # Thread ID scopes the conversation memory to tenant, user and agent type;
+        # tenant_id scopes the coalescing of model calls
+        return {
+            "configurable": {
+                "thread_id": self.thread_id(conversation_id or uuid.uuid4().hex),
+                "tenant_id": self.tenant_id
+            }
+        }
+    
+    @staticmethod
+    def _final_result(final_state: Dict[str, Any]) -> Dict[str, Any]:
+        if final_state.get("error"):
+            return {
+                "success": False,
+                "error": final_state["error"],
+                "messages": final_state.get("messages", [])
+            }
+        
+        messages = final_state.get("messages", [])
+        replies = [message.content for message in messages if isinstance(message, AIMessage)]
+        return {
+            "success": True,
+            "result": final_state.get("result", {}),
+            "reply": replies[-1] if replies else None,
+            "messages": messages
+        }
+    
+    async def _generate(self, state: AgentState, prompt: str):
+        """Model call of a generating node: the turn's assembled conversation plus the node prompt"""
+        messages = generation_input(state["messages"], prompt)
+        prompt_size_stats.observe(type(self).__name__, sum(message_tokens(m) for m in messages))
+        return await self.llm.ainvoke(messages)
+    
+    @staticmethod
+    def _fit_data(data: Any) -> str:
+        """Tool data for a node prompt, cut to its token budget"""
+        return truncate_to_tokens(str(data), settings.AGENT_CONTEXT_DATA_TOKENS)
+    
+    @staticmethod
+    def _tool_results(state: AgentState) -> List[Dict[str, Any]]:
+        """Outcomes of the planned tool calls run by the tools node"""
+        return state["context"].get("tool_results", [])
+    
+    async def record_turn(self, message: str, reply: str, conversation_id: str) -> None:
+        """Add a turn answered without running the graph (semantic cache hit) to the conversation memory"""
+        config = self._run_config(conversation_id)
+        previous = await self.app.aget_state(config)
+        history = list(previous.values.get("messages", [])) if previous else []
+        await self.app.aupdate_state(config, {
+            "messages": history + [HumanMessage(content=message), AIMessage(content=reply)]
+        })
+    
+    def has_history(self, conversation_id: Optional[str]) -> bool:
+        """Whether the conversation already has turns in memory"""
+        if conversation_id is None:
+            return False
+        return self.memory.get_tuple(self._run_config(conversation_id)) is not None
+    
+    def thread_id(self, conversation_id: str) -> str:
+        """Checkpointer thread of a conversation with this agent"""
+        return f"{self.tenant_id}:{self.user_id}:{type(self).__name__}:{conversation_id}"
+    
     def _should_continue(self, state: AgentState) -> str:
         """Determine if processing should continue"""
         if state.get("error"):
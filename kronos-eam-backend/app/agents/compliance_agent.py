@@ -8,9 +8,9 @@ import logging
 
 from langchain_core.messages import HumanMessage, AIMessage
 from langgraph.graph import StateGraph, END
-from langgraph.prebuilt import ToolNode
 
 from app.agents.base import BaseAgent, AgentState
+from app.core.agent_tools import ParallelToolNode
 from app.agents.tools import (
     get_plant_info,
     get_compliance_status,
@@ -59,7 +59,7 @@ Always provide specific regulatory references and deadlines.
         # Add nodes
         workflow.add_node("analyze", self._analyze_compliance_request)
         workflow.add_node("check_compliance", self._check_compliance_status)
-        workflow.add_node("tools", ToolNode(self._get_tools()))
+        workflow.add_node("tools", ParallelToolNode(self._get_tools()))
         workflow.add_node("assess_risks", self._assess_compliance_risks)
         workflow.add_node("recommend", self._generate_recommendations)
         workflow.add_node("respond", self._generate_response)
@@ -153,7 +153,7 @@ Always provide specific regulatory references and deadlines.
             
             # Generate recommendations based on risks
             prompt = f"""Based on the compliance risk assessment:
-{risk_assessment}
+{self._fit_data(risk_assessment)}
 
 Provide:
 1. Immediate actions required
@@ -163,10 +163,7 @@ Provide:
 5. Risk mitigation strategies
 """
             
-            response = await self.llm.ainvoke([
-                {"role": "system", "content": self._get_system_prompt()},
-                {"role": "user", "content": prompt}
-            ])
+            response = await self._generate(state, prompt)
             
             state["context"]["recommendations"] = response.content
             state["current_step"] = "recommendations_generated"
@@ -202,10 +199,8 @@ Provide:
     def _extract_tool_results(self, state: AgentState) -> Dict[str, Any]:
         """Extract results from tool calls"""
         results = {}
-        for msg in state["messages"]:
-            if hasattr(msg, "tool_calls_results"):
-                for result in msg.tool_calls_results:
-                    results[result.get("tool_name", "unknown")] = result.get("output", {})
+        for result in self._tool_results(state):
+            results[result.get("tool_name", "unknown")] = result.get("output", {})
         return results
     
     async def _perform_risk_assessment(self, tool_results: Dict[str, Any]) -> Dict[str, Any]:
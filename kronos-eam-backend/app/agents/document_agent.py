@@ -8,9 +8,9 @@ import logging
 
 from langchain_core.messages import HumanMessage, AIMessage
 from langgraph.graph import StateGraph, END
-from langgraph.prebuilt import ToolNode
 
 from app.agents.base import BaseAgent, AgentState
+from app.core.agent_tools import ParallelToolNode
 from app.agents.tools import search_documents, get_plant_info
 from app.agents.rag_tools import (
     semantic_document_search,
@@ -64,7 +64,7 @@ Always extract specific dates, reference numbers, and key obligations.
         # Add nodes
         workflow.add_node("analyze", self._analyze_document_request)
         workflow.add_node("search", self._search_documents)
-        workflow.add_node("tools", ToolNode(self._get_tools()))
+        workflow.add_node("tools", ParallelToolNode(self._get_tools()))
         workflow.add_node("extract", self._extract_information)
         workflow.add_node("synthesize", self._synthesize_findings)
         workflow.add_node("respond", self._generate_response)
@@ -151,12 +151,9 @@ Always extract specific dates, reference numbers, and key obligations.
         """Synthesize findings from document analysis"""
         try:
             extracted_info = state["context"].get("extracted_information", {})
-            original_query = state["messages"][-1].content if state["messages"] else ""
             
             prompt = f"""Based on the extracted document information:
-{extracted_info}
-
-Original request: {original_query}
+{self._fit_data(extracted_info)}
 
 Provide:
 1. Key findings relevant to the request
@@ -166,10 +163,7 @@ Provide:
 5. Recommendations for document management
 """
             
-            response = await self.llm.ainvoke([
-                {"role": "system", "content": self._get_system_prompt()},
-                {"role": "user", "content": prompt}
-            ])
+            response = await self._generate(state, prompt)
             
             state["context"]["synthesis"] = response.content
             state["current_step"] = "synthesis_complete"
@@ -229,13 +223,11 @@ Provide:
         """Extract document search results from state"""
         documents = []
         
-        for msg in state["messages"]:
-            if hasattr(msg, "tool_calls_results"):
-                for result in msg.tool_calls_results:
-                    if result.get("tool_name") == "search_documents":
-                        docs = result.get("output", [])
-                        if isinstance(docs, list):
-                            documents.extend(docs)
+        for result in self._tool_results(state):
+            if result.get("tool_name") == "search_documents":
+                docs = result.get("output", [])
+                if isinstance(docs, list):
+                    documents.extend(docs)
         
         # Remove duplicates based on document ID
         seen = set()
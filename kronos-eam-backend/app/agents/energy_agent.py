@@ -8,9 +8,9 @@ import logging
 
 from langchain_core.messages import HumanMessage, AIMessage
 from langgraph.graph import StateGraph, END
-from langgraph.prebuilt import ToolNode
 
 from app.agents.base import BaseAgent, AgentState
+from app.core.agent_tools import ParallelToolNode
 from app.agents.tools import (
     get_plant_info,
     get_performance_metrics,
@@ -57,7 +57,7 @@ Always provide quantified recommendations with expected improvements.
         # Add nodes
         workflow.add_node("analyze", self._analyze_energy_request)
         workflow.add_node("collect_data", self._collect_performance_data)
-        workflow.add_node("tools", ToolNode(self._get_tools()))
+        workflow.add_node("tools", ParallelToolNode(self._get_tools()))
         workflow.add_node("analyze_performance", self._analyze_performance)
         workflow.add_node("optimize", self._generate_optimizations)
         workflow.add_node("respond", self._generate_response)
@@ -155,7 +155,7 @@ Always provide quantified recommendations with expected improvements.
             analysis = state["context"].get("performance_analysis", {})
             
             prompt = f"""Based on the performance analysis:
-{analysis}
+{self._fit_data(analysis)}
 
 Provide:
 1. Specific optimization opportunities with quantified improvements
@@ -165,10 +165,7 @@ Provide:
 5. Implementation timeline
 """
             
-            response = await self.llm.ainvoke([
-                {"role": "system", "content": self._get_system_prompt()},
-                {"role": "user", "content": prompt}
-            ])
+            response = await self._generate(state, prompt)
             
             state["context"]["optimizations"] = response.content
             state["current_step"] = "optimizations_generated"
@@ -215,19 +212,17 @@ Provide:
         }
         
         # Parse tool results from messages
-        for msg in state["messages"]:
-            if hasattr(msg, "tool_calls_results"):
-                for result in msg.tool_calls_results:
-                    if "period_days" in result.get("args", {}):
-                        period = result["args"]["period_days"]
-                        if period == 7:
-                            results["weekly_metrics"] = result.get("output", {})
-                        elif period == 30:
-                            results["monthly_metrics"] = result.get("output", {})
-                        elif period == 90:
-                            results["quarterly_metrics"] = result.get("output", {})
-                    elif result.get("tool_name") == "get_plant_info":
-                        results["impianto_info"] = result.get("output", {})
+        for result in self._tool_results(state):
+            if "period_days" in result.get("args", {}):
+                period = result["args"]["period_days"]
+                if period == 7:
+                    results["weekly_metrics"] = result.get("output", {})
+                elif period == 30:
+                    results["monthly_metrics"] = result.get("output", {})
+                elif period == 90:
+                    results["quarterly_metrics"] = result.get("output", {})
+            elif result.get("tool_name") == "get_plant_info":
+                results["impianto_info"] = result.get("output", {})
         
         return results
     
@@ -8,9 +8,9 @@ import logging
 
 from langchain_core.messages import HumanMessage, AIMessage
 from langgraph.graph import StateGraph, END
-from langgraph.prebuilt import ToolNode
 
 from app.agents.base import BaseAgent, AgentState
+from app.core.agent_tools import ParallelToolNode
 from app.agents.tools import (
     get_plant_info,
     get_maintenance_schedule,
@@ -56,7 +56,7 @@ Use the available tools to gather data and create tasks when needed.
         # Add nodes
         workflow.add_node("analyze", self._analyze_request)
         workflow.add_node("gather_data", self._gather_maintenance_data)
-        workflow.add_node("tools", ToolNode(self._get_tools()))
+        workflow.add_node("tools", ParallelToolNode(self._get_tools()))
         workflow.add_node("generate_plan", self._generate_maintenance_plan)
         workflow.add_node("respond", self._generate_response)
         
@@ -139,14 +139,12 @@ Use the available tools to gather data and create tasks when needed.
         try:
             # Extract tool results from messages
             tool_results = []
-            for msg in state["messages"]:
-                if hasattr(msg, "tool_calls_results"):
-                    tool_results.extend(msg.tool_calls_results)
+            tool_results.extend(self._tool_results(state))
             
             # Generate maintenance plan based on data
             prompt = f"""Based on the following data, generate a maintenance plan:
 
-Tool Results: {tool_results}
+Tool Results: {self._fit_data(tool_results)}
 
 Provide:
 1. Current maintenance status
@@ -156,10 +154,7 @@ Provide:
 5. Optimization suggestions
 """
             
-            response = await self.llm.ainvoke([
-                {"role": "system", "content": self._get_system_prompt()},
-                {"role": "user", "content": prompt}
-            ])
+            response = await self._generate(state, prompt)
             
             state["context"]["maintenance_plan"] = response.content
             state["current_step"] = "plan_generated"
@@ -6,8 +6,10 @@ from typing import Dict, Any, Optional, List
 from langchain_core.tools import tool
 import logging
 
+from app.core.config import settings
 from app.rag.factory import VectorStoreFactory
 from app.rag.embeddings import EmbeddingService
+from app.services.context_assembler import fit_chunks
 
 logger = logging.getLogger(__name__)
 
@@ -51,12 +53,12 @@ async def semantic_document_search(query: str, tenant_id: str, top_k: int = 5) -
             top_k=top_k
         )
         
-        # Format results
+        # Format results: most relevant chunks within the context budget
         formatted_results = []
-        for result in results:
+        for result, content in fit_chunks(results, settings.AGENT_CONTEXT_RAG_TOKENS):
             formatted_results.append({
                 "id": result.id,
-                "content": result.content[:500] + "..." if len(result.content) > 500 else result.content,
+                "content": content,
                 "score": result.score,
                 "metadata": result.metadata
             })
@@ -104,12 +106,12 @@ async def hybrid_document_search(
             alpha=0.7  # Weight towards semantic search
         )
         
-        # Format results
+        # Format results: most relevant chunks within the context budget
         formatted_results = []
-        for result in results:
+        for result, content in fit_chunks(results, settings.AGENT_CONTEXT_RAG_TOKENS):
             formatted_results.append({
                 "id": result.id,
-                "content": result.content[:500] + "..." if len(result.content) > 500 else result.content,
+                "content": content,
                 "score": result.score,
                 "metadata": result.metadata,
                 "document_name": result.metadata.get("document_name", "Unknown"),
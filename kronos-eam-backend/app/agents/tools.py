@@ -8,18 +8,25 @@ from langchain_core.tools import tool
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_, func
 
-from app.core.database import get_db
 from app.models.plant import (
     Plant, 
     PlantPerformance,
     Maintenance,
     MaintenanceStatusEnum,
-    ComplianceChecklist
+    MaintenanceTypeEnum
 )
-from app.models.document import Document, DocumentStatusEnum
+from app.models.document import Document
 from app.models.workflow import Workflow, WorkflowTask, TaskStatusEnum
 from app.rag.factory import VectorStoreFactory
 from app.rag.embeddings import EmbeddingService
+from app.services.plant_context import (
+    get_plant_snapshot,
+    invalidate_plant_snapshot,
+    tool_session,
+    plant_info,
+    maintenance_schedule,
+    compliance_status
+)
 import logging
 import asyncio
 
@@ -48,116 +55,51 @@ def get_embedding_service():
 def get_plant_info(plant_id: int, tenant_id: str) -> Dict[str, Any]:
     """Get detailed information about a power plant"""
     try:
-        db = next(get_db(tenant_id))
-        
-        plant = db.query(Plant).filter(
-            Plant.id == plant_id,
-            Plant.tenant_id == tenant_id
-        ).first()
-        
-        if not plant:
+        snapshot = get_plant_snapshot(plant_id, tenant_id)
+        if not snapshot:
             return {"error": "Plant not found"}
         
-        return {
-            "id": plant.id,
-            "name": plant.name,
-            "type": plant.type,
-            "installed_power": plant.power_kw,
-            "status": plant.status,
-            "municipality": plant.municipality,
-            "province": plant.province,
-            "activation_date": None,  # Field not available in model
-            "registry": {
-                "censimp_code": plant.registry.censimp if plant.registry else None,
-                "pod": plant.registry.pod if plant.registry else None,
-                "connection_voltage": plant.registry.connection_voltage if plant.registry else None
-            }
-        }
+        return plant_info(snapshot)
     except Exception as e:
         logger.error(f"Error getting plant info: {e}")
         return {"error": str(e)}
-    finally:
-        db.close()
 
 
 @tool  
 def get_maintenance_schedule(impianto_id: int, tenant_id: str, days_ahead: int = 30) -> List[Dict[str, Any]]:
     """Get upcoming maintenance schedule for a power plant"""
     try:
-        db = next(get_db(tenant_id))
-        
-        end_date = datetime.utcnow() + timedelta(days=days_ahead)
+        snapshot = get_plant_snapshot(impianto_id, tenant_id)
+        if not snapshot:
+            return []
         
-        manutenzioni = db.query(Maintenance).filter(
-            Maintenance.impianto_id == impianto_id,
-            Maintenance.data_pianificata <= end_date,
-            Maintenance.stato.in_([MaintenanceStatusEnum.PLANNED, MaintenanceStatusEnum.IN_PROGRESS])
-        ).order_by(Maintenance.data_pianificata).all()
-        
-        return [
-            {
-                "id": m.id,
-                "tipo": m.tipo,
-                "descrizione": m.descrizione,
-                "data_pianificata": m.data_pianificata.isoformat(),
-                "stato": m.stato
-            }
-            for m in manutenzioni
-        ]
+        return maintenance_schedule(snapshot, days_ahead)
     except Exception as e:
         logger.error(f"Error getting maintenance schedule: {e}")
         return []
-    finally:
-        db.close()
 
 
 @tool
 def get_compliance_status(impianto_id: int, tenant_id: str) -> Dict[str, Any]:
     """Get compliance status for a power plant"""
     try:
-        db = next(get_db(tenant_id))
-        
-        # Get latest checklist
-        checklist = db.query(ChecklistConformita).filter(
-            ChecklistConformita.impianto_id == impianto_id
-        ).order_by(ChecklistConformita.created_at.desc()).first()
-        
-        if not checklist:
-            return {"compliant": False, "score": 0, "issues": ["No compliance checklist found"]}
-        
-        # Count expiring documents
-        expiring_docs = db.query(func.count(Document.id)).filter(
-            Document.impianto_id == impianto_id,
-            Document.stato == DocumentStatusEnum.VALIDO,
-            Document.data_scadenza <= datetime.utcnow() + timedelta(days=30)
-        ).scalar()
-        
-        issues = []
-        if not checklist.autorizzazione_unica:
-            issues.append("Missing Autorizzazione Unica")
-        if not checklist.connessione_rete:
-            issues.append("Missing grid connection agreement")
-        if expiring_docs > 0:
-            issues.append(f"{expiring_docs} documents expiring soon")
+        snapshot = get_plant_snapshot(impianto_id, tenant_id)
+        if not snapshot:
+            return {"error": "Plant not found"}
         
-        return {
-            "compliant": checklist.conforme,
-            "score": checklist.punteggio_conformita,
-            "last_check": checklist.ultima_verifica.isoformat() if checklist.ultima_verifica else None,
-            "issues": issues
-        }
+        return compliance_status(snapshot)
     except Exception as e:
         logger.error(f"Error getting compliance status: {e}")
         return {"error": str(e)}
-    finally:
-        db.close()
 
 
 @tool
 def get_performance_metrics(impianto_id: int, tenant_id: str, period_days: int = 7) -> Dict[str, Any]:
     """Get performance metrics for a power plant"""
     try:
-        db = next(get_db(tenant_id))
+        snapshot = get_plant_snapshot(impianto_id, tenant_id)
+        if not snapshot:
+            return {"error": "Plant not found"}
         
         start_date = datetime.utcnow() - timedelta(days=period_days)
         
@@ -166,28 +108,28 @@ def get_performance_metrics(impianto_id: int, tenant_id: str, period_days: int =
         start_year = start_date.year
         start_month = start_date.month
         
-        performance_data = db.query(
-            func.avg(PlantPerformance.produzione_effettiva_kwh).label('avg_production'),
-            func.sum(PlantPerformance.produzione_effettiva_kwh).label('total_production'),
-            func.avg(PlantPerformance.performance_ratio).label('avg_efficiency'),
-            func.count(PlantPerformance.id).label('data_points')
-        ).filter(
-            PlantPerformance.impianto_id == impianto_id,
-            or_(
-                PlantPerformance.anno > start_year,
-                and_(
-                    PlantPerformance.anno == start_year,
-                    PlantPerformance.mese >= start_month
+        with tool_session(tenant_id) as db:
+            performance_data = db.query(
+                func.avg(PlantPerformance.actual_production_kwh).label('avg_production'),
+                func.sum(PlantPerformance.actual_production_kwh).label('total_production'),
+                func.avg(PlantPerformance.performance_ratio).label('avg_efficiency'),
+                func.count(PlantPerformance.id).label('data_points')
+            ).filter(
+                PlantPerformance.plant_id == impianto_id,
+                or_(
+                    PlantPerformance.year > start_year,
+                    and_(
+                        PlantPerformance.year == start_year,
+                        PlantPerformance.month >= start_month
+                    )
                 )
-            )
-        ).first()
+            ).first()
         
-        # Get impianto capacity
-        impianto = db.query(Plant).filter(Plant.id == impianto_id).first()
+        # Capacity from the snapshot
         capacity_factor = None
-        if impianto and impianto.potenza_installata and performance_data.avg_production:
+        if snapshot.plant["power_kw"] and performance_data.avg_production:
             # Calculate capacity factor
-            theoretical_max = impianto.potenza_installata * 24 * period_days
+            theoretical_max = snapshot.plant["power_kw"] * 24 * period_days
             capacity_factor = (performance_data.total_production / theoretical_max) * 100
         
         return {
@@ -201,85 +143,77 @@ def get_performance_metrics(impianto_id: int, tenant_id: str, period_days: int =
     except Exception as e:
         logger.error(f"Error getting performance metrics: {e}")
         return {"error": str(e)}
-    finally:
-        db.close()
 
 
 @tool
 def search_documents(query: str, tenant_id: str, impianto_id: Optional[int] = None) -> List[Dict[str, Any]]:
     """Search for documents related to power plants"""
     try:
-        db = next(get_db(tenant_id))
-        
-        # Build query
-        q = db.query(Document).filter(
-            Document.tenant_id == tenant_id
-        )
-        
-        if impianto_id:
-            q = q.filter(Document.impianto_id == impianto_id)
-        
-        # Search in nome and descrizione
-        search_filter = or_(
-            Document.nome.ilike(f"%{query}%"),
-            Document.descrizione.ilike(f"%{query}%")
-        )
-        q = q.filter(search_filter)
-        
-        documents = q.limit(10).all()
-        
-        return [
-            {
-                "id": doc.id,
-                "nome": doc.nome,
-                "tipo": doc.tipo,
-                "categoria": doc.categoria,
-                "stato": doc.stato,
-                "data_scadenza": doc.data_scadenza.isoformat() if doc.data_scadenza else None,
-                "impianto_id": doc.impianto_id
-            }
-            for doc in documents
-        ]
+        with tool_session(tenant_id) as db:
+            # Build query
+            q = db.query(Document).filter(
+                Document.tenant_id == tenant_id
+            )
+            
+            if impianto_id:
+                q = q.filter(Document.impianto_id == impianto_id)
+            
+            # Search in nome and descrizione
+            search_filter = or_(
+                Document.nome.ilike(f"%{query}%"),
+                Document.descrizione.ilike(f"%{query}%")
+            )
+            q = q.filter(search_filter)
+            
+            documents = q.limit(10).all()
+            
+            return [
+                {
+                    "id": doc.id,
+                    "nome": doc.nome,
+                    "tipo": doc.tipo,
+                    "categoria": doc.categoria,
+                    "stato": doc.stato,
+                    "data_scadenza": doc.data_scadenza.isoformat() if doc.data_scadenza else None,
+                    "impianto_id": doc.impianto_id
+                }
+                for doc in documents
+            ]
     except Exception as e:
         logger.error(f"Error searching documents: {e}")
         return []
-    finally:
-        db.close()
 
 
 @tool
 def get_active_workflows(tenant_id: str, impianto_id: Optional[int] = None) -> List[Dict[str, Any]]:
     """Get active workflows"""
     try:
-        db = next(get_db(tenant_id))
-        
-        q = db.query(Workflow).filter(
-            Workflow.tenant_id == tenant_id,
-            Workflow.stato_corrente.in_(["Attivo", "In Corso"])
-        )
-        
-        if impianto_id:
-            q = q.filter(Workflow.impianto_id == impianto_id)
-        
-        workflows = q.all()
-        
-        return [
-            {
-                "id": w.id,
-                "nome": w.nome,
-                "tipo": w.tipo,
-                "stato": w.stato_corrente,
-                "progresso": w.progresso,
-                "data_scadenza": w.data_scadenza.isoformat() if w.data_scadenza else None,
-                "impianto_nome": w.impiantoNome
-            }
-            for w in workflows
-        ]
+        with tool_session(tenant_id) as db:
+            q = db.query(Workflow).filter(
+                Workflow.tenant_id == tenant_id,
+                Workflow.current_status.in_(["Attivo", "In Corso"])
+            )
+            
+            if impianto_id:
+                q = q.filter(Workflow.plant_id == impianto_id)
+            
+            workflows = q.all()
+            
+            return [
+                {
+                    "id": w.id,
+                    "nome": w.name,
+                    "tipo": w.type,
+                    "stato": w.current_status,
+                    "progresso": w.progress,
+                    "data_scadenza": w.due_date.isoformat() if w.due_date else None,
+                    "impianto_nome": w.plant_name
+                }
+                for w in workflows
+            ]
     except Exception as e:
         logger.error(f"Error getting workflows: {e}")
         return []
-    finally:
-        db.close()
 
 
 @tool
@@ -292,87 +226,81 @@ def create_maintenance_task(
 ) -> Dict[str, Any]:
     """Create a new maintenance task"""
     try:
-        db = next(get_db(tenant_id))
-        
-        # Verify impianto exists
-        impianto = db.query(Plant).filter(
-            Plant.id == impianto_id,
-            Plant.tenant_id == tenant_id
-        ).first()
-        
-        if not impianto:
-            return {"error": "Plant not found"}
-        
-        # Create maintenance
-        manutenzione = Maintenance(
-            impianto_id=impianto_id,
-            tenant_id=tenant_id,
-            tipo=tipo,
-            descrizione=descrizione,
-            data_pianificata=datetime.fromisoformat(data_pianificata),
-            stato=MaintenanceStatusEnum.PLANNED
-        )
-        
-        db.add(manutenzione)
-        db.commit()
-        db.refresh(manutenzione)
-        
-        return {
-            "success": True,
-            "id": manutenzione.id,
-            "message": f"Maintenance task created for {impianto.nome}"
-        }
+        with tool_session(tenant_id) as db:
+            # Verify impianto exists
+            impianto = db.query(Plant).filter(
+                Plant.id == impianto_id,
+                Plant.tenant_id == tenant_id
+            ).first()
+            
+            if not impianto:
+                return {"error": "Plant not found"}
+            
+            # Create maintenance
+            manutenzione = Maintenance(
+                plant_id=impianto_id,
+                tenant_id=tenant_id,
+                type=MaintenanceTypeEnum(tipo),
+                description=descrizione,
+                planned_date=datetime.fromisoformat(data_pianificata),
+                status=MaintenanceStatusEnum.PLANNED
+            )
+            
+            db.add(manutenzione)
+            db.commit()
+            db.refresh(manutenzione)
+            invalidate_plant_snapshot(impianto_id, tenant_id)
+            
+            return {
+                "success": True,
+                "id": manutenzione.id,
+                "message": f"Maintenance task created for {impianto.name}"
+            }
     except Exception as e:
         logger.error(f"Error creating maintenance task: {e}")
-        db.rollback()
         return {"error": str(e)}
-    finally:
-        db.close()
 
 
 @tool
 def update_task_status(task_id: int, tenant_id: str, new_status: str, notes: Optional[str] = None) -> Dict[str, Any]:
     """Update the status of a workflow task"""
     try:
-        db = next(get_db(tenant_id))
-        
-        # Get task with tenant check through workflow
-        task = db.query(WorkflowTask).join(Workflow).filter(
-            WorkflowTask.id == task_id,
-            Workflow.tenant_id == tenant_id
-        ).first()
-        
-        if not task:
-            return {"error": "Task not found"}
-        
-        # Update status
-        task.status = TaskStatusEnum[new_status.upper()]
-        
-        if task.status == TaskStatusEnum.COMPLETED:
-            task.completato_data = datetime.utcnow()
-        
-        # Add comment if notes provided
-        if notes:
-            from app.models.workflow import TaskComment
-            comment = TaskComment(
-                task_id=task_id,
-                user_id=1,  # System user
-                testo=f"Status updated to {new_status}: {notes}",
-                tenant_id=tenant_id
-            )
-            db.add(comment)
-        
-        db.commit()
-        
-        return {
-            "success": True,
-            "task_id": task_id,
-            "new_status": new_status,
-            "message": f"Task status updated to {new_status}"
-        }
+        with tool_session(tenant_id) as db:
+            # Get task with tenant check through workflow
+            task = db.query(WorkflowTask).join(Workflow).filter(
+                WorkflowTask.id == task_id,
+                Workflow.tenant_id == tenant_id
+            ).first()
+            
+            if not task:
+                return {"error": "Task not found"}
+            
+            # Update status
+            task.status = TaskStatusEnum[new_status.upper()]
+            
+            if task.status == TaskStatusEnum.COMPLETED:
+                task.completato_data = datetime.utcnow()
+            
+            # Add comment if notes provided
+            if notes:
+                from app.models.workflow import TaskComment
+                comment = TaskComment(
+                    task_id=task_id,
+                    user_id=1,  # System user
+                    testo=f"Status updated to {new_status}: {notes}",
+                    tenant_id=tenant_id
+                )
+                db.add(comment)
+            
+            db.commit()
+            invalidate_plant_snapshot(task.workflow.plant_id, tenant_id)
+            
+            return {
+                "success": True,
+                "task_id": task_id,
+                "new_status": new_status,
+                "message": f"Task status updated to {new_status}"
+            }
     except Exception as e:
         logger.error(f"Error updating task status: {e}")
-        db.rollback()
-        return {"error": str(e)}
-    finally:
-        db.close()
\ No newline at end of file
+        return {"error": str(e)}
\ No newline at end of file
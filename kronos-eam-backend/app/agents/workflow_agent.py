@@ -8,9 +8,9 @@ import logging
 
 from langchain_core.messages import HumanMessage, AIMessage
 from langgraph.graph import StateGraph, END
-from langgraph.prebuilt import ToolNode
 
 from app.agents.base import BaseAgent, AgentState
+from app.core.agent_tools import ParallelToolNode
 from app.agents.tools import (
     get_plant_info,
     get_active_workflows,
@@ -61,7 +61,7 @@ Help users navigate Italian energy sector bureaucracy efficiently.
         # Add nodes
         workflow.add_node("analyze", self._analyze_workflow_request)
         workflow.add_node("assess_status", self._assess_workflow_status)
-        workflow.add_node("tools", ToolNode(self._get_tools()))
+        workflow.add_node("tools", ParallelToolNode(self._get_tools()))
         workflow.add_node("plan_actions", self._plan_workflow_actions)
         workflow.add_node("execute", self._execute_workflow_steps)
         workflow.add_node("respond", self._generate_response)
@@ -161,7 +161,7 @@ Help users navigate Italian energy sector bureaucracy efficiently.
             
             # Generate detailed execution steps
             prompt = f"""Based on the workflow action plan:
-{action_plan}
+{self._fit_data(action_plan)}
 
 Provide:
 1. Step-by-step execution guide
@@ -171,10 +171,7 @@ Provide:
 5. Automation opportunities
 """
             
-            response = await self.llm.ainvoke([
-                {"role": "system", "content": self._get_system_prompt()},
-                {"role": "user", "content": prompt}
-            ])
+            response = await self._generate(state, prompt)
             
             state["context"]["execution_guide"] = response.content
             state["current_step"] = "execution_planned"
@@ -246,13 +243,11 @@ Provide:
         workflows = []
         documents = []
         
-        for msg in state["messages"]:
-            if hasattr(msg, "tool_calls_results"):
-                for result in msg.tool_calls_results:
-                    if result.get("tool_name") == "get_active_workflows":
-                        workflows = result.get("output", [])
-                    elif result.get("tool_name") == "search_documents":
-                        documents = result.get("output", [])
+        for result in self._tool_results(state):
+            if result.get("tool_name") == "get_active_workflows":
+                workflows = result.get("output", [])
+            elif result.get("tool_name") == "search_documents":
+                documents = result.get("output", [])
         
         return {
             "active_workflows": workflows,
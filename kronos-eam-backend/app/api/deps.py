@@ -11,7 +11,7 @@ import redis
 
 from app.core.database import get_db
 from app.core.config import settings
-from app.core.security import get_current_active_user, TokenData, TenantContext
+from app.core.security import get_current_active_user, get_current_active_stream_user, TokenData, TenantContext
 
 
 def get_redis_client() -> Optional[redis.Redis]:
@@ -23,7 +23,8 @@ from app.api.v1.endpoints import (
     chat,
     smart_assistant,
     tasks,
-    audit
+    audit,
+    changes
 )
 
 api_router = APIRouter()
@@ -152,4 +153,11 @@ api_router.include_router(
     audit.router,
     prefix="/audit",
     tags=["audit"]
-)
\ No newline at end of file
+)
+
+# Change feed (server push)
+api_router.include_router(
+    changes.router,
+    prefix="/changes",
+    tags=["changes"]
+)
@@ -0,0 +1,61 @@
+"""
+Change feed endpoints: catch-up reads and Server-Sent Events stream
+"""
+
+from typing import Optional, Dict, Any
+from fastapi import APIRouter, Depends, Header, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.api import deps
+from app.core.database import get_db_context
+from app.core.security import TokenData
+from app.services.change_feed_service import ChangeFeedService, stream_changes, format_sse
+
+
+router = APIRouter()
+
+
+@router.get("/", response_model=Dict[str, Any])
+async def get_changes(
+    offset: Optional[int] = Query(None, ge=0, description="Last offset seen; omit to get the current offset"),
+    limit: int = Query(500, ge=1, le=1000),
+    db: Session = Depends(deps.get_tenant_db),
+    current_user: TokenData = Depends(deps.get_current_active_user)
+):
+    """Events after an offset, for clients that catch up without a stream"""
+    service = ChangeFeedService(db)
+    if offset is None:
+        return {"events": [], "offset": service.latest_offset(current_user.tenant_id), "reset": False}
+    return service.read(current_user.tenant_id, int(current_user.sub), offset, limit)
+
+
+@router.get("/stream")
+async def stream_change_feed(
+    offset: Optional[int] = Query(None, ge=0, description="Resume after this offset"),
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+    current_user: TokenData = Depends(deps.get_current_active_stream_user)
+):
+    """
+    Server-Sent Events stream of the tenant's change feed
+
+    EventSource clients pass the access token as the `token` query parameter.
+    Browsers reconnect with Last-Event-ID automatically, which resumes the
+    stream where it stopped.
+    """
+    if offset is None and last_event_id and last_event_id.isdigit():
+        offset = int(last_event_id)
+
+    tenant_id = current_user.tenant_id
+    user_id = int(current_user.sub)
+
+    async def events():
+        yield "retry: 3000\n\n"
+        async for change in stream_changes(lambda: get_db_context(tenant_id), tenant_id, user_id, offset):
+            yield ": keep-alive\n\n" if change is None else format_sse(change)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -5,6 +5,7 @@ Chat endpoints for AI agent interactions
 from typing import Optional, List
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_current_active_user, get_tenant_db
@@ -19,7 +20,8 @@ from app.schemas.chat import (
 )
 from app.services.agent_service import agent_service, AgentType
 from app.models.chat import ChatSession as ChatSessionModel, ChatMessage as ChatMessageModel
-from app.core.database import get_db
+from app.services.agent_streaming import format_agent_sse
+from app.core.database import get_db, get_db_context
 
 router = APIRouter()
 
@@ -39,38 +41,8 @@ async def chat_with_agent(
     - **context**: Optional context data (e.g., impianto_id)
     """
     try:
-        # Create or get session
-        if request.session_id:
-            session = db.query(ChatSessionModel).filter(
-                ChatSessionModel.id == request.session_id,
-                ChatSessionModel.tenant_id == current_user.tenant_id
-            ).first()
-            if not session:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Session not found"
-                )
-        else:
-            # Create new session
-            session = ChatSessionModel(
-                tenant_id=current_user.tenant_id,
-                user_id=current_user.sub,
-                agent_type=request.agent_type or AgentType.GENERAL,
-                title=request.message[:50] + "..." if len(request.message) > 50 else request.message
-            )
-            db.add(session)
-            db.commit()
-            db.refresh(session)
-        
-        # Store user message
-        user_message = ChatMessageModel(
-            session_id=session.id,
-            tenant_id=current_user.tenant_id,
-            role="user",
-            content=request.message,
-            timestamp=datetime.utcnow()
-        )
-        db.add(user_message)
+        session = _get_or_create_session(db, request, current_user)
+        _add_user_message(db, session, request, current_user)
         
         # Process with agent
         result = await agent_service.process_message(
@@ -78,13 +50,12 @@ async def chat_with_agent(
             tenant_id=current_user.tenant_id,
             user_id=current_user.sub,
             agent_type=request.agent_type or session.agent_type,
-            context=request.context
+            context=request.context,
+            conversation_id=str(session.id)
         )
         
         # Store assistant response
-        assistant_content = result.get("result", {}).get("summary", "I couldn't process your request.")
-        if not result.get("success", False):
-            assistant_content = f"I encountered an error: {result.get('error', 'Unknown error')}"
+        assistant_content = _assistant_content(result)
         
         assistant_message = ChatMessageModel(
             session_id=session.id,
@@ -126,6 +97,55 @@ async def chat_with_agent(
         )
 
 
+@router.post("/chat/stream")
+async def stream_chat_with_agent(
+    request: ChatRequest,
+    current_user: TokenData = Depends(get_current_active_user),
+    db: Session = Depends(get_tenant_db)
+):
+    """
+    Chat with an AI agent, streamed as Server-Sent Events
+    
+    Events: `session` (session ID, sent first), `agent`, `node_start`,
+    `token`, `tool_start`, `tool_end`, `node_end` and a final `result`.
+    Tokens are sent as the model produces them, so the first bytes do not
+    wait for the answer to be complete.
+    """
+    session = _get_or_create_session(db, request, current_user)
+    _add_user_message(db, session, request, current_user)
+    db.commit()
+    
+    session_id = session.id
+    tenant_id = current_user.tenant_id
+    agent_type = request.agent_type or session.agent_type
+    
+    async def events():
+        seq = 0
+        yield format_agent_sse({"type": "session", "session_id": session_id}, seq)
+        
+        async for event in agent_service.stream_message(
+            message=request.message,
+            tenant_id=tenant_id,
+            user_id=current_user.sub,
+            agent_type=agent_type,
+            context=request.context,
+            conversation_id=str(session_id)
+        ):
+            seq += 1
+            yield format_agent_sse(event, seq)
+            
+            if event["type"] == "result":
+                # The request's session is closed once streaming starts
+                with get_db_context(tenant_id) as stream_db:
+                    _store_assistant_message(stream_db, session_id, tenant_id, event)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/chat/sessions", response_model=ChatSessionList)
 async def list_chat_sessions(
     limit: int = 20,
@@ -290,4 +310,63 @@ async def submit_chat_feedback(
     
     db.commit()
     
-    return {"message": "Feedback submitted successfully"}
\ No newline at end of file
+    return {"message": "Feedback submitted successfully"}
+
+
+def _get_or_create_session(db: Session, request: ChatRequest, current_user: TokenData) -> ChatSessionModel:
+    """Session named in the request, or a new one titled after the message"""
+    if request.session_id:
+        session = db.query(ChatSessionModel).filter(
+            ChatSessionModel.id == request.session_id,
+            ChatSessionModel.tenant_id == current_user.tenant_id
+        ).first()
+        if not session:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Session not found"
+            )
+        return session
+    
+    session = ChatSessionModel(
+        tenant_id=current_user.tenant_id,
+        user_id=current_user.sub,
+        agent_type=request.agent_type or AgentType.GENERAL,
+        title=request.message[:50] + "..." if len(request.message) > 50 else request.message
+    )
+    db.add(session)
+    db.commit()
+    db.refresh(session)
+    return session
+
+
+def _add_user_message(db: Session, session: ChatSessionModel, request: ChatRequest, current_user: TokenData) -> None:
+    db.add(ChatMessageModel(
+        session_id=session.id,
+        tenant_id=current_user.tenant_id,
+        role="user",
+        content=request.message,
+        timestamp=datetime.utcnow()
+    ))
+
+
+def _assistant_content(result: dict) -> str:
+    if not result.get("success", False):
+        return f"I encountered an error: {result.get('error', 'Unknown error')}"
+    return (result.get("result") or {}).get("summary", "I couldn't process your request.")
+
+
+def _store_assistant_message(db: Session, session_id: int, tenant_id: str, result: dict) -> None:
+    """Persist the outcome of a streamed run (the user message is stored up front)"""
+    db.add(ChatMessageModel(
+        session_id=session_id,
+        tenant_id=tenant_id,
+        role="assistant",
+        content=_assistant_content(result),
+        model_metadata={key: value for key, value in result.items() if key != "type"},
+        timestamp=datetime.utcnow()
+    ))
+    session = db.get(ChatSessionModel, session_id)
+    if session:
+        session.last_activity = datetime.utcnow()
+        session.message_count = (session.message_count or 0) + 2
+    db.commit()
@@ -4,9 +4,8 @@ Document management API endpoints
 
 from typing import List, Optional, Dict, Any
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Body
+from fastapi import APIRouter, Depends, HTTPException, Request, UploadFile, File, Query, Body
 from sqlalchemy.orm import Session
-from io import BytesIO
 
 from app.api import deps
 from app.models.user import User
@@ -20,6 +19,9 @@ from app.schemas.document import (
     DocumentCopyRequest
 )
 from app.services.document_service import DocumentService
+from app.core.config import settings
+from app.core.storage import FileTooLargeError
+from app.core.downloads import file_response
 from app.core.audit_decorator import audit_action
 from app.models.audit import TipoModificaEnum
 
@@ -48,27 +50,33 @@ async def upload_document(
     """Upload a new document"""
     service = DocumentService(db)
     
-    # Read file content
-    content = await file.read()
-    file_obj = BytesIO(content)
-    file_obj.filename = file.filename
+    # Stream the upload to a staging file: hashed and size-checked as bytes arrive
+    try:
+        staged = await service.storage.stage_upload(file, max_size=settings.MAX_UPLOAD_SIZE)
+    except FileTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     
-    document = service.create_document(
-        name=name,
-        file=file_obj,
-        category=category,
-        tenant_id=current_user.tenant_id,
-        user_id=current_user.id,
-        description=description,
-        plant_id=plant_id,
-        workflow_id=workflow_id,
-        task_id=task_id,
-        expiry_date=expiry_date,
-        tags=tags,
-        is_standard=is_standard,
-        regulatory_references=regulatory_references,
-        external_links=external_links
-    )
+    try:
+        document = service.create_document(
+            nome=name,
+            file=file,
+            categoria=category,
+            tenant_id=current_user.tenant_id,
+            user_id=current_user.id,
+            descrizione=description,
+            impianto_id=plant_id,
+            workflow_id=workflow_id,
+            task_id=task_id,
+            data_scadenza=expiry_date,
+            tags=tags,
+            is_standard=is_standard,
+            riferimenti_normativi=regulatory_references,
+            link_esterni=external_links,
+            staged_file=staged
+        )
+    finally:
+        # No-op once committed into storage
+        service.storage.discard_staged(staged)
     
     return document
 
@@ -131,18 +139,22 @@ async def update_document_file(
     """Update document file (creates new version)"""
     service = DocumentService(db)
     
-    # Read file content
-    content = await file.read()
-    file_obj = BytesIO(content)
-    file_obj.filename = file.filename
+    try:
+        staged = await service.storage.stage_upload(file, max_size=settings.MAX_UPLOAD_SIZE)
+    except FileTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     
-    document = service.update_document(
-        document_id=document_id,
-        user_id=current_user.id,
-        tenant_id=current_user.tenant_id,
-        new_file=file_obj,
-        version_note=version_note
-    )
+    try:
+        document = service.update_document(
+            document_id=document_id,
+            user_id=current_user.id,
+            tenant_id=current_user.tenant_id,
+            new_file=file,
+            version_note=version_note,
+            staged_file=staged
+        )
+    finally:
+        service.storage.discard_staged(staged)
     
     return document
 
@@ -293,15 +305,15 @@ async def delete_document(
     return {"message": "Document deleted successfully"}
 
 
-@router.get("/{document_id}/download")
+@router.api_route("/{document_id}/download", methods=["GET", "HEAD"])
 async def download_document(
+    request: Request,
     document_id: int,
+    inline: bool = Query(False, description="Display in the browser instead of downloading"),
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_active_user)
 ):
-    """Download document file"""
-    from fastapi.responses import StreamingResponse
-    
+    """Download document file (supports Range, ETag and conditional requests)"""
     document = db.query(Document).filter(
         Document.id == document_id,
         Document.tenant_id == current_user.tenant_id
@@ -313,18 +325,18 @@ async def download_document(
     service = DocumentService(db)
     
     try:
-        content = service.storage.retrieve_file(document.file_path)
-        
-        return StreamingResponse(
-            BytesIO(content),
-            media_type=document.mime_type or "application/octet-stream",
-            headers={
-                "Content-Disposition": f"attachment; filename={document.nome}"
-            }
-        )
-    
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error retrieving file: {str(e)}")
+        path = service.storage.local_path(document.file_path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Document file not found")
+    
+    return file_response(
+        request,
+        path,
+        media_type=document.mime_type,
+        filename=document.nome,
+        checksum=document.checksum,
+        inline=inline
+    )
 
 
 @router.get("/{document_id}/versions", response_model=List[Dict[str, Any]])
@@ -42,6 +42,7 @@ from app.schemas.plant import (
     PerformanceData
 )
 from app.services.workflow_data_service import WorkflowDataService
+from app.services.bulk_mutation_service import BulkMutationService
 
 router = APIRouter()
 
@@ -622,37 +623,25 @@ async def bulk_update_plants(
     current_user: TokenData = Depends(get_current_active_user),
     db: Session = Depends(get_tenant_db)
 ):
-    """Bulk update multiple plants"""
-    updated_count = 0
-    errors = []
-    
-    for update in updates:
-        try:
-            plant_id = update.get("id")
-            update_data = update.get("update_data", {})
-            
-            plant = db.query(Plant).filter(
-                Plant.id == plant_id,
-                Plant.tenant_id == current_user.tenant_id
-            ).first()
-            
-            if plant:
-                for field, value in update_data.items():
-                    if hasattr(plant, field):
-                        setattr(plant, field, value)
-                plant.updated_by = current_user.sub
-                updated_count += 1
-            else:
-                errors.append(f"Plant {plant_id} not found")
-                
-        except Exception as e:
-            errors.append(f"Error updating plant {plant_id}: {str(e)}")
-    
-    db.commit()
+    """Bulk update multiple plants in a single transaction"""
+    service = BulkMutationService(db)
+    
+    try:
+        result = service.bulk_update_plants(
+            updates=updates,
+            user_id=current_user.sub,
+            tenant_id=current_user.tenant_id
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
     return {
-        "updated": updated_count,
-        "errors": errors
+        "updated": result["updated_count"],
+        "errors": [r["error"] for r in result["results"] if r.get("error")],
+        "results": result["results"]
     }
 
 
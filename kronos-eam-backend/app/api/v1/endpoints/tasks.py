@@ -171,6 +171,8 @@ async def assign_task(
 @router.get("/{task_id}/timeline", response_model=TaskTimelineResponse)
 async def get_task_timeline(
     task_id: int,
+    limit: int = Query(100, ge=1, le=500),
+    offset: int = Query(0, ge=0),
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_active_user)
 ):
@@ -180,7 +182,9 @@ async def get_task_timeline(
     try:
         timeline = service.get_task_timeline(
             task_id=task_id,
-            tenant_id=current_user.tenant_id
+            tenant_id=current_user.tenant_id,
+            limit=limit,
+            offset=offset
         )
         
         return timeline
@@ -230,19 +234,22 @@ async def bulk_update_tasks(
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_active_user)
 ):
-    """Bulk update multiple tasks"""
+    """Bulk update multiple tasks in a single transaction"""
     service = TaskService(db)
     
-    result = service.bulk_update_tasks(
-        task_ids=bulk_data.task_ids,
-        user_id=current_user.id,
-        tenant_id=current_user.tenant_id,
-        status=bulk_data.status,
-        priority=bulk_data.priority,
-        assignee=bulk_data.assignee,
-        dueDate=bulk_data.dueDate,
-        note=bulk_data.note
-    )
+    try:
+        result = service.bulk_update_tasks(
+            task_ids=bulk_data.task_ids,
+            user_id=current_user.id,
+            tenant_id=current_user.tenant_id,
+            status=bulk_data.status,
+            priority=bulk_data.priority,
+            assignee=bulk_data.assignee,
+            dueDate=bulk_data.dueDate,
+            note=bulk_data.note
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     return result
 
@@ -2,11 +2,13 @@
 Voice Features endpoints for speech-to-text and text-to-speech
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, WebSocket, WebSocketDisconnect
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import Optional, Dict, Any, List
 import io
+import json
+import logging
 
 from app.api.deps import get_current_active_user, get_tenant_db
 from app.schemas.auth import TokenData
@@ -15,6 +17,8 @@ from app.services.agent_service import AgentType
 from app.services.voice.gemini_tts import GeminiVoice
 from app.services.voice.text_to_speech import VoiceGender, AudioEncoding
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 
@@ -70,6 +74,69 @@ async def transcribe_audio(
         )
 
 
+@router.websocket("/transcribe/stream")
+async def transcribe_stream(
+    websocket: WebSocket,
+    token: str = "",
+    language_code: Optional[str] = None,
+    sample_rate: int = 16000
+):
+    """
+    Incremental transcription over a WebSocket
+    
+    - **token**: JWT access token (query parameter)
+    - **language_code**: Language hint (e.g., 'it-IT', 'en-US')
+    - **sample_rate**: Rate of the audio sent (8000-48000)
+    
+    The client sends binary frames of 16-bit little-endian mono PCM and a
+    text frame "end" (or {"type": "end"}) when done. The server replies
+    with JSON events: speech_start, partial and final (with latency_ms),
+    then {"type": "end"} before closing.
+    """
+    from app.core.security import verify_token
+    
+    try:
+        verify_token(token, ValueError("Invalid token"))
+    except ValueError:
+        await websocket.close(code=1008)
+        return
+    if not 8000 <= sample_rate <= 48000:
+        await websocket.close(code=1003)
+        return
+    
+    await websocket.accept()
+    
+    async def audio_chunks():
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes"):
+                yield message["bytes"]
+            elif message.get("text"):
+                text = message["text"].strip()
+                try:
+                    request = json.loads(text)
+                except ValueError:
+                    request = text
+                if request == "end" or (isinstance(request, dict) and request.get("type") == "end"):
+                    return
+    
+    try:
+        async for event in voice_service.stt_service.transcribe_stream(audio_chunks(), language_code, sample_rate):
+            await websocket.send_json(event)
+        await websocket.send_json({"type": "end"})
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Streaming transcription error: {str(e)}")
+        try:
+            await websocket.close(code=1011)
+        except Exception:
+            pass
+
+
 @router.post("/synthesize")
 async def synthesize_speech(
     text: str = Form(...),
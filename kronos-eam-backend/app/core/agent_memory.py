@@ -0,0 +1,238 @@
+"""
+Bounded conversation memory and pooling for LangGraph agents
+"""
+
+from typing import Any, Callable, Hashable, Optional, Sequence, Tuple
+from collections import OrderedDict, defaultdict
+import logging
+import sqlite3
+import threading
+import time
+
+from langgraph.checkpoint.base import BaseCheckpointSaver, CheckpointTuple
+from langgraph.checkpoint.memory import InMemorySaver
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedMemorySaver(InMemorySaver):
+    """
+    In-memory checkpointer holding at most `max_threads` conversations.
+
+    Threads are evicted least-recently-used first, and when idle for longer
+    than `ttl_seconds`. With a `backing` saver (SQLite/Postgres) every
+    checkpoint is also written there, and an evicted thread is restored
+    from it the next time the conversation is resumed; without one an
+    evicted conversation simply starts over.
+    """
+
+    def __init__(
+        self,
+        max_threads: int,
+        ttl_seconds: Optional[float] = None,
+        backing: Optional[BaseCheckpointSaver] = None
+    ):
+        super().__init__()
+        self.max_threads = max_threads
+        self.ttl_seconds = ttl_seconds
+        self.backing = backing
+        self._last_used: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.evictions = 0
+        self.restores = 0
+
+    @property
+    def thread_count(self) -> int:
+        return len(self._last_used)
+
+    def get_tuple(self, config) -> Optional[CheckpointTuple]:
+        thread_id = str(config["configurable"]["thread_id"])
+        with self._lock:
+            if thread_id in self._last_used:
+                self._touch(thread_id)
+                return super().get_tuple(config)
+        if self.backing is None:
+            return None
+
+        saved = self.backing.get_tuple(config)
+        if saved is not None and "checkpoint_id" not in config["configurable"]:
+            with self._lock:
+                self._restore(thread_id, saved)
+        return saved
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = str(config["configurable"]["thread_id"])
+        with self._lock:
+            result = super().put(config, checkpoint, metadata, new_versions)
+            self._touch(thread_id)
+        if self.backing is not None:
+            self.backing.put(config, checkpoint, metadata, new_versions)
+        return result
+
+    def put_writes(self, config, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        thread_id = str(config["configurable"]["thread_id"])
+        with self._lock:
+            super().put_writes(config, writes, task_id, task_path)
+            self._touch(thread_id)
+        if self.backing is not None:
+            self.backing.put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._last_used.pop(str(thread_id), None)
+            super().delete_thread(thread_id)
+        if self.backing is not None:
+            self.backing.delete_thread(thread_id)
+
+    def _touch(self, thread_id: str) -> None:
+        """Mark a thread as used and evict expired or excess threads"""
+        now = time.monotonic()
+        self._last_used[thread_id] = now
+        self._last_used.move_to_end(thread_id)
+
+        if self.ttl_seconds is not None:
+            while self._last_used:
+                oldest, last_used = next(iter(self._last_used.items()))
+                if now - last_used <= self.ttl_seconds:
+                    break
+                self._evict(oldest)
+
+        while len(self._last_used) > self.max_threads:
+            self._evict(next(iter(self._last_used)))
+
+    def _evict(self, thread_id: str) -> None:
+        self._last_used.pop(thread_id, None)
+        # Memory only: the backing saver keeps the thread for a later restore
+        super().delete_thread(thread_id)
+        self.evictions += 1
+
+    def _restore(self, thread_id: str, saved: CheckpointTuple) -> None:
+        """Load the latest checkpoint of an evicted thread back into memory"""
+        parent = saved.parent_config or {"configurable": {}}
+        config = {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": saved.config["configurable"].get("checkpoint_ns", ""),
+                "checkpoint_id": parent["configurable"].get("checkpoint_id"),
+            }
+        }
+        # Every channel counts as new so that all values are stored, not only the last deltas
+        super().put(config, saved.checkpoint, saved.metadata, saved.checkpoint["channel_versions"])
+
+        writes_by_task = defaultdict(list)
+        for task_id, channel, value in saved.pending_writes or []:
+            writes_by_task[task_id].append((channel, value))
+        for task_id, writes in writes_by_task.items():
+            super().put_writes(saved.config, writes, task_id)
+
+        self._touch(thread_id)
+        self.restores += 1
+
+
+def create_backing_saver(backend: str, url: Optional[str]) -> Optional[BaseCheckpointSaver]:
+    """
+    Persistent saver for evicted conversations (AGENT_CHECKPOINT_BACKEND)
+
+    Args:
+        backend: "memory" (no persistence), "sqlite" or "postgres"
+        url: SQLite file path or PostgreSQL DSN
+
+    Returns:
+        The saver with its tables set up, or None for "memory"
+    """
+    if backend == "memory":
+        return None
+    if not url:
+        raise RuntimeError(f"AGENT_CHECKPOINT_URL is required for the {backend} checkpoint backend")
+
+    if backend == "sqlite":
+        try:
+            from langgraph.checkpoint.sqlite import SqliteSaver
+        except ImportError as e:
+            raise RuntimeError("langgraph-checkpoint-sqlite is required for the sqlite checkpoint backend") from e
+        saver = SqliteSaver(sqlite3.connect(url, check_same_thread=False))
+    elif backend == "postgres":
+        try:
+            from langgraph.checkpoint.postgres import PostgresSaver
+            from psycopg import Connection
+            from psycopg.rows import dict_row
+        except ImportError as e:
+            raise RuntimeError("langgraph-checkpoint-postgres is required for the postgres checkpoint backend") from e
+        connection = Connection.connect(url, autocommit=True, prepare_threshold=0, row_factory=dict_row)
+        saver = PostgresSaver(connection)
+    else:
+        raise ValueError(f"Unknown agent checkpoint backend: {backend}")
+
+    saver.setup()
+    return saver
+
+
+_checkpointer: Optional[BoundedMemorySaver] = None
+_checkpointer_lock = threading.Lock()
+
+
+def get_agent_checkpointer() -> BoundedMemorySaver:
+    """Process-wide conversation memory shared by all compiled agent graphs"""
+    global _checkpointer
+    with _checkpointer_lock:
+        if _checkpointer is None:
+            _checkpointer = BoundedMemorySaver(
+                max_threads=settings.AGENT_MEMORY_MAX_THREADS,
+                ttl_seconds=settings.AGENT_MEMORY_TTL_SECONDS,
+                backing=create_backing_saver(
+                    settings.AGENT_CHECKPOINT_BACKEND, settings.AGENT_CHECKPOINT_URL
+                )
+            )
+        return _checkpointer
+
+
+class AgentPool:
+    """
+    LRU pool of agent handles keyed by (tenant, user, agent type).
+
+    Handles are cheap (graphs and LLM clients are shared per process), so
+    the pool only bounds the number of live objects; an evicted handle is
+    rebuilt on next use without losing conversation memory.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._agents: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._agents)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._agents
+
+    def get(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """Return the pooled agent for key, creating it with factory() if needed"""
+        with self._lock:
+            agent = self._agents.get(key)
+            if agent is not None:
+                self._agents.move_to_end(key)
+                return agent
+
+        agent = factory()
+        with self._lock:
+            agent = self._agents.setdefault(key, agent)
+            self._agents.move_to_end(key)
+            while len(self._agents) > self.max_size:
+                self._agents.popitem(last=False)
+        return agent
+
+    def discard(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop pooled agents whose key matches predicate"""
+        with self._lock:
+            keys = [key for key in self._agents if predicate(key)]
+            for key in keys:
+                del self._agents[key]
+        return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._agents.clear()
+
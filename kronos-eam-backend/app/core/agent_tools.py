@@ -0,0 +1,144 @@
+"""
+Concurrent tool execution for LangGraph agents
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
+import functools
+import json
+import logging
+import threading
+import time
+
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_tool_executor() -> ThreadPoolExecutor:
+    """Thread pool running blocking (synchronous) tools, shared by all agents"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.AGENT_TOOL_THREADS,
+                thread_name_prefix="agent-tool"
+            )
+        return _executor
+
+
+class ParallelToolNode:
+    """
+    Graph node running all tool calls of a turn concurrently.
+
+    Two kinds of calls are executed:
+    - tool calls requested by the model on the last AIMessage; each one
+      produces a ToolMessage, as with LangGraph's ToolNode
+    - calls planned by earlier nodes in `state["context"]["tool_calls"]`
+      ({"tool": name, "args": {...}}); their outcomes are stored in
+      `state["context"]["tool_results"]` as {"tool_name", "args", "output"}
+
+    At most `max_concurrency` calls run at once and each one is abandoned
+    after `timeout` seconds. Async tools run on the event loop, blocking
+    tools (DB queries) on a shared thread pool. A failing or slow tool
+    never fails the turn: its result carries the error instead. A timed
+    out blocking tool keeps its thread until it returns, since threads
+    cannot be cancelled.
+    """
+
+    def __init__(
+        self,
+        tools: Sequence[BaseTool],
+        max_concurrency: Optional[int] = None,
+        timeout: Optional[float] = None,
+        executor: Optional[ThreadPoolExecutor] = None
+    ):
+        self.tools = {tool.name: tool for tool in tools}
+        self.max_concurrency = max_concurrency or settings.AGENT_TOOL_MAX_CONCURRENCY
+        self.timeout = timeout if timeout is not None else settings.AGENT_TOOL_TIMEOUT_SECONDS
+        self.executor = executor
+
+    async def __call__(self, state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+        messages = list(state.get("messages") or [])
+        context = dict(state.get("context") or {})
+
+        model_calls = []
+        if messages and isinstance(messages[-1], AIMessage):
+            model_calls = list(messages[-1].tool_calls)
+        planned_calls = [
+            {"name": call.get("tool"), "args": call.get("args") or {}, "id": None}
+            for call in context.pop("tool_calls", None) or []
+        ]
+
+        outcomes = await self.run_calls(model_calls + planned_calls, config)
+
+        for call, (output, error) in zip(model_calls, outcomes):
+            messages.append(ToolMessage(
+                content=_message_content(error or output),
+                name=call["name"],
+                tool_call_id=call["id"],
+                status="error" if error else "success"
+            ))
+        if planned_calls:
+            context["tool_results"] = list(context.get("tool_results") or []) + [
+                {"tool_name": call["name"], "args": call["args"], "output": {"error": error} if error else output}
+                for call, (output, error) in zip(planned_calls, outcomes[len(model_calls):])
+            ]
+
+        return {"messages": messages, "context": context}
+
+    async def run_calls(self, calls: List[Dict[str, Any]], config: Optional[RunnableConfig] = None) -> List[tuple]:
+        """
+        Run tool calls concurrently
+
+        Args:
+            calls: {"name", "args", "id"} dicts
+            config: Run config, so tool events reach callbacks and streams
+
+        Returns:
+            (output, error) for each call, in the order of calls
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(call):
+            async with semaphore:
+                return await self._run_call(call, config)
+
+        return list(await asyncio.gather(*(run(call) for call in calls)))
+
+    async def _run_call(self, call: Dict[str, Any], config: Optional[RunnableConfig]) -> tuple:
+        tool = self.tools.get(call["name"])
+        if tool is None:
+            return None, f"Unknown tool: {call['name']}"
+
+        started = time.monotonic()
+        try:
+            if getattr(tool, "coroutine", None) is not None:
+                pending = tool.ainvoke(call["args"], config)
+            else:
+                loop = asyncio.get_running_loop()
+                # copy_context keeps the callback context of this run in the worker thread
+                invoke = functools.partial(contextvars.copy_context().run, tool.invoke, call["args"], config)
+                pending = loop.run_in_executor(self.executor or get_tool_executor(), invoke)
+            return await asyncio.wait_for(pending, timeout=self.timeout), None
+        except asyncio.TimeoutError:
+            logger.warning(f"Tool {call['name']} timed out after {self.timeout}s")
+            return None, f"Tool {call['name']} timed out after {self.timeout}s"
+        except Exception as e:
+            logger.error(f"Tool {call['name']} failed: {str(e)}")
+            return None, f"Tool {call['name']} failed: {str(e)}"
+        finally:
+            logger.debug(f"Tool {call['name']} ran for {time.monotonic() - started:.3f}s")
+
+
+def _message_content(value: Any) -> str:
+    return value if isinstance(value, str) else json.dumps(value, default=str)
@@ -0,0 +1,173 @@
+"""
+In-memory audio decoding and resampling for speech models
+"""
+
+from typing import Optional, Tuple
+from functools import lru_cache
+from math import ceil, gcd
+import io
+import logging
+import wave
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Formats that carry no header: 16-bit little-endian mono PCM
+RAW_PCM_FORMATS = ("pcm", "raw", "l16", "s16le")
+# Half length of the resampling filter, in input periods of the slower rate
+RESAMPLE_HALF_WIDTH = 8
+# Kaiser window shape of the resampling filter (~60 dB stopband)
+RESAMPLE_KAISER_BETA = 6.0
+# Output samples computed per vectorized block
+RESAMPLE_BLOCK = 16384
+
+
+def _pcm_to_float(frames: bytes, sample_width: int, channels: int) -> np.ndarray:
+    """Interleaved integer PCM to float32 in [-1, 1), shape (frames, channels)"""
+    if sample_width == 1:
+        audio = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif sample_width == 2:
+        audio = np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768.0
+    elif sample_width == 3:
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3)
+        ints = (raw[:, 0].astype(np.int32) | (raw[:, 1].astype(np.int32) << 8) | (raw[:, 2].astype(np.int32) << 16))
+        ints = np.where(ints >= 1 << 23, ints - (1 << 24), ints)
+        audio = ints.astype(np.float32) / float(1 << 23)
+    elif sample_width == 4:
+        audio = np.frombuffer(frames, dtype="<i4").astype(np.float32) / float(1 << 31)
+    else:
+        raise ValueError(f"Unsupported sample width: {sample_width} bytes")
+    return audio.reshape(-1, channels)
+
+
+def decode_audio(data: bytes, format: str = "wav", raw_sample_rate: int = 16000) -> Tuple[np.ndarray, int]:
+    """
+    Decode an audio payload without touching the disk
+
+    WAV (integer PCM) and headerless PCM are decoded with the standard
+    library; anything else (float WAV, FLAC, OGG, MP3) goes through
+    soundfile reading from memory.
+
+    Args:
+        data: Encoded audio
+        format: Container hint ('wav', 'pcm', 'flac', 'mp3', ...)
+        raw_sample_rate: Sample rate of headerless PCM
+
+    Returns:
+        (float32 samples shaped (frames, channels), sample rate)
+    """
+    if not data:
+        raise ValueError("Empty audio payload")
+
+    if format.lower() in RAW_PCM_FORMATS:
+        usable = len(data) - len(data) % 2
+        return _pcm_to_float(data[:usable], 2, 1), raw_sample_rate
+
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        try:
+            with wave.open(io.BytesIO(data), "rb") as wav:
+                frames = wav.readframes(wav.getnframes())
+                return _pcm_to_float(frames, wav.getsampwidth(), wav.getnchannels()), wav.getframerate()
+        except wave.Error:
+            # Float or extensible WAV: left to soundfile
+            pass
+
+    try:
+        import soundfile as sf
+    except ImportError:
+        raise ValueError(f"Unsupported audio format without soundfile: {format}")
+    audio, sample_rate = sf.read(io.BytesIO(data), dtype="float32", always_2d=True)
+    return audio, sample_rate
+
+
+def to_mono(audio: np.ndarray) -> np.ndarray:
+    if audio.ndim == 1:
+        return audio
+    return audio.mean(axis=1, dtype=np.float32) if audio.shape[1] > 1 else audio[:, 0]
+
+
+@lru_cache(maxsize=16)
+def _polyphase_filter(up: int, down: int) -> Tuple[np.ndarray, int]:
+    """
+    Windowed-sinc low-pass for an up/down ratio, split into `up` phases
+
+    Returns:
+        (filter bank shaped (up, taps per phase), delay of the filter)
+    """
+    max_rate = max(up, down)
+    half_len = RESAMPLE_HALF_WIDTH * max_rate
+    n = np.arange(-half_len, half_len + 1)
+    cutoff = 1.0 / max_rate
+    h = up * cutoff * np.sinc(cutoff * n) * np.kaiser(len(n), RESAMPLE_KAISER_BETA)
+
+    taps = ceil(len(h) / up)
+    padded = np.zeros(taps * up)
+    padded[:len(h)] = h
+    # bank[phase, q] = h[phase + q * up]
+    bank = padded.reshape(taps, up).T.astype(np.float32)
+    return np.ascontiguousarray(bank), half_len
+
+
+def resample(audio: np.ndarray, orig_sr: int, target_sr: int) -> np.ndarray:
+    """
+    Rational polyphase resampling of a mono signal
+
+    Only the filter taps that meet input samples are evaluated (a few
+    dozen per output sample for speech rates), instead of filtering the
+    upsampled signal.
+    """
+    audio = np.asarray(audio, dtype=np.float32)
+    if orig_sr == target_sr or len(audio) == 0:
+        return audio
+
+    divisor = gcd(orig_sr, target_sr)
+    up, down = target_sr // divisor, orig_sr // divisor
+    bank, delay = _polyphase_filter(up, down)
+    taps = bank.shape[1]
+
+    n_out = ceil(len(audio) * up / down)
+    # Zero padding on both sides covers the filter overhang at the edges
+    padded = np.concatenate([np.zeros(taps, np.float32), audio, np.zeros(taps, np.float32)])
+    offsets = np.arange(taps)
+
+    output = np.empty(n_out, dtype=np.float32)
+    for start in range(0, n_out, RESAMPLE_BLOCK):
+        m = np.arange(start, min(start + RESAMPLE_BLOCK, n_out))
+        t = m * down + delay
+        # Input sample (t // up - q) meets tap phase + q * up
+        index = (t // up)[:, None] - offsets[None, :] + taps
+        output[start:start + len(m)] = np.einsum("ij,ij->i", padded[index], bank[t % up])
+    return output
+
+
+def load_audio(
+    data: bytes,
+    format: str = "wav",
+    sample_rate: int = 16000,
+    max_duration: Optional[float] = None
+) -> np.ndarray:
+    """
+    Audio bytes to what speech models expect: mono float32 in [-1, 1] at sample_rate
+
+    Args:
+        data: Encoded audio
+        format: Container hint
+        sample_rate: Target sample rate (also the rate of headerless PCM)
+        max_duration: Seconds kept from the start, if set
+
+    Returns:
+        1-D float32 samples
+    """
+    audio, source_rate = decode_audio(data, format, raw_sample_rate=sample_rate)
+    audio = to_mono(audio)
+
+    # Trim before resampling, so the cut part is never processed
+    if max_duration:
+        audio = audio[:int(source_rate * max_duration)]
+    audio = resample(audio, source_rate, sample_rate)
+
+    peak = float(np.max(np.abs(audio))) if len(audio) else 0.0
+    if peak > 1.0:
+        audio = audio / peak
+    return audio.astype(np.float32, copy=False)
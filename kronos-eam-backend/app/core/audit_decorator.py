@@ -3,11 +3,11 @@ Decorators for automatic audit logging
 """
 
 from functools import wraps
-from typing import Optional, Callable, Any, Dict
+from typing import Optional, Callable
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
 
-from app.services.audit_service import AuditService
+from app.services.audit_service import AuditService, AUDIT_BUFFER_KEY, AUDIT_TRACKED_KEY
 from app.models.audit import TipoModificaEnum
 
 
@@ -26,10 +26,14 @@ def audit_action(
         entity_type: Type of entity being modified
         tipo_modifica: Type of modification
         entity_id_param: Parameter name containing entity ID
-        capture_old_state: Whether to capture entity state before modification
-        capture_new_state: Whether to capture entity state after modification
+        capture_old_state: Whether to record previous values of modified columns
+        capture_new_state: Whether to record new values of modified columns
         note_param: Parameter name containing optional note
         
+    Captured values come from SQLAlchemy attribute history as the session
+    flushes, so only modified columns are recorded and no extra reads are
+    issued.
+    
     Usage:
         @audit_action("workflow", TipoModificaEnum.AGGIORNAMENTO)
         def update_workflow(id: int, ...):
@@ -61,13 +65,12 @@ def audit_action(
             # Initialize audit service
             audit_service = AuditService(db)
             
-            # Capture old state if requested
-            old_values = None
-            if capture_old_state:
-                # This would need to be customized per entity type
-                old_entity = _get_entity(db, entity_type, entity_id)
-                if old_entity:
-                    old_values = _entity_to_dict(old_entity)
+            # Track column changes made by the handler if requested
+            model_class = None
+            if capture_old_state or capture_new_state:
+                model_class = _get_entity_model(entity_type)
+                if model_class:
+                    audit_service.track_entity(model_class, entity_id)
             
             # Get additional context
             ip_address = None
@@ -82,12 +85,17 @@ def audit_action(
                 # Execute the actual function
                 result = await func(*args, **kwargs)
                 
-                # Capture new state if requested
+                old_values = None
                 new_values = None
-                if capture_new_state:
-                    new_entity = _get_entity(db, entity_type, entity_id)
-                    if new_entity:
-                        new_values = _entity_to_dict(new_entity)
+                changed_fields = None
+                if model_class:
+                    changes = audit_service.pop_entity_changes(model_class, entity_id)
+                    if changes:
+                        changed_fields = changes["changed_fields"]
+                        if capture_old_state:
+                            old_values = changes["old_values"]
+                        if capture_new_state:
+                            new_values = changes["new_values"]
                 
                 # Log the audit entry
                 audit_service.log_change(
@@ -98,14 +106,23 @@ def audit_action(
                     tenant_id=current_user.tenant_id,
                     old_values=old_values,
                     new_values=new_values,
+                    changed_fields=changed_fields,
                     ip_address=ip_address,
                     user_agent=user_agent,
                     note=note
                 )
                 
+                # Handlers usually commit before returning: write the entry
+                # rather than leaving it for a commit that may never come
+                if db.info.get(AUDIT_BUFFER_KEY):
+                    db.commit()
+                
                 return result
                 
             except Exception as e:
+                if model_class:
+                    db.info.get(AUDIT_TRACKED_KEY, {}).pop((model_class, str(entity_id)), None)
+                
                 # Log failed attempt if it's a deletion
                 if tipo_modifica == TipoModificaEnum.ELIMINAZIONE:
                     audit_service.log_change(
@@ -117,7 +134,8 @@ def audit_action(
                         dettaglio_modifica={"error": str(e), "failed": True},
                         ip_address=ip_address,
                         user_agent=user_agent,
-                        note=note
+                        note=note,
+                        immediate=True
                     )
                 raise
         
@@ -133,8 +151,8 @@ def audit_action(
     return decorator
 
 
-def _get_entity(db: Session, entity_type: str, entity_id: int) -> Optional[Any]:
-    """Get entity by type and ID"""
+def _get_entity_model(entity_type: str) -> Optional[type]:
+    """Get the mapped class for an entity type"""
     # Import models dynamically to avoid circular imports
     from app.models.workflow import Workflow, WorkflowTask
     from app.models.document import Document
@@ -149,34 +167,7 @@ def _get_entity(db: Session, entity_type: str, entity_id: int) -> Optional[Any]:
         "impianto": Plant
     }
     
-    model_class = entity_map.get(entity_type.lower())
-    if not model_class:
-        return None
-    
-    return db.query(model_class).filter(model_class.id == entity_id).first()
-
-
-def _entity_to_dict(entity: Any) -> Dict[str, Any]:
-    """Convert SQLAlchemy entity to dictionary"""
-    if not entity:
-        return {}
-    
-    # Get all column attributes
-    result = {}
-    for column in entity.__table__.columns:
-        value = getattr(entity, column.name)
-        
-        # Convert non-serializable types
-        if hasattr(value, "isoformat"):  # datetime
-            value = value.isoformat()
-        elif hasattr(value, "value"):  # Enum
-            value = value.value
-        elif isinstance(value, (list, dict)):  # JSON columns
-            pass  # Already serializable
-        
-        result[column.name] = value
-    
-    return result
+    return entity_map.get(entity_type.lower())
 
 
 # Import asyncio only if needed
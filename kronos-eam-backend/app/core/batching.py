@@ -0,0 +1,115 @@
+"""
+Dynamic batching of concurrent model requests
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from concurrent.futures import Executor, ThreadPoolExecutor
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class DynamicBatcher:
+    """
+    Groups concurrent requests into one call of a batch function
+
+    The first request of a batch waits at most `max_wait_ms` for others
+    to join; a batch is closed earlier when it reaches `max_batch_size`.
+    Batches run one at a time in a dedicated thread (a model forward pass
+    is not shared between threads), and requests arriving meanwhile form
+    the next batch.
+
+    `process_batch` receives the list of items and returns one result per
+    item, in order. If it raises, every request of the batch fails with
+    that error.
+    """
+
+    def __init__(
+        self,
+        process_batch: Callable[[List[Any]], Sequence[Any]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 5.0,
+        executor: Optional[Executor] = None,
+        name: str = "batch"
+    ):
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.name = name
+        self._executor = executor
+        self._lock = threading.Lock()
+        # Queues and workers belong to one event loop
+        self._workers: Dict[int, Tuple[asyncio.AbstractEventLoop, asyncio.Queue, asyncio.Task]] = {}
+        self.batches = 0
+        self.items = 0
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.items / self.batches if self.batches else 0.0
+
+    @property
+    def executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=self.name)
+            return self._executor
+
+    async def submit(self, item: Any) -> Any:
+        """Result of item, computed in the next batch"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue(loop).put_nowait((item, future))
+        return await future
+
+    def _queue(self, loop: asyncio.AbstractEventLoop) -> asyncio.Queue:
+        worker = self._workers.get(id(loop))
+        if worker is None or worker[0] is not loop or worker[2].done():
+            queue: asyncio.Queue = asyncio.Queue()
+            worker = (loop, queue, loop.create_task(self._run(queue)))
+            self._workers[id(loop)] = worker
+        return worker[1]
+
+    async def _collect(self, queue: asyncio.Queue) -> List[Tuple[Any, asyncio.Future]]:
+        loop = asyncio.get_running_loop()
+        batch = [await queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not queue.empty():
+                batch.append(queue.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        # Callers that gave up need no result
+        return [(item, future) for item, future in batch if not future.done()]
+
+    async def _run(self, queue: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect(queue)
+            if not batch:
+                continue
+            items = [item for item, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor, self.process_batch, items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"{self.name}: {len(results)} results for {len(items)} requests")
+            except Exception as e:
+                logger.error(f"{self.name} batch of {len(items)} failed: {str(e)}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            finally:
+                self.batches += 1
+                self.items += len(items)
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
@@ -67,12 +67,45 @@ class Settings(BaseSettings):
     LANGGRAPH_MEMORY_TYPE: str = "redis"  # redis, postgresql, in-memory
     LANGGRAPH_MAX_STEPS: int = 10
     LANGGRAPH_CHECKPOINT_INTERVAL: int = 5
+    AGENT_POOL_SIZE: int = 256  # Agent handles kept per process (LRU)
+    AGENT_MEMORY_MAX_THREADS: int = 1000  # Conversations kept in memory by the checkpointer (LRU)
+    AGENT_MEMORY_TTL_SECONDS: int = 3600  # Idle conversations are dropped from memory after this
+    AGENT_CHECKPOINT_BACKEND: str = "memory"  # memory, sqlite or postgres (restores evicted conversations)
+    AGENT_CHECKPOINT_URL: Optional[str] = None  # SQLite file path or PostgreSQL DSN for the backend
+    AGENT_TOOL_MAX_CONCURRENCY: int = 4  # Tool calls of one turn running at the same time
+    AGENT_TOOL_TIMEOUT_SECONDS: float = 30.0  # A tool call is abandoned after this
+    AGENT_TOOL_THREADS: int = 16  # Thread pool for blocking (DB) tools, shared by all agents
+    LLM_CACHE_ENABLED: bool = False  # Reuse answers of near-duplicate prompts (opt-in)
+    LLM_CACHE_BACKEND: str = "memory"  # memory (per process) or redis (shared)
+    LLM_CACHE_SIMILARITY_THRESHOLD: float = 0.95  # Cosine similarity of normalized prompts for a hit
+    LLM_CACHE_TTL_SECONDS: int = 3600
+    LLM_CACHE_MAX_ENTRIES: int = 5000  # Memory: all tenants; redis: per tenant/agent/context
+    AGENT_CONTEXT_MAX_TOKENS: int = 6000  # Budget of the conversation sent to the model each turn
+    AGENT_CONTEXT_RECENT_TURNS: int = 8  # Latest turns kept verbatim; older ones are summarized
+    AGENT_CONTEXT_SUMMARY_TOKENS: int = 800  # Budget of the summary of older turns
+    AGENT_CONTEXT_RAG_TOKENS: int = 2000  # Budget of the retrieved chunks returned by a search tool
+    AGENT_CONTEXT_DATA_TOKENS: int = 3000  # Budget of the tool data a generating node adds to the conversation
+    AGENT_SNAPSHOT_MAX_ITEMS: int = 50  # Maintenances, tasks and documents loaded in a plant context snapshot
     
     # Voice Services
     GOOGLE_CLOUD_PROJECT: Optional[str] = None
     GOOGLE_APPLICATION_CREDENTIALS: Optional[str] = None
     VOICE_LANGUAGE_CODE: str = "it-IT"  # Italian by default
     VOICE_SAMPLE_RATE: int = 16000
+    STT_WARMUP_ON_STARTUP: bool = False  # Load the STT model and run one pass at startup
+    STT_MAX_BATCH_SIZE: int = 8  # Concurrent transcriptions sharing one forward pass
+    STT_MAX_BATCH_WAIT_MS: float = 5.0  # Longest a request waits for others to join its batch
+    STT_STREAM_VAD_MARGIN_DB: float = 12.0  # Energy above the noise floor that counts as speech
+    STT_STREAM_END_SILENCE_MS: int = 500  # Silence that ends an utterance
+    STT_STREAM_PARTIAL_INTERVAL_MS: int = 600  # Speech between two partial hypotheses
+    STT_STREAM_PARTIAL_WINDOW_SECONDS: float = 6.0  # Audio decoded for a partial (latest part of the utterance)
+    STT_STREAM_MAX_SEGMENT_SECONDS: float = 20.0  # Longer utterances are finalized in pieces
+    STT_STREAM_MAX_FINAL_LATENCY_MS: int = 1500  # Bound on end of speech to final transcript (logged when exceeded)
+    TTS_CACHE_ENABLED: bool = True  # Reuse synthesized audio of identical sentences
+    TTS_CACHE_PATH: str = "/tmp/tts-cache"
+    TTS_CACHE_MAX_MB: int = 256  # Least recently used files are evicted beyond this
+    TTS_CACHE_SPLIT_SENTENCES: bool = True  # Cache sentence by sentence (MP3/WAV output only)
+    TTS_CACHE_MAX_SENTENCE_CHARS: int = 300  # Longer sentences are cut at commas
     
     # Vector Database Configuration
     VECTOR_STORE_TYPE: str = "qdrant"  # qdrant or vertex_ai
@@ -122,14 +155,46 @@ class Settings(BaseSettings):
     RATE_LIMIT_PER_HOUR: int = 1000
     RATE_LIMIT_STORAGE: str = "redis"  # redis or memory
     
+    # Bulk Mutation Configuration
+    BULK_UPDATE_MAX_ITEMS: int = 2000  # Max IDs accepted in one bulk request
+    BULK_UPDATE_CHUNK_SIZE: int = 500  # Max IDs per UPDATE ... WHERE id IN (...)
+    
+    # Audit Configuration
+    AUDIT_BUFFER_MAX_ENTRIES: int = 500  # Buffered entries per unit of work before an early flush
+    AUDIT_PARTITION_MONTHS_AHEAD: int = 3  # Monthly partitions created in advance
+    AUDIT_HOT_MONTHS: int = 12  # Months kept in the database before archival
+    AUDIT_ARCHIVE_PATH: str = "/var/lib/kronos-eam/audit-archive"  # Persistent storage: archived months exist only here
+    AUDIT_ARCHIVE_BATCH_SIZE: int = 50000  # Rows fetched and written per Parquet row group
+    AUDIT_REPORT_CACHE_SIZE: int = 256  # Cached compliance reports of closed periods
+    AUDIT_REPORT_CLOSED_AFTER_MINUTES: int = 10  # Delay before a period counts as closed
+    
+    # Deadline Reminder Configuration
+    REMINDER_URGENT_HOURS: int = 24  # "Urgent" reminder when due within this window
+    REMINDER_UPCOMING_DAYS: int = 7  # "Upcoming" reminder when due within this window
+    REMINDER_BATCH_SIZE: int = 1000  # Tasks processed per transaction in a sweep
+    
     # File Upload Configuration
     MAX_UPLOAD_SIZE: int = 52428800  # 50MB
     ALLOWED_EXTENSIONS: List[str] = ["pdf", "doc", "docx", "xls", "xlsx", "png", "jpg", "jpeg", "xml"]
     UPLOAD_PATH: str = "/tmp/uploads"
+    UPLOAD_CHUNK_SIZE: int = 1048576  # 1MB, bytes held in memory per upload while streaming
+    DOWNLOAD_CHUNK_SIZE: int = 262144  # 256KB, read size when streaming files from disk
+    DOWNLOAD_CACHE_MAX_AGE: int = 0  # Seconds browsers may reuse a download before revalidating
+    DOCUMENT_BLOB_GC_GRACE_HOURS: int = 24  # Unreferenced blobs are kept this long before deletion
+    DOCUMENT_BLOB_GC_BATCH_SIZE: int = 500  # Blobs deleted per transaction by the garbage collector
     
     # WebSocket Configuration
     WS_MESSAGE_QUEUE: str = "redis"  # redis or memory
     WS_HEARTBEAT_INTERVAL: int = 30
+    WS_PUBSUB_CHANNEL: str = "kronos:ws:fanout"  # Redis channel shared by all workers
+    WS_SEND_QUEUE_SIZE: int = 256  # Messages buffered per connection
+    WS_SEND_TIMEOUT: float = 10.0  # Seconds a single send may take before the client is dropped
+    WS_SLOW_CONSUMER_POLICY: str = "close"  # close or drop (messages) when the send queue is full
+    
+    # Change Feed Configuration
+    CHANGE_FEED_RETENTION_HOURS: int = 72  # Older events are pruned; clients behind that reload
+    CHANGE_FEED_POLL_INTERVAL: float = 15.0  # Idle streams re-check for other workers' events
+    CHANGE_FEED_BATCH_SIZE: int = 500  # Events per read when replaying
     
     # Monitoring
     SENTRY_DSN: Optional[str] = None
@@ -147,6 +212,20 @@ class Settings(BaseSettings):
     SMTP_USER: Optional[str] = None
     SMTP_PASSWORD: Optional[str] = None
     SMTP_FROM: str = "noreply@kronos-eam.com"
+    SMTP_USE_TLS: bool = True  # STARTTLS after connecting
+    SMTP_POOL_SIZE: int = 5  # Persistent SMTP connections per worker
+    SMTP_TIMEOUT: int = 30
+    APP_URL: str = "http://localhost:3000"  # Base URL of links in emails
+    
+    # Notification Delivery Workers
+    NOTIFICATION_WORKER_BATCH_SIZE: int = 100  # Queue rows claimed per batch
+    NOTIFICATION_WORKER_POLL_INTERVAL: float = 5.0  # Seconds between polls of an empty queue
+    NOTIFICATION_CLAIM_LEASE_SECONDS: int = 300  # Claimed rows become claimable again after this
+    NOTIFICATION_EMAIL_CONCURRENCY: int = 5  # Concurrent deliveries per channel
+    NOTIFICATION_SMS_CONCURRENCY: int = 10
+    NOTIFICATION_PUSH_CONCURRENCY: int = 20
+    NOTIFICATION_DIGEST_DAILY_TIME: str = "08:00"  # Daily digest time when the user has none (HH:MM)
+    NOTIFICATION_DIGEST_MAX_ITEMS: int = 50  # Lines rendered in one digest message
     
     # Cache Configuration
     CACHE_TTL: int = 300  # 5 minutes
@@ -191,7 +191,7 @@ def init_db(tenant_id: Optional[str] = None) -> None:
     engine = get_engine(tenant_id)
     
     # Import all models to ensure they're registered
-    from app.models import tenant, user, plant, workflow, document, chat, notification, integration  # noqa
+    from app.models import tenant, user, plant, workflow, document, chat, notification, integration, change_feed  # noqa
     
     # Create tables
     Base.metadata.create_all(bind=engine)
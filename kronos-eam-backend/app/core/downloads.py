@@ -0,0 +1,199 @@
+"""
+HTTP file downloads with validators, conditional GET and byte ranges
+
+Files are streamed from disk in DOWNLOAD_CHUNK_SIZE reads (never loaded
+whole in memory). The ETag is the stored SHA-256 checksum, so clients that
+already hold the content get a 304 and PDF viewers can seek with Range
+requests instead of re-downloading the document.
+"""
+
+from typing import AsyncIterator, List, Optional
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from pathlib import Path
+from urllib.parse import quote
+import os
+import re
+
+import anyio
+from fastapi import Request
+from starlette.responses import Response, StreamingResponse
+
+from app.core.config import settings
+
+
+_RANGE_SPEC = re.compile(r"^(\d*)-(\d*)$")
+
+
+def make_etag(checksum: Optional[str], stat: os.stat_result) -> str:
+    """Strong ETag from the content checksum, weak one from size/mtime when missing"""
+    if checksum:
+        return f'"{checksum}"'
+    return f'W/"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+
+
+def content_disposition(filename: str, inline: bool = False) -> str:
+    """Content-Disposition with an ASCII fallback and RFC 5987 UTF-8 name"""
+    disposition = "inline" if inline else "attachment"
+    fallback = filename.encode("ascii", "ignore").decode().replace('"', "").replace("\\", "") or "download"
+    return f"{disposition}; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename)}"
+
+
+def file_response(
+    request: Request,
+    path: Path,
+    *,
+    media_type: Optional[str] = None,
+    filename: Optional[str] = None,
+    checksum: Optional[str] = None,
+    inline: bool = False
+) -> Response:
+    """
+    Build the response for a file on disk, honouring conditional and Range headers
+
+    Args:
+        request: Incoming request (If-None-Match, If-Modified-Since, Range, If-Range)
+        path: File on disk
+        media_type: Content type, defaults to application/octet-stream
+        filename: Name offered to the client in Content-Disposition
+        checksum: Stored SHA-256 of the content, used as strong ETag
+        inline: Ask browsers to display the file instead of saving it
+
+    Returns:
+        304, 206, 416 or 200 response; bodies are streamed from disk
+    """
+    stat = path.stat()
+    size = stat.st_size
+    etag = make_etag(checksum, stat)
+    last_modified = datetime.fromtimestamp(int(stat.st_mtime), tz=timezone.utc)
+
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(last_modified, usegmt=True),
+        "Accept-Ranges": "bytes",
+        # Tenant documents: never in shared caches, revalidate through the ETag
+        "Cache-Control": f"private, max-age={settings.DOWNLOAD_CACHE_MAX_AGE}, must-revalidate",
+    }
+    if filename:
+        headers["Content-Disposition"] = content_disposition(filename, inline)
+
+    if _not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+
+    media_type = media_type or "application/octet-stream"
+    ranges = _requested_range(request, etag, last_modified, size)
+
+    if ranges == "unsatisfiable":
+        headers["Content-Range"] = f"bytes */{size}"
+        return Response(status_code=416, headers=headers)
+
+    if ranges is None:
+        start, end, status_code = 0, size - 1, 200
+    else:
+        (start, end), status_code = ranges, 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    length = max(end - start + 1, 0)
+    headers["Content-Length"] = str(length)
+
+    if request.method == "HEAD":
+        return Response(status_code=status_code, headers=headers, media_type=media_type)
+
+    return StreamingResponse(
+        _read_range(path, start, length),
+        status_code=status_code,
+        headers=headers,
+        media_type=media_type
+    )
+
+
+async def _read_range(path: Path, start: int, length: int) -> AsyncIterator[bytes]:
+    """Yield `length` bytes from `start` in DOWNLOAD_CHUNK_SIZE reads"""
+    chunk_size = settings.DOWNLOAD_CHUNK_SIZE
+    async with await anyio.open_file(path, "rb") as f:
+        await f.seek(start)
+        while length > 0:
+            chunk = await f.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _etag_list(header: str) -> List[str]:
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+
+def _weak_match(a: str, b: str) -> bool:
+    return a.removeprefix("W/") == b.removeprefix("W/")
+
+
+def _parse_http_date(value: str) -> Optional[datetime]:
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+    """RFC 9110 13.2.2: If-None-Match wins over If-Modified-Since"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = _etag_list(if_none_match)
+        return "*" in tags or any(_weak_match(tag, etag) for tag in tags)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        since = _parse_http_date(if_modified_since)
+        return since is not None and last_modified <= since
+
+    return False
+
+
+def _requested_range(request: Request, etag: str, last_modified: datetime, size: int):
+    """
+    Single byte range asked for by the client
+
+    Returns None to serve the whole file (no/ignored Range, multiple ranges,
+    stale If-Range), "unsatisfiable" for a 416, otherwise (start, end).
+    """
+    header = request.headers.get("range")
+    if not header or not header.startswith("bytes="):
+        return None
+
+    if_range = request.headers.get("if-range")
+    if if_range:
+        if if_range.startswith(('"', "W/")):
+            # Range over a changed representation must not be spliced: strong match only
+            if if_range.startswith("W/") or if_range != etag:
+                return None
+        else:
+            since = _parse_http_date(if_range)
+            if since is None or last_modified > since:
+                return None
+
+    specs = header[len("bytes="):].split(",")
+    if len(specs) != 1:
+        # Multipart ranges are rare for documents; the full body is a valid answer
+        return None
+
+    match = _RANGE_SPEC.match(specs[0].strip())
+    if not match or match.group(1) == match.group(2) == "":
+        # Malformed ranges are ignored, not refused
+        return None
+
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            return "unsatisfiable"
+        return max(size - suffix, 0), size - 1
+
+    start, end = int(first), int(last) if last else size - 1
+    if last and end < start:
+        return None
+    if start >= size:
+        return "unsatisfiable"
+    return start, min(end, size - 1)
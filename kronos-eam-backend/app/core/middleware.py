@@ -12,6 +12,7 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from prometheus_client import Counter, Histogram
 
 from app.core.config import settings
+from app.core.request_context import set_request_context, reset_request_context
 
 logger = logging.getLogger(__name__)
 
@@ -36,9 +37,17 @@ class RequestTrackingMiddleware(BaseHTTPMiddleware):
         # Add request ID for tracing
         request_id = request.headers.get("X-Request-ID", f"req_{int(time.time() * 1000)}")
         request.state.request_id = request_id
+        context_token = set_request_context(
+            request_id=request_id,
+            ip_address=request.client.host if request.client else None,
+            user_agent=request.headers.get("user-agent")
+        )
         
         # Process request
-        response = await call_next(request)
+        try:
+            response = await call_next(request)
+        finally:
+            reset_request_context(context_token)
         
         # Track metrics
         duration = time.time() - start_time
@@ -0,0 +1,44 @@
+"""
+Per-request context shared with code that has no access to the Request object.
+Used to correlate audit entries and logs with the originating HTTP request.
+"""
+
+from contextvars import ContextVar, Token
+from typing import Optional, Dict, Any
+
+
+_request_context: ContextVar[Optional[Dict[str, Any]]] = ContextVar(
+    "request_context", default=None
+)
+
+
+def set_request_context(
+    request_id: Optional[str] = None,
+    ip_address: Optional[str] = None,
+    user_agent: Optional[str] = None
+) -> Token:
+    """Bind request metadata to the current execution context.
+
+    Args:
+        request_id: Request identifier (X-Request-ID)
+        ip_address: Client IP address
+        user_agent: Client user agent
+
+    Returns:
+        Token to pass to reset_request_context
+    """
+    return _request_context.set({
+        "request_id": request_id,
+        "ip_address": ip_address,
+        "user_agent": user_agent
+    })
+
+
+def reset_request_context(token: Token) -> None:
+    """Restore the context that was active before set_request_context."""
+    _request_context.reset(token)
+
+
+def get_request_context() -> Dict[str, Any]:
+    """Get the metadata of the current request (empty outside a request)."""
+    return _request_context.get() or {}
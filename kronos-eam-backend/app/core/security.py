@@ -7,7 +7,7 @@ from datetime import datetime, timedelta
 from typing import Optional, Dict, Any, List
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from fastapi import HTTPException, status, Depends
+from fastapi import HTTPException, status, Depends, Query
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
@@ -31,6 +31,13 @@ oauth2_scheme = OAuth2PasswordBearer(
     scheme_name="JWT"
 )
 
+# Same scheme, for endpoints that also accept the token elsewhere
+optional_oauth2_scheme = OAuth2PasswordBearer(
+    tokenUrl=f"{settings.API_V1_STR}/auth/login",
+    scheme_name="JWT",
+    auto_error=False
+)
+
 
 class TokenData(BaseModel):
     """Token payload data"""
@@ -194,6 +201,28 @@ async def get_current_active_user(
     return current_user
 
 
+async def get_current_active_stream_user(
+    header_token: Optional[str] = Depends(optional_oauth2_scheme),
+    token: Optional[str] = Query(None, description="JWT access token, for EventSource clients that cannot send headers"),
+    db: Session = Depends(get_db)
+) -> TokenData:
+    """
+    Get current active user of a streaming endpoint
+
+    Browser EventSource cannot set the Authorization header, so the token is
+    also accepted as a query parameter, as for the WebSocket endpoint.
+    """
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    if not (header_token or token):
+        raise credentials_exception
+    
+    return await get_current_active_user(verify_token(header_token or token, credentials_exception), db)
+
+
 # Mock authentication for local development
 async def mock_get_current_active_user() -> TokenData:
     """Mock authentication that always returns a valid user"""
@@ -0,0 +1,133 @@
+"""
+Coalescing of identical in-flight calls (singleflight)
+"""
+
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import logging
+
+from langchain_core.runnables.config import ensure_config
+from langchain_core.tracers._streaming import _StreamingCallbackHandler
+
+logger = logging.getLogger(__name__)
+
+
+def make_key(*parts: Any) -> str:
+    """Stable key of call arguments (dicts in any key order give the same key)"""
+    payload = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class SingleFlight:
+    """
+    Runs one call per key at a time; concurrent callers with the same key
+    await that call and share its result (or its exception).
+
+    The call runs in its own task, so a caller giving up (cancelled, timed
+    out) does not cancel it for the others. Nothing is cached: once the
+    call completes, the next caller starts a new one. Shared results must
+    be treated as read-only.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Tuple[int, Hashable], asyncio.Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Result of fn(), or of the identical call already in flight for key"""
+        loop = asyncio.get_running_loop()
+        # Futures belong to one event loop
+        flight_key = (id(loop), key)
+
+        task = self._calls.get(flight_key)
+        if task is None:
+            self.calls += 1
+            task = loop.create_task(fn())
+            self._calls[flight_key] = task
+            task.add_done_callback(lambda done: self._forget(flight_key, done))
+        else:
+            self.coalesced += 1
+
+        return await asyncio.shield(task)
+
+    def _forget(self, flight_key: Tuple[int, Hashable], task: asyncio.Future) -> None:
+        if self._calls.get(flight_key) is task:
+            del self._calls[flight_key]
+        if not task.cancelled() and task.exception() is not None:
+            # Retrieved here so that a failure nobody awaits anymore is not reported as unhandled
+            logger.debug(f"Coalesced call failed: {task.exception()}")
+
+
+def _message_key(message: Any) -> Tuple[str, str]:
+    """(role, whitespace-normalized content) of a chat message in any input form"""
+    if isinstance(message, tuple):
+        role, content = message
+    elif isinstance(message, dict):
+        role, content = message.get("role", ""), message.get("content", "")
+    elif isinstance(message, str):
+        role, content = "user", message
+    else:
+        role, content = getattr(message, "type", ""), getattr(message, "content", "")
+    if isinstance(content, str):
+        content = " ".join(content.split())
+    return str(role), json.dumps(content, sort_keys=True, default=str)
+
+
+def _streams_tokens(config: Dict[str, Any]) -> bool:
+    """Whether a run has a token listener (astream_events), which makes chat models stream"""
+    callbacks = config.get("callbacks")
+    handlers = getattr(callbacks, "handlers", callbacks) or []
+    return any(isinstance(handler, _StreamingCallbackHandler) for handler in handlers)
+
+
+# Model attributes that change the completion of the same prompt
+MODEL_PARAMETERS = ("model", "model_name", "temperature", "top_p", "top_k", "max_output_tokens", "max_tokens")
+
+
+class CoalescingLLM:
+    """
+    Chat model wrapper sharing one `ainvoke` among identical concurrent calls
+
+    Calls are identical when tenant, model parameters, normalized messages
+    and call options match. The tenant is read from the `tenant_id` of the
+    run's configurable (agent graphs are shared by all tenants); calls
+    outside a tenant run are never coalesced. Neither are calls of a run
+    whose tokens are being streamed: callers awaiting another run's call
+    would receive the whole answer at once, with no token events. Everything
+    else is delegated to the model.
+    """
+
+    def __init__(self, llm, flight: Optional[SingleFlight] = None):
+        self.llm = llm
+        self.flight = flight if flight is not None else llm_flight
+        self._parameters = {name: getattr(llm, name) for name in MODEL_PARAMETERS if hasattr(llm, name)}
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.llm, name)
+
+    async def ainvoke(self, input: Any, config: Optional[Dict[str, Any]] = None, **kwargs) -> Any:
+        run_config = ensure_config(config)
+        tenant_id = run_config.get("configurable", {}).get("tenant_id")
+        if tenant_id is None or _streams_tokens(run_config):
+            return await self.llm.ainvoke(input, config, **kwargs)
+
+        messages = input if isinstance(input, list) else [input]
+        key = make_key(
+            str(tenant_id),
+            type(self.llm).__name__,
+            self._parameters,
+            [_message_key(message) for message in messages],
+            kwargs
+        )
+        return await self.flight.do(key, lambda: self.llm.ainvoke(input, config, **kwargs))
+
+
+# Process-wide flights: LLM generations and vector store searches
+llm_flight = SingleFlight()
+search_flight = SingleFlight()
@@ -0,0 +1,243 @@
+"""
+Voice activity detection and incremental transcription of PCM streams
+"""
+
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+from collections import deque
+import asyncio
+import logging
+import math
+import time
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Energy floor below which a frame is never speech, in dBFS
+MIN_SPEECH_DB = -50.0
+# Smoothing of the background noise estimate (per non-speech frame)
+NOISE_FLOOR_ALPHA = 0.05
+
+
+def pcm16_to_float(data: bytes) -> np.ndarray:
+    """16-bit little-endian PCM to float32 in [-1, 1)"""
+    usable = len(data) - len(data) % 2
+    return np.frombuffer(data[:usable], dtype="<i2").astype(np.float32) / 32768.0
+
+
+def frame_energy_db(frame: np.ndarray) -> float:
+    return 10 * math.log10(float(np.mean(frame.astype(np.float64) ** 2)) + 1e-10)
+
+
+class EnergyVAD:
+    """
+    Frame classifier: speech when the energy exceeds the background noise
+    estimate by `margin_db` (and MIN_SPEECH_DB)
+
+    The noise floor follows non-speech frames (and drops at once to any
+    quieter frame), so steady background noise does not count as speech.
+    """
+
+    def __init__(self, margin_db: float = 12.0, min_speech_db: float = MIN_SPEECH_DB):
+        self.margin_db = margin_db
+        self.min_speech_db = min_speech_db
+        self.noise_floor: Optional[float] = None
+
+    def is_speech(self, frame: np.ndarray) -> bool:
+        energy = frame_energy_db(frame)
+        if self.noise_floor is None:
+            self.noise_floor = energy
+        speech = energy > max(self.min_speech_db, self.noise_floor + self.margin_db)
+        if energy < self.noise_floor:
+            self.noise_floor = energy
+        elif not speech:
+            self.noise_floor += NOISE_FLOOR_ALPHA * (energy - self.noise_floor)
+        return speech
+
+
+class StreamingTranscriber:
+    """
+    Cuts a PCM stream into utterances and transcribes them as they arrive
+
+    Events passed to `emit`:
+
+    - speech_start: an utterance began (`start` in stream seconds)
+    - partial: hypothesis for the last `partial_window` seconds of the
+      utterance, every `partial_interval_ms` of speech; decoded in the
+      background, at most one at a time, and dropped if the utterance is
+      finalized first
+    - final: transcript of the whole utterance, once `end_silence_ms` of
+      silence follow it (or it reaches `max_segment_seconds`).
+      `latency_ms` is the time from the end of speech to the transcript:
+      the silence needed to detect it plus the decoding time.
+
+    Args:
+        transcribe: Coroutine function turning float32 samples (at
+            sample_rate) into text
+        emit: Coroutine function receiving the events
+        sample_rate: Rate of the incoming PCM
+    """
+
+    def __init__(
+        self,
+        transcribe: Callable[[np.ndarray], Awaitable[str]],
+        emit: Callable[[Dict[str, Any]], Awaitable[None]],
+        sample_rate: int = 16000,
+        vad: Optional[EnergyVAD] = None,
+        frame_ms: int = 20,
+        start_ms: int = 60,
+        pre_roll_ms: int = 200,
+        end_silence_ms: Optional[int] = None,
+        partial_interval_ms: Optional[int] = None,
+        partial_window: Optional[float] = None,
+        max_segment_seconds: Optional[float] = None,
+        max_final_latency_ms: Optional[int] = None
+    ):
+        self.transcribe = transcribe
+        self.emit = emit
+        self.sample_rate = sample_rate
+        self.vad = vad or EnergyVAD(margin_db=settings.STT_STREAM_VAD_MARGIN_DB)
+        self.frame_size = sample_rate * frame_ms // 1000
+        self.frame_seconds = self.frame_size / sample_rate
+        self.start_frames = max(1, start_ms // frame_ms)
+        self.end_silence_frames = max(1, (end_silence_ms or settings.STT_STREAM_END_SILENCE_MS) // frame_ms)
+        self.partial_frames = max(1, (partial_interval_ms or settings.STT_STREAM_PARTIAL_INTERVAL_MS) // frame_ms)
+        self.partial_window_frames = int((partial_window or settings.STT_STREAM_PARTIAL_WINDOW_SECONDS) / self.frame_seconds)
+        self.max_segment_frames = int((max_segment_seconds or settings.STT_STREAM_MAX_SEGMENT_SECONDS) / self.frame_seconds)
+        self.max_final_latency_ms = max_final_latency_ms or settings.STT_STREAM_MAX_FINAL_LATENCY_MS
+
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._pre_roll: Deque[np.ndarray] = deque(maxlen=max(1, pre_roll_ms // frame_ms))
+        self._frames = 0  # Frames processed since the stream began
+        self._speech_run = 0
+        self._silence_run = 0
+        self._segment: Optional[List[np.ndarray]] = None
+        self._segment_id = -1
+        self._segment_start = 0.0
+        self._speech_end = 0.0
+        self._since_partial = 0
+        self._partial_task: Optional[asyncio.Task] = None
+        self.segments = 0
+
+    @property
+    def position(self) -> float:
+        """Seconds of audio processed"""
+        return self._frames * self.frame_seconds
+
+    @property
+    def in_speech(self) -> bool:
+        return self._segment is not None
+
+    async def feed(self, pcm: bytes) -> None:
+        """Process a chunk of 16-bit little-endian mono PCM (any length)"""
+        await self.feed_samples(pcm16_to_float(pcm))
+
+    async def feed_samples(self, samples: np.ndarray) -> None:
+        samples = np.concatenate([self._pending, np.asarray(samples, dtype=np.float32)])
+        complete = len(samples) - len(samples) % self.frame_size
+        self._pending = samples[complete:]
+        for start in range(0, complete, self.frame_size):
+            await self._process_frame(samples[start:start + self.frame_size])
+
+    async def finish(self) -> None:
+        """End of the stream: finalize the utterance in progress"""
+        if self._segment is not None:
+            await self._finalize()
+        await self._cancel_partial()
+
+    async def _process_frame(self, frame: np.ndarray) -> None:
+        speech = self.vad.is_speech(frame)
+        self._frames += 1
+
+        if self._segment is None:
+            self._pre_roll.append(frame)
+            self._speech_run = self._speech_run + 1 if speech else 0
+            if self._speech_run >= self.start_frames:
+                await self._start_segment()
+            return
+
+        self._segment.append(frame)
+        if speech:
+            self._silence_run = 0
+            self._speech_end = self.position
+        else:
+            self._silence_run += 1
+        self._since_partial += 1
+
+        if self._silence_run >= self.end_silence_frames or len(self._segment) >= self.max_segment_frames:
+            await self._finalize()
+        elif self._since_partial >= self.partial_frames and self._silence_run == 0:
+            self._since_partial = 0
+            self._start_partial()
+
+    async def _start_segment(self) -> None:
+        self._segment = list(self._pre_roll)
+        self._pre_roll.clear()
+        self._segment_id += 1
+        self._segment_start = self.position - len(self._segment) * self.frame_seconds
+        self._speech_end = self.position
+        self._silence_run = 0
+        self._since_partial = 0
+        await self.emit({"type": "speech_start", "segment": self._segment_id, "start": round(self._segment_start, 3)})
+
+    def _start_partial(self) -> None:
+        if self._partial_task is not None and not self._partial_task.done():
+            # The model is still on the previous window; skip this one
+            return
+        audio = np.concatenate(self._segment[-self.partial_window_frames:])
+        self._partial_task = asyncio.create_task(self._partial(self._segment_id, audio, self.position))
+
+    async def _partial(self, segment_id: int, audio: np.ndarray, end: float) -> None:
+        try:
+            text = await self.transcribe(audio)
+        except Exception as e:
+            logger.warning(f"Partial transcription failed: {str(e)}")
+            return
+        if segment_id == self._segment_id and self._segment is not None:
+            await self.emit({"type": "partial", "segment": segment_id, "transcript": text, "end": round(end, 3)})
+
+    async def _cancel_partial(self) -> None:
+        task, self._partial_task = self._partial_task, None
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _finalize(self) -> None:
+        segment, self._segment = self._segment, None
+        segment_id = self._segment_id
+        await self._cancel_partial()
+
+        # Trailing silence beyond the pre-roll length carries no speech
+        keep = len(segment) - max(0, self._silence_run - self._pre_roll.maxlen)
+        audio = np.concatenate(segment[:keep])
+        detection_ms = (self.position - self._speech_end) * 1000
+        self._speech_run = self._silence_run = 0
+        self.segments += 1
+
+        started = time.perf_counter()
+        try:
+            text = await self.transcribe(audio)
+            error = None
+        except Exception as e:
+            logger.error(f"Segment transcription failed: {str(e)}")
+            text, error = "", str(e)
+        latency_ms = detection_ms + (time.perf_counter() - started) * 1000
+        if latency_ms > self.max_final_latency_ms:
+            logger.warning(f"Final transcript after {latency_ms:.0f} ms (bound {self.max_final_latency_ms} ms)")
+
+        event = {
+            "type": "final",
+            "segment": segment_id,
+            "transcript": text,
+            "start": round(self._segment_start, 3),
+            "end": round(self._speech_end, 3),
+            "latency_ms": round(latency_ms, 1)
+        }
+        if error:
+            event["error"] = error
+        await self.emit(event)
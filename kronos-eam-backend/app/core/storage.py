@@ -2,69 +2,192 @@
 File storage backend for document management
 """
 
+from typing import BinaryIO, Iterable, Optional, Union
+from dataclasses import dataclass
 from pathlib import Path
 from datetime import datetime
+import asyncio
 import hashlib
 import os
+import tempfile
+import uuid
 
 from app.core.config import settings
 
 
+class FileTooLargeError(ValueError):
+    """Upload exceeded the size limit while it was being received"""
+
+    def __init__(self, max_size: int):
+        super().__init__(f"File too large. Max size: {max_size} bytes")
+        self.max_size = max_size
+
+
+@dataclass
+class StagedFile:
+    """File written to the staging area, hashed and measured, not yet in tenant storage"""
+    temp_path: Path
+    size: int
+    checksum: str
+
+
 class StorageBackend:
     """File storage backend implementation"""
-    
+
     def __init__(self):
         self.base_path = Path(settings.UPLOAD_PATH)
         self.base_path.mkdir(parents=True, exist_ok=True)
-    
+        # Staging lives under the storage root so commits are atomic renames
+        self.staging_path = self.base_path / ".staging"
+        self.staging_path.mkdir(parents=True, exist_ok=True)
+
     def store_file(
         self,
-        content: bytes,
+        content: Union[bytes, BinaryIO],
+        filename: str,
+        tenant_id: int,
+        subfolder: str = ""
+    ) -> str:
+        """Store file (bytes or a readable file object) and return path"""
+        if isinstance(content, (bytes, bytearray)):
+            staged = self.stage_chunks([content])
+        else:
+            staged = self.stage_file(content)
+        return self.commit_staged(staged, filename, tenant_id, subfolder)
+
+    def stage_file(self, file: BinaryIO, max_size: Optional[int] = None) -> StagedFile:
+        """Stage a readable file object in chunks, without loading it in memory"""
+        chunk_size = settings.UPLOAD_CHUNK_SIZE
+        return self.stage_chunks(iter(lambda: file.read(chunk_size), b""), max_size)
+
+    def stage_chunks(self, chunks: Iterable[bytes], max_size: Optional[int] = None) -> StagedFile:
+        """Write chunks to a staging file, hashing and enforcing the size limit as they arrive"""
+        writer = _StagingWriter(self.staging_path, max_size)
+        try:
+            for chunk in chunks:
+                writer.write(chunk)
+            return writer.finish()
+        except BaseException:
+            writer.abort()
+            raise
+
+    async def stage_upload(self, upload, max_size: Optional[int] = None) -> StagedFile:
+        """
+        Stage an incoming upload (e.g. a FastAPI UploadFile) chunk by chunk
+
+        At most one chunk is held in memory; disk writes and hashing run in
+        the thread pool so the event loop keeps serving other requests.
+
+        Raises:
+            FileTooLargeError: The upload exceeded max_size (nothing is kept)
+        """
+        chunk_size = settings.UPLOAD_CHUNK_SIZE
+        writer = await asyncio.to_thread(_StagingWriter, self.staging_path, max_size)
+        try:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                await asyncio.to_thread(writer.write, chunk)
+            return await asyncio.to_thread(writer.finish)
+        except BaseException:
+            await asyncio.to_thread(writer.abort)
+            raise
+
+    def commit_staged(
+        self,
+        staged: StagedFile,
         filename: str,
         tenant_id: int,
         subfolder: str = ""
     ) -> str:
-        """Store file and return path"""
-        # Create tenant directory
-        tenant_path = self.base_path / str(tenant_id) / subfolder
-        tenant_path.mkdir(parents=True, exist_ok=True)
-        
+        """Atomically move a staged file into tenant storage and return its path"""
         # Generate unique filename
         timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        unique_filename = f"{timestamp}_{filename}"
-        
-        file_path = tenant_path / unique_filename
-        
-        # Write file
-        with open(file_path, 'wb') as f:
-            f.write(content)
-        
-        # Return relative path
-        return str(file_path.relative_to(self.base_path))
-    
+        unique_filename = f"{timestamp}_{uuid.uuid4().hex[:8]}_{Path(filename).name}"
+
+        file_path = Path(str(tenant_id)) / subfolder / unique_filename
+        return self.commit_staged_as(staged, str(file_path))
+
+    def commit_staged_as(self, staged: StagedFile, file_path: str) -> str:
+        """Atomically move a staged file to an exact relative path (replacing it)"""
+        full_path = self.base_path / file_path
+        full_path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(staged.temp_path, full_path)
+        return file_path
+
+    def discard_staged(self, staged: StagedFile) -> None:
+        """Remove a staged file that will not be committed"""
+        try:
+            staged.temp_path.unlink()
+        except FileNotFoundError:
+            pass
+
     def retrieve_file(self, file_path: str) -> bytes:
         """Retrieve file content"""
         full_path = self.base_path / file_path
-        
+
         if not full_path.exists():
             raise FileNotFoundError(f"File not found: {file_path}")
-        
+
         with open(full_path, 'rb') as f:
             return f.read()
-    
+
+    def local_path(self, file_path: str) -> Path:
+        """Resolve a stored file to its path on disk, for streaming without a memory copy"""
+        full_path = (self.base_path / file_path).resolve()
+
+        if self.base_path.resolve() not in full_path.parents or not full_path.is_file():
+            raise FileNotFoundError(f"File not found: {file_path}")
+
+        return full_path
+
     def delete_file(self, file_path: str):
         """Delete file"""
         full_path = self.base_path / file_path
-        
+
         if full_path.exists():
             full_path.unlink()
-    
+
     def get_file_url(self, file_path: str) -> str:
         """Get URL for file access"""
         # In production, this would return a signed URL from cloud storage
         return f"/api/v1/documents/download/{file_path}"
-    
+
     def file_exists(self, file_path: str) -> bool:
         """Check if file exists"""
         full_path = self.base_path / file_path
-        return full_path.exists()
\ No newline at end of file
+        return full_path.exists()
+
+
+class _StagingWriter:
+    """Temporary file with incremental SHA-256 and size enforcement"""
+
+    def __init__(self, staging_path: Path, max_size: Optional[int]):
+        self.max_size = max_size
+        self.size = 0
+        self.digest = hashlib.sha256()
+        fd, path = tempfile.mkstemp(dir=staging_path, suffix=".part")
+        self.path = Path(path)
+        self.file = os.fdopen(fd, "wb")
+
+    def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.max_size is not None and self.size > self.max_size:
+            raise FileTooLargeError(self.max_size)
+        self.digest.update(chunk)
+        self.file.write(chunk)
+
+    def finish(self) -> StagedFile:
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        return StagedFile(temp_path=self.path, size=self.size, checksum=self.digest.hexdigest())
+
+    def abort(self) -> None:
+        if not self.file.closed:
+            self.file.close()
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
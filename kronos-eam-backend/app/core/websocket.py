@@ -1,95 +1,284 @@
 """
 WebSocket connection manager for real-time notifications
+
+Connections are indexed per tenant and per (tenant, user). Every connection
+has a bounded send queue drained by its own writer task, so fan-out only
+enqueues and never waits on a client: a slow consumer fills its own queue
+and is closed (or has messages dropped) without stalling anyone else.
+
+With several Uvicorn workers, messages are published on a pub/sub backplane
+(Redis, or an in-memory stand-in for single-process runs and tests) and
+every worker delivers them to its local connections.
 """
 
-from typing import Dict, List
+from typing import Any, Callable, Awaitable, Dict, Optional, Set, Tuple
 from fastapi import WebSocket
+import asyncio
 import json
+import logging
+import uuid
+
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Close code sent to consumers that cannot keep up (RFC 6455 "Try Again Later")
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+class _Connection:
+    """One WebSocket with its bounded send queue and writer task"""
+
+    def __init__(self, websocket: WebSocket, tenant_id: str, user_id: str, manager: "ConnectionManager"):
+        self.websocket = websocket
+        self.tenant_id = tenant_id
+        self.user_id = user_id
+        self.manager = manager
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=manager.queue_size)
+        self.dropped = 0
+        self.closed = False
+        self.writer = asyncio.create_task(self._write())
+
+    def offer(self, message_text: str) -> None:
+        """Enqueue a message without waiting; applies the slow consumer policy when full"""
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(message_text)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.manager.slow_consumer_policy == "close":
+                logger.warning(
+                    f"Closing slow WebSocket consumer (tenant {self.tenant_id}, user {self.user_id})"
+                )
+                self.close(SLOW_CONSUMER_CLOSE_CODE)
+
+    def close(self, code: int = 1000) -> None:
+        """Unregister and close the socket in the background"""
+        if self.closed:
+            return
+        self.closed = True
+        self.manager._unregister(self)
+        self.writer.cancel()
+        asyncio.create_task(self._close_socket(code))
+
+    async def _write(self) -> None:
+        try:
+            while True:
+                message_text = await self.queue.get()
+                await asyncio.wait_for(
+                    self.websocket.send_text(message_text),
+                    timeout=self.manager.send_timeout
+                )
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            # Send failed or timed out: the client is gone or too slow
+            logger.info(f"WebSocket send failed (tenant {self.tenant_id}, user {self.user_id}): {e}")
+            self.close(SLOW_CONSUMER_CLOSE_CODE)
+
+    async def _close_socket(self, code: int) -> None:
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+
+class InMemoryPubSub:
+    """
+    Process-local stand-in for the Redis backplane
+
+    Every manager subscribed to the same instance receives every published
+    message, which is how several workers behave against one Redis.
+    """
+
+    def __init__(self):
+        self._handlers: Set[Callable[[str], Awaitable[None]]] = set()
+
+    async def publish(self, payload: str) -> None:
+        for handler in list(self._handlers):
+            await handler(payload)
+
+    async def subscribe(self, handler: Callable[[str], Awaitable[None]]) -> None:
+        self._handlers.add(handler)
+
+    async def close(self, handler: Callable[[str], Awaitable[None]]) -> None:
+        self._handlers.discard(handler)
+
+
+class RedisPubSub:
+    """Backplane over a Redis pub/sub channel"""
+
+    def __init__(self, redis_url: str, channel: str):
+        import redis.asyncio as aioredis
+
+        self.channel = channel
+        self._redis = aioredis.from_url(redis_url, decode_responses=True)
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+
+    async def publish(self, payload: str) -> None:
+        await self._redis.publish(self.channel, payload)
+
+    async def subscribe(self, handler: Callable[[str], Awaitable[None]]) -> None:
+        self._pubsub = self._redis.pubsub()
+        await self._pubsub.subscribe(self.channel)
+        self._listener = asyncio.create_task(self._listen(handler))
+
+    async def _listen(self, handler: Callable[[str], Awaitable[None]]) -> None:
+        while True:
+            try:
+                async for message in self._pubsub.listen():
+                    if message.get("type") == "message":
+                        await handler(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"WebSocket backplane subscription failed, resubscribing: {e}")
+                await asyncio.sleep(1)
+
+    async def close(self, handler: Callable[[str], Awaitable[None]]) -> None:
+        if self._listener:
+            self._listener.cancel()
+        if self._pubsub is not None:
+            await self._pubsub.unsubscribe(self.channel)
+            await self._pubsub.close()
+        await self._redis.close()
 
 
 class ConnectionManager:
     """Manages WebSocket connections for real-time updates"""
-    
-    def __init__(self):
-        # Maps tenant_id to list of active connections
-        self.active_connections: Dict[int, List[WebSocket]] = {}
-        # Maps connection to user info
-        self.connection_users: Dict[WebSocket, Dict] = {}
-    
-    async def connect(self, websocket: WebSocket, tenant_id: int, user_id: int):
+
+    def __init__(
+        self,
+        backplane: Optional[Any] = None,
+        queue_size: Optional[int] = None,
+        send_timeout: Optional[float] = None,
+        slow_consumer_policy: Optional[str] = None
+    ):
+        self.backplane = backplane
+        self.queue_size = queue_size or settings.WS_SEND_QUEUE_SIZE
+        self.send_timeout = send_timeout or settings.WS_SEND_TIMEOUT
+        self.slow_consumer_policy = slow_consumer_policy or settings.WS_SLOW_CONSUMER_POLICY
+        self.instance_id = uuid.uuid4().hex
+
+        # tenant_id -> connections, (tenant_id, user_id) -> connections
+        self.tenant_connections: Dict[str, Set[_Connection]] = {}
+        self.user_connections: Dict[Tuple[str, str], Set[_Connection]] = {}
+        self.connections: Dict[WebSocket, _Connection] = {}
+        self._started = False
+
+    async def start(self) -> None:
+        """Subscribe to the backplane (configured from settings when none was given)"""
+        if self._started:
+            return
+        if self.backplane is None:
+            if settings.WS_MESSAGE_QUEUE == "redis" and not settings.DISABLE_REDIS:
+                self.backplane = RedisPubSub(str(settings.REDIS_URL), settings.WS_PUBSUB_CHANNEL)
+            else:
+                self.backplane = InMemoryPubSub()
+        try:
+            await self.backplane.subscribe(self._on_backplane_message)
+        except Exception as e:
+            # In development, fall back to process-local delivery if Redis is not available
+            logger.warning(f"WebSocket backplane unavailable, delivering to local connections only: {e}")
+            self.backplane = InMemoryPubSub()
+            await self.backplane.subscribe(self._on_backplane_message)
+        self._started = True
+
+    async def stop(self) -> None:
+        """Leave the backplane and close every local connection"""
+        if self._started:
+            await self.backplane.close(self._on_backplane_message)
+            self._started = False
+        for connection in list(self.connections.values()):
+            connection.close(1001)
+
+    async def connect(self, websocket: WebSocket, tenant_id: str, user_id: str):
         """Accept a new WebSocket connection"""
         await websocket.accept()
-        
-        # Add to tenant connections
-        if tenant_id not in self.active_connections:
-            self.active_connections[tenant_id] = []
-        self.active_connections[tenant_id].append(websocket)
-        
-        # Store user info
-        self.connection_users[websocket] = {
-            "tenant_id": tenant_id,
-            "user_id": user_id
-        }
-    
+
+        connection = _Connection(websocket, str(tenant_id), str(user_id), self)
+        self.connections[websocket] = connection
+        self.tenant_connections.setdefault(connection.tenant_id, set()).add(connection)
+        self.user_connections.setdefault((connection.tenant_id, connection.user_id), set()).add(connection)
+
     def disconnect(self, websocket: WebSocket):
         """Remove a WebSocket connection"""
-        # Get user info
-        user_info = self.connection_users.get(websocket)
-        if not user_info:
-            return
-        
-        tenant_id = user_info["tenant_id"]
-        
-        # Remove from tenant connections
-        if tenant_id in self.active_connections:
-            self.active_connections[tenant_id].remove(websocket)
-            if not self.active_connections[tenant_id]:
-                del self.active_connections[tenant_id]
-        
-        # Remove user info
-        del self.connection_users[websocket]
-    
+        connection = self.connections.get(websocket)
+        if connection:
+            connection.closed = True
+            connection.writer.cancel()
+            self._unregister(connection)
+
+    def _unregister(self, connection: _Connection) -> None:
+        self.connections.pop(connection.websocket, None)
+
+        tenant_set = self.tenant_connections.get(connection.tenant_id)
+        if tenant_set is not None:
+            tenant_set.discard(connection)
+            if not tenant_set:
+                del self.tenant_connections[connection.tenant_id]
+
+        user_key = (connection.tenant_id, connection.user_id)
+        user_set = self.user_connections.get(user_key)
+        if user_set is not None:
+            user_set.discard(connection)
+            if not user_set:
+                del self.user_connections[user_key]
+
     async def send_personal_message(self, message: str, websocket: WebSocket):
         """Send a message to a specific connection"""
-        await websocket.send_text(message)
-    
-    async def broadcast_to_tenant(self, tenant_id: int, message: dict):
-        """Broadcast a message to all connections in a tenant"""
-        if tenant_id not in self.active_connections:
+        connection = self.connections.get(websocket)
+        if connection:
+            connection.offer(message)
+
+    async def broadcast_to_tenant(self, tenant_id: str, message: dict):
+        """Broadcast a message to all connections of a tenant, on every worker"""
+        await self._publish(str(tenant_id), None, message)
+
+    async def send_to_user(self, tenant_id: str, user_id: str, message: dict):
+        """Send a message to every connection of a user, on every worker"""
+        await self._publish(str(tenant_id), str(user_id), message)
+
+    async def _publish(self, tenant_id: str, user_id: Optional[str], message: dict) -> None:
+        message_text = json.dumps(message, default=str)
+
+        # Local connections are served directly; other workers get it from the backplane
+        self._deliver_local(tenant_id, user_id, message_text)
+        if self._started:
+            await self.backplane.publish(json.dumps({
+                "origin": self.instance_id,
+                "tenant_id": tenant_id,
+                "user_id": user_id,
+                "message": message_text
+            }))
+
+    async def _on_backplane_message(self, payload: str) -> None:
+        try:
+            envelope = json.loads(payload)
+        except (TypeError, ValueError):
+            logger.warning("Ignoring malformed WebSocket backplane message")
             return
-        
-        message_text = json.dumps(message)
-        
-        # Send to all connections in tenant
-        disconnected = []
-        for connection in self.active_connections[tenant_id]:
-            try:
-                await connection.send_text(message_text)
-            except:
-                # Connection is closed
-                disconnected.append(connection)
-        
-        # Clean up disconnected connections
-        for connection in disconnected:
-            self.disconnect(connection)
-    
-    async def send_to_user(self, tenant_id: int, user_id: int, message: dict):
-        """Send a message to a specific user"""
-        if tenant_id not in self.active_connections:
+        if envelope.get("origin") == self.instance_id:
             return
-        
-        message_text = json.dumps(message)
-        
-        # Find connections for this user
-        for connection in self.active_connections[tenant_id]:
-            user_info = self.connection_users.get(connection)
-            if user_info and user_info["user_id"] == user_id:
-                try:
-                    await connection.send_text(message_text)
-                except:
-                    # Connection is closed
-                    self.disconnect(connection)
+        self._deliver_local(envelope["tenant_id"], envelope.get("user_id"), envelope["message"])
+
+    def _deliver_local(self, tenant_id: str, user_id: Optional[str], message_text: str) -> int:
+        """Enqueue on every matching local connection; returns the number of targets"""
+        if user_id is None:
+            targets = self.tenant_connections.get(tenant_id)
+        else:
+            targets = self.user_connections.get((tenant_id, user_id))
+        if not targets:
+            return 0
+
+        targets = list(targets)
+        for connection in targets:
+            connection.offer(message_text)
+        return len(targets)
 
 
 # Global connection manager instance
-manager = ConnectionManager()
\ No newline at end of file
+manager = ConnectionManager()
@@ -5,8 +5,10 @@ Multi-tenant renewable energy asset management system
 
 from contextlib import asynccontextmanager
 from datetime import datetime
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
 from fastapi.responses import JSONResponse
+import asyncio
+import json
 import logging
 from prometheus_client import Counter, Histogram, generate_latest, CollectorRegistry, REGISTRY
 from starlette.responses import Response
@@ -22,6 +24,11 @@ from app.core.middleware import (
 )
 from app.core.rate_limit import RateLimitMiddleware
 from app.api.v1.api import api_router
+from app.core.websocket import manager as ws_manager
+from app.core.database import get_db_context
+from app.services.change_feed_service import ChangeFeedService, broker as change_feed_broker
+from app.services.context_assembler import prompt_size_stats
+from app.services import data_generation  # noqa: F401  (registers its session listeners)
 
 # Configure logging
 log_format = (
@@ -75,6 +82,18 @@ def setup_prometheus_metrics():
 
 REQUEST_COUNT, REQUEST_DURATION, metrics_registry = setup_prometheus_metrics()
 
+# Estimated size of the prompt (conversation plus tool data) sent by each agent's generating node
+AGENT_PROMPT_TOKENS = Histogram(
+    'agent_prompt_tokens',
+    'Estimated tokens of the prompt sent to the model per agent turn',
+    ['agent'],
+    buckets=(250, 500, 1000, 2000, 4000, 6000, 8000, 16000),
+    registry=metrics_registry
+)
+prompt_size_stats.add_observer(
+    lambda agent, tokens: AGENT_PROMPT_TOKENS.labels(agent=agent).observe(tokens)
+)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -107,10 +126,25 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"Failed to initialize AI agents: {e}")
     
+    # Load the speech model before the first request needs it
+    if settings.ENABLE_VOICE_FEATURES and settings.STT_WARMUP_ON_STARTUP:
+        try:
+            from app.services.voice.voice_service import voice_service
+            await voice_service.stt_service.warm_up()
+        except ImportError:
+            logger.warning("Voice dependencies not installed, skipping STT warm-up")
+        except Exception as e:
+            logger.error(f"Failed to warm up STT model: {e}")
+    
+    # Join the cross-worker WebSocket backplane
+    await ws_manager.start()
+    change_feed_broker.bind_loop(asyncio.get_running_loop())
+    
     yield
     
     # Shutdown
     logger.info("Shutting down application")
+    await ws_manager.stop()
     cleanup_connections()
     logger.info("Application shutdown complete")
 
@@ -285,36 +319,72 @@ app.include_router(api_router, prefix=settings.API_V1_STR)
 
 # WebSocket endpoint for real-time features
 @app.websocket("/ws/{tenant_id}")
-async def websocket_endpoint(websocket, tenant_id: str) -> None:
+async def websocket_endpoint(websocket: WebSocket, tenant_id: str, token: str = "") -> None:
     """WebSocket endpoint for real-time updates.
     
     Args:
         websocket: WebSocket connection
         tenant_id: Tenant identifier for isolation
+        token: JWT access token (query parameter)
     """
+    from app.core.security import verify_token
+    
     try:
-        await websocket.accept()
-        await websocket.send_json({
+        token_data = verify_token(token, ValueError("Invalid token"))
+    except ValueError:
+        await websocket.close(code=1008)
+        return
+    if str(token_data.tenant_id) != tenant_id:
+        await websocket.close(code=1008)
+        return
+    
+    await ws_manager.connect(websocket, tenant_id, token_data.sub)
+    try:
+        # All sends go through the connection's queue
+        await ws_manager.send_personal_message(json.dumps({
             "type": "connection",
             "status": "connected",
             "tenant_id": tenant_id,
             "timestamp": datetime.utcnow().isoformat()
-        })
-        
-        # TODO: Implement full WebSocket handler with:
-        # - Authentication verification
-        # - Message routing
-        # - Real-time notifications
-        # - Presence tracking
+        }), websocket)
         
-        # For now, echo messages
+        # Server-to-client channel: clients only send keep-alives and change feed resumes
         while True:
             data = await websocket.receive_text()
-            await websocket.send_text(f"Echo: {data}")
+            if data == "ping":
+                await ws_manager.send_personal_message("pong", websocket)
+                continue
+            try:
+                request = json.loads(data)
+            except ValueError:
+                continue
+            if isinstance(request, dict) and request.get("type") == "resume":
+                await _replay_changes(websocket, tenant_id, int(token_data.sub), int(request.get("offset") or 0))
+    except WebSocketDisconnect:
+        pass
     except Exception as e:
         logger.error(f"WebSocket error for tenant {tenant_id}: {e}")
     finally:
-        await websocket.close()
+        ws_manager.disconnect(websocket)
+
+
+async def _replay_changes(websocket: WebSocket, tenant_id: str, user_id: int, offset: int) -> None:
+    """Send the change feed events after an offset; clients dedupe live events by offset"""
+    def read(after: int):
+        with get_db_context(tenant_id) as db:
+            return ChangeFeedService(db).read(tenant_id, user_id, after, settings.CHANGE_FEED_BATCH_SIZE)
+    
+    while True:
+        page = await asyncio.to_thread(read, offset)
+        if page["reset"]:
+            await ws_manager.send_personal_message(json.dumps({"type": "change", "change": {
+                "offset": offset, "type": "reset", "data": {}, "widgets": ["*"]
+            }}), websocket)
+        for change in page["events"]:
+            await ws_manager.send_personal_message(json.dumps({"type": "change", "change": change}), websocket)
+        offset = page["offset"]
+        if len(page["events"]) < settings.CHANGE_FEED_BATCH_SIZE:
+            return
 
 
 if __name__ == "__main__":
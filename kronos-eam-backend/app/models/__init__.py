@@ -4,7 +4,7 @@ All models support multi-tenant architecture
 """
 
 from app.models.base import Base, TenantMixin, TimestampMixin, AuditMixin
-from app.models.tenant import Tenant, TenantPlan
+from app.models.tenant import Tenant, TenantPlan, TenantDataGeneration
 from app.models.user import User, ApiKey, UserSession
 from app.models.plant import (
     Plant,
@@ -17,15 +17,18 @@ from app.models.workflow import (
     Workflow,
     WorkflowStage,
     WorkflowTask,
+    TaskEvent,
+    TaskInboxCounter,
     TaskDocument,
     TaskComment,
     WorkflowTemplate,
     TaskTemplate
 )
-from app.models.document import Document, DocumentVersion, DocumentExtraction, DocumentCopy, DocumentTemplate
+from app.models.document import Document, DocumentVersion, DocumentBlob, DocumentExtraction, DocumentCopy, DocumentTemplate
 # from app.models.integration import Integration, IntegrationLog, IntegrationCredential
-from app.models.notification import Notification, NotificationPreference
-from app.models.audit import AuditLog, AuditLogView
+from app.models.notification import Notification, NotificationPreference, ReminderLedger
+from app.models.audit import AuditLog, AuditLogArchive, AuditLogView
+from app.models.change_feed import ChangeEvent, ChangeFeedStream
 
 __all__ = [
     # Base classes
@@ -37,6 +40,7 @@ __all__ = [
     # Tenant models
     "Tenant",
     "TenantPlan",
+    "TenantDataGeneration",
     
     # User models
     "User",
@@ -54,6 +58,8 @@ __all__ = [
     "Workflow",
     "WorkflowStage",
     "WorkflowTask",
+    "TaskEvent",
+    "TaskInboxCounter",
     "TaskDocument",
     "TaskComment",
     "WorkflowTemplate",
@@ -62,6 +68,7 @@ __all__ = [
     # Document models
     "Document",
     "DocumentVersion",
+    "DocumentBlob",
     "DocumentExtraction",
     "DocumentCopy",
     "DocumentTemplate",
@@ -74,8 +81,14 @@ __all__ = [
     # Notification models
     "Notification",
     "NotificationPreference",
+    "ReminderLedger",
     
     # Audit models
     "AuditLog",
+    "AuditLogArchive",
     "AuditLogView",
+    
+    # Change feed models
+    "ChangeEvent",
+    "ChangeFeedStream",
 ]
\ No newline at end of file
@@ -3,7 +3,7 @@ Audit and logging models for compliance tracking
 """
 
 from datetime import datetime
-from sqlalchemy import Column, String, Integer, DateTime, JSON, ForeignKey, Text, Enum
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, JSON, ForeignKey, Text, Enum, Index, Sequence
 from sqlalchemy.orm import relationship
 import enum
 
@@ -19,11 +19,28 @@ class TipoModificaEnum(str, enum.Enum):
 
 
 class AuditLog(Base, TenantMixin):
-    """Complete audit trail for all entity changes"""
-    __tablename__ = "audit_logs"
+    """Complete audit trail for all entity changes
     
-    # Primary key
-    id = Column(Integer, primary_key=True, index=True)
+    On PostgreSQL the table is range-partitioned by month on created_at
+    (see alembic revision 002_partition_audit_logs); the physical primary key
+    is (id, created_at). Cold months are moved to compressed Parquet files
+    and tracked in AuditLogArchive.
+    """
+    __tablename__ = "audit_logs"
+    __table_args__ = (
+        Index("ix_audit_logs_tenant_created", "tenant_id", "created_at"),
+        Index("ix_audit_logs_tenant_entity", "tenant_id", "entity_type", "entity_id", "created_at"),
+        Index("ix_audit_logs_tenant_user", "tenant_id", "utente_id", "created_at"),
+    )
+    
+    # Primary key: (id, created_at) as on the partitioned table. The id comes
+    # from one sequence shared by all partitions; SQLite (tests) cannot
+    # autoincrement a composite key, so there the table key is id alone
+    id = Column(
+        BigInteger().with_variant(Integer, "sqlite"),
+        Sequence("audit_logs_part_id_seq"),
+        primary_key=True
+    )
     
     # Entity tracking
     entity_type = Column(String(50), nullable=False)  # workflow, task, document, etc.
@@ -51,12 +68,14 @@ class AuditLog(Base, TenantMixin):
     note = Column(Text)  # Optional user-provided reason
     automatic = Column(Integer, default=0)  # 1 if system-generated change
     
-    # Timestamp
+    # Timestamp (partition key)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     
     # Relationships
     utente = relationship("User")
     
+    __mapper_args__ = {"primary_key": [id, created_at]}
+    
     def __repr__(self):
         return f"<AuditLog {self.entity_type}:{self.entity_id} - {self.tipo_modifica}>"
     
@@ -91,6 +110,30 @@ class AuditLog(Base, TenantMixin):
         return base_summary
 
 
+class AuditLogArchive(Base):
+    """Manifest of audit log months moved out of the database"""
+    __tablename__ = "audit_log_archives"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    
+    # Archived range: [period_start, period_end)
+    period_start = Column(DateTime, nullable=False, unique=True)
+    period_end = Column(DateTime, nullable=False)
+    
+    # Archive file (relative to AUDIT_ARCHIVE_PATH)
+    file_path = Column(String(500), nullable=False)
+    file_format = Column(String(20), default="parquet", nullable=False)
+    compression = Column(String(20), default="zstd", nullable=False)
+    checksum = Column(String(64), nullable=False)  # SHA-256 of the file
+    size_bytes = Column(BigInteger, nullable=False)
+    row_count = Column(Integer, nullable=False)
+    
+    archived_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f"<AuditLogArchive {self.period_start:%Y-%m} ({self.row_count} rows)>"
+
+
 class AuditLogView(Base):
     """Materialized view for efficient audit log queries"""
     __tablename__ = "audit_log_view"
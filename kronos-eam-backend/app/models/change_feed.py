@@ -0,0 +1,43 @@
+"""
+Change feed model: per-tenant stream of domain events pushed to clients
+"""
+
+from datetime import datetime
+from sqlalchemy import Column, String, Integer, DateTime, JSON, Index
+
+from app.models.base import Base, TenantMixin
+
+
+class ChangeEvent(Base, TenantMixin):
+    """Domain event of the change feed; clients resume from its stream offset"""
+    __tablename__ = "change_events"
+    __table_args__ = (
+        Index("ix_change_events_tenant_offset", "tenant_id", "stream_offset", unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    
+    # Position in the tenant stream, assigned when the transaction commits
+    stream_offset = Column(Integer)
+    
+    event_type = Column(String(50), nullable=False)  # task.status_changed, workflow.progress, ...
+    entity_type = Column(String(50))
+    entity_id = Column(Integer)
+    user_id = Column(Integer)  # Only visible to this user when set
+    
+    data = Column(JSON, default=dict)
+    widgets = Column(JSON, default=list)  # Client views to refresh
+    
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f"<ChangeEvent {self.stream_offset} {self.event_type}>"
+
+
+class ChangeFeedStream(Base):
+    """End of a tenant stream: the last offset handed out"""
+    __tablename__ = "change_feed_streams"
+    
+    tenant_id = Column(String(50), primary_key=True)
+    last_offset = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
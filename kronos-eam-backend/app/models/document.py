@@ -3,11 +3,11 @@ Document management models
 """
 
 from datetime import datetime
-from sqlalchemy import Column, String, Integer, DateTime, Boolean, JSON, ForeignKey, Text, Enum, Float
+from sqlalchemy import Column, String, Integer, DateTime, Boolean, JSON, ForeignKey, Text, Enum, Float, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 import enum
 
-from app.models.base import BaseModel
+from app.models.base import Base, BaseModel, TenantMixin
 
 
 class DocumentTypeEnum(str, enum.Enum):
@@ -51,7 +51,7 @@ class Document(BaseModel):
     stato = Column(Enum(DocumentStatusEnum), default=DocumentStatusEnum.VALIDO)
     
     # File info
-    file_path = Column(String(500), nullable=False)
+    file_path = Column(String(500), nullable=False, index=True)
     file_size = Column(Integer)  # Bytes
     mime_type = Column(String(100))
     checksum = Column(String(64))  # SHA256
@@ -114,7 +114,7 @@ class DocumentVersion(BaseModel):
     document_id = Column(Integer, ForeignKey("documents.id"), nullable=False)
     versione = Column(Integer, nullable=False)
     
-    file_path = Column(String(500), nullable=False)
+    file_path = Column(String(500), nullable=False, index=True)
     file_size = Column(Integer)
     checksum = Column(String(64))
     
@@ -128,6 +128,34 @@ class DocumentVersion(BaseModel):
         return f"<DocumentVersion {self.document_id} v{self.versione}>"
 
 
+class DocumentBlob(Base, TenantMixin):
+    """File content stored once per tenant, addressed by its SHA256
+    
+    Documents and versions with identical bytes share one blob through their
+    file_path. ref_count is maintained by DocumentStorageService on every
+    flush of Document/DocumentVersion; blobs left at zero are removed by the
+    garbage collector after a grace period.
+    """
+    __tablename__ = "document_blobs"
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "checksum", name="uq_document_blob_checksum"),
+        Index("ix_document_blobs_gc", "ref_count", "last_used_at"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    checksum = Column(String(64), nullable=False)  # SHA256
+    file_path = Column(String(500), nullable=False, unique=True)
+    file_size = Column(Integer)
+    
+    ref_count = Column(Integer, nullable=False, default=0)
+    
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_used_at = Column(DateTime, default=datetime.utcnow, nullable=False)  # Last stored or (de)referenced
+    
+    def __repr__(self):
+        return f"<DocumentBlob {self.checksum[:12]} refs={self.ref_count}>"
+
+
 class DocumentExtraction(BaseModel):
     """AI extraction results for documents"""
     __tablename__ = "document_extractions"
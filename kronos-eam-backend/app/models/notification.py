@@ -3,11 +3,11 @@ Notification models for user alerts and messages
 """
 
 from datetime import datetime
-from sqlalchemy import Column, String, Integer, DateTime, Boolean, JSON, ForeignKey, Text, Enum
+from sqlalchemy import Column, String, Integer, DateTime, Boolean, JSON, ForeignKey, Text, Enum, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 import enum
 
-from app.models.base import BaseModel
+from app.models.base import Base, BaseModel, TenantMixin
 
 
 class NotificationTypeEnum(str, enum.Enum):
@@ -103,7 +103,7 @@ class NotificationPreference(BaseModel):
     
     # Frequency
     digest_enabled = Column(Boolean, default=False)
-    digest_frequency = Column(String(20))  # daily, weekly
+    digest_frequency = Column(String(20))  # immediate, hourly, daily, weekly
     digest_time = Column(String(5))  # HH:MM
     
     # Filtering
@@ -150,15 +150,19 @@ class NotificationTemplate(BaseModel):
 class NotificationQueue(BaseModel):
     """Queue for outbound notifications"""
     __tablename__ = "notification_queue"
+    __table_args__ = (
+        # Batch claiming by delivery workers
+        Index("ix_notification_queue_claim", "stato", "programmata_per"),
+    )
     
-    notification_id = Column(Integer, ForeignKey("notifications.id"), nullable=False)
+    notification_id = Column(Integer, ForeignKey("notifications.id"))  # NULL for digests
     canale = Column(Enum(NotificationChannelEnum), nullable=False)
     
     # Recipient details
     destinatario = Column(String(500), nullable=False)  # Email, phone, device token
     
     # Status
-    stato = Column(String(50), default="pending")  # pending, sending, sent, failed
+    stato = Column(String(50), default="pending")  # digest, digested, pending, sending, sent, failed
     tentativi = Column(Integer, default=0)
     max_tentativi = Column(Integer, default=3)
     
@@ -169,8 +173,36 @@ class NotificationQueue(BaseModel):
     # Error tracking
     ultimo_errore = Column(Text)
     
+    # Digest: rendered content of a digest row, and the digest a held row was coalesced into
+    titolo = Column(String(200))
+    messaggio = Column(Text)
+    digest_id = Column(Integer, ForeignKey("notification_queue.id"))
+    
     # Relationship
     notification = relationship("Notification")
     
     def __repr__(self):
-        return f"<NotificationQueue {self.notification_id} - {self.canale}>"
\ No newline at end of file
+        return f"<NotificationQueue {self.notification_id} - {self.canale}>"
+
+
+class ReminderLedger(Base, TenantMixin):
+    """Deadline reminders already sent, one row per (task, threshold)
+    
+    Rows are claimed before the notification is created, so overlapping
+    scheduler runs cannot send the same reminder twice.
+    """
+    __tablename__ = "reminder_ledger"
+    __table_args__ = (
+        UniqueConstraint("task_id", "threshold", name="uq_reminder_ledger_task_threshold"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    task_id = Column(Integer, ForeignKey("workflow_tasks.id", ondelete="CASCADE"), nullable=False)
+    threshold = Column(String(20), nullable=False)  # urgent, upcoming
+    
+    due_date = Column(DateTime)  # Due date the reminder was sent for
+    notification_id = Column(Integer, ForeignKey("notifications.id"))
+    sent_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f"<ReminderLedger task={self.task_id} {self.threshold}>"
@@ -201,4 +201,19 @@ class TenantPlan(Base, TimestampMixin):
                     "Dedicated account manager"
                 ]
             }
-        ]
\ No newline at end of file
+        ]
+
+class TenantDataGeneration(Base):
+    """Counter bumped by every committed change of the data agents read
+    
+    Cached agent answers are scoped to the generation they were computed
+    in (see app.services.data_generation).
+    """
+    __tablename__ = "tenant_data_generations"
+    
+    tenant_id = Column(String(50), primary_key=True)
+    generation = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f"<TenantDataGeneration {self.tenant_id}: {self.generation}>"
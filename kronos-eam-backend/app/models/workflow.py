@@ -3,11 +3,11 @@ Workflow models for process automation
 """
 
 from datetime import datetime
-from sqlalchemy import Column, String, Integer, Float, DateTime, Boolean, JSON, ForeignKey, Text, Enum
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, Integer, Float, DateTime, Boolean, JSON, ForeignKey, Text, Enum, Index, UniqueConstraint
+from sqlalchemy.orm import relationship, column_property
 import enum
 
-from app.models.base import BaseModel
+from app.models.base import Base, BaseModel, TenantMixin
 
 
 class WorkflowStatusEnum(str, enum.Enum):
@@ -160,6 +160,10 @@ class WorkflowStage(BaseModel):
 class WorkflowTask(BaseModel):
     """Individual task within a workflow"""
     __tablename__ = "workflow_tasks"
+    __table_args__ = (
+        Index("ix_workflow_tasks_inbox", "assignee", "status", "due_date"),
+        Index("ix_workflow_tasks_due_date", "due_date"),
+    )
     
     workflow_id = Column(Integer, ForeignKey("workflows.id"), nullable=False)
     stage_id = Column(Integer, ForeignKey("workflow_stages.id"))
@@ -167,14 +171,22 @@ class WorkflowTask(BaseModel):
     title = Column(String(200), nullable=False)
     description = Column(Text)
     
-    status = Column(Enum(TaskStatusEnum, values_callable=lambda x: [e.value for e in x]), default=TaskStatusEnum.TO_START)
-    priority = Column(Enum(TaskPriorityEnum, values_callable=lambda x: [e.value for e in x]), default=TaskPriorityEnum.MEDIUM)
-    
-    assignee = Column(String(255))  # Email or user identifier
+    # Inbox counter buckets: active_history loads the old value of an expired
+    # attribute before it is replaced, so the counters know which bucket to leave
+    status = column_property(
+        Column(Enum(TaskStatusEnum, values_callable=lambda x: [e.value for e in x]), default=TaskStatusEnum.TO_START),
+        active_history=True
+    )
+    priority = column_property(
+        Column(Enum(TaskPriorityEnum, values_callable=lambda x: [e.value for e in x]), default=TaskPriorityEnum.MEDIUM),
+        active_history=True
+    )
+    
+    assignee = column_property(Column(String(255)), active_history=True)  # Email or user identifier
     due_date = Column(DateTime)
     
-    estimated_hours = Column(Float)
-    actual_hours = Column(Float)
+    estimated_hours = column_property(Column(Float), active_history=True)
+    actual_hours = column_property(Column(Float), active_history=True)
     
     # Dependencies
     dependencies = Column(JSON, default=list)  # List of task IDs
@@ -232,6 +244,60 @@ class WorkflowTask(BaseModel):
         return f"<WorkflowTask {self.title}>"
 
 
+class TaskEvent(Base, TenantMixin):
+    """Task timeline projection, written together with the task's audit entries"""
+    __tablename__ = "task_events"
+    __table_args__ = (
+        Index("ix_task_events_task_timestamp", "task_id", "timestamp"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    task_id = Column(Integer, ForeignKey("workflow_tasks.id", ondelete="CASCADE"), nullable=False)
+    
+    event_type = Column(String(50), nullable=False)  # created, status_change, assignment_change, ...
+    actor_id = Column(Integer, ForeignKey("users.id"))
+    actor_email = Column(String(255))  # Denormalized, avoids loading users on read
+    
+    old_value = Column(JSON)
+    new_value = Column(JSON)
+    details = Column(String(500))
+    
+    timestamp = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f"<TaskEvent {self.task_id}:{self.event_type}>"
+
+
+class TaskInboxCounter(Base, TenantMixin):
+    """Per-assignee task counters for one (status, priority) bucket
+    
+    Maintained by TaskInboxService whenever tasks are created, updated,
+    reassigned or deleted, and rebuilt by its periodic reconciliation.
+    """
+    __tablename__ = "task_inbox_counters"
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "assignee", "status", "priority", name="uq_task_inbox_bucket"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    assignee = Column(String(255), nullable=False)
+    status = Column(String(50), nullable=False, default="")  # TaskStatusEnum value
+    priority = Column(String(50), nullable=False, default="")  # TaskPriorityEnum value
+    
+    task_count = Column(Integer, nullable=False, default=0)
+    
+    # Sums backing the average hours statistics
+    estimated_count = Column(Integer, nullable=False, default=0)
+    estimated_hours_sum = Column(Float, nullable=False, default=0)
+    actual_count = Column(Integer, nullable=False, default=0)
+    actual_hours_sum = Column(Float, nullable=False, default=0)
+    
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<TaskInboxCounter {self.assignee} {self.status}/{self.priority}: {self.task_count}>"
+
+
 class TaskDocument(BaseModel):
     """Documents attached to tasks"""
     __tablename__ = "task_documents"
@@ -8,6 +8,8 @@ from dataclasses import dataclass
 from enum import Enum
 import logging
 
+from app.core.singleflight import make_key, search_flight
+
 logger = logging.getLogger(__name__)
 
 
@@ -102,7 +104,6 @@ class BaseVectorStore(ABC):
         """Add documents to the vector store"""
         pass
     
-    @abstractmethod
     async def search(
         self,
         query_embedding: List[float],
@@ -111,7 +112,32 @@ class BaseVectorStore(ABC):
         filters: Optional[Dict[str, Any]] = None,
         **kwargs
     ) -> List[SearchResult]:
-        """Search for similar documents"""
+        """
+        Search for similar documents
+        
+        Identical concurrent searches (same tenant, embedding, top_k, filters
+        and options) share one query to the store.
+        """
+        key = make_key(
+            self.config.store_type, self.config.collection_name, tenant_id,
+            query_embedding, top_k, filters, kwargs
+        )
+        results = await search_flight.do(
+            key, lambda: self._search(query_embedding, tenant_id, top_k, filters, **kwargs)
+        )
+        # Callers get their own list; the results themselves are shared
+        return list(results)
+    
+    @abstractmethod
+    async def _search(
+        self,
+        query_embedding: List[float],
+        tenant_id: str,
+        top_k: int = 10,
+        filters: Optional[Dict[str, Any]] = None,
+        **kwargs
+    ) -> List[SearchResult]:
+        """Search for similar documents in the store"""
         pass
     
     @abstractmethod
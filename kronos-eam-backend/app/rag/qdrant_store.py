@@ -120,7 +120,7 @@ class QdrantVectorStore(BaseVectorStore):
             logger.error(f"Error adding documents to Qdrant: {str(e)}")
             raise
     
-    async def search(
+    async def _search(
         self,
         query_embedding: List[float],
         tenant_id: str,
@@ -217,7 +217,7 @@ class VertexAIVectorStore(BaseVectorStore):
             logger.error(f"Error adding documents to Vertex AI: {str(e)}")
             raise
     
-    async def search(
+    async def _search(
         self,
         query_embedding: List[float],
         tenant_id: str,
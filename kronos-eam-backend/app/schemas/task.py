@@ -113,6 +113,8 @@ class TaskTimelineResponse(BaseModel):
     timeline: Dict[str, Any]
     events: List[TaskTimelineEvent]
     total_events: int
+    limit: int = 100
+    offset: int = 0
     duration: Optional[float] = None
     is_overdue: bool
 
@@ -145,9 +147,19 @@ class BulkTaskUpdate(BaseModel):
     note: Optional[str] = None
 
 
+class BulkItemResult(BaseModel):
+    """Per-ID outcome of a bulk update"""
+    id: int
+    status: str  # updated, unchanged, not_found
+    changed_fields: List[str] = []
+    error: Optional[str] = None
+
+
 class BulkUpdateResponse(BaseModel):
     """Bulk update response schema"""
     updated_count: int
+    unchanged_count: int = 0
     failed_count: int
     failed_ids: List[int]
-    success: bool
\ No newline at end of file
+    success: bool
+    results: List[BulkItemResult] = []
\ No newline at end of file
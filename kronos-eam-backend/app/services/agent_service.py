@@ -2,8 +2,9 @@
 Agent Service for managing LangGraph agents
 """
 
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, AsyncIterator
 from enum import Enum
+import asyncio
 import logging
 from datetime import datetime
 
@@ -15,6 +16,10 @@ from app.agents import (
     WorkflowAutomationAgent
 )
 from app.core.config import get_settings
+from app.core.agent_memory import AgentPool
+from app.core.database import get_db_context
+from app.services.data_generation import current_generation
+from app.services.semantic_cache import get_semantic_cache
 
 logger = logging.getLogger(__name__)
 
@@ -34,16 +39,13 @@ class AgentService:
     
     def __init__(self):
         self.settings = get_settings()
-        self._agents_cache: Dict[str, Any] = {}
+        # Bounded: graphs, LLM clients and conversation memory are shared, handles are cheap to rebuild
+        self._agents_cache = AgentPool(max_size=self.settings.AGENT_POOL_SIZE)
     
     def get_agent(self, agent_type: AgentType, tenant_id: str, user_id: Optional[str] = None):
         """Get or create an agent instance"""
-        cache_key = f"{tenant_id}:{user_id}:{agent_type}"
+        cache_key = (tenant_id, user_id, agent_type)
         
-        if cache_key in self._agents_cache:
-            return self._agents_cache[cache_key]
-        
-        # Create new agent based on type
         agent_class_map = {
             AgentType.MAINTENANCE: MaintenanceAgent,
             AgentType.COMPLIANCE: ComplianceAgent,
@@ -56,10 +58,9 @@ class AgentService:
         if not agent_class:
             raise ValueError(f"Unknown agent type: {agent_type}")
         
-        agent = agent_class(tenant_id=tenant_id, user_id=user_id)
-        self._agents_cache[cache_key] = agent
-        
-        return agent
+        return self._agents_cache.get(
+            cache_key, lambda: agent_class(tenant_id=tenant_id, user_id=user_id)
+        )
     
     async def process_message(
         self,
@@ -67,9 +68,10 @@ class AgentService:
         tenant_id: str,
         user_id: Optional[str] = None,
         agent_type: Optional[AgentType] = None,
-        context: Optional[Dict[str, Any]] = None
+        context: Optional[Dict[str, Any]] = None,
+        conversation_id: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Process a message with the appropriate agent"""
+        """Process a message with the appropriate agent (conversation_id resumes its memory)"""
         try:
             # Auto-detect agent type if not specified
             if not agent_type:
@@ -79,7 +81,21 @@ class AgentService:
             agent = self.get_agent(agent_type, tenant_id, user_id)
             
             # Process the message
-            result = await agent.invoke(message, context)
+            if self.settings.LLM_CACHE_ENABLED and not agent.has_history(conversation_id):
+                # Only opening messages: follow-ups depend on the conversation so far
+                result = await get_semantic_cache().get_or_compute(
+                    message,
+                    tenant_id=tenant_id,
+                    agent_type=agent_type,
+                    generation=await asyncio.to_thread(self._data_generation, tenant_id),
+                    compute=lambda: agent.invoke(message, context, conversation_id=conversation_id),
+                    context=context
+                )
+                if result.get("cached") and conversation_id and result.get("reply"):
+                    # The graph did not run: keep the turn in memory so follow-ups see it
+                    await agent.record_turn(message, result["reply"], conversation_id)
+            else:
+                result = await agent.invoke(message, context, conversation_id=conversation_id)
             
             # Add metadata
             result["agent_type"] = agent_type
@@ -96,6 +112,43 @@ class AgentService:
                 "timestamp": datetime.utcnow().isoformat()
             }
     
+    async def stream_message(
+        self,
+        message: str,
+        tenant_id: str,
+        user_id: Optional[str] = None,
+        agent_type: Optional[AgentType] = None,
+        context: Optional[Dict[str, Any]] = None,
+        conversation_id: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of process_message
+        
+        Yields an "agent" event right away (before any model call), then the
+        agent's node/token/tool events and a final "result" event.
+        """
+        try:
+            if not agent_type:
+                agent_type = self._detect_agent_type(message)
+            agent = self.get_agent(agent_type, tenant_id, user_id)
+        except Exception as e:
+            logger.error(f"Error processing message: {str(e)}", exc_info=True)
+            yield {"type": "result", "success": False, "error": str(e), "agent_type": agent_type}
+            return
+        
+        yield {"type": "agent", "agent_type": agent_type, "timestamp": datetime.utcnow().isoformat()}
+        
+        async for event in agent.astream(message, context, conversation_id=conversation_id):
+            if event["type"] == "result":
+                event["agent_type"] = agent_type
+                event["timestamp"] = datetime.utcnow().isoformat()
+            yield event
+    
+    def _data_generation(self, tenant_id: str) -> int:
+        """Generation of the data the agents read: any change of it invalidates cached answers"""
+        with get_db_context(tenant_id) as db:
+            return current_generation(db, tenant_id)
+    
     def _detect_agent_type(self, message: str) -> AgentType:
         """Detect the most appropriate agent type based on message content"""
         message_lower = message.lower()
@@ -240,9 +293,7 @@ class AgentService:
         """Clear agent cache"""
         if tenant_id:
             # Clear only for specific tenant
-            keys_to_remove = [k for k in self._agents_cache.keys() if k.startswith(f"{tenant_id}:")]
-            for key in keys_to_remove:
-                del self._agents_cache[key]
+            self._agents_cache.discard(lambda key: key[0] == tenant_id)
         else:
             # Clear all
             self._agents_cache.clear()
@@ -0,0 +1,99 @@
+"""
+Streaming of LangGraph agent runs: node, LLM token and tool events
+"""
+
+from typing import Any, AsyncIterator, Dict, Optional
+import json
+
+from langchain_core.messages import BaseMessage
+
+
+# Tool inputs/outputs are previews for the UI, not the full payload
+TOOL_PREVIEW_CHARS = 2000
+
+
+async def stream_graph_events(app, state: Dict[str, Any], config: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run a compiled graph and yield its progress as it happens
+
+    LLM tokens are streamed even when nodes call `ainvoke`: LangChain chat
+    models switch to streaming when an event stream is listening. For the
+    same reason CoalescingLLM does not share the model calls of a streamed
+    run with other runs.
+
+    Yields:
+        {"type": "node_start", "node": name}
+        {"type": "token", "node": name, "text": str}
+        {"type": "tool_start", "node": name, "tool": name, "call_id": str, "input": ...}
+        {"type": "tool_end", "node": name, "tool": name, "call_id": str, "output": str}
+        {"type": "node_end", "node": name}
+        {"type": "final", "state": dict} as the last event (final graph state)
+    """
+    final_state: Optional[Dict[str, Any]] = None
+
+    async for event in app.astream_events(state, config, version="v2"):
+        kind = event["event"]
+        node = event.get("metadata", {}).get("langgraph_node")
+
+        if kind in ("on_chain_start", "on_chain_end"):
+            if not event.get("parent_ids"):
+                # The graph run itself
+                if kind == "on_chain_end":
+                    final_state = event["data"].get("output")
+            elif node and event["name"] == node:
+                yield {"type": "node_start" if kind == "on_chain_start" else "node_end", "node": node}
+
+        elif kind == "on_chat_model_stream":
+            text = _chunk_text(event["data"]["chunk"])
+            if text:
+                yield {"type": "token", "node": node, "text": text}
+
+        elif kind == "on_tool_start":
+            yield {
+                "type": "tool_start",
+                "node": node,
+                "tool": event["name"],
+                "call_id": event["run_id"],
+                "input": _preview(event["data"].get("input"))
+            }
+
+        elif kind == "on_tool_end":
+            output = event["data"].get("output")
+            if isinstance(output, BaseMessage):
+                output = output.content
+            yield {
+                "type": "tool_end",
+                "node": node,
+                "tool": event["name"],
+                "call_id": event["run_id"],
+                "output": _preview(output)
+            }
+
+    yield {"type": "final", "state": final_state or {}}
+
+
+def format_agent_sse(event: Dict[str, Any], seq: int) -> str:
+    """Server-Sent Events frame for an agent event"""
+    return f"id: {seq}\nevent: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+def _chunk_text(chunk: Any) -> str:
+    """Text of a streamed message chunk (Gemini may send a list of content parts)"""
+    content = getattr(chunk, "content", chunk)
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            part if isinstance(part, str) else part.get("text", "")
+            for part in content
+            if isinstance(part, (str, dict))
+        )
+    return ""
+
+
+def _preview(value: Any) -> Any:
+    if isinstance(value, (dict, list, int, float, bool)) or value is None:
+        text = json.dumps(value, default=str)
+        return value if len(text) <= TOOL_PREVIEW_CHARS else text[:TOOL_PREVIEW_CHARS] + "…"
+    text = str(value)
+    return text if len(text) <= TOOL_PREVIEW_CHARS else text[:TOOL_PREVIEW_CHARS] + "…"
@@ -0,0 +1,447 @@
+"""
+Audit log partition maintenance and archival to compressed columnar files
+"""
+
+from typing import Optional, Dict, Any, List, Tuple, Callable
+from datetime import datetime
+from pathlib import Path
+from collections import Counter
+from sqlalchemy.orm import Session
+from sqlalchemy import text, delete, select
+import hashlib
+import json
+import logging
+import os
+
+from app.models.audit import AuditLog, AuditLogArchive, TipoModificaEnum
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Columns written to the archive files, in order
+ARCHIVE_COLUMNS = [
+    "id", "tenant_id", "entity_type", "entity_id", "tipo_modifica",
+    "dettaglio_modifica", "utente_id", "ip_address", "user_agent",
+    "session_id", "request_id", "old_values", "new_values",
+    "changed_fields", "note", "automatic", "created_at"
+]
+
+# JSON columns are stored as serialized strings in the archive
+JSON_COLUMNS = {"dettaglio_modifica", "old_values", "new_values", "changed_fields"}
+
+CRITICAL_ENTITIES = ["workflow", "document", "user"]
+CRITICAL_TYPES = [TipoModificaEnum.ELIMINAZIONE.name, TipoModificaEnum.RESPONSABILE_CAMBIO.name]
+
+
+def month_start(value: datetime) -> datetime:
+    """First instant of the month containing value"""
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(value: datetime, months: int) -> datetime:
+    """Shift a month start by a number of months"""
+    index = value.year * 12 + value.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(period_start: datetime) -> str:
+    """Name of the monthly partition starting at period_start"""
+    return f"audit_logs_y{period_start:%Y}m{period_start:%m}"
+
+
+def _require_pyarrow():
+    """Import pyarrow lazily; it is only needed for archival"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        return pyarrow
+    except ImportError as e:
+        raise RuntimeError("pyarrow is required for audit log archival") from e
+
+
+class AuditArchiveService:
+    """
+    Manages monthly audit_logs partitions and the cold-storage archive.
+
+    Months older than AUDIT_HOT_MONTHS are exported to one zstd-compressed
+    Parquet file each, recorded in audit_log_archives and removed from the
+    database (DETACH + DROP of the partition on PostgreSQL, a range DELETE
+    elsewhere). Readers use read_archived_rows (or read_archived_logs) to
+    cover archived ranges.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.archive_path = Path(settings.AUDIT_ARCHIVE_PATH)
+
+    @property
+    def is_partitioned(self) -> bool:
+        """Whether audit_logs is a partitioned PostgreSQL table"""
+        if self.db.get_bind().dialect.name != "postgresql":
+            return False
+        return bool(self.db.execute(text(
+            "SELECT 1 FROM pg_partitioned_table pt "
+            "JOIN pg_class c ON c.oid = pt.partrelid "
+            "WHERE c.relname = 'audit_logs'"
+        )).scalar())
+
+    def ensure_partitions(self, months_ahead: Optional[int] = None) -> List[str]:
+        """
+        Create monthly partitions from the current month onwards
+
+        Args:
+            months_ahead: Number of future months to prepare
+
+        Returns:
+            Names of the partitions that were created
+        """
+        if not self.is_partitioned:
+            return []
+
+        months_ahead = settings.AUDIT_PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+        current = month_start(datetime.utcnow())
+        existing = set(self.list_partitions())
+        created = []
+
+        for offset in range(months_ahead + 1):
+            start = add_months(current, offset)
+            name = partition_name(start)
+            if name in existing:
+                continue
+            self.db.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF audit_logs "
+                f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{add_months(start, 1):%Y-%m-%d}')"
+            ))
+            created.append(name)
+
+        self.db.commit()
+        if created:
+            logger.info(f"Created audit log partitions: {', '.join(created)}")
+        return created
+
+    def list_partitions(self) -> List[str]:
+        """Names of the monthly partitions currently attached to audit_logs"""
+        if not self.is_partitioned:
+            return []
+        rows = self.db.execute(text(
+            "SELECT child.relname FROM pg_inherits i "
+            "JOIN pg_class parent ON parent.oid = i.inhparent "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "WHERE parent.relname = 'audit_logs' AND child.relname LIKE 'audit_logs_y%'"
+        )).all()
+        return sorted(name for (name,) in rows)
+
+    def archive_cold_partitions(self, hot_months: Optional[int] = None) -> List[AuditLogArchive]:
+        """
+        Archive every month older than the hot retention window
+
+        Args:
+            hot_months: Months to keep in the database
+
+        Returns:
+            Manifest entries of the months archived by this run
+        """
+        hot_months = settings.AUDIT_HOT_MONTHS if hot_months is None else hot_months
+        cutoff = add_months(month_start(datetime.utcnow()), -hot_months)
+
+        archived_starts = {
+            start for (start,) in self.db.query(AuditLogArchive.period_start).all()
+        }
+
+        oldest = self.db.query(AuditLog.created_at).filter(
+            AuditLog.created_at < cutoff
+        ).order_by(AuditLog.created_at.asc()).limit(1).scalar()
+
+        results = []
+        period = month_start(oldest) if oldest else cutoff
+        while period < cutoff:
+            if period not in archived_starts:
+                archive = self.archive_month(period)
+                if archive:
+                    results.append(archive)
+            period = add_months(period, 1)
+        return results
+
+    def archive_month(self, period_start: datetime) -> Optional[AuditLogArchive]:
+        """
+        Move one month of audit logs to a compressed Parquet file
+
+        Rows are streamed from the database and written one Parquet row
+        group of AUDIT_ARCHIVE_BATCH_SIZE rows at a time, so memory does not
+        grow with the month. The file is written to a temporary name and
+        renamed into place before the manifest row is inserted and the rows
+        are removed, all in one transaction, so a failed run can simply be
+        repeated.
+
+        Args:
+            period_start: First day of the month to archive
+
+        Returns:
+            Manifest entry, or None if the month has no rows
+        """
+        pa = _require_pyarrow()
+        period_start = month_start(period_start)
+        period_end = add_months(period_start, 1)
+
+        relative_path = Path(f"{period_start:%Y}") / f"audit_logs_{period_start:%Y_%m}.parquet"
+        target = self.archive_path / relative_path
+        temp_target = target.with_suffix(".parquet.tmp")
+        schema = self._archive_schema(pa)
+        batch_size = settings.AUDIT_ARCHIVE_BATCH_SIZE
+
+        # Plain column rows through a server-side cursor: nothing enters the
+        # caller's identity map
+        result = self.db.execute(
+            select(*[getattr(AuditLog, column) for column in ARCHIVE_COLUMNS]).where(
+                AuditLog.created_at >= period_start,
+                AuditLog.created_at < period_end
+            ).order_by(
+                AuditLog.tenant_id, AuditLog.created_at, AuditLog.id
+            ).execution_options(yield_per=batch_size)
+        )
+
+        row_count = 0
+        writer = None
+        try:
+            for batch in result.partitions():
+                if writer is None:
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    writer = pa.parquet.ParquetWriter(temp_target, schema, compression="zstd")
+                writer.write_table(
+                    pa.Table.from_pylist([self._row_to_record(row) for row in batch], schema=schema),
+                    row_group_size=batch_size
+                )
+                row_count += len(batch)
+        except Exception:
+            if writer is not None:
+                writer.close()
+                temp_target.unlink(missing_ok=True)
+            raise
+        finally:
+            result.close()
+
+        if writer is None:
+            self._drop_month(period_start)
+            self.db.commit()
+            return None
+
+        writer.close()
+        checksum = self._file_checksum(temp_target)
+        os.replace(temp_target, target)
+
+        archive = AuditLogArchive(
+            period_start=period_start,
+            period_end=period_end,
+            file_path=str(relative_path),
+            file_format="parquet",
+            compression="zstd",
+            checksum=checksum,
+            size_bytes=target.stat().st_size,
+            row_count=row_count
+        )
+
+        try:
+            self.db.add(archive)
+            self._drop_month(period_start)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            logger.exception(f"Failed to archive audit logs for {period_start:%Y-%m}")
+            raise
+
+        logger.info(f"Archived {row_count} audit log rows for {period_start:%Y-%m} to {relative_path}")
+        return archive
+
+    def archived_periods(self, start_date: datetime, end_date: datetime) -> List[AuditLogArchive]:
+        """Manifest entries overlapping [start_date, end_date]"""
+        return self.db.query(AuditLogArchive).filter(
+            AuditLogArchive.period_start <= end_date,
+            AuditLogArchive.period_end > start_date
+        ).order_by(AuditLogArchive.period_start).all()
+
+    def read_archived_rows(
+        self,
+        tenant_id: str,
+        start_date: datetime,
+        end_date: datetime,
+        entity_type: Optional[str] = None,
+        columns: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Read archived audit rows of a tenant within a time range
+
+        Tenant, time range and entity type are pushed down to the Parquet
+        reader so only matching row groups are decoded.
+
+        Args:
+            tenant_id: Tenant ID
+            start_date: Inclusive lower bound on created_at
+            end_date: Inclusive upper bound on created_at
+            entity_type: Optional entity type filter
+            columns: Columns to read (defaults to all archived columns)
+
+        Returns:
+            Matching rows as dicts, oldest first
+        """
+        archives = self.archived_periods(start_date, end_date)
+        if not archives:
+            return []
+
+        pa = _require_pyarrow()
+        filters = [
+            ("tenant_id", "=", str(tenant_id)),
+            ("created_at", ">=", start_date),
+            ("created_at", "<=", end_date)
+        ]
+        if entity_type:
+            filters.append(("entity_type", "=", entity_type))
+
+        records = []
+        for archive in archives:
+            path = self.archive_path / archive.file_path
+            if not path.exists():
+                logger.error(f"Audit archive file missing: {path}")
+                continue
+            table = pa.parquet.read_table(path, columns=columns, filters=filters)
+            for record in table.to_pylist():
+                for column in JSON_COLUMNS.intersection(record):
+                    if record[column] is not None:
+                        record[column] = json.loads(record[column])
+                records.append(record)
+        return records
+
+    def read_archived_logs(
+        self,
+        tenant_id: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        entity_type: Optional[str] = None,
+        match: Optional[Callable[[Dict[str, Any]], bool]] = None
+    ) -> List[AuditLog]:
+        """
+        Archived audit entries of a tenant as AuditLog objects, newest first
+
+        The objects are transient (never added to the session), so they can
+        be returned next to the entries still in the database.
+
+        Args:
+            tenant_id: Tenant ID
+            start_date: Inclusive lower bound on created_at (open if None)
+            end_date: Inclusive upper bound on created_at (open if None)
+            entity_type: Optional entity type filter
+            match: Optional predicate on the archived row dicts
+
+        Returns:
+            Matching entries, newest first
+        """
+        rows = self.read_archived_rows(
+            tenant_id, start_date or datetime.min, end_date or datetime.max, entity_type
+        )
+        logs = []
+        for row in rows:
+            if match is not None and not match(row):
+                continue
+            log = AuditLog(**row)
+            log.tipo_modifica = TipoModificaEnum[row["tipo_modifica"]]
+            logs.append(log)
+        logs.sort(key=lambda log: (log.created_at, log.id), reverse=True)
+        return logs
+
+    def aggregate_archived(
+        self,
+        tenant_id: str,
+        start_date: datetime,
+        end_date: datetime,
+        entity_type: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Compliance report counters over archived ranges
+
+        Returns:
+            Dict with total, critical, automatic, by_type (enum name keys),
+            by_entity and by_user counters
+        """
+        rows = self.read_archived_rows(
+            tenant_id, start_date, end_date, entity_type,
+            columns=["entity_type", "tipo_modifica", "utente_id", "automatic", "tenant_id", "created_at"]
+        )
+
+        by_type = Counter(row["tipo_modifica"] for row in rows)
+        by_entity = Counter(row["entity_type"] for row in rows)
+        by_user = Counter(row["utente_id"] for row in rows if row["utente_id"] is not None)
+
+        return {
+            "total": len(rows),
+            "critical": sum(
+                1 for row in rows
+                if row["entity_type"] in CRITICAL_ENTITIES or row["tipo_modifica"] in CRITICAL_TYPES
+            ),
+            "automatic": sum(1 for row in rows if row["automatic"] == 1),
+            "by_type": dict(by_type),
+            "by_entity": dict(by_entity),
+            "by_user": dict(by_user)
+        }
+
+    def _drop_month(self, period_start: datetime) -> None:
+        """Remove a month of rows from the database"""
+        name = partition_name(period_start)
+        if self.is_partitioned and name in self.list_partitions():
+            self.db.execute(text(f"ALTER TABLE audit_logs DETACH PARTITION {name}"))
+            self.db.execute(text(f"DROP TABLE {name}"))
+            return
+
+        # Rows still in the default partition or in an unpartitioned table
+        self.db.execute(
+            delete(AuditLog).where(
+                AuditLog.created_at >= period_start,
+                AuditLog.created_at < add_months(period_start, 1)
+            ).execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def _archive_schema(pa):
+        """Arrow schema of the archive files"""
+        return pa.schema([
+            ("id", pa.int64()),
+            ("tenant_id", pa.string()),
+            ("entity_type", pa.string()),
+            ("entity_id", pa.int64()),
+            ("tipo_modifica", pa.string()),
+            ("dettaglio_modifica", pa.string()),
+            ("utente_id", pa.int64()),
+            ("ip_address", pa.string()),
+            ("user_agent", pa.string()),
+            ("session_id", pa.string()),
+            ("request_id", pa.string()),
+            ("old_values", pa.string()),
+            ("new_values", pa.string()),
+            ("changed_fields", pa.string()),
+            ("note", pa.string()),
+            ("automatic", pa.int8()),
+            ("created_at", pa.timestamp("us"))
+        ])
+
+    @staticmethod
+    def _row_to_record(row) -> Dict[str, Any]:
+        """Flatten an AuditLog row for the archive"""
+        record = {}
+        for column in ARCHIVE_COLUMNS:
+            value = getattr(row, column)
+            if column in JSON_COLUMNS:
+                value = json.dumps(value, default=str) if value is not None else None
+            elif column == "tipo_modifica" and value is not None:
+                value = value.name
+            elif column == "tenant_id" and value is not None:
+                value = str(value)
+            record[column] = value
+        return record
+
+    @staticmethod
+    def _file_checksum(path: Path) -> str:
+        """SHA-256 of a file"""
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
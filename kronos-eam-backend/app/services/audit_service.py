@@ -2,16 +2,45 @@
 Audit logging service for compliance tracking
 """
 
-from typing import Optional, Dict, Any, List
-from datetime import datetime
+from typing import Optional, Dict, Any, List, Callable
+from datetime import datetime, timedelta
+from collections import OrderedDict
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, insert, event, inspect
+import copy
 import json
+import logging
 
 from app.models.audit import AuditLog, TipoModificaEnum
 from app.models.user import User
 from app.core.config import settings
 from app.core.security import get_current_user
+from app.core.request_context import get_request_context
+from app.services.task_event_service import TaskEventService
+from app.services.audit_archive_service import (
+    AuditArchiveService, CRITICAL_ENTITIES, CRITICAL_TYPES
+)
+
+
+logger = logging.getLogger(__name__)
+
+# Key under Session.info holding audit entries waiting for the next commit
+AUDIT_BUFFER_KEY = "audit_buffer"
+
+# Compliance reports of closed periods, keyed by (tenant, start, end, entity type)
+_compliance_report_cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+
+# Key under Session.info holding entities whose column changes are captured at flush
+AUDIT_TRACKED_KEY = "audit_tracked"
+
+
+def _audit_value(value: Any) -> Any:
+    """Convert a column value to its JSON representation for audit logs"""
+    if hasattr(value, "isoformat"):  # datetime
+        return value.isoformat()
+    if hasattr(value, "value"):  # Enum
+        return value.value
+    return value
 
 
 class AuditService:
@@ -35,11 +64,20 @@ class AuditService:
         session_id: Optional[str] = None,
         request_id: Optional[str] = None,
         note: Optional[str] = None,
-        automatic: bool = False
-    ) -> AuditLog:
+        automatic: bool = False,
+        immediate: bool = False,
+        changed_fields: Optional[List[str]] = None
+    ) -> Optional[AuditLog]:
         """
         Create an audit log entry for an entity change
         
+        By default the entry is buffered on the session and written, together
+        with every other entry of the same unit of work, by one multi-row
+        INSERT when the session commits. No extra transaction is opened, so
+        call it before the commit of the change it describes: an entry logged
+        after that commit waits for the next one and is lost without it.
+        Request correlation fields default to the current request context.
+        
         Args:
             entity_type: Type of entity (workflow, task, document, etc.)
             entity_id: ID of the entity
@@ -55,41 +93,179 @@ class AuditService:
             request_id: Request identifier
             note: Optional user-provided reason
             automatic: Whether this was a system-generated change
+            immediate: Write and commit the entry right away instead of
+                buffering it (e.g. when the unit of work is about to fail)
+            changed_fields: Modified fields when already known (e.g. from
+                attribute history); computed from old/new values otherwise
             
         Returns:
-            Created AuditLog entry
+            Created AuditLog entry when immediate, otherwise None
         """
-        # Calculate changed fields if both old and new values provided
-        changed_fields = []
-        if old_values and new_values:
-            changed_fields = [
-                field for field in new_values 
-                if field in old_values and old_values[field] != new_values[field]
-            ]
-        
-        audit_log = AuditLog(
-            entity_type=entity_type,
-            entity_id=entity_id,
-            tipo_modifica=tipo_modifica,
-            utente_id=user_id,
-            tenant_id=tenant_id,
-            old_values=old_values,
-            new_values=new_values,
-            changed_fields=changed_fields,
-            dettaglio_modifica=dettaglio_modifica or {},
-            ip_address=ip_address,
-            user_agent=user_agent,
-            session_id=session_id,
-            request_id=request_id,
-            note=note,
-            automatic=1 if automatic else 0
-        )
+        context = get_request_context()
+        entry = {
+            "entity_type": entity_type,
+            "entity_id": entity_id,
+            "tipo_modifica": tipo_modifica,
+            "user_id": user_id,
+            "tenant_id": tenant_id,
+            "old_values": old_values,
+            "new_values": new_values,
+            "changed_fields": changed_fields,
+            "dettaglio_modifica": dettaglio_modifica,
+            "ip_address": ip_address or context.get("ip_address"),
+            "user_agent": user_agent or context.get("user_agent"),
+            "session_id": session_id,
+            "request_id": request_id or context.get("request_id"),
+            "note": note,
+            "automatic": automatic,
+            "created_at": datetime.utcnow()
+        }
+        
+        if immediate:
+            row = self._entry_to_row(entry)
+            audit_log = AuditLog(**row)
+            self.db.add(audit_log)
+            TaskEventService(self.db).project_audit_rows([row])
+            self.db.commit()
+            self.db.refresh(audit_log)
+            return audit_log
+        
+        buffer = self.db.info.setdefault(AUDIT_BUFFER_KEY, [])
+        buffer.append(entry)
+        
+        # Keep memory bounded on very large units of work
+        if len(buffer) >= settings.AUDIT_BUFFER_MAX_ENTRIES:
+            self.flush_buffer()
+        
+        return None
+    
+    def track_entity(self, model_class: type, entity_id: Any) -> None:
+        """
+        Capture column changes of an entity from SQLAlchemy attribute history
+        
+        Changes are recorded by a before_flush hook as the session flushes,
+        so no extra query is issued; retrieve them with pop_entity_changes.
+        
+        Args:
+            model_class: Mapped class of the entity
+            entity_id: Primary key of the entity
+        """
+        tracked = self.db.info.setdefault(AUDIT_TRACKED_KEY, {})
+        tracked.setdefault((model_class, str(entity_id)), {"old_values": {}, "new_values": {}})
+    
+    def pop_entity_changes(self, model_class: type, entity_id: Any) -> Optional[Dict[str, Any]]:
+        """
+        Stop tracking an entity and return the changes captured so far
         
-        self.db.add(audit_log)
-        self.db.commit()
-        self.db.refresh(audit_log)
+        Pending changes are flushed first so they are included.
+        
+        Args:
+            model_class: Mapped class of the entity
+            entity_id: Primary key of the entity
+            
+        Returns:
+            Dict with old_values, new_values and changed_fields (modified
+            columns only), or None if the entity was not tracked
+        """
+        key = (model_class, str(entity_id))
+        if key in self.db.info.get(AUDIT_TRACKED_KEY, {}) and (self.db.dirty or self.db.deleted):
+            self.db.flush()
+        
+        changes = self.db.info.get(AUDIT_TRACKED_KEY, {}).pop(key, None)
+        if changes is None:
+            return None
+        
+        # Fields set back to their original value within the unit of work
+        changed_fields = [
+            field for field, value in changes["new_values"].items()
+            if changes["old_values"].get(field) != value
+        ]
+        return {
+            "old_values": {field: changes["old_values"].get(field) for field in changed_fields},
+            "new_values": {field: changes["new_values"][field] for field in changed_fields},
+            "changed_fields": changed_fields
+        }
+    
+    def flush_buffer(self) -> int:
+        """
+        Write buffered entries of this session with one multi-row INSERT
+        
+        The insert joins the current transaction; it is called automatically
+        before every commit.
+        
+        Returns:
+            Number of entries written
+        """
+        return self.log_changes_bulk([])
+    
+    def log_changes_bulk(self, entries: List[Dict[str, Any]]) -> int:
+        """
+        Insert many audit log entries with a single multi-row INSERT
+        
+        The insert joins the caller's transaction; nothing is committed here.
+        Task entries also feed the task_events timeline projection.
+        
+        Args:
+            entries: Dicts accepting the same keys as log_change, plus an
+                optional precomputed changed_fields list
+                
+        Returns:
+            Number of entries written
+        """
+        # Entries buffered earlier in this unit of work go first to keep ordering
+        pending = self.db.info.pop(AUDIT_BUFFER_KEY, None) or []
+        entries = pending + list(entries)
+        if not entries:
+            return 0
+        
+        now = datetime.utcnow()
+        context = get_request_context()
+        rows = []
+        for entry in entries:
+            row = self._entry_to_row(entry)
+            row["created_at"] = row["created_at"] or now
+            row["request_id"] = row["request_id"] or context.get("request_id")
+            rows.append(row)
+        
+        self.db.execute(insert(AuditLog), rows)
+        
+        # Keep the task timeline projection in the same transaction
+        TaskEventService(self.db).project_audit_rows(rows)
+        return len(rows)
+    
+    @staticmethod
+    def _entry_to_row(entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Map a log_change style entry to AuditLog column values"""
+        old_values = entry.get("old_values")
+        new_values = entry.get("new_values")
+        changed_fields = entry.get("changed_fields")
+        if changed_fields is None:
+            # Calculate changed fields if both old and new values provided
+            changed_fields = []
+            if old_values and new_values:
+                changed_fields = [
+                    field for field in new_values
+                    if field in old_values and old_values[field] != new_values[field]
+                ]
         
-        return audit_log
+        return {
+            "entity_type": entry["entity_type"],
+            "entity_id": entry["entity_id"],
+            "tipo_modifica": entry["tipo_modifica"],
+            "utente_id": entry.get("user_id"),
+            "tenant_id": entry.get("tenant_id"),
+            "old_values": old_values,
+            "new_values": new_values,
+            "changed_fields": changed_fields,
+            "dettaglio_modifica": entry.get("dettaglio_modifica") or {},
+            "ip_address": entry.get("ip_address"),
+            "user_agent": entry.get("user_agent"),
+            "session_id": entry.get("session_id"),
+            "request_id": entry.get("request_id"),
+            "note": entry.get("note"),
+            "automatic": 1 if entry.get("automatic") else 0,
+            "created_at": entry.get("created_at")
+        }
     
     def get_entity_history(
         self,
@@ -118,7 +294,10 @@ class AuditService:
             AuditLog.tenant_id == tenant_id
         ).order_by(AuditLog.created_at.desc())
         
-        return query.offset(offset).limit(limit).all()
+        return self._page_with_archived(
+            query, tenant_id, offset, limit, entity_type=entity_type,
+            match=lambda row: row["entity_id"] == entity_id
+        )
     
     def get_user_activity(
         self,
@@ -157,7 +336,10 @@ class AuditService:
         if entity_type:
             query = query.filter(AuditLog.entity_type == entity_type)
         
-        return query.order_by(AuditLog.created_at.desc()).offset(offset).limit(limit).all()
+        return self._page_with_archived(
+            query.order_by(AuditLog.created_at.desc()), tenant_id, offset, limit,
+            start_date, end_date, entity_type, match=lambda row: row["utente_id"] == user_id
+        )
     
     def get_critical_changes(
         self,
@@ -192,7 +374,10 @@ class AuditService:
             (AuditLog.tipo_modifica.in_(critical_types))
         )
         
-        return query.order_by(AuditLog.created_at.desc()).limit(limit).all()
+        return self._page_with_archived(
+            query.order_by(AuditLog.created_at.desc()), tenant_id, 0, limit, start_date,
+            match=lambda row: row["entity_type"] in CRITICAL_ENTITIES or row["tipo_modifica"] in CRITICAL_TYPES
+        )
     
     def get_compliance_report(
         self,
@@ -212,66 +397,103 @@ class AuditService:
             
         Returns:
             Compliance report with statistics
+            
+        Reports whose period ended more than AUDIT_REPORT_CLOSED_AFTER_MINUTES
+        ago are cached per (tenant, period, entity type) in this process.
         """
-        base_query = self.db.query(AuditLog).filter(
+        # Closed periods never change: serve them from the cache
+        cache_key = (str(tenant_id), start_date, end_date, entity_type)
+        is_closed = end_date < datetime.utcnow() - timedelta(minutes=settings.AUDIT_REPORT_CLOSED_AFTER_MINUTES)
+        if is_closed:
+            cached = _compliance_report_cache.get(cache_key)
+            if cached is not None:
+                _compliance_report_cache.move_to_end(cache_key)
+                return copy.deepcopy(cached)
+        
+        # One grouped pass: every counter derives from these groups
+        query = self.db.query(
+            AuditLog.entity_type,
+            AuditLog.tipo_modifica,
+            AuditLog.utente_id,
+            User.email,
+            User.name,
+            func.count(AuditLog.id),
+            func.count(AuditLog.id).filter(AuditLog.automatic == 1)
+        ).outerjoin(
+            User, User.id == AuditLog.utente_id
+        ).filter(
             AuditLog.tenant_id == tenant_id,
             AuditLog.created_at >= start_date,
             AuditLog.created_at <= end_date
         )
         
         if entity_type:
-            base_query = base_query.filter(AuditLog.entity_type == entity_type)
-        
-        # Get total changes
-        total_changes = base_query.count()
-        
-        # Get changes by type
-        changes_by_type = {}
-        for tipo in TipoModificaEnum:
-            count = base_query.filter(AuditLog.tipo_modifica == tipo).count()
-            changes_by_type[tipo.value] = count
+            query = query.filter(AuditLog.entity_type == entity_type)
         
-        # Get changes by entity
-        changes_by_entity = {}
-        entity_counts = base_query.with_entities(
+        groups = query.group_by(
             AuditLog.entity_type,
-            func.count(AuditLog.id)
-        ).group_by(AuditLog.entity_type).all()
-        
-        for entity_type, count in entity_counts:
-            changes_by_entity[entity_type] = count
-        
-        # Get most active users
-        user_activity = base_query.with_entities(
+            AuditLog.tipo_modifica,
             AuditLog.utente_id,
-            func.count(AuditLog.id).label('change_count')
-        ).filter(
-            AuditLog.utente_id.isnot(None)
-        ).group_by(
-            AuditLog.utente_id
-        ).order_by(
-            func.count(AuditLog.id).desc()
-        ).limit(10).all()
-        
-        # Get user details
+            User.email,
+            User.name
+        ).all()
+        
+        total_changes = 0
+        critical_changes = 0
+        automatic_changes = 0
+        changes_by_type = {tipo.value: 0 for tipo in TipoModificaEnum}
+        changes_by_entity = {}
+        user_counts = {}
+        users = {}
+        
+        for group_entity, tipo, user_id, user_email, user_name, count, automatic_count in groups:
+            total_changes += count
+            automatic_changes += automatic_count
+            if group_entity in CRITICAL_ENTITIES or tipo.name in CRITICAL_TYPES:
+                critical_changes += count
+            changes_by_type[tipo.value] += count
+            changes_by_entity[group_entity] = changes_by_entity.get(group_entity, 0) + count
+            if user_id is not None:
+                user_counts[user_id] = user_counts.get(user_id, 0) + count
+                users[user_id] = (user_email, user_name)
+        
+        # Months moved to cold storage are read from the archive files
+        archived = AuditArchiveService(self.db).aggregate_archived(
+            str(tenant_id), start_date, end_date, entity_type
+        )
+        total_changes += archived["total"]
+        critical_changes += archived["critical"]
+        automatic_changes += archived["automatic"]
+        for tipo_name, count in archived["by_type"].items():
+            tipo_value = TipoModificaEnum[tipo_name].value
+            changes_by_type[tipo_value] += count
+        for entity_type_name, count in archived["by_entity"].items():
+            changes_by_entity[entity_type_name] = changes_by_entity.get(entity_type_name, 0) + count
+        for user_id, count in archived["by_user"].items():
+            user_counts[user_id] = user_counts.get(user_id, 0) + count
+        
+        user_activity = sorted(user_counts.items(), key=lambda item: item[1], reverse=True)[:10]
+        
+        # Users seen only in archived months are resolved with one query
+        missing = [user_id for user_id, _ in user_activity if user_id not in users]
+        if missing:
+            for user_id, user_email, user_name in self.db.query(
+                User.id, User.email, User.name
+            ).filter(User.id.in_(missing)).all():
+                users[user_id] = (user_email, user_name)
+        
         active_users = []
         for user_id, change_count in user_activity:
-            user = self.db.query(User).filter(User.id == user_id).first()
-            if user:
+            user_email, user_name = users.get(user_id, (None, None))
+            if user_email:
                 active_users.append({
                     "user_id": user_id,
-                    "user_email": user.email,
-                    "user_name": user.nome_completo,
+                    "user_email": user_email,
+                    "user_name": user_name,
                     "change_count": change_count
                 })
         
-        # Get critical changes count
-        critical_changes = base_query.filter(
-            (AuditLog.entity_type.in_(["workflow", "document", "user"])) |
-            (AuditLog.tipo_modifica.in_([TipoModificaEnum.ELIMINAZIONE, TipoModificaEnum.RESPONSABILE_CAMBIO]))
-        ).count()
-        
-        return {
+        report = {
             "period": {
                 "start_date": start_date.isoformat(),
                 "end_date": end_date.isoformat()
@@ -279,14 +501,21 @@ class AuditService:
             "summary": {
                 "total_changes": total_changes,
                 "critical_changes": critical_changes,
-                "automatic_changes": base_query.filter(AuditLog.automatic == 1).count(),
-                "manual_changes": base_query.filter(AuditLog.automatic == 0).count()
+                "automatic_changes": automatic_changes,
+                "manual_changes": total_changes - automatic_changes
             },
             "changes_by_type": changes_by_type,
             "changes_by_entity": changes_by_entity,
             "most_active_users": active_users,
             "report_generated_at": datetime.utcnow().isoformat()
         }
+        
+        if is_closed:
+            _compliance_report_cache[cache_key] = copy.deepcopy(report)
+            while len(_compliance_report_cache) > settings.AUDIT_REPORT_CACHE_SIZE:
+                _compliance_report_cache.popitem(last=False)
+        
+        return report
     
     def search_audit_logs(
         self,
@@ -350,12 +579,104 @@ class AuditService:
         limit = search_params.get("limit", 100)
         offset = search_params.get("offset", 0)
         
-        return query.offset(offset).limit(limit).all()
+        # The same criteria on archived rows (tipo_modifica is stored by enum name)
+        archived_criteria = {
+            column: search_params.get(param)
+            for param, column in (("entity_id", "entity_id"), ("user_id", "utente_id"), ("ip_address", "ip_address"))
+            if search_params.get(param)
+        }
+        tipo = search_params.get("tipo_modifica")
+        if tipo:
+            archived_criteria["tipo_modifica"] = TipoModificaEnum(tipo).name
+        changed_field = search_params.get("changed_field")
+        
+        def match(row: Dict[str, Any]) -> bool:
+            if any(row[column] != value for column, value in archived_criteria.items()):
+                return False
+            return not changed_field or changed_field in (row["changed_fields"] or [])
+        
+        return self._page_with_archived(
+            query, tenant_id, offset, limit, search_params.get("start_date"), search_params.get("end_date"),
+            search_params.get("entity_type"), match
+        )
+    
+    def _page_with_archived(
+        self,
+        query,
+        tenant_id: int,
+        offset: int,
+        limit: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        entity_type: Optional[str] = None,
+        match: Optional[Callable[[Dict[str, Any]], bool]] = None
+    ) -> List[AuditLog]:
+        """
+        Page of a newest-first audit query, continued into archived months
+        
+        Archived months are older than every entry left in the table, so
+        they follow the table's rows. The archive is only read when the page
+        is not filled from the table.
+        """
+        hot = query.offset(offset).limit(limit).all()
+        if len(hot) == limit:
+            return hot
+        
+        archived = AuditArchiveService(self.db).read_archived_logs(
+            str(tenant_id), start_date, end_date, entity_type, match
+        )
+        if not archived:
+            return hot
+        hot_total = offset + len(hot) if hot else query.order_by(None).count()
+        skip = max(0, offset - hot_total)
+        return hot + archived[skip:skip + limit - len(hot)]
+
+
+# Flush buffered audit entries as part of the transaction being committed
+@event.listens_for(Session, "before_commit")
+def flush_audit_buffer_before_commit(session):
+    """Write the session's buffered audit entries with one multi-row INSERT"""
+    if session.info.get(AUDIT_BUFFER_KEY):
+        AuditService(session).flush_buffer()
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_audit_buffer_after_rollback(session):
+    """Entries describing rolled-back changes must not be written"""
+    discarded = session.info.pop(AUDIT_BUFFER_KEY, None)
+    if discarded:
+        logger.debug(f"Discarded {len(discarded)} buffered audit entries after rollback")
+    session.info.pop(AUDIT_TRACKED_KEY, None)
+
+
+@event.listens_for(Session, "before_flush")
+def capture_tracked_changes_before_flush(session, flush_context, instances):
+    """Record modified columns of tracked entities from attribute history"""
+    tracked = session.info.get(AUDIT_TRACKED_KEY)
+    if not tracked:
+        return
+    
+    for obj in session.dirty:
+        state = inspect(obj)
+        if not state.identity:
+            continue
+        changes = tracked.get((type(obj), str(state.identity[0])))
+        if changes is None:
+            continue
+        
+        for attr in state.mapper.column_attrs:
+            history = state.attrs[attr.key].history
+            if not history.added and not history.deleted:
+                continue
+            # Keep the value from before the first flush of the unit of work
+            if attr.key not in changes["old_values"]:
+                changes["old_values"][attr.key] = _audit_value(history.deleted[0]) if history.deleted else None
+            changes["new_values"][attr.key] = _audit_value(history.added[0]) if history.added else None
 
 
 # Audit context manager for automatic logging
 class AuditContext:
-    """Context manager for automatic audit logging"""
+    """Context manager for automatic audit logging (commit after the block)"""
     
     def __init__(
         self,
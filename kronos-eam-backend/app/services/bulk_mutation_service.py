@@ -0,0 +1,478 @@
+"""
+Set-based bulk mutation engine for tasks and plants
+"""
+
+from typing import Optional, List, Dict, Any, Tuple
+from datetime import datetime
+from sqlalchemy.orm import Session
+from sqlalchemy import update
+import json
+import logging
+
+from app.models.workflow import (
+    Workflow, WorkflowTask, TaskStatusEnum, TaskPriorityEnum, ActionStatusEnum
+)
+from app.models.plant import Plant
+from app.models.user import User
+from app.models.audit import TipoModificaEnum
+from app.models.notification import NotificationTypeEnum, NotificationPriorityEnum
+from app.services.audit_service import AuditService
+from app.services.notification_service import NotificationService
+from app.services.task_inbox_service import TaskInboxService
+from app.services.change_feed_service import emit_change
+from app.services.data_generation import mark_data_changed
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Columns that a bulk plant update is never allowed to touch
+PLANT_PROTECTED_FIELDS = {
+    "id", "tenant_id", "created_at", "created_by",
+    "is_deleted", "deleted_at", "deleted_by"
+}
+
+
+class BulkMutationService:
+    """
+    Applies a batch of changes with a constant number of statements.
+
+    The batch is validated up front, rows are loaded with a single SELECT,
+    changes are written as grouped UPDATE ... WHERE id IN (...) statements and
+    audit rows / notifications are inserted in batches, all in one transaction.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.audit_service = AuditService(db)
+        self.notification_service = NotificationService(db)
+
+    def bulk_update_tasks(
+        self,
+        task_ids: List[int],
+        user_id: int,
+        tenant_id: str,
+        status: Optional[TaskStatusEnum] = None,
+        priority: Optional[TaskPriorityEnum] = None,
+        assignee: Optional[str] = None,
+        due_date: Optional[datetime] = None,
+        note: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Update many tasks with the same change set
+
+        Args:
+            task_ids: IDs of the tasks to update
+            user_id: User performing the update
+            tenant_id: Tenant ID
+            status: New status
+            priority: New priority
+            assignee: New assignee email
+            due_date: New due date
+            note: Optional reason stored on the audit entries
+
+        Returns:
+            Summary counters plus one result entry per requested ID
+
+        Raises:
+            ValueError: If the batch fails validation; nothing is written
+        """
+        ids = self._validate_ids(task_ids)
+        if status is None and priority is None and assignee is None and due_date is None:
+            raise ValueError("No changes requested")
+
+        new_assignee = None
+        if assignee is not None:
+            new_assignee = self.db.query(User.id, User.email).filter(
+                User.email == assignee,
+                User.tenant_id == tenant_id
+            ).first()
+            if not new_assignee:
+                raise ValueError("Assignee not found")
+
+        actor_email = None
+        if status == TaskStatusEnum.COMPLETED:
+            actor_email = self.db.query(User.email).filter(User.id == user_id).scalar()
+
+        rows = self.db.query(
+            WorkflowTask.id,
+            WorkflowTask.workflow_id,
+            WorkflowTask.status,
+            WorkflowTask.priority,
+            WorkflowTask.assignee,
+            WorkflowTask.due_date,
+            WorkflowTask.estimated_hours,
+            WorkflowTask.actual_hours,
+            WorkflowTask.timeline,
+            WorkflowTask.audit_enabled
+        ).join(
+            Workflow, Workflow.id == WorkflowTask.workflow_id
+        ).filter(
+            WorkflowTask.id.in_(ids),
+            Workflow.tenant_id == tenant_id
+        ).all()
+        rows_by_id = {row.id: row for row in rows}
+
+        now = datetime.utcnow()
+        results: Dict[int, Dict[str, Any]] = {}
+        column_changes: Dict[int, Dict[str, Any]] = {}
+        timeline_changes: Dict[int, Dict[str, Any]] = {}
+        audit_entries: List[Dict[str, Any]] = []
+        reassigned_ids: List[int] = []
+        inbox_moves: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+
+        for task_id in ids:
+            row = rows_by_id.get(task_id)
+            if not row:
+                results[task_id] = {"id": task_id, "status": "not_found", "error": "Task not found"}
+                continue
+
+            changes, timeline, changed_fields = self._compute_task_changes(
+                row, status, priority, assignee, due_date, actor_email, now
+            )
+
+            if not changed_fields:
+                results[task_id] = {"id": task_id, "status": "unchanged", "changed_fields": []}
+                continue
+
+            column_changes[task_id] = changes
+            if timeline is not None:
+                timeline_changes[task_id] = timeline
+            results[task_id] = {"id": task_id, "status": "updated", "changed_fields": changed_fields}
+
+            if "assignee" in changed_fields:
+                reassigned_ids.append(task_id)
+
+            if {"status", "priority", "assignee"} & set(changed_fields):
+                inbox_moves.append((
+                    self._inbox_snapshot(row, {}),
+                    self._inbox_snapshot(row, changes)
+                ))
+
+            if not row.audit_enabled:
+                continue
+
+            if "assignee" in changed_fields:
+                audit_entries.append({
+                    "entity_type": "task",
+                    "entity_id": task_id,
+                    "tipo_modifica": TipoModificaEnum.RESPONSABILE_CAMBIO,
+                    "user_id": user_id,
+                    "tenant_id": tenant_id,
+                    "dettaglio_modifica": {
+                        "old_assignee": row.assignee,
+                        "new_assignee": assignee,
+                        "bulk": True
+                    },
+                    "note": note or "Bulk update"
+                })
+
+            audit_entries.append({
+                "entity_type": "task",
+                "entity_id": task_id,
+                "tipo_modifica": TipoModificaEnum.AGGIORNAMENTO,
+                "user_id": user_id,
+                "tenant_id": tenant_id,
+                "old_values": self._task_snapshot(row.status, row.priority, row.assignee),
+                "new_values": self._task_snapshot(
+                    changes.get("status", row.status),
+                    changes.get("priority", row.priority),
+                    changes.get("assignee", row.assignee)
+                ),
+                "changed_fields": changed_fields,
+                "dettaglio_modifica": {"bulk": True},
+                "note": note or "Bulk update"
+            })
+
+        try:
+            for task_id, timeline in timeline_changes.items():
+                column_changes[task_id]["timeline"] = timeline
+            self._apply_updates(WorkflowTask, column_changes, now)
+            self.audit_service.log_changes_bulk(audit_entries)
+
+            # Set-based updates bypass the ORM flush hooks of the inbox counters
+            inbox = TaskInboxService(self.db)
+            for old, new in inbox_moves:
+                inbox.record_move(tenant_id, old, new)
+            inbox.apply_pending()
+
+            # Set-based updates bypass the change feed flush hook as well: one event per batch
+            updated_ids = [task_id for task_id in ids if task_id in column_changes]
+            if updated_ids:
+                mark_data_changed(self.db, tenant_id)
+                emit_change(
+                    self.db, tenant_id, "task.bulk_updated", entity_type="task",
+                    data={"task_ids": updated_ids, "status": status.value if status else None}
+                )
+
+            if new_assignee and reassigned_ids:
+                self.notification_service.create_notifications_bulk([{
+                    "user_id": new_assignee.id,
+                    "tenant_id": tenant_id,
+                    "tipo": NotificationTypeEnum.TASK,
+                    "titolo": f"{len(reassigned_ids)} task assegnati",
+                    "messaggio": f"Ti sono stati assegnati {len(reassigned_ids)} task.",
+                    "priorita": NotificationPriorityEnum.MEDIA,
+                    "link": "/tasks",
+                    "azione": "view_tasks",
+                    "metadata": {"task_ids": reassigned_ids, "bulk": True}
+                }])
+
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            logger.exception("Bulk task update failed, transaction rolled back")
+            raise
+
+        return self._summarize(ids, results)
+
+    def bulk_update_plants(
+        self,
+        updates: List[Dict[str, Any]],
+        user_id: str,
+        tenant_id: str
+    ) -> Dict[str, Any]:
+        """
+        Update many plants, each with its own change set
+
+        Args:
+            updates: List of {"id": int, "update_data": dict}
+            user_id: User performing the update
+            tenant_id: Tenant ID
+
+        Returns:
+            Summary counters plus one result entry per requested ID
+
+        Raises:
+            ValueError: If the batch fails validation; nothing is written
+        """
+        columns = set(Plant.__table__.columns.keys())
+        payloads: Dict[int, Dict[str, Any]] = {}
+        errors = []
+
+        for position, item in enumerate(updates):
+            plant_id = item.get("id")
+            update_data = item.get("update_data") or {}
+            if not isinstance(plant_id, int):
+                errors.append(f"Item {position}: missing or invalid id")
+                continue
+            if plant_id in payloads:
+                errors.append(f"Item {position}: duplicate id {plant_id}")
+                continue
+            invalid = [
+                field for field in update_data
+                if field not in columns or field in PLANT_PROTECTED_FIELDS
+            ]
+            if invalid:
+                errors.append(f"Plant {plant_id}: invalid fields {', '.join(sorted(invalid))}")
+                continue
+            payloads[plant_id] = dict(update_data)
+
+        if errors:
+            raise ValueError("; ".join(errors))
+        ids = self._validate_ids(list(payloads))
+
+        # Current values of every submitted column, in one SELECT
+        fields = sorted({field for payload in payloads.values() for field in payload})
+        rows_by_id = {
+            row.id: row for row in self.db.query(
+                Plant.id, *[getattr(Plant, field) for field in fields]
+            ).filter(
+                Plant.id.in_(ids),
+                Plant.tenant_id == tenant_id,
+                Plant.is_deleted == False
+            ).all()
+        }
+
+        now = datetime.utcnow()
+        results: Dict[int, Dict[str, Any]] = {}
+        column_changes: Dict[int, Dict[str, Any]] = {}
+        audit_entries: List[Dict[str, Any]] = []
+
+        for plant_id in ids:
+            row = rows_by_id.get(plant_id)
+            if not row:
+                results[plant_id] = {"id": plant_id, "status": "not_found", "error": f"Plant {plant_id} not found"}
+                continue
+
+            payload = payloads[plant_id]
+            old_values = self._jsonable({field: getattr(row, field) for field in payload})
+            new_values = self._jsonable(payload)
+            changed_fields = sorted(field for field in payload if old_values[field] != new_values[field])
+            if not changed_fields:
+                results[plant_id] = {"id": plant_id, "status": "unchanged", "changed_fields": []}
+                continue
+
+            column_changes[plant_id] = dict(
+                {field: payload[field] for field in changed_fields}, updated_by=user_id
+            )
+            results[plant_id] = {"id": plant_id, "status": "updated", "changed_fields": changed_fields}
+            audit_entries.append({
+                "entity_type": "impianto",
+                "entity_id": plant_id,
+                "tipo_modifica": TipoModificaEnum.AGGIORNAMENTO,
+                "user_id": int(user_id) if str(user_id).isdigit() else None,
+                "tenant_id": tenant_id,
+                "old_values": {field: old_values[field] for field in changed_fields},
+                "new_values": {field: new_values[field] for field in changed_fields},
+                "changed_fields": changed_fields,
+                "dettaglio_modifica": {"bulk": True}
+            })
+
+        try:
+            self._apply_updates(Plant, column_changes, now)
+            self.audit_service.log_changes_bulk(audit_entries)
+            if column_changes:
+                mark_data_changed(self.db, tenant_id)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            logger.exception("Bulk plant update failed, transaction rolled back")
+            raise
+
+        return self._summarize(ids, results)
+
+    def _validate_ids(self, ids: List[int]) -> List[int]:
+        """De-duplicate IDs preserving order and enforce the batch size limit"""
+        unique_ids = list(dict.fromkeys(ids))
+        if not unique_ids:
+            raise ValueError("No IDs provided")
+        if len(unique_ids) > settings.BULK_UPDATE_MAX_ITEMS:
+            raise ValueError(
+                f"Batch too large: {len(unique_ids)} items, maximum is {settings.BULK_UPDATE_MAX_ITEMS}"
+            )
+        return unique_ids
+
+    def _compute_task_changes(
+        self,
+        row,
+        status: Optional[TaskStatusEnum],
+        priority: Optional[TaskPriorityEnum],
+        assignee: Optional[str],
+        due_date: Optional[datetime],
+        actor_email: Optional[str],
+        now: datetime
+    ) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]], List[str]]:
+        """Mirror TaskService.update_task rules for a single loaded row"""
+        changes: Dict[str, Any] = {}
+        changed_fields: List[str] = []
+        timeline = dict(row.timeline) if row.timeline else None
+        timeline_touched = False
+
+        if status is not None and status != row.status:
+            if status == TaskStatusEnum.IN_PROGRESS and row.status == TaskStatusEnum.TO_START:
+                timeline = timeline or {}
+                timeline["inizio_effettivo"] = now.isoformat()
+                timeline_touched = True
+                changes["action_status"] = ActionStatusEnum.IN_PROGRESS
+            elif status == TaskStatusEnum.COMPLETED:
+                timeline = timeline or {}
+                timeline["fine"] = now.isoformat()
+                timeline_touched = True
+                changes["completed_by"] = actor_email
+                changes["completed_date"] = now
+                changes["action_status"] = ActionStatusEnum.COMPLETED
+            elif status == TaskStatusEnum.BLOCKED:
+                changes["action_status"] = ActionStatusEnum.CANCELLED
+
+            changes["status"] = status
+            changed_fields.append("status")
+
+        if priority is not None and priority != row.priority:
+            changes["priority"] = priority
+            changed_fields.append("priority")
+
+        if assignee is not None and assignee != row.assignee:
+            changes["assignee"] = assignee
+            changed_fields.append("assignee")
+
+        if due_date is not None and due_date != row.due_date:
+            changes["due_date"] = due_date
+            if timeline is not None:
+                timeline["scadenza"] = due_date.isoformat()
+                timeline_touched = True
+            changed_fields.append("due_date")
+
+            if due_date < now and changes.get("status", row.status) != TaskStatusEnum.COMPLETED:
+                changes["status"] = TaskStatusEnum.DELAYED
+                changes["action_status"] = ActionStatusEnum.DELAYED
+                if "status" not in changed_fields:
+                    changed_fields.append("status")
+
+        return changes, (timeline if timeline_touched else None), changed_fields
+
+    def _apply_updates(self, model, changes_by_id: Dict[int, Dict[str, Any]], now: datetime) -> None:
+        """
+        Write per-row changes with as few statements as possible
+
+        Rows sharing an identical change set are written with one
+        UPDATE ... WHERE id IN (...) per chunk; rows whose values differ
+        (e.g. per-row timeline JSON) are sent as a single executemany.
+        """
+        groups: Dict[str, Tuple[Dict[str, Any], List[int]]] = {}
+        for entity_id, changes in changes_by_id.items():
+            key = json.dumps(self._jsonable(changes), sort_keys=True)
+            if key not in groups:
+                groups[key] = (changes, [])
+            groups[key][1].append(entity_id)
+
+        chunk_size = settings.BULK_UPDATE_CHUNK_SIZE
+        per_row = []
+        for changes, ids in groups.values():
+            if len(ids) == 1:
+                per_row.append(dict(changes, id=ids[0], updated_at=now))
+                continue
+            for start in range(0, len(ids), chunk_size):
+                self.db.execute(
+                    update(model)
+                    .where(model.id.in_(ids[start:start + chunk_size]))
+                    .values(**changes, updated_at=now)
+                    .execution_options(synchronize_session=False)
+                )
+
+        if per_row:
+            self.db.execute(update(model), per_row)
+
+    def _summarize(self, ids: List[int], results: Dict[int, Dict[str, Any]]) -> Dict[str, Any]:
+        """Build the response in the order the IDs were requested"""
+        ordered = [results[entity_id] for entity_id in ids]
+        failed_ids = [r["id"] for r in ordered if r["status"] == "not_found"]
+        return {
+            "updated_count": sum(1 for r in ordered if r["status"] == "updated"),
+            "unchanged_count": sum(1 for r in ordered if r["status"] == "unchanged"),
+            "failed_count": len(failed_ids),
+            "failed_ids": failed_ids,
+            "success": len(failed_ids) == 0,
+            "results": ordered
+        }
+
+    @staticmethod
+    def _task_snapshot(status, priority, assignee) -> Dict[str, Any]:
+        return {
+            "status": status.value if status else None,
+            "priority": priority.value if priority else None,
+            "assignee": assignee
+        }
+
+    @staticmethod
+    def _inbox_snapshot(row, changes: Dict[str, Any]) -> Dict[str, Any]:
+        """Inbox bucket values of a task row with changes applied"""
+        return {
+            "assignee": changes.get("assignee", row.assignee),
+            "status": changes.get("status", row.status),
+            "priority": changes.get("priority", row.priority),
+            "estimated_hours": row.estimated_hours,
+            "actual_hours": row.actual_hours
+        }
+
+    @staticmethod
+    def _jsonable(values: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert enums and datetimes so values can be stored as JSON"""
+        result = {}
+        for key, value in values.items():
+            if hasattr(value, "isoformat"):
+                value = value.isoformat()
+            elif hasattr(value, "value"):
+                value = value.value
+            result[key] = value
+        return result
@@ -0,0 +1,466 @@
+"""
+Change feed: typed per-tenant domain events pushed to clients
+
+Services do not publish anything themselves: flush listeners turn task,
+workflow, document and notification changes into ChangeEvent rows written in
+the same transaction, and once the transaction commits the events are pushed
+to WebSocket clients and wake up the SSE streams of the tenant. Clients
+resume from the last offset they saw, so nothing is lost across reconnects,
+and refresh only the widgets listed in each event.
+
+Offsets are not the event IDs: IDs are assigned at flush, so a slower
+transaction could commit an ID below one a client already read. Each tenant
+has a counter row (ChangeFeedStream) that the committing transaction bumps
+just before it commits; holding its lock until the commit makes the offsets
+of a tenant contiguous and visible in order.
+"""
+
+from typing import Optional, List, Dict, Any, Set, Tuple, AsyncIterator, Callable
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from sqlalchemy import event, func, inspect, or_, select
+import asyncio
+import json
+import logging
+
+from app.models.change_feed import ChangeEvent, ChangeFeedStream
+from app.models.document import Document, DocumentExtraction
+from app.models.notification import Notification
+from app.models.workflow import Workflow, WorkflowTask
+from app.core.config import settings
+from app.core.websocket import manager as ws_manager
+
+
+logger = logging.getLogger(__name__)
+
+# Keys under Session.info: flushed events waiting for offsets, then events waiting to be published
+CHANGE_FEED_PENDING_KEY = "change_feed_pending"
+CHANGE_FEED_COMMITTING_KEY = "change_feed_committing"
+
+# Event type -> client views to refresh
+EVENT_WIDGETS = {
+    "task.status_changed": ["tasks", "calendar", "dashboard.metrics", "dashboard.summary", "dashboard.alerts"],
+    "task.assigned": ["tasks", "dashboard.summary"],
+    "task.bulk_updated": ["tasks", "calendar", "dashboard.metrics", "dashboard.summary", "dashboard.alerts"],
+    "workflow.progress": ["workflows", "dashboard.metrics", "dashboard.summary", "dashboard.compliance-matrix"],
+    "document.created": ["documents", "dashboard.summary"],
+    "document.indexed": ["documents"],
+    "document.extraction": ["documents"],
+    "notification.created": ["notifications"],
+}
+
+
+def _enum_value(value: Any) -> Any:
+    return getattr(value, "value", value)
+
+
+def emit_change(
+    db: Session,
+    tenant_id: str,
+    event_type: str,
+    entity_type: Optional[str] = None,
+    entity_id: Optional[int] = None,
+    data: Optional[Dict[str, Any]] = None,
+    user_id: Optional[int] = None
+) -> ChangeEvent:
+    """
+    Add a domain event to the caller's transaction
+
+    Only needed for changes that bypass the ORM flush (set-based updates);
+    ORM changes of tracked models are captured automatically.
+
+    Args:
+        db: Session whose transaction the event joins
+        tenant_id: Tenant stream
+        event_type: One of EVENT_WIDGETS
+        entity_type: Changed entity type
+        entity_id: Changed entity ID
+        data: Event details
+        user_id: Restrict the event to one user
+
+    Returns:
+        The pending event (its offset is assigned on commit)
+    """
+    change = ChangeEvent(
+        tenant_id=str(tenant_id),
+        event_type=event_type,
+        entity_type=entity_type,
+        entity_id=entity_id,
+        user_id=user_id,
+        data=data or {},
+        widgets=EVENT_WIDGETS.get(event_type, []),
+        created_at=datetime.utcnow()
+    )
+    db.add(change)
+    return change
+
+
+def serialize_change(change: ChangeEvent) -> Dict[str, Any]:
+    """Wire format of an event"""
+    return {
+        "offset": change.stream_offset,
+        "type": change.event_type,
+        "entity_type": change.entity_type,
+        "entity_id": change.entity_id,
+        "user_id": change.user_id,
+        "data": change.data or {},
+        "widgets": change.widgets or [],
+        "created_at": change.created_at.isoformat() if change.created_at else None
+    }
+
+
+def format_sse(change: Dict[str, Any]) -> str:
+    """Server-Sent Events frame; the offset is the event ID used by Last-Event-ID"""
+    return f"id: {change['offset']}\nevent: {change['type']}\ndata: {json.dumps(change, default=str)}\n\n"
+
+
+class ChangeFeedBroker:
+    """
+    Process-local dispatch of committed events
+
+    Wakes up the streams subscribed to a tenant and pushes the events to
+    WebSocket clients through the connection manager (which fans out to the
+    other workers). Commits can happen in the event loop thread or in the
+    threadpool of sync endpoints, so dispatch is always scheduled on the loop.
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._waiters: Dict[str, Set[asyncio.Event]] = {}
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Loop that receives events committed from other threads"""
+        self._loop = loop
+
+    def subscribe(self, tenant_id: str) -> asyncio.Event:
+        waiter = asyncio.Event()
+        self._waiters.setdefault(str(tenant_id), set()).add(waiter)
+        return waiter
+
+    def unsubscribe(self, tenant_id: str, waiter: asyncio.Event) -> None:
+        waiters = self._waiters.get(str(tenant_id))
+        if waiters is not None:
+            waiters.discard(waiter)
+            if not waiters:
+                del self._waiters[str(tenant_id)]
+
+    def publish(self, changes: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """Dispatch committed (tenant_id, event) pairs; safe to call from any thread"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = self._loop
+            if loop is None or loop.is_closed():
+                return  # No event loop in this process (scripts): clients catch up from the table
+            loop.call_soon_threadsafe(self._dispatch, changes)
+            return
+        self._dispatch(changes)
+
+    def _dispatch(self, changes: List[Tuple[str, Dict[str, Any]]]) -> None:
+        for tenant_id in {tenant_id for tenant_id, _ in changes}:
+            for waiter in self._waiters.get(tenant_id, ()):
+                waiter.set()
+        asyncio.ensure_future(self._push(changes))
+
+    async def _push(self, changes: List[Tuple[str, Dict[str, Any]]]) -> None:
+        for tenant_id, change in changes:
+            message = {"type": "change", "change": change}
+            try:
+                if change["user_id"] is not None:
+                    await ws_manager.send_to_user(tenant_id, change["user_id"], message)
+                else:
+                    await ws_manager.broadcast_to_tenant(tenant_id, message)
+            except Exception as e:
+                logger.error(f"Failed to push change {change['offset']} to WebSocket clients: {e}")
+
+
+# Global broker instance
+broker = ChangeFeedBroker()
+
+
+class ChangeFeedService:
+    """Reads of the change feed, with resume-from-offset"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def read(
+        self,
+        tenant_id: str,
+        user_id: Optional[int],
+        offset: int,
+        limit: int = 500
+    ) -> Dict[str, Any]:
+        """
+        Events after an offset visible to a user
+
+        Args:
+            tenant_id: Tenant stream
+            user_id: Reader (events targeted at other users are skipped)
+            offset: Last offset the client has seen
+            limit: Maximum number of events
+
+        Returns:
+            events, offset (to resume from) and reset (events after the
+            given offset were pruned: the client must reload everything)
+        """
+        query = self.db.query(ChangeEvent).filter(
+            ChangeEvent.tenant_id == str(tenant_id),
+            ChangeEvent.stream_offset > offset
+        )
+        if user_id is not None:
+            query = query.filter(or_(ChangeEvent.user_id.is_(None), ChangeEvent.user_id == user_id))
+        changes = query.order_by(ChangeEvent.stream_offset).limit(limit).all()
+
+        reset = False
+        if offset:
+            # Offsets are contiguous and pruned oldest first, so a gap after the offset means pruning
+            oldest = self.db.query(func.min(ChangeEvent.stream_offset)).filter(
+                ChangeEvent.tenant_id == str(tenant_id)
+            ).scalar()
+            if oldest is None:
+                reset = offset < self.latest_offset(tenant_id)
+            else:
+                reset = offset < oldest - 1
+
+        events = [serialize_change(change) for change in changes]
+        return {
+            "events": events,
+            "offset": events[-1]["offset"] if events else offset,
+            "reset": reset
+        }
+
+    def latest_offset(self, tenant_id: str) -> int:
+        """Current end of a tenant stream (where new subscribers start)"""
+        return self.db.scalar(
+            select(ChangeFeedStream.last_offset).where(ChangeFeedStream.tenant_id == str(tenant_id))
+        ) or 0
+
+    def prune(self, older_than: Optional[datetime] = None) -> int:
+        """Delete events past the retention period"""
+        older_than = older_than or datetime.utcnow() - timedelta(hours=settings.CHANGE_FEED_RETENTION_HOURS)
+        deleted = self.db.query(ChangeEvent).filter(
+            ChangeEvent.created_at < older_than
+        ).delete(synchronize_session=False)
+        self.db.commit()
+        return deleted
+
+
+async def stream_changes(
+    session_factory: Callable[[], Any],
+    tenant_id: str,
+    user_id: Optional[int],
+    offset: Optional[int] = None,
+    heartbeat: Optional[float] = None
+) -> AsyncIterator[Optional[Dict[str, Any]]]:
+    """
+    Follow a tenant stream from an offset
+
+    Replays the events after the offset, then waits for commits of this
+    process (or polls, for events committed by other workers). Each read uses
+    a short-lived session in a worker thread, so an open stream holds no
+    database connection while idle.
+
+    Args:
+        session_factory: Context manager factory of sessions
+        tenant_id: Tenant stream
+        user_id: Reader
+        offset: Resume after this offset (None starts at the current end)
+        heartbeat: Seconds between wake-ups while idle
+
+    Yields:
+        Events, {"type": "reset"} when the offset was pruned, and None as a
+        keep-alive while idle
+    """
+    heartbeat = heartbeat or settings.CHANGE_FEED_POLL_INTERVAL
+
+    def read(after: Optional[int]) -> Dict[str, Any]:
+        with session_factory() as db:
+            service = ChangeFeedService(db)
+            if after is None:
+                return {"events": [], "offset": service.latest_offset(tenant_id), "reset": False}
+            return service.read(tenant_id, user_id, after, settings.CHANGE_FEED_BATCH_SIZE)
+
+    waiter = broker.subscribe(tenant_id)
+    try:
+        while True:
+            # Cleared before reading so a commit during the read is not missed
+            waiter.clear()
+            page = await asyncio.to_thread(read, offset)
+            if page["reset"]:
+                yield {"offset": offset, "type": "reset", "data": {}, "widgets": ["*"]}
+            for change in page["events"]:
+                yield change
+            offset = page["offset"]
+
+            if len(page["events"]) >= settings.CHANGE_FEED_BATCH_SIZE:
+                continue
+            try:
+                await asyncio.wait_for(waiter.wait(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+    finally:
+        broker.unsubscribe(tenant_id, waiter)
+
+
+def _changes_from_flush(session: Session) -> List[Dict[str, Any]]:
+    """Domain events of the ORM changes about to be flushed"""
+    changes = []
+    notified: Set[Tuple[str, int]] = set()
+
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Notification):
+            if obj in session.new and (obj.tenant_id, obj.user_id) not in notified:
+                # One event per user and flush, however many notifications were created
+                notified.add((obj.tenant_id, obj.user_id))
+                changes.append({
+                    "tenant_id": obj.tenant_id, "event_type": "notification.created",
+                    "entity_type": "notification", "user_id": obj.user_id, "data": {}
+                })
+            continue
+
+        if obj in session.new:
+            if isinstance(obj, Document):
+                changes.append({
+                    "tenant_id": obj.tenant_id, "event_type": "document.created",
+                    "entity_type": "document", "data": {"nome": obj.nome}
+                })
+            continue
+
+        state = inspect(obj)
+        if isinstance(obj, WorkflowTask):
+            for key, event_type in (("status", "task.status_changed"), ("assignee", "task.assigned")):
+                history = state.attrs[key].history
+                if history.added and history.deleted and history.added[0] != history.deleted[0]:
+                    changes.append({
+                        "tenant_id": obj.tenant_id, "event_type": event_type,
+                        "entity_type": "task", "entity_id": obj.id,
+                        "data": {
+                            "workflow_id": obj.workflow_id,
+                            "old": _enum_value(history.deleted[0]),
+                            "new": _enum_value(history.added[0])
+                        }
+                    })
+        elif isinstance(obj, Workflow):
+            history = state.attrs["progress"].history
+            if history.added and history.added[0] != (history.deleted[0] if history.deleted else None):
+                changes.append({
+                    "tenant_id": obj.tenant_id, "event_type": "workflow.progress",
+                    "entity_type": "workflow", "entity_id": obj.id,
+                    "data": {"progress": history.added[0], "current_status": obj.current_status}
+                })
+        elif isinstance(obj, Document):
+            history = state.attrs["ai_processed"].history
+            if history.added and history.added[0] and not (history.deleted and history.deleted[0]):
+                changes.append({
+                    "tenant_id": obj.tenant_id, "event_type": "document.indexed",
+                    "entity_type": "document", "entity_id": obj.id, "data": {}
+                })
+        elif isinstance(obj, DocumentExtraction):
+            history = state.attrs["status"].history
+            if history.added and history.deleted and history.added[0] != history.deleted[0]:
+                changes.append({
+                    "tenant_id": obj.tenant_id, "event_type": "document.extraction",
+                    "entity_type": "document", "entity_id": obj.document_id,
+                    "data": {"status": history.added[0]}
+                })
+    return changes
+
+
+@event.listens_for(Session, "before_flush")
+def capture_changes_before_flush(session, flush_context, instances):
+    """Add the events of tracked ORM changes to the flush"""
+    for change in _changes_from_flush(session):
+        emit_change(session, **change)
+
+
+def allocate_offsets(connection, tenant_id: str, count: int) -> int:
+    """
+    Reserve the next offsets of a tenant stream
+
+    The counter row stays locked until the caller's transaction ends, so
+    concurrent writers of the tenant take offsets in commit order.
+
+    Returns:
+        The last reserved offset
+    """
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        raise RuntimeError(f"Change feed offsets are not supported on {dialect}")
+
+    table = ChangeFeedStream.__table__
+    stmt = dialect_insert(table).values(tenant_id=tenant_id, last_offset=count, updated_at=datetime.utcnow())
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["tenant_id"],
+        set_={"last_offset": table.c.last_offset + count, "updated_at": stmt.excluded.updated_at}
+    ).returning(table.c.last_offset)
+    return connection.execute(stmt).scalar_one()
+
+
+@event.listens_for(Session, "after_flush")
+def collect_flushed_changes(session, flush_context):
+    """Keep flushed events until the transaction commits"""
+    flushed = [obj for obj in session.new if isinstance(obj, ChangeEvent)]
+    if flushed:
+        session.info.setdefault(CHANGE_FEED_PENDING_KEY, []).extend(flushed)
+
+
+@event.listens_for(Session, "before_commit")
+def assign_offsets_before_commit(session):
+    """Number the events of the transaction in their tenant streams"""
+    # Events of changes still pending are only captured by this flush
+    session.flush()
+    # Events of rolled-back savepoints are no longer persistent
+    pending = [
+        change for change in session.info.pop(CHANGE_FEED_PENDING_KEY, [])
+        if inspect(change).persistent
+    ]
+    if not pending:
+        return
+
+    by_tenant: Dict[str, List[ChangeEvent]] = {}
+    for change in sorted(pending, key=lambda change: change.id):
+        by_tenant.setdefault(change.tenant_id, []).append(change)
+
+    connection = session.connection()
+    committing = []
+    # Sorted so that transactions of several tenants lock the counters in the same order
+    for tenant_id in sorted(by_tenant):
+        changes = by_tenant[tenant_id]
+        last = allocate_offsets(connection, tenant_id, len(changes))
+        for stream_offset, change in enumerate(changes, start=last - len(changes) + 1):
+            change.stream_offset = stream_offset
+            committing.append((change, tenant_id, serialize_change(change)))
+    session.flush()
+    # Released savepoints fire this too; the outermost commit publishes them all
+    session.info.setdefault(CHANGE_FEED_COMMITTING_KEY, []).extend(committing)
+
+
+@event.listens_for(Session, "after_commit")
+def publish_committed_changes(session):
+    """Push committed events to subscribers"""
+    committing = session.info.pop(CHANGE_FEED_COMMITTING_KEY, None)
+    if committing:
+        broker.publish([(tenant_id, payload) for _, tenant_id, payload in committing])
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def discard_rolled_back_changes(session, previous_transaction):
+    """Events of rolled-back changes must not be published"""
+    # A savepoint rollback only drops the events flushed inside it
+    pending = [
+        change for change in session.info.pop(CHANGE_FEED_PENDING_KEY, [])
+        if inspect(change).persistent
+    ]
+    if pending:
+        session.info[CHANGE_FEED_PENDING_KEY] = pending
+    committing = [
+        entry for entry in session.info.pop(CHANGE_FEED_COMMITTING_KEY, [])
+        if inspect(entry[0]).persistent
+    ]
+    if committing:
+        session.info[CHANGE_FEED_COMMITTING_KEY] = committing
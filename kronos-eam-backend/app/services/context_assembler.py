@@ -0,0 +1,300 @@
+"""
+Token-budgeted assembly of the conversation context sent to the model
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from dataclasses import dataclass
+import logging
+import math
+import re
+import threading
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Marks the system message carrying the summary of older turns
+SUMMARY_MESSAGE_NAME = "conversation_summary"
+SUMMARY_HEADER = "Riepilogo della conversazione precedente:"
+# Per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+# Words kept from each side of a summarized turn
+SUMMARY_WORDS_PER_MESSAGE = 24
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Local approximation of a subword tokenizer
+
+    Punctuation marks count one token each, words one token per four
+    characters (rounded up); close to SentencePiece/BPE counts on Italian
+    and English text, without a model-specific vocabulary.
+    """
+    if not text:
+        return 0
+    return sum(math.ceil(len(piece) / 4) for piece in _TOKEN_PATTERN.findall(text))
+
+
+def message_tokens(message: BaseMessage) -> int:
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    return estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Longest prefix of text (at a piece boundary) within max_tokens"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    used = 0
+    end = 0
+    for match in _TOKEN_PATTERN.finditer(text):
+        cost = math.ceil(len(match.group()) / 4)
+        if used + cost > max(max_tokens - 1, 0):
+            break
+        used += cost
+        end = match.end()
+    return text[:end].rstrip() + "…"
+
+
+@dataclass
+class AssembledContext:
+    """Messages for the model and how the budget was spent"""
+    messages: List[BaseMessage]
+    tokens: int
+    kept_turns: int
+    summarized_turns: int = 0
+    dropped_turns: int = 0
+    truncated: bool = False
+
+
+def _turns(history: Sequence[BaseMessage]) -> List[List[BaseMessage]]:
+    """Group messages into turns, each starting at a user message"""
+    turns: List[List[BaseMessage]] = []
+    for message in history:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([message])
+        else:
+            turns[-1].append(message)
+    return turns
+
+
+def _summary_line(turn: List[BaseMessage]) -> str:
+    parts = []
+    for message in turn:
+        if not isinstance(message.content, str) or not message.content.strip():
+            continue
+        words = message.content.split()
+        text = " ".join(words[:SUMMARY_WORDS_PER_MESSAGE]) + ("…" if len(words) > SUMMARY_WORDS_PER_MESSAGE else "")
+        parts.append(f"{'Utente' if isinstance(message, HumanMessage) else 'Assistente'}: {text}")
+    return " / ".join(parts)
+
+
+class ContextAssembler:
+    """
+    Fits a conversation into a token budget
+
+    The system prompt and the new user message are always kept. The most
+    recent turns follow, newest first, up to `recent_turns` and the
+    budget. Older turns are condensed into one summary message of at most
+    `summary_tokens` (carrying over the previous summary), and whatever
+    does not fit there is dropped.
+    """
+
+    def __init__(
+        self,
+        max_tokens: Optional[int] = None,
+        recent_turns: Optional[int] = None,
+        summary_tokens: Optional[int] = None
+    ):
+        self.max_tokens = max_tokens or settings.AGENT_CONTEXT_MAX_TOKENS
+        self.recent_turns = recent_turns or settings.AGENT_CONTEXT_RECENT_TURNS
+        self.summary_tokens = summary_tokens if summary_tokens is not None else settings.AGENT_CONTEXT_SUMMARY_TOKENS
+
+    def assemble(self, system_prompt: str, history: Sequence[BaseMessage], message: BaseMessage) -> AssembledContext:
+        """
+        Build the model input for a new message
+
+        Args:
+            system_prompt: Agent instructions
+            history: Earlier messages of the conversation (system messages
+                other than a previous summary are ignored)
+            message: The new user message
+
+        Returns:
+            The assembled context; its messages are within max_tokens
+        """
+        system = SystemMessage(content=system_prompt)
+        budget = self.max_tokens - message_tokens(system)
+
+        truncated = False
+        if message_tokens(message) > budget:
+            message = message.model_copy(update={
+                "content": truncate_to_tokens(message.content, budget - MESSAGE_OVERHEAD_TOKENS)
+            })
+            truncated = True
+        budget -= message_tokens(message)
+
+        previous_summary = ""
+        conversation = []
+        for item in history:
+            if isinstance(item, SystemMessage):
+                if item.name == SUMMARY_MESSAGE_NAME:
+                    previous_summary = item.content
+                continue
+            conversation.append(item)
+        turns = _turns(conversation)
+
+        # Room for the summary is set aside only when there is something to summarize
+        summary_reserve = min(self.summary_tokens, budget) if (previous_summary or len(turns) > self.recent_turns) else 0
+        recent_budget = budget - summary_reserve
+
+        kept: List[List[BaseMessage]] = []
+        used = 0
+        for turn in reversed(turns[-self.recent_turns:]):
+            cost = sum(message_tokens(m) for m in turn)
+            if used + cost > recent_budget:
+                break
+            kept.insert(0, turn)
+            used += cost
+        older = turns[:len(turns) - len(kept)]
+
+        summary_message = None
+        summarized = 0
+        if older or previous_summary:
+            summary_budget = (
+                min(self.summary_tokens, budget - used)
+                - MESSAGE_OVERHEAD_TOKENS - estimate_tokens(SUMMARY_HEADER) - 1
+            )
+            lines: List[str] = []
+            # Newest older turns first: they matter most for the next answer
+            for turn in reversed(older):
+                line = _summary_line(turn)
+                if line and estimate_tokens("\n".join([line] + lines)) > summary_budget:
+                    break
+                if line:
+                    lines.insert(0, line)
+                summarized += 1
+            if previous_summary:
+                # The previous summary fills what is left, oldest facts first
+                room = summary_budget - estimate_tokens("\n".join(lines)) - 1
+                if room > 8:
+                    lines.insert(0, truncate_to_tokens(previous_summary[len(SUMMARY_HEADER):].strip(), room))
+            if lines:
+                summary_message = SystemMessage(
+                    content=f"{SUMMARY_HEADER}\n" + "\n".join(lines),
+                    name=SUMMARY_MESSAGE_NAME
+                )
+
+        messages: List[BaseMessage] = [system]
+        if summary_message is not None:
+            messages.append(summary_message)
+        for turn in kept:
+            messages.extend(turn)
+        messages.append(message)
+
+        return AssembledContext(
+            messages=messages,
+            tokens=sum(message_tokens(m) for m in messages),
+            kept_turns=len(kept),
+            summarized_turns=summarized,
+            dropped_turns=len(older) - summarized,
+            truncated=truncated
+        )
+
+
+def generation_input(conversation: Sequence[BaseMessage], prompt: str) -> List[BaseMessage]:
+    """
+    Model input of a generating agent node
+
+    The assembled conversation with the node's prompt (tool data and
+    instructions) appended to the new user message. System messages, the
+    agent instructions and the summary of older turns, are merged into one
+    leading system message, which is what chat models accept.
+
+    Args:
+        conversation: Assembled messages of the turn (see ContextAssembler)
+        prompt: Node prompt, already fitted to its budget
+
+    Returns:
+        Messages to send to the model
+    """
+    system = [message.content for message in conversation if isinstance(message, SystemMessage)]
+    messages = [message for message in conversation if not isinstance(message, SystemMessage)]
+    if messages and isinstance(messages[-1], HumanMessage):
+        messages[-1] = messages[-1].model_copy(update={"content": f"{messages[-1].content}\n\n{prompt}"})
+    else:
+        messages.append(HumanMessage(content=prompt))
+    return ([SystemMessage(content="\n\n".join(system))] if system else []) + messages
+
+
+def _field(item: Any, name: str) -> Any:
+    return item.get(name) if isinstance(item, dict) else getattr(item, name, None)
+
+
+def fit_chunks(chunks: Sequence[Any], max_tokens: int, min_chunk_tokens: int = 32) -> List[Tuple[Any, str]]:
+    """
+    Retrieved chunks that fit a token budget, most relevant first
+
+    Args:
+        chunks: Search results (objects or dicts with `content` and `score`)
+        max_tokens: Budget for all chunk texts
+        min_chunk_tokens: A chunk is cut to the remaining budget only if
+            at least this much is left; otherwise selection stops
+
+    Returns:
+        (chunk, text) pairs by decreasing score; text may be truncated
+    """
+    selected = []
+    remaining = max_tokens
+    for chunk in sorted(chunks, key=lambda c: _field(c, "score") or 0, reverse=True):
+        text = _field(chunk, "content") or ""
+        cost = estimate_tokens(text)
+        if cost <= remaining:
+            selected.append((chunk, text))
+            remaining -= cost
+        elif remaining >= min_chunk_tokens:
+            selected.append((chunk, truncate_to_tokens(text, remaining)))
+            break
+        else:
+            break
+    return selected
+
+
+class PromptSizeStats:
+    """
+    Sizes of the prompts sent to the model by generating agent nodes, per agent
+
+    Observers (e.g. a Prometheus histogram registered by the app) receive
+    every observation as (agent, tokens).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._observers: List[Callable[[str, int], None]] = []
+
+    def add_observer(self, observer: Callable[[str, int], None]) -> None:
+        self._observers.append(observer)
+
+    def observe(self, agent: str, tokens: int) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(agent, {"count": 0, "total": 0, "max": 0, "last": 0})
+            stats["count"] += 1
+            stats["total"] += tokens
+            stats["max"] = max(stats["max"], tokens)
+            stats["last"] = tokens
+        for observer in self._observers:
+            try:
+                observer(agent, tokens)
+            except Exception as e:
+                logger.warning(f"Prompt size observer failed: {str(e)}")
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {agent: dict(stats) for agent, stats in self._stats.items()}
+
+
+prompt_size_stats = PromptSizeStats()
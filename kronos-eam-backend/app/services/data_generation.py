@@ -0,0 +1,103 @@
+"""
+Per-tenant generation of the data read by the agents
+
+A counter per tenant, bumped after every committed change of plants,
+maintenances, performance records, compliance checklists, documents,
+workflows or tasks. The semantic cache scopes agent answers to the
+generation they were computed in, so such a change retires them, while
+notifications and other rows the agents never read leave them alone.
+
+The bump runs in its own short transaction after the commit, so writers
+do not hold the tenant's counter row for the length of their transaction.
+An answer computed from data read before the commit is stored under the
+older generation and never served afterwards.
+"""
+
+from typing import Iterable
+from datetime import datetime
+from sqlalchemy.orm import Session
+from sqlalchemy import event, select
+import logging
+
+from app.models.document import Document
+from app.models.plant import Plant, PlantPerformance, Maintenance, ComplianceChecklist
+from app.models.tenant import TenantDataGeneration
+from app.models.workflow import Workflow, WorkflowTask
+
+
+logger = logging.getLogger(__name__)
+
+# Key under Session.info holding the tenants whose agent data changed in the transaction
+CHANGED_TENANTS_KEY = "data_generation_tenants"
+
+# Models read by the agent tools and plant snapshots
+AGENT_DATA_MODELS = (Plant, PlantPerformance, Maintenance, ComplianceChecklist, Document, Workflow, WorkflowTask)
+
+
+def mark_data_changed(db: Session, tenant_id: str) -> None:
+    """
+    Bump the tenant's generation when the transaction commits
+
+    Only needed for set-based writes, which bypass the ORM flush; ORM
+    changes of AGENT_DATA_MODELS are captured automatically.
+    """
+    db.info.setdefault(CHANGED_TENANTS_KEY, set()).add(str(tenant_id))
+
+
+def current_generation(db: Session, tenant_id: str) -> int:
+    """Data generation of a tenant (0 before its first change)"""
+    return db.scalar(
+        select(TenantDataGeneration.generation).where(TenantDataGeneration.tenant_id == str(tenant_id))
+    ) or 0
+
+
+def bump_generations(connection, tenant_ids: Iterable[str]) -> None:
+    """Increment the generation of each tenant with one upsert"""
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        raise RuntimeError(f"Data generations are not supported on {dialect}")
+
+    table = TenantDataGeneration.__table__
+    now = datetime.utcnow()
+    # Sorted so that concurrent bumps lock the rows in the same order
+    stmt = dialect_insert(table).values([
+        {"tenant_id": tenant_id, "generation": 1, "updated_at": now} for tenant_id in sorted(tenant_ids)
+    ])
+    connection.execute(stmt.on_conflict_do_update(
+        index_elements=["tenant_id"],
+        set_={"generation": table.c.generation + 1, "updated_at": stmt.excluded.updated_at}
+    ))
+
+
+@event.listens_for(Session, "before_flush")
+def record_agent_data_changes(session, flush_context, instances):
+    """Tenants with inserts, updates or deletes of the data agents read"""
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, AGENT_DATA_MODELS):
+            continue
+        if obj in session.dirty and not session.is_modified(obj, include_collections=False):
+            continue
+        mark_data_changed(session, obj.tenant_id)
+
+
+@event.listens_for(Session, "after_commit")
+def bump_committed_generations(session):
+    """Retire cached answers computed from the data before this commit"""
+    tenant_ids = session.info.pop(CHANGED_TENANTS_KEY, None)
+    if not tenant_ids:
+        return
+    try:
+        with session.get_bind().engine.begin() as connection:
+            bump_generations(connection, tenant_ids)
+    except Exception:
+        logger.exception("Data generation bump failed; cached agent answers may be stale until they expire")
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_agent_data_changes(session):
+    """Rolled-back changes leave the generation alone"""
+    session.info.pop(CHANGED_TENANTS_KEY, None)
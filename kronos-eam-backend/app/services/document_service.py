@@ -32,7 +32,8 @@ from app.models.audit import TipoModificaEnum
 from app.services.audit_service import AuditService
 from app.services.notification_service import NotificationService
 from app.core.config import settings
-from app.core.storage import StorageBackend
+from app.core.storage import StorageBackend, StagedFile
+from app.services.document_storage_service import DocumentStorageService
 
 
 class DocumentService:
@@ -41,6 +42,7 @@ class DocumentService:
     def __init__(self, db: Session):
         self.db = db
         self.storage = StorageBackend()
+        self.blob_storage = DocumentStorageService(db, self.storage)
         self.audit_service = AuditService(db)
         self.notification_service = NotificationService(db)
     
@@ -60,14 +62,16 @@ class DocumentService:
         metadata: Optional[Dict[str, Any]] = None,
         is_standard: bool = False,
         riferimenti_normativi: Optional[List[str]] = None,
-        link_esterni: Optional[List[str]] = None
+        link_esterni: Optional[List[str]] = None,
+        staged_file: Optional[StagedFile] = None
     ) -> Document:
         """
         Create a new document with versioning and audit trail
         
         Args:
             nome: Document name
-            file: File binary content
+            file: File object, read in chunks (only its filename is used
+                when staged_file is given)
             categoria: Document category
             tenant_id: Tenant ID
             user_id: User creating the document
@@ -81,6 +85,8 @@ class DocumentService:
             is_standard: Whether this is a standard document
             riferimenti_normativi: Normative references
             link_esterni: External links
+            staged_file: Upload already staged (hashed and size-checked) by
+                StorageBackend.stage_upload; it is moved into storage
             
         Returns:
             Created document
@@ -105,20 +111,13 @@ class DocumentService:
         }
         tipo = tipo_map.get(extension, DocumentTypeEnum.PDF)
         
-        # Read file content
-        content = file.read()
-        file_size = len(content)
-        
-        # Calculate checksum
-        checksum = hashlib.sha256(content).hexdigest()
+        # Stage the content in chunks: size and checksum are computed while writing
+        staged = staged_file or self.storage.stage_file(file)
+        file_size = staged.size
+        checksum = staged.checksum
         
-        # Store file
-        file_path = self.storage.store_file(
-            content=content,
-            filename=filename,
-            tenant_id=tenant_id,
-            subfolder=f"documents/{categoria.value.lower()}"
-        )
+        # Store content once per tenant: identical bytes share the same blob
+        file_path = self.blob_storage.store_staged(staged, tenant_id).file_path
         
         # Create document record
         document = Document(
@@ -144,13 +143,9 @@ class DocumentService:
         )
         
         self.db.add(document)
-        self.db.commit()
-        self.db.refresh(document)
-        
-        # Create initial version
-        self._create_version(document, user_id, "Versione iniziale")
+        self.db.flush()
         
-        # Log creation
+        # Log creation in the same transaction
         self.audit_service.log_change(
             entity_type="document",
             entity_id=document.id,
@@ -164,6 +159,12 @@ class DocumentService:
             }
         )
         
+        # Create initial version
+        self._create_version(document, user_id, "Versione iniziale")
+        
+        self.db.commit()
+        self.db.refresh(document)
+        
         return document
     
     def update_document(
@@ -179,9 +180,10 @@ class DocumentService:
         riferimenti_normativi: Optional[List[str]] = None,
         link_esterni: Optional[List[str]] = None,
         new_file: Optional[BinaryIO] = None,
-        version_note: Optional[str] = None
+        version_note: Optional[str] = None,
+        staged_file: Optional[StagedFile] = None
     ) -> Document:
-        """Update document with version tracking"""
+        """Update document with version tracking (staged_file: new_file already staged)"""
         document = self.db.query(Document).filter(
             Document.id == document_id,
             Document.tenant_id == tenant_id
@@ -219,17 +221,11 @@ class DocumentService:
             self._create_version(document, user_id, version_note or "File aggiornato")
             
             # Store new file
-            content = new_file.read()
-            file_size = len(content)
-            checksum = hashlib.sha256(content).hexdigest()
+            staged = staged_file or self.storage.stage_file(new_file)
+            file_size = staged.size
+            checksum = staged.checksum
             
-            filename = getattr(new_file, 'filename', document.nome)
-            file_path = self.storage.store_file(
-                content=content,
-                filename=filename,
-                tenant_id=tenant_id,
-                subfolder=f"documents/{document.categoria.value.lower()}"
-            )
+            file_path = self.blob_storage.store_staged(staged, tenant_id).file_path
             
             # Update document
             document.file_path = file_path
@@ -246,10 +242,7 @@ class DocumentService:
             "data_scadenza": document.data_scadenza.isoformat() if document.data_scadenza else None
         }
         
-        self.db.commit()
-        self.db.refresh(document)
-        
-        # Log update
+        # Log update in the same transaction
         self.audit_service.log_change(
             entity_type="document",
             entity_id=document.id,
@@ -261,6 +254,9 @@ class DocumentService:
             note=version_note
         )
         
+        self.db.commit()
+        self.db.refresh(document)
+        
         # TODO: Notify if standard document updated (requires async handling)
         # if document.is_standard:
         #     self._notify_standard_document_update(document, user_id, tenant_id)
@@ -301,27 +297,11 @@ class DocumentService:
         if not source:
             raise ValueError("Source document not found")
         
-        # Copy file
-        source_content = self.storage.retrieve_file(source.file_path)
-        
-        # Apply customizations if needed (e.g., template processing)
-        if customizations and source.tipo in [DocumentTypeEnum.DOC, DocumentTypeEnum.DOCX]:
-            # This would process templates with customizations
-            # For now, just copy as-is
-            content = source_content
-        else:
-            content = source_content
-        
-        # Create new document
+        # Customizations (e.g. template processing of DOC/DOCX) are not applied
+        # to the content yet: the copy references the source file, no bytes
+        # are duplicated
         nome = nome_copia or f"Copia di {source.nome}"
         
-        new_file_path = self.storage.store_file(
-            content=content,
-            filename=nome,
-            tenant_id=tenant_id,
-            subfolder=f"documents/{source.categoria.value.lower()}/copies"
-        )
-        
         # Create document record
         copy = Document(
             nome=nome,
@@ -329,10 +309,10 @@ class DocumentService:
             tipo=source.tipo,
             categoria=source.categoria,
             stato=DocumentStatusEnum.VALIDO,
-            file_path=new_file_path,
-            file_size=len(content),
+            file_path=source.file_path,
+            file_size=source.file_size,
             mime_type=source.mime_type,
-            checksum=hashlib.sha256(content).hexdigest(),
+            checksum=source.checksum,
             impianto_id=target_impianto_id or source.impianto_id,
             tags=source.tags.copy() if source.tags else [],
             is_standard=False,  # Copies are not standard
@@ -340,8 +320,7 @@ class DocumentService:
         )
         
         self.db.add(copy)
-        self.db.commit()
-        self.db.refresh(copy)
+        self.db.flush()
         
         # Create copy record
         copy_record = DocumentCopy(
@@ -355,9 +334,8 @@ class DocumentService:
         )
         
         self.db.add(copy_record)
-        self.db.commit()
         
-        # Log copy creation
+        # Log copy creation in the same transaction
         self.audit_service.log_change(
             entity_type="document",
             entity_id=copy.id,
@@ -370,6 +348,9 @@ class DocumentService:
             }
         )
         
+        self.db.commit()
+        self.db.refresh(copy)
+        
         return copy
     
     def search_documents(
@@ -538,9 +519,7 @@ class DocumentService:
         if document_id not in task.documenti_associati:
             task.documenti_associati.append(document_id)
         
-        self.db.commit()
-        
-        # Log the linking
+        # Log the linking in the same transaction
         self.audit_service.log_change(
             entity_type="document",
             entity_id=document_id,
@@ -553,6 +532,8 @@ class DocumentService:
             }
         )
         
+        self.db.commit()
+        
         return True
     
     def _create_version(
@@ -575,8 +556,8 @@ class DocumentService:
             tenant_id=document.tenant_id
         )
         
+        # Committed by the caller with the document change
         self.db.add(version)
-        self.db.commit()
     
     def _get_search_facets(self, tenant_id: int) -> Dict[str, Any]:
         """Get facets for search filtering"""
@@ -744,12 +725,7 @@ class DocumentService:
         filename = f"{template.nome}_{datetime.now().strftime('%Y%m%d_%H%M%S')}{extension}"
         
         # Store file
-        file_path = self.storage.store_file(
-            content=content,
-            filename=filename,
-            tenant_id=tenant_id,
-            subfolder=f"documents/{template.categoria.value.lower()}/generated"
-        )
+        file_path = self.blob_storage.store_bytes(content, tenant_id).file_path
         
         # Create document record
         document = Document(
@@ -771,10 +747,9 @@ class DocumentService:
         )
         
         self.db.add(document)
-        self.db.commit()
-        self.db.refresh(document)
+        self.db.flush()
         
-        # Log generation
+        # Log generation in the same transaction
         self.audit_service.log_change(
             entity_type="document",
             entity_id=document.id,
@@ -788,6 +763,9 @@ class DocumentService:
             }
         )
         
+        self.db.commit()
+        self.db.refresh(document)
+        
         return document
     
     def _generate_pdf_from_template(self, template: DocumentTemplate, context: Dict[str, Any]) -> bytes:
@@ -982,50 +960,3 @@ Firma del Richiedente: _______________________________
             query = query.filter(WorkflowDocumentTemplate.tenant_id == tenant_id)
         
         return query.order_by(WorkflowDocumentTemplate.ordine).all()
-
-
-class StorageBackend:
-    """File storage backend (placeholder for actual implementation)"""
-    
-    def __init__(self):
-        self.base_path = Path(settings.UPLOAD_PATH)
-        self.base_path.mkdir(parents=True, exist_ok=True)
-    
-    def store_file(
-        self,
-        content: bytes,
-        filename: str,
-        tenant_id: int,
-        subfolder: str = ""
-    ) -> str:
-        """Store file and return path"""
-        # Create tenant directory
-        tenant_path = self.base_path / str(tenant_id) / subfolder
-        tenant_path.mkdir(parents=True, exist_ok=True)
-        
-        # Generate unique filename
-        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        unique_filename = f"{timestamp}_{filename}"
-        
-        file_path = tenant_path / unique_filename
-        
-        # Write file
-        with open(file_path, 'wb') as f:
-            f.write(content)
-        
-        # Return relative path
-        return str(file_path.relative_to(self.base_path))
-    
-    def retrieve_file(self, file_path: str) -> bytes:
-        """Retrieve file content"""
-        full_path = self.base_path / file_path
-        
-        with open(full_path, 'rb') as f:
-            return f.read()
-    
-    def delete_file(self, file_path: str):
-        """Delete file"""
-        full_path = self.base_path / file_path
-        
-        if full_path.exists():
-            full_path.unlink()
\ No newline at end of file
@@ -0,0 +1,427 @@
+"""
+Content-addressed document storage with reference counting
+"""
+
+from typing import Optional, Dict, BinaryIO, List
+from datetime import datetime, timedelta
+from collections import defaultdict
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import func, event, inspect, update, delete, select
+import logging
+import os
+
+from app.models.document import Document, DocumentVersion, DocumentBlob
+from app.core.storage import StorageBackend, StagedFile
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Key under Session.info holding ref_count deltas waiting for the end of the flush
+BLOB_REF_DELTAS_KEY = "document_blob_ref_deltas"
+
+# Folder (under the tenant root) holding content-addressed files
+BLOB_FOLDER = "blobs"
+
+# Rows whose file_path references a blob
+REFERENCING_MODELS = (Document, DocumentVersion)
+
+
+class DocumentStorageService:
+    """
+    Stores document content once per tenant, addressed by SHA256.
+
+    Document.file_path and DocumentVersion.file_path point at the blob file,
+    so copies and versions with identical bytes share it. Blob ref_counts
+    move at flush time with every insert, delete or file_path change of
+    those rows; collect_garbage() removes blobs left unreferenced for the
+    grace period, reconcile() rebuilds the counts and migrate_legacy_files()
+    moves files stored under per-upload names into the blob store.
+    """
+
+    def __init__(self, db: Session, storage: Optional[StorageBackend] = None):
+        self.db = db
+        self.storage = storage or StorageBackend()
+
+    @staticmethod
+    def blob_path(tenant_id: str, checksum: str) -> str:
+        """Storage path of the blob holding content with this checksum"""
+        return f"{tenant_id}/{BLOB_FOLDER}/{checksum[:2]}/{checksum}"
+
+    def store_staged(self, staged: StagedFile, tenant_id: str) -> DocumentBlob:
+        """
+        Store a staged file, reusing the tenant's blob when the content exists
+
+        The staged file is consumed either way. The returned blob is
+        referenced by pointing a Document/DocumentVersion file_path at it.
+
+        Args:
+            staged: File staged by StorageBackend (size and checksum known)
+            tenant_id: Tenant owning the content
+
+        Returns:
+            The DocumentBlob for the content
+        """
+        tenant_id = str(tenant_id)
+        now = datetime.utcnow()
+
+        blob = self._find(tenant_id, staged.checksum)
+        if blob is None:
+            blob = DocumentBlob(
+                tenant_id=tenant_id,
+                checksum=staged.checksum,
+                file_path=self.blob_path(tenant_id, staged.checksum),
+                file_size=staged.size,
+                ref_count=0,
+                created_at=now,
+                last_used_at=now
+            )
+            try:
+                with self.db.begin_nested():
+                    self.db.add(blob)
+            except IntegrityError:
+                # Same content stored concurrently by another transaction
+                blob = self._find(tenant_id, staged.checksum)
+
+        # Reuse postpones garbage collection of a blob that just dropped to zero;
+        # the row lock taken by _find keeps it until then
+        blob.last_used_at = now
+
+        if self.storage.file_exists(blob.file_path):
+            self.storage.discard_staged(staged)
+        else:
+            self.storage.commit_staged_as(staged, blob.file_path)
+        return blob
+
+    def store_bytes(self, content: bytes, tenant_id: str) -> DocumentBlob:
+        """Store in-memory content (e.g. generated documents)"""
+        return self.store_staged(self.storage.stage_chunks([content]), tenant_id)
+
+    def store_file(self, file: BinaryIO, tenant_id: str) -> DocumentBlob:
+        """Store a readable file object, streamed in chunks"""
+        return self.store_staged(self.storage.stage_file(file), tenant_id)
+
+    def reconcile(self, tenant_id: Optional[str] = None) -> int:
+        """
+        Rebuild blob ref_counts from documents and versions
+
+        Args:
+            tenant_id: Limit to one tenant (all tenants when None)
+
+        Returns:
+            Number of blobs whose count was corrected
+        """
+        references: Dict[str, int] = defaultdict(int)
+        for model in REFERENCING_MODELS:
+            query = self.db.query(model.file_path, func.count(model.id)).filter(
+                model.file_path.in_(self._blob_paths(tenant_id))
+            )
+            for file_path, count in query.group_by(model.file_path):
+                references[file_path] += count
+
+        blobs = self.db.query(DocumentBlob.id, DocumentBlob.file_path, DocumentBlob.ref_count)
+        if tenant_id:
+            blobs = blobs.filter(DocumentBlob.tenant_id == str(tenant_id))
+
+        now = datetime.utcnow()
+        rows = [
+            {"id": blob_id, "ref_count": references.get(file_path, 0), "last_used_at": now}
+            for blob_id, file_path, ref_count in blobs
+            if ref_count != references.get(file_path, 0)
+        ]
+
+        try:
+            if rows:
+                self.db.execute(update(DocumentBlob), rows)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            logger.exception("Document blob reconciliation failed")
+            raise
+
+        logger.info(f"Reconciled {len(rows)} document blob reference counts")
+        return len(rows)
+
+    def collect_garbage(
+        self,
+        grace_hours: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        sweep_orphans: bool = True
+    ) -> Dict[str, int]:
+        """
+        Delete blobs that have been unreferenced for longer than the grace period
+
+        The grace period covers uploads that stored content but have not yet
+        committed the referencing document. Rows are deleted (and locked)
+        before their files, so a concurrent store of the same content either
+        sees the row gone and writes a new blob, or keeps it alive.
+
+        Args:
+            grace_hours: Minimum unreferenced age (DOCUMENT_BLOB_GC_GRACE_HOURS)
+            batch_size: Blobs per transaction (DOCUMENT_BLOB_GC_BATCH_SIZE)
+            sweep_orphans: Also delete old blob files that have no row
+
+        Returns:
+            Dict with blobs_deleted, bytes_freed and orphan_files_deleted
+        """
+        grace_hours = settings.DOCUMENT_BLOB_GC_GRACE_HOURS if grace_hours is None else grace_hours
+        batch_size = batch_size or settings.DOCUMENT_BLOB_GC_BATCH_SIZE
+        cutoff = datetime.utcnow() - timedelta(hours=grace_hours)
+        collectable = (DocumentBlob.ref_count <= 0, DocumentBlob.last_used_at < cutoff)
+        stats = {"blobs_deleted": 0, "bytes_freed": 0, "orphan_files_deleted": 0}
+
+        last_id = 0
+        while True:
+            candidates = self.db.query(
+                DocumentBlob.id, DocumentBlob.file_path, DocumentBlob.file_size
+            ).filter(
+                DocumentBlob.id > last_id, *collectable
+            ).order_by(DocumentBlob.id).limit(batch_size).all()
+            if not candidates:
+                break
+            last_id = candidates[-1].id
+
+            try:
+                removed = []
+                for blob_id, file_path, file_size in candidates:
+                    # Re-checked under the row lock: the blob may have been reused meanwhile
+                    result = self.db.execute(
+                        delete(DocumentBlob).where(DocumentBlob.id == blob_id, *collectable)
+                    )
+                    if result.rowcount:
+                        removed.append((file_path, file_size or 0))
+                for file_path, _ in removed:
+                    self.storage.delete_file(file_path)
+                self.db.commit()
+            except Exception:
+                self.db.rollback()
+                logger.exception("Document blob garbage collection failed")
+                raise
+
+            stats["blobs_deleted"] += len(removed)
+            stats["bytes_freed"] += sum(size for _, size in removed)
+
+        if sweep_orphans:
+            stats["orphan_files_deleted"] = self._sweep_orphan_files(cutoff)
+
+        logger.info(f"Document blob garbage collection: {stats}")
+        return stats
+
+    def migrate_legacy_files(
+        self,
+        tenant_id: Optional[str] = None,
+        batch_size: int = 100,
+        dry_run: bool = False
+    ) -> Dict[str, int]:
+        """
+        Move files stored under per-upload names into the blob store
+
+        Every distinct legacy file_path is re-hashed, stored as (or matched
+        to) a blob and all documents and versions pointing at it are
+        repointed in one transaction per batch. Legacy files are deleted
+        only after the batch is committed.
+
+        Args:
+            tenant_id: Limit to one tenant (all tenants when None)
+            batch_size: Legacy paths per transaction
+            dry_run: Only hash and count, change nothing
+
+        Returns:
+            Dict with paths, rows, deduplicated, bytes_saved and missing counts
+        """
+        stats = {"paths": 0, "rows": 0, "deduplicated": 0, "bytes_saved": 0, "missing": 0}
+        seen_checksums = set()
+        last_path = ""
+
+        while True:
+            batch = self._legacy_paths(tenant_id, after=last_path, limit=batch_size)
+            if not batch:
+                break
+            last_path = batch[-1][1]
+
+            migrated = []
+            try:
+                for path_tenant, file_path in batch:
+                    try:
+                        local_path = self.storage.local_path(file_path)
+                    except FileNotFoundError:
+                        logger.warning(f"Legacy document file missing, left as is: {file_path}")
+                        stats["missing"] += 1
+                        continue
+
+                    with open(local_path, "rb") as f:
+                        staged = self.storage.stage_file(f)
+
+                    key = (path_tenant, staged.checksum)
+                    duplicate = key in seen_checksums or self._find(path_tenant, staged.checksum) is not None
+                    seen_checksums.add(key)
+                    stats["paths"] += 1
+                    if duplicate:
+                        stats["deduplicated"] += 1
+                        stats["bytes_saved"] += staged.size
+
+                    if dry_run:
+                        self.storage.discard_staged(staged)
+                        continue
+
+                    blob = self.store_staged(staged, path_tenant)
+                    repointed = 0
+                    for model in REFERENCING_MODELS:
+                        result = self.db.execute(
+                            update(model).where(
+                                model.tenant_id == path_tenant,
+                                model.file_path == file_path
+                            ).values(
+                                file_path=blob.file_path,
+                                checksum=blob.checksum
+                            ).execution_options(synchronize_session=False)
+                        )
+                        repointed += result.rowcount
+                    # Core updates bypass the flush listener: count the references here
+                    record_blob_reference(self.db, blob.file_path, repointed)
+                    stats["rows"] += repointed
+                    migrated.append(file_path)
+
+                if not dry_run:
+                    self.db.flush()
+                    apply_blob_references(self.db)
+                    self.db.commit()
+            except Exception:
+                self.db.rollback()
+                logger.exception("Document blob migration failed")
+                raise
+
+            for file_path in migrated:
+                self.storage.delete_file(file_path)
+
+        logger.info(f"Document blob migration{' (dry run)' if dry_run else ''}: {stats}")
+        return stats
+
+    def _find(self, tenant_id: str, checksum: str) -> Optional[DocumentBlob]:
+        # Locked until commit: collect_garbage cannot delete a blob being reused
+        return self.db.query(DocumentBlob).filter(
+            DocumentBlob.tenant_id == str(tenant_id),
+            DocumentBlob.checksum == checksum
+        ).with_for_update().first()
+
+    def _blob_paths(self, tenant_id: Optional[str]):
+        paths = select(DocumentBlob.file_path)
+        if tenant_id:
+            paths = paths.where(DocumentBlob.tenant_id == str(tenant_id))
+        return paths
+
+    def _legacy_paths(self, tenant_id: Optional[str], after: str, limit: int) -> List[tuple]:
+        """Distinct (tenant_id, file_path) referenced by rows but not stored as blobs"""
+        paths = set()
+        for model in REFERENCING_MODELS:
+            query = self.db.query(model.tenant_id, model.file_path).filter(
+                model.file_path > after,
+                model.file_path.notin_(self._blob_paths(None))
+            )
+            if tenant_id:
+                query = query.filter(model.tenant_id == str(tenant_id))
+            paths.update(query.distinct().order_by(model.file_path).limit(limit).all())
+        return sorted(paths, key=lambda row: row[1])[:limit]
+
+    def _sweep_orphan_files(self, cutoff: datetime) -> int:
+        """Delete blob files older than cutoff that no row refers to (e.g. rolled-back uploads)"""
+        cutoff_ts = cutoff.timestamp()
+        deleted = 0
+        for blob_dir in self.storage.base_path.glob(f"*/{BLOB_FOLDER}"):
+            for root, _, files in os.walk(blob_dir):
+                candidates = {}
+                for name in files:
+                    full_path = os.path.join(root, name)
+                    if os.path.getmtime(full_path) < cutoff_ts:
+                        candidates[os.path.relpath(full_path, self.storage.base_path)] = full_path
+                if not candidates:
+                    continue
+                known = {
+                    path for (path,) in self.db.query(DocumentBlob.file_path).filter(
+                        DocumentBlob.file_path.in_(list(candidates))
+                    )
+                }
+                for relative_path, full_path in candidates.items():
+                    if relative_path not in known:
+                        os.unlink(full_path)
+                        deleted += 1
+        return deleted
+
+
+def record_blob_reference(session: Session, file_path: Optional[str], delta: int) -> None:
+    """Accumulate a ref_count change for the blob at file_path (applied after the flush)"""
+    if not file_path or not delta:
+        return
+    deltas = session.info.setdefault(BLOB_REF_DELTAS_KEY, {})
+    deltas[file_path] = deltas.get(file_path, 0) + delta
+
+
+def apply_blob_references(session: Session, connection=None) -> int:
+    """
+    Write the recorded ref_count deltas, one statement per distinct delta
+
+    Paths that are not blobs (files not yet migrated) match no row.
+
+    Returns:
+        Number of blobs updated
+    """
+    deltas: Dict[str, int] = session.info.pop(BLOB_REF_DELTAS_KEY, None) or {}
+    connection = connection or session.connection()
+    table = DocumentBlob.__table__
+    now = datetime.utcnow()
+
+    by_delta: Dict[int, List[str]] = defaultdict(list)
+    for file_path, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(file_path)
+
+    touched = 0
+    for delta, paths in by_delta.items():
+        result = connection.execute(
+            update(table).where(table.c.file_path.in_(paths)).values(
+                ref_count=table.c.ref_count + delta,
+                last_used_at=now
+            )
+        )
+        touched += result.rowcount
+    return touched
+
+
+def _loaded_file_path(state) -> Optional[str]:
+    history = state.attrs.file_path.history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return None
+
+
+@event.listens_for(Session, "before_flush")
+def record_document_blob_references(session, flush_context, instances):
+    """Turn Document/DocumentVersion inserts, deletes and file changes into ref_count deltas"""
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, REFERENCING_MODELS):
+            continue
+        state = inspect(obj)
+
+        if obj in session.new:
+            record_blob_reference(session, obj.file_path, 1)
+        elif obj in session.deleted:
+            record_blob_reference(session, _loaded_file_path(state), -1)
+        elif state.attrs.file_path.history.has_changes():
+            record_blob_reference(session, _loaded_file_path(state), -1)
+            record_blob_reference(session, obj.file_path, 1)
+
+
+@event.listens_for(Session, "after_flush")
+def apply_document_blob_references(session, flush_context):
+    """Write ref_count deltas in the transaction of the flush"""
+    if session.info.get(BLOB_REF_DELTAS_KEY):
+        apply_blob_references(session, session.connection())
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_document_blob_references(session):
+    """Deltas of rolled-back changes must not be written"""
+    session.info.pop(BLOB_REF_DELTAS_KEY, None)
@@ -0,0 +1,353 @@
+"""
+Notification delivery workers with batch claiming and pooled SMTP
+"""
+
+from typing import Optional, List, Dict, Any, Callable
+from datetime import datetime, timedelta
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import update
+import asyncio
+import logging
+import smtplib
+import ssl
+
+from app.models.notification import NotificationQueue, NotificationChannelEnum
+from app.services.notification_service import NotificationService
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class SMTPConnectionPool:
+    """
+    Bounded pool of persistent SMTP connections.
+
+    Connections are opened lazily (EHLO, STARTTLS and login happen once per
+    connection, not per message) and reused across messages. smtplib is
+    blocking, so every network call runs in the default thread pool and the
+    event loop is never blocked. A connection that fails is discarded and a
+    fresh one is opened for the next message.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        use_tls: bool = True,
+        size: int = 5,
+        timeout: float = 30
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.size = size
+        self.timeout = timeout
+
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(size)
+        self.connections_opened = 0
+
+    @classmethod
+    def from_settings(cls) -> "SMTPConnectionPool":
+        """Pool configured from the SMTP_* settings"""
+        return cls(
+            host=settings.SMTP_HOST,
+            port=settings.SMTP_PORT,
+            username=settings.SMTP_USER,
+            password=settings.SMTP_PASSWORD,
+            use_tls=settings.SMTP_USE_TLS,
+            size=settings.SMTP_POOL_SIZE,
+            timeout=settings.SMTP_TIMEOUT
+        )
+
+    async def send_message(self, message) -> None:
+        """Send a message over a pooled connection, reconnecting once if it went stale"""
+        async with self._slots:
+            connection = None if self._idle.empty() else self._idle.get_nowait()
+            try:
+                if connection is None:
+                    connection = await asyncio.to_thread(self._open)
+                try:
+                    await asyncio.to_thread(connection.send_message, message)
+                except smtplib.SMTPServerDisconnected:
+                    # Idle connection closed by the server: retry on a fresh one
+                    self._discard(connection)
+                    connection = None
+                    connection = await asyncio.to_thread(self._open)
+                    await asyncio.to_thread(connection.send_message, message)
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException):
+                # Message-level rejection: the session is still usable
+                if connection is not None:
+                    self._idle.put_nowait(connection)
+                raise
+            except Exception:
+                if connection is not None:
+                    self._discard(connection)
+                raise
+            else:
+                self._idle.put_nowait(connection)
+
+    async def close(self) -> None:
+        """Close all idle connections"""
+        while not self._idle.empty():
+            connection = self._idle.get_nowait()
+            await asyncio.to_thread(self._quit, connection)
+
+    def _open(self) -> smtplib.SMTP:
+        connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        connection.ehlo()
+        if self.use_tls:
+            connection.starttls(context=ssl.create_default_context())
+            connection.ehlo()
+        if self.username:
+            connection.login(self.username, self.password)
+        self.connections_opened += 1
+        return connection
+
+    def _discard(self, connection: smtplib.SMTP) -> None:
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _quit(connection: smtplib.SMTP) -> None:
+        try:
+            connection.quit()
+        except Exception:
+            connection.close()
+
+
+class NotificationDeliveryWorker:
+    """
+    Drains the notification queue in claimed batches.
+
+    Several workers (threads, processes or hosts) can run side by side: each
+    claims a batch with SELECT ... FOR UPDATE SKIP LOCKED and leases it by
+    moving programmata_per forward, so rows are never delivered twice and a
+    crashed worker's batch becomes claimable again once the lease expires.
+    Held digest rows are coalesced before each claim. Deliveries run
+    concurrently with a bounded pool per channel; outcomes are
+    written back in one transaction per batch. Failed deliveries are retried
+    with exponential backoff using tentativi / max_tentativi / programmata_per.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        smtp_pool: Optional[SMTPConnectionPool] = None,
+        batch_size: Optional[int] = None,
+        channel_concurrency: Optional[Dict[NotificationChannelEnum, int]] = None,
+        lease_seconds: Optional[int] = None
+    ):
+        self.session_factory = session_factory
+        self.smtp_pool = smtp_pool
+        self.batch_size = batch_size or settings.NOTIFICATION_WORKER_BATCH_SIZE
+        self.lease_seconds = lease_seconds or settings.NOTIFICATION_CLAIM_LEASE_SECONDS
+
+        concurrency = {
+            NotificationChannelEnum.EMAIL: settings.NOTIFICATION_EMAIL_CONCURRENCY,
+            NotificationChannelEnum.SMS: settings.NOTIFICATION_SMS_CONCURRENCY,
+            NotificationChannelEnum.PUSH: settings.NOTIFICATION_PUSH_CONCURRENCY,
+        }
+        concurrency.update(channel_concurrency or {})
+        self._limits = {channel: asyncio.Semaphore(limit) for channel, limit in concurrency.items()}
+
+        self._senders = {
+            NotificationChannelEnum.EMAIL: self._send_email,
+            NotificationChannelEnum.SMS: self._send_sms,
+            NotificationChannelEnum.PUSH: self._send_push,
+        }
+
+    async def run(self, stop_event: asyncio.Event, poll_interval: Optional[float] = None) -> None:
+        """Process batches until stop_event is set, sleeping while the queue is empty"""
+        poll_interval = poll_interval or settings.NOTIFICATION_WORKER_POLL_INTERVAL
+        while not stop_event.is_set():
+            try:
+                processed = await self.process_batch()
+            except Exception:
+                logger.exception("Notification delivery batch failed")
+                processed = 0
+
+            if not processed:
+                try:
+                    await asyncio.wait_for(stop_event.wait(), timeout=poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def drain(self) -> Dict[str, int]:
+        """Process batches until nothing is claimable"""
+        totals = {"sent": 0, "retry": 0, "failed": 0}
+        while True:
+            batch_stats = await self.process_batch(return_stats=True)
+            if not batch_stats:
+                return totals
+            for key in totals:
+                totals[key] += batch_stats[key]
+
+    async def process_batch(self, return_stats: bool = False):
+        """
+        Claim one batch, deliver it and record the outcomes
+
+        Returns:
+            Number of rows processed (or per-outcome counters with return_stats)
+        """
+        await asyncio.to_thread(self._flush_digests)
+        items = await asyncio.to_thread(self._claim_batch)
+        if not items:
+            return {} if return_stats else 0
+
+        results = await asyncio.gather(*(self._deliver(item) for item in items))
+        stats = await asyncio.to_thread(self._record_outcomes, items, results)
+        return stats if return_stats else len(items)
+
+    def _flush_digests(self) -> None:
+        """Turn held rows whose digest window closed into deliverable rows"""
+        with self.session_factory() as db:
+            NotificationService(db).flush_digests()
+
+    def _claim_batch(self) -> List[Dict[str, Any]]:
+        """Claim and lease a batch of due rows (pending, or leased but expired)"""
+        now = datetime.utcnow()
+        with self.session_factory() as db:
+            rows = db.query(NotificationQueue).options(
+                joinedload(NotificationQueue.notification)
+            ).filter(
+                NotificationQueue.stato.in_(["pending", "sending"]),
+                NotificationQueue.programmata_per <= now,
+                NotificationQueue.tentativi < NotificationQueue.max_tentativi
+            ).order_by(
+                NotificationQueue.programmata_per
+            ).limit(self.batch_size).with_for_update(
+                skip_locked=True, of=NotificationQueue
+            ).all()
+
+            if not rows:
+                db.rollback()
+                return []
+
+            lease_until = now + timedelta(seconds=self.lease_seconds)
+            db.execute(
+                update(NotificationQueue).where(
+                    NotificationQueue.id.in_([row.id for row in rows])
+                ).values(
+                    stato="sending",
+                    programmata_per=lease_until
+                ).execution_options(synchronize_session=False)
+            )
+
+            items = [self._snapshot(row) for row in rows]
+            db.commit()
+            return items
+
+    async def _deliver(self, item: Dict[str, Any]) -> Optional[str]:
+        """Deliver one item within its channel's concurrency limit; returns the error, if any"""
+        sender = self._senders.get(item["canale"])
+        if sender is None:
+            return f"Unsupported channel {item['canale']}"
+
+        async with self._limits[item["canale"]]:
+            try:
+                await sender(item)
+                return None
+            except Exception as e:
+                logger.warning(f"Delivery of notification queue item {item['id']} failed: {e}")
+                return str(e) or e.__class__.__name__
+
+    def _record_outcomes(self, items: List[Dict[str, Any]], errors: List[Optional[str]]) -> Dict[str, int]:
+        """Write back sent / retry / failed outcomes in one transaction"""
+        now = datetime.utcnow()
+        stats = {"sent": 0, "retry": 0, "failed": 0}
+        rows = []
+
+        for item, error in zip(items, errors):
+            if error is None:
+                rows.append({"id": item["id"], "stato": "sent", "inviata_il": now, "ultimo_errore": None})
+                stats["sent"] += 1
+                continue
+
+            tentativi = item["tentativi"] + 1
+            row = {"id": item["id"], "tentativi": tentativi, "ultimo_errore": error[:2000]}
+            if tentativi >= item["max_tentativi"]:
+                row["stato"] = "failed"
+                stats["failed"] += 1
+            else:
+                # Retry with exponential backoff
+                row["stato"] = "pending"
+                row["programmata_per"] = now + timedelta(minutes=5 * (2 ** tentativi))
+                stats["retry"] += 1
+            rows.append(row)
+
+        with self.session_factory() as db:
+            # Rows need the same keys for one executemany per shape
+            for keys in {tuple(sorted(row)) for row in rows}:
+                db.execute(update(NotificationQueue), [row for row in rows if tuple(sorted(row)) == keys])
+            db.commit()
+        return stats
+
+    @staticmethod
+    def _snapshot(row: NotificationQueue) -> Dict[str, Any]:
+        """Detached copy of what delivery needs"""
+        notification = row.notification
+        return {
+            "id": row.id,
+            "canale": row.canale,
+            "destinatario": row.destinatario,
+            "tentativi": row.tentativi or 0,
+            "max_tentativi": row.max_tentativi or 3,
+            "titolo": row.titolo or (notification.titolo if notification else ""),
+            "messaggio": row.messaggio or (notification.messaggio if notification else ""),
+            "link": notification.link if notification else None
+        }
+
+    async def _send_email(self, item: Dict[str, Any]) -> None:
+        """Send email notification over the SMTP pool"""
+        if self.smtp_pool is None:
+            if not settings.SMTP_HOST:
+                raise RuntimeError("SMTP is not configured")
+            self.smtp_pool = SMTPConnectionPool.from_settings()
+        await self.smtp_pool.send_message(build_email_message(item))
+
+    async def _send_sms(self, item: Dict[str, Any]) -> None:
+        """Send SMS notification (placeholder for actual implementation)"""
+        # This would integrate with an SMS provider like Twilio
+        logger.info(f"SMS notification to {item['destinatario']}: {item['messaggio']}")
+
+    async def _send_push(self, item: Dict[str, Any]) -> None:
+        """Send push notification (placeholder for actual implementation)"""
+        # This would integrate with FCM or APNs
+        logger.info(f"Push notification to {item['destinatario']}: {item['titolo']}")
+
+
+def build_email_message(item: Dict[str, Any]) -> MIMEMultipart:
+    """Render the HTML email of a queued notification"""
+    msg = MIMEMultipart()
+    msg['From'] = settings.SMTP_FROM
+    msg['To'] = item["destinatario"]
+    msg['Subject'] = item["titolo"]
+
+    link = item.get("link")
+    html_body = f"""
+    <html>
+        <body>
+            <h2>{item["titolo"]}</h2>
+            <p>{item["messaggio"].replace(chr(10), "<br>")}</p>
+            {f'<p><a href="{settings.APP_URL}{link}">Visualizza dettagli</a></p>' if link else ''}
+            <hr>
+            <p style="font-size: 12px; color: #666;">
+                Questa email è stata inviata da Kronos EAM. 
+                Per modificare le preferenze di notifica, accedi al tuo profilo.
+            </p>
+        </body>
+    </html>
+    """
+
+    msg.attach(MIMEText(html_body, 'html'))
+    return msg
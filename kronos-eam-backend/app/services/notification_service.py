@@ -3,14 +3,12 @@ Comprehensive notification service for multi-channel delivery
 """
 
 from typing import Optional, List, Dict, Any
-from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy import and_, or_, update
 import asyncio
 import logging
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import smtplib
 import json
 
 from app.models.notification import (
@@ -28,6 +26,9 @@ from app.core.websocket import manager as ws_manager
 
 logger = logging.getLogger(__name__)
 
+# Digest windows of NotificationPreference.digest_frequency; anything else is immediate
+DIGEST_FREQUENCIES = ("hourly", "daily", "weekly")
+
 
 class NotificationService:
     """Service for managing notifications across multiple channels"""
@@ -100,7 +101,7 @@ class NotificationService:
         self.db.refresh(notification)
         
         # Queue for delivery
-        await self._queue_notification(notification, channels)
+        await self._queue_notification(notification, channels, preferences)
         
         # Send immediate web notification
         if NotificationChannelEnum.WEB in channels:
@@ -158,6 +159,98 @@ class NotificationService:
             **notification_params
         )
     
+    def create_notifications_bulk(
+        self,
+        items: List[Dict[str, Any]]
+    ) -> List[Notification]:
+        """
+        Create many notifications and their delivery queue rows in batches
+        
+        Users and preferences are loaded with one query each. Rows are added
+        to the caller's transaction; nothing is committed here, so the caller
+        can write notifications atomically with the change that caused them.
+        
+        Args:
+            items: Dicts with user_id, tenant_id, tipo, titolo, messaggio and
+                optional priorita, impianto_id, workflow_id, documento_id,
+                link, azione, metadata, force_channels
+                
+        Returns:
+            Created notifications (flushed, with IDs assigned)
+        """
+        if not items:
+            return []
+        
+        user_ids = {item["user_id"] for item in items}
+        users = {
+            user.id: user for user in
+            self.db.query(User).filter(User.id.in_(user_ids)).all()
+        }
+        preferences = {
+            pref.user_id: pref for pref in
+            self.db.query(NotificationPreference).filter(
+                NotificationPreference.user_id.in_(user_ids)
+            ).all()
+        }
+        
+        notifications = []
+        channels_by_notification = []
+        prefs_by_notification = []
+        for item in items:
+            priorita = item.get("priorita", NotificationPriorityEnum.MEDIA)
+            prefs = preferences.get(item["user_id"]) or self._default_preferences()
+            channels = item.get("force_channels") or self._get_enabled_channels(
+                prefs, item["tipo"], priorita
+            )
+            
+            notification = Notification(
+                user_id=item["user_id"],
+                tenant_id=item["tenant_id"],
+                tipo=item["tipo"],
+                titolo=item["titolo"],
+                messaggio=item["messaggio"],
+                priorita=priorita,
+                impianto_id=item.get("impianto_id"),
+                workflow_id=item.get("workflow_id"),
+                documento_id=item.get("documento_id"),
+                link=item.get("link"),
+                azione=item.get("azione"),
+                canali=channels,
+                model_metadata=item.get("metadata") or {},
+                inviata=True,
+                data_invio=datetime.utcnow()
+            )
+            notifications.append(notification)
+            channels_by_notification.append(channels)
+            prefs_by_notification.append(prefs)
+        
+        self.db.add_all(notifications)
+        self.db.flush()
+        
+        now = datetime.utcnow()
+        queue_items = []
+        for notification, channels, prefs in zip(notifications, channels_by_notification, prefs_by_notification):
+            user = users.get(notification.user_id)
+            if not user:
+                continue
+            digest_due_at = self._digest_due_at(prefs, notification.priorita, now)
+            for channel in channels:
+                destinatario = self._get_recipient_address(user, channel)
+                if destinatario:
+                    queue_items.append(self._queue_row(notification, channel, destinatario, digest_due_at))
+        
+        if queue_items:
+            self.db.add_all(queue_items)
+            self.db.flush()
+        
+        return notifications
+    
+    async def push_web_notifications(self, notifications: List[Notification]):
+        """Push already-persisted notifications to connected web clients"""
+        for notification in notifications:
+            if NotificationChannelEnum.WEB in (notification.canali or []):
+                await self._send_web_notification(notification)
+    
     def get_user_preferences(self, user_id: int) -> NotificationPreference:
         """Get or create user notification preferences"""
         preferences = self.db.query(NotificationPreference).filter(
@@ -244,102 +337,37 @@ class NotificationService:
         self.db.commit()
         return count
     
-    async def send_deadline_reminders(self, tenant_id: int):
-        """Send reminders for upcoming deadlines"""
-        # Find tasks with upcoming due dates
-        tomorrow = datetime.utcnow() + timedelta(days=1)
-        week_ahead = datetime.utcnow() + timedelta(days=7)
-        
-        # Tasks due tomorrow
-        urgent_tasks = self.db.query(WorkflowTask).join(
-            Workflow
-        ).filter(
-            Workflow.tenant_id == tenant_id,
-            WorkflowTask.dueDate >= datetime.utcnow(),
-            WorkflowTask.dueDate <= tomorrow,
-            WorkflowTask.status != "Completato"
-        ).all()
-        
-        for task in urgent_tasks:
-            if task.assignee:
-                user = self.db.query(User).filter(
-                    User.email == task.assignee,
-                    User.tenant_id == tenant_id
-                ).first()
-                
-                if user:
-                    await self.send_from_template(
-                        "task_deadline_urgent",
-                        user_id=user.id,
-                        tenant_id=tenant_id,
-                        variables={
-                            "task_title": task.title,
-                            "workflow_name": task.workflow.nome,
-                            "due_date": task.dueDate.strftime("%d/%m/%Y %H:%M"),
-                            "impianto_name": task.workflow.impianto.nome if task.workflow.impianto else ""
-                        },
-                        workflow_id=task.workflow_id,
-                        priorita=NotificationPriorityEnum.ALTA,
-                        link=f"/workflows/{task.workflow_id}/tasks/{task.id}"
-                    )
-        
-        # Tasks due within a week
-        upcoming_tasks = self.db.query(WorkflowTask).join(
-            Workflow
-        ).filter(
-            Workflow.tenant_id == tenant_id,
-            WorkflowTask.dueDate > tomorrow,
-            WorkflowTask.dueDate <= week_ahead,
-            WorkflowTask.status != "Completato"
-        ).all()
-        
-        for task in upcoming_tasks:
-            if task.assignee:
-                user = self.db.query(User).filter(
-                    User.email == task.assignee,
-                    User.tenant_id == tenant_id
-                ).first()
-                
-                if user:
-                    await self.send_from_template(
-                        "task_deadline_reminder",
-                        user_id=user.id,
-                        tenant_id=tenant_id,
-                        variables={
-                            "task_title": task.title,
-                            "workflow_name": task.workflow.nome,
-                            "due_date": task.dueDate.strftime("%d/%m/%Y"),
-                            "days_remaining": (task.dueDate - datetime.utcnow()).days
-                        },
-                        workflow_id=task.workflow_id,
-                        link=f"/workflows/{task.workflow_id}/tasks/{task.id}"
-                    )
+    async def send_deadline_reminders(self, tenant_id: Optional[str] = None) -> Dict[str, int]:
+        """
+        Send reminders for upcoming deadlines
+        
+        Delegates to DeadlineReminderScheduler, which sweeps all tenants (or
+        the given one) with set-based queries and records every reminder in
+        the reminder ledger so it is sent only once.
+        """
+        from app.services.reminder_service import DeadlineReminderScheduler
+        
+        return await DeadlineReminderScheduler(self.db).run_sweep(tenant_id=tenant_id)
     
-    async def process_notification_queue(self):
-        """Process queued notifications for delivery"""
-        pending_notifications = self.db.query(NotificationQueue).filter(
-            NotificationQueue.stato == "pending",
-            NotificationQueue.programmata_per <= datetime.utcnow(),
-            NotificationQueue.tentativi < NotificationQueue.max_tentativi
-        ).all()
-        
-        for queue_item in pending_notifications:
-            try:
-                await self._deliver_notification(queue_item)
-            except Exception as e:
-                logger.error(f"Failed to deliver notification {queue_item.id}: {e}")
-                queue_item.tentativi += 1
-                queue_item.ultimo_errore = str(e)
-                
-                if queue_item.tentativi >= queue_item.max_tentativi:
-                    queue_item.stato = "failed"
-                else:
-                    # Retry with exponential backoff
-                    queue_item.programmata_per = datetime.utcnow() + timedelta(
-                        minutes=5 * (2 ** queue_item.tentativi)
-                    )
+    async def process_notification_queue(self) -> Dict[str, int]:
+        """
+        Process queued notifications for delivery
+        
+        Drains the queue with a NotificationDeliveryWorker bound to the same
+        database; long-running deployments run scripts/notification_worker.py
+        instead.
+        """
+        from app.services.notification_delivery import NotificationDeliveryWorker
         
         self.db.commit()
+        worker = NotificationDeliveryWorker(
+            sessionmaker(bind=self.db.get_bind(), autoflush=False, expire_on_commit=False)
+        )
+        try:
+            return await worker.drain()
+        finally:
+            if worker.smtp_pool is not None:
+                await worker.smtp_pool.close()
     
     def _get_enabled_channels(
         self,
@@ -381,44 +409,214 @@ class NotificationService:
         
         return channels
     
+    def _default_preferences(self) -> NotificationPreference:
+        """Transient preferences matching the column defaults of a new user"""
+        return NotificationPreference(
+            email_enabled=True,
+            sms_enabled=False,
+            push_enabled=True,
+            scadenze_enabled=True,
+            task_enabled=True,
+            sistema_enabled=True,
+            workflow_enabled=True,
+            min_priority=NotificationPriorityEnum.BASSA
+        )
+    
+    def _get_recipient_address(
+        self,
+        user: User,
+        channel: NotificationChannelEnum
+    ) -> Optional[str]:
+        """Resolve the delivery address of a user for a queued channel"""
+        if channel == NotificationChannelEnum.WEB:
+            return None  # Handled separately
+        if channel == NotificationChannelEnum.EMAIL:
+            return user.email
+        if channel == NotificationChannelEnum.SMS and hasattr(user, 'telefono'):
+            return user.telefono
+        if channel == NotificationChannelEnum.PUSH and hasattr(user, 'push_token'):
+            return user.push_token
+        return None
+    
     async def _queue_notification(
         self,
         notification: Notification,
-        channels: List[NotificationChannelEnum]
+        channels: List[NotificationChannelEnum],
+        preferences: Optional[NotificationPreference] = None
     ):
         """Queue notification for delivery across channels"""
         user = self.db.query(User).filter(User.id == notification.user_id).first()
+        digest_due_at = self._digest_due_at(
+            preferences or self._default_preferences(), notification.priorita, datetime.utcnow()
+        )
         
         for channel in channels:
-            if channel == NotificationChannelEnum.WEB:
-                continue  # Handled separately
-            
-            destinatario = None
-            if channel == NotificationChannelEnum.EMAIL:
-                destinatario = user.email
-            elif channel == NotificationChannelEnum.SMS and hasattr(user, 'telefono'):
-                destinatario = user.telefono
-            elif channel == NotificationChannelEnum.PUSH and hasattr(user, 'push_token'):
-                destinatario = user.push_token
+            destinatario = self._get_recipient_address(user, channel)
             
             if destinatario:
-                queue_item = NotificationQueue(
-                    notification_id=notification.id,
-                    canale=channel,
-                    destinatario=destinatario,
-                    tenant_id=notification.tenant_id
-                )
-                self.db.add(queue_item)
+                self.db.add(self._queue_row(notification, channel, destinatario, digest_due_at))
         
         notification.inviata = True
         notification.data_invio = datetime.utcnow()
         self.db.commit()
     
+    def _queue_row(
+        self,
+        notification: Notification,
+        channel: NotificationChannelEnum,
+        destinatario: str,
+        digest_due_at: Optional[datetime]
+    ) -> NotificationQueue:
+        """Queue row for one channel, held for the user's digest when one is due"""
+        queue_item = NotificationQueue(
+            notification_id=notification.id,
+            canale=channel,
+            destinatario=destinatario,
+            tenant_id=notification.tenant_id
+        )
+        if digest_due_at:
+            queue_item.stato = "digest"
+            queue_item.programmata_per = digest_due_at
+        return queue_item
+    
+    def _digest_due_at(
+        self,
+        preferences: NotificationPreference,
+        priorita: NotificationPriorityEnum,
+        now: datetime
+    ) -> Optional[datetime]:
+        """
+        End of the digest window a new notification falls into
+        
+        Returns:
+            UTC time at which held rows are flushed, or None to deliver
+            immediately (digest disabled, "immediate" or high priority)
+        """
+        frequency = preferences.digest_frequency or "daily"
+        if not preferences.digest_enabled or frequency not in DIGEST_FREQUENCIES:
+            return None
+        if priorita == NotificationPriorityEnum.ALTA:
+            return None
+        
+        if frequency == "hourly":
+            return now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        
+        # Daily and weekly digests go out at the user's local digest time
+        try:
+            tz = ZoneInfo(preferences.timezone or "Europe/Rome")
+        except (ZoneInfoNotFoundError, ValueError):
+            tz = timezone.utc
+        try:
+            hour, minute = (int(part) for part in (preferences.digest_time or "").split(":"))
+        except ValueError:
+            hour, minute = (int(part) for part in settings.NOTIFICATION_DIGEST_DAILY_TIME.split(":"))
+        
+        local_now = now.replace(tzinfo=timezone.utc).astimezone(tz)
+        due = local_now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if due <= local_now:
+            due += timedelta(days=1)
+        if frequency == "weekly":
+            due += timedelta(days=(7 - due.weekday()) % 7)  # Monday
+        return due.astimezone(timezone.utc).replace(tzinfo=None)
+    
+    def flush_digests(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Coalesce held queue rows whose digest window has closed
+        
+        Rows are grouped per user, channel and address: a group with a single
+        row is released as is, larger groups become one digest row with a
+        rendered summary and their members are marked "digested". The
+        delivery worker then sends the digest like any other queue row.
+        
+        Args:
+            now: Reference time (defaults to the current UTC time)
+            
+        Returns:
+            Counters: held rows flushed, digests created, rows released as is
+        """
+        now = now or datetime.utcnow()
+        held = self.db.query(NotificationQueue, Notification).join(
+            Notification, NotificationQueue.notification_id == Notification.id
+        ).filter(
+            NotificationQueue.stato == "digest",
+            NotificationQueue.programmata_per <= now
+        ).order_by(
+            NotificationQueue.id
+        ).with_for_update(skip_locked=True, of=NotificationQueue).all()
+        
+        stats = {"flushed": len(held), "digests": 0, "released": 0}
+        if not held:
+            self.db.rollback()
+            return stats
+        
+        groups: Dict[tuple, List[Any]] = {}
+        for queue_item, notification in held:
+            key = (queue_item.tenant_id, notification.user_id, queue_item.canale, queue_item.destinatario)
+            groups.setdefault(key, []).append((queue_item, notification))
+        
+        deliver_at = datetime.utcnow()
+        released = []
+        digests = []
+        for (tenant_id, _, canale, destinatario), members in groups.items():
+            if len(members) == 1:
+                released.append({"id": members[0][0].id, "stato": "pending", "programmata_per": deliver_at})
+                continue
+            titolo, messaggio = self._render_digest([notification for _, notification in members])
+            digests.append((NotificationQueue(
+                tenant_id=tenant_id,
+                canale=canale,
+                destinatario=destinatario,
+                titolo=titolo,
+                messaggio=messaggio,
+                stato="pending",
+                programmata_per=deliver_at
+            ), members))
+        
+        if digests:
+            self.db.add_all([digest for digest, _ in digests])
+            self.db.flush()
+        
+        coalesced = [
+            {"id": queue_item.id, "stato": "digested", "digest_id": digest.id}
+            for digest, members in digests
+            for queue_item, _ in members
+        ]
+        for rows in (released, coalesced):
+            if rows:
+                self.db.execute(update(NotificationQueue), rows)
+        self.db.commit()
+        
+        stats["digests"] = len(digests)
+        stats["released"] = len(released)
+        return stats
+    
+    def _render_digest(self, notifications: List[Notification]) -> tuple:
+        """Title and message of a digest; identical titles are collapsed into one line"""
+        by_title: Dict[str, List[Notification]] = {}
+        for notification in notifications:
+            by_title.setdefault(notification.titolo, []).append(notification)
+        
+        max_items = settings.NOTIFICATION_DIGEST_MAX_ITEMS
+        lines = []
+        for titolo, same_title in list(by_title.items())[:max_items]:
+            if len(same_title) == 1:
+                lines.append(f"- {titolo}: {same_title[0].messaggio}")
+            else:
+                lines.append(f"- {titolo} ({len(same_title)})")
+        
+        remaining = sum(len(same_title) for same_title in list(by_title.values())[max_items:])
+        if remaining:
+            lines.append(f"... e altre {remaining} notifiche")
+        
+        return f"Kronos EAM: {len(notifications)} nuove notifiche", "\n".join(lines)
+    
     async def _send_web_notification(self, notification: Notification):
         """Send real-time web notification via WebSocket"""
         try:
-            await ws_manager.send_personal_message(
-                message={
+            await ws_manager.send_to_user(
+                notification.tenant_id,
+                notification.user_id,
+                {
                     "type": "notification",
                     "data": {
                         "id": notification.id,
@@ -429,77 +627,11 @@ class NotificationService:
                         "link": notification.link,
                         "created_at": notification.created_at.isoformat()
                     }
-                },
-                user_id=str(notification.user_id)
+                }
             )
         except Exception as e:
             logger.error(f"Failed to send web notification: {e}")
     
-    async def _deliver_notification(self, queue_item: NotificationQueue):
-        """Deliver a queued notification"""
-        queue_item.stato = "sending"
-        self.db.commit()
-        
-        try:
-            if queue_item.canale == NotificationChannelEnum.EMAIL:
-                await self._send_email_notification(queue_item)
-            elif queue_item.canale == NotificationChannelEnum.SMS:
-                await self._send_sms_notification(queue_item)
-            elif queue_item.canale == NotificationChannelEnum.PUSH:
-                await self._send_push_notification(queue_item)
-            
-            queue_item.stato = "sent"
-            queue_item.inviata_il = datetime.utcnow()
-            
-        except Exception as e:
-            raise e
-        finally:
-            self.db.commit()
-    
-    async def _send_email_notification(self, queue_item: NotificationQueue):
-        """Send email notification"""
-        notification = queue_item.notification
-        
-        # Create message
-        msg = MIMEMultipart()
-        msg['From'] = settings.SMTP_FROM
-        msg['To'] = queue_item.destinatario
-        msg['Subject'] = notification.titolo
-        
-        # Create HTML body
-        html_body = f"""
-        <html>
-            <body>
-                <h2>{notification.titolo}</h2>
-                <p>{notification.messaggio}</p>
-                {f'<p><a href="{settings.APP_URL}{notification.link}">Visualizza dettagli</a></p>' if notification.link else ''}
-                <hr>
-                <p style="font-size: 12px; color: #666;">
-                    Questa email è stata inviata da Kronos EAM. 
-                    Per modificare le preferenze di notifica, accedi al tuo profilo.
-                </p>
-            </body>
-        </html>
-        """
-        
-        msg.attach(MIMEText(html_body, 'html'))
-        
-        # Send email
-        with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT) as server:
-            server.starttls()
-            server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
-            server.send_message(msg)
-    
-    async def _send_sms_notification(self, queue_item: NotificationQueue):
-        """Send SMS notification (placeholder for actual implementation)"""
-        # This would integrate with an SMS provider like Twilio
-        logger.info(f"SMS notification to {queue_item.destinatario}: {queue_item.notification.messaggio}")
-    
-    async def _send_push_notification(self, queue_item: NotificationQueue):
-        """Send push notification (placeholder for actual implementation)"""
-        # This would integrate with FCM or APNs
-        logger.info(f"Push notification to {queue_item.destinatario}: {queue_item.notification.titolo}")
-    
     def _process_template(self, template: str, variables: Dict[str, Any]) -> str:
         """Process template with variables"""
         result = template
@@ -552,6 +684,7 @@ class NotificationService:
             queue_query = queue_query.filter(Notification.user_id == user_id)
         
         delivery_stats = {
+            "held": queue_query.filter(NotificationQueue.stato == "digest").count(),
             "pending": queue_query.filter(NotificationQueue.stato == "pending").count(),
             "sent": queue_query.filter(NotificationQueue.stato == "sent").count(),
             "failed": queue_query.filter(NotificationQueue.stato == "failed").count()
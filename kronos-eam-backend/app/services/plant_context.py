@@ -0,0 +1,389 @@
+"""
+Per-turn data access for agent tools and the plant context snapshot
+"""
+
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+import functools
+import logging
+import threading
+
+from sqlalchemy.orm import Session, joinedload
+
+from app.core.config import settings
+from app.core.database import get_db_context
+from app.models.document import Document, DocumentStatusEnum
+from app.models.plant import Plant, Maintenance, MaintenanceStatusEnum
+from app.models.workflow import Workflow, WorkflowTask, TaskStatusEnum
+
+logger = logging.getLogger(__name__)
+
+OPEN_MAINTENANCE_STATUSES = (MaintenanceStatusEnum.PLANNED, MaintenanceStatusEnum.IN_PROGRESS)
+OPEN_TASK_STATUSES = (
+    TaskStatusEnum.TO_START, TaskStatusEnum.IN_PROGRESS, TaskStatusEnum.DELAYED, TaskStatusEnum.BLOCKED
+)
+# Documents that are still in force or on their way to be
+KEY_DOCUMENT_STATUSES = (DocumentStatusEnum.VALIDO, DocumentStatusEnum.DA_APPROVARE)
+
+# Expiry dates of the compliance checklist, with the label used in deadlines
+CHECKLIST_DEADLINES = {
+    "dso_connection_expiry": "DSO connection",
+    "customs_license_expiry": "Customs license",
+    "spi_verification_next": "SPI verification",
+    "consumption_declaration_expiry": "Consumption declaration",
+    "antimafia_expiry": "Antimafia certification",
+    "fuel_mix_expiry": "Fuel mix",
+    "aia_expiry": "AIA authorization",
+}
+# Checklist items every plant in operation is expected to have
+CHECKLIST_REQUIREMENTS = {
+    "dso_connection": "Missing grid connection agreement",
+    "gse_activation": "Missing GSE activation",
+    "terna_registration": "Missing Terna registration",
+}
+
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def _value(enum_value: Any) -> Any:
+    return getattr(enum_value, "value", enum_value)
+
+
+@dataclass
+class PlantSnapshot:
+    """
+    What the agent tools know about a plant during one turn
+
+    Plain data detached from the session, so it can be shared by tools
+    running in different threads.
+    """
+    plant: Dict[str, Any]
+    registry: Optional[Dict[str, Any]]
+    checklist: Optional[Dict[str, Any]]
+    maintenances: List[Dict[str, Any]]
+    open_tasks: List[Dict[str, Any]]
+    documents: List[Dict[str, Any]]
+    deadlines: List[Dict[str, Any]]
+    loaded_at: datetime = field(default_factory=datetime.utcnow)
+
+
+def load_plant_snapshot(db: Session, plant_id: int, tenant_id: str, max_items: Optional[int] = None) -> Optional[PlantSnapshot]:
+    """
+    Load a plant and its open work with four queries
+
+    Args:
+        db: Session of the tenant
+        plant_id: Plant ID
+        tenant_id: Tenant ID
+        max_items: Cap on maintenances, tasks and documents loaded
+
+    Returns:
+        The snapshot, or None if the plant does not exist for the tenant
+    """
+    limit = max_items or settings.AGENT_SNAPSHOT_MAX_ITEMS
+
+    plant = db.query(Plant).options(
+        joinedload(Plant.registry), joinedload(Plant.checklist)
+    ).filter(
+        Plant.id == plant_id,
+        Plant.tenant_id == tenant_id
+    ).first()
+    if not plant:
+        return None
+
+    maintenances = db.query(Maintenance).filter(
+        Maintenance.plant_id == plant_id,
+        Maintenance.status.in_(OPEN_MAINTENANCE_STATUSES)
+    ).order_by(Maintenance.planned_date).limit(limit).all()
+
+    tasks = db.query(WorkflowTask, Workflow.name).join(
+        Workflow, WorkflowTask.workflow_id == Workflow.id
+    ).filter(
+        Workflow.plant_id == plant_id,
+        Workflow.tenant_id == tenant_id,
+        WorkflowTask.status.in_(OPEN_TASK_STATUSES)
+    ).order_by(WorkflowTask.due_date.is_(None), WorkflowTask.due_date).limit(limit).all()
+
+    documents = db.query(Document).filter(
+        Document.impianto_id == plant_id,
+        Document.tenant_id == tenant_id,
+        Document.stato.in_(KEY_DOCUMENT_STATUSES)
+    ).order_by(Document.data_scadenza.is_(None), Document.data_scadenza).limit(limit).all()
+
+    registry = plant.registry
+    checklist = plant.checklist
+    snapshot = PlantSnapshot(
+        plant={
+            "id": plant.id,
+            "name": plant.name,
+            "code": plant.code,
+            "type": _value(plant.type),
+            "power_kw": plant.power_kw,
+            "status": _value(plant.status),
+            "municipality": plant.municipality,
+            "province": plant.province,
+            "next_deadline": _iso(plant.next_deadline),
+            "next_deadline_type": plant.next_deadline_type,
+        },
+        registry={
+            "censimp_code": registry.censimp,
+            "pod": registry.pod,
+            "gaudi": registry.gaudi,
+            "connection_voltage": registry.connection_voltage,
+            "grid_operator": registry.grid_operator,
+            "regime": registry.regime,
+            "operation_date": _iso(registry.operation_date),
+        } if registry else None,
+        checklist={
+            "compliance_score": checklist.compliance_score,
+            "last_update": _iso(checklist.last_update),
+            **{name: bool(getattr(checklist, name)) for name in CHECKLIST_REQUIREMENTS},
+            **{name: _iso(getattr(checklist, name)) for name in CHECKLIST_DEADLINES},
+        } if checklist else None,
+        maintenances=[
+            {
+                "id": m.id,
+                "type": _value(m.type),
+                "description": m.description,
+                "planned_date": _iso(m.planned_date),
+                "status": _value(m.status),
+            }
+            for m in maintenances
+        ],
+        open_tasks=[
+            {
+                "id": task.id,
+                "title": task.title,
+                "workflow": workflow_name,
+                "status": _value(task.status),
+                "priority": _value(task.priority),
+                "assignee": task.assignee,
+                "due_date": _iso(task.due_date),
+            }
+            for task, workflow_name in tasks
+        ],
+        documents=[
+            {
+                "id": doc.id,
+                "nome": doc.nome,
+                "tipo": _value(doc.tipo),
+                "categoria": _value(doc.categoria),
+                "stato": _value(doc.stato),
+                "data_scadenza": _iso(doc.data_scadenza),
+            }
+            for doc in documents
+        ],
+        deadlines=[]
+    )
+    snapshot.deadlines = _deadlines(snapshot, limit)
+    return snapshot
+
+
+def _deadlines(snapshot: PlantSnapshot, limit: int) -> List[Dict[str, Any]]:
+    """Every dated item of the snapshot, soonest first"""
+    deadlines = []
+    if snapshot.plant["next_deadline"]:
+        deadlines.append({
+            "date": snapshot.plant["next_deadline"],
+            "type": "plant",
+            "description": snapshot.plant["next_deadline_type"],
+        })
+    for name, label in CHECKLIST_DEADLINES.items():
+        if snapshot.checklist and snapshot.checklist[name]:
+            deadlines.append({"date": snapshot.checklist[name], "type": "compliance", "description": label})
+    for m in snapshot.maintenances:
+        deadlines.append({"date": m["planned_date"], "type": "maintenance", "description": m["description"], "id": m["id"]})
+    for task in snapshot.open_tasks:
+        if task["due_date"]:
+            deadlines.append({"date": task["due_date"], "type": "task", "description": task["title"], "id": task["id"]})
+    for doc in snapshot.documents:
+        if doc["data_scadenza"]:
+            deadlines.append({"date": doc["data_scadenza"], "type": "document", "description": doc["nome"], "id": doc["id"]})
+    deadlines.sort(key=lambda d: d["date"])
+    return deadlines[:limit]
+
+
+class ToolTurnScope:
+    """
+    Database access shared by the tools of one agent turn
+
+    Plant snapshots are loaded once per turn, through a session taken from
+    the pool when the first snapshot is needed and returned when the turn
+    ends. Tools run concurrently in threads, so that session is used by one
+    snapshot load at a time; the other queries of the tools use sessions of
+    their own and run in parallel.
+    """
+
+    def __init__(self, tenant_id: str, session_context: Optional[Callable[[], ContextManager[Session]]] = None):
+        self.tenant_id = str(tenant_id)
+        self.lock = threading.RLock()
+        self.snapshots: Dict[int, Optional[PlantSnapshot]] = {}
+        self.sessions_opened = 0
+        self.session_context = session_context or functools.partial(get_db_context, tenant_id)
+        self._context: Optional[ContextManager[Session]] = None
+        self._db: Optional[Session] = None
+
+    def session(self) -> Session:
+        with self.lock:
+            if self._db is None:
+                self._context = self.session_context()
+                self._db = self._context.__enter__()
+                self.sessions_opened += 1
+            return self._db
+
+    def invalidate(self, plant_id: int) -> None:
+        """Forget a plant's snapshot after a tool changed its data"""
+        with self.lock:
+            self.snapshots.pop(plant_id, None)
+
+    def close(self, failed: bool = False) -> None:
+        with self.lock:
+            if self._context is not None:
+                context, self._context, self._db = self._context, None, None
+                if failed:
+                    context.__exit__(RuntimeError, RuntimeError("agent turn failed"), None)
+                else:
+                    context.__exit__(None, None, None)
+            self.snapshots.clear()
+
+
+_turn_scope: ContextVar[Optional[ToolTurnScope]] = ContextVar("agent_tool_turn", default=None)
+
+
+@contextmanager
+def agent_turn(
+    tenant_id: str,
+    session_context: Optional[Callable[[], ContextManager[Session]]] = None
+) -> Iterator[ToolTurnScope]:
+    """
+    Scope the snapshot loads of the tools called while the block runs to one session
+
+    Args:
+        tenant_id: Tenant of the agent
+        session_context: Factory of the session context manager
+            (get_db_context of the tenant by default)
+    """
+    scope = ToolTurnScope(tenant_id, session_context)
+    token = _turn_scope.set(scope)
+    failed = False
+    try:
+        yield scope
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        try:
+            _turn_scope.reset(token)
+        except ValueError:
+            # Closed from another context (an abandoned stream)
+            _turn_scope.set(None)
+        scope.close(failed)
+
+
+def current_turn(tenant_id: str) -> Optional[ToolTurnScope]:
+    scope = _turn_scope.get()
+    if scope is not None and scope.tenant_id == str(tenant_id):
+        return scope
+    return None
+
+
+@contextmanager
+def tool_session(tenant_id: str) -> Iterator[Session]:
+    """
+    Session of a tool call, from the turn's session factory when there is one
+
+    Each call gets its own pooled session for the length of the block, so
+    concurrent tools do not wait for each other; only snapshot loads go
+    through the turn's shared session.
+    """
+    scope = current_turn(tenant_id)
+    session_context = scope.session_context if scope is not None else functools.partial(get_db_context, tenant_id)
+    with session_context() as db:
+        yield db
+
+
+def get_plant_snapshot(plant_id: int, tenant_id: str) -> Optional[PlantSnapshot]:
+    """
+    Snapshot of a plant, loaded at most once per turn
+
+    Returns:
+        The snapshot, or None if the plant does not exist for the tenant
+    """
+    scope = current_turn(tenant_id)
+    if scope is None:
+        with get_db_context(tenant_id) as db:
+            return load_plant_snapshot(db, plant_id, tenant_id)
+
+    with scope.lock:
+        if plant_id not in scope.snapshots:
+            db = scope.session()
+            try:
+                scope.snapshots[plant_id] = load_plant_snapshot(db, plant_id, tenant_id)
+            except Exception:
+                # Leave the shared session usable for the next load
+                db.rollback()
+                raise
+        return scope.snapshots[plant_id]
+
+
+def invalidate_plant_snapshot(plant_id: int, tenant_id: str) -> None:
+    """Reload the plant on its next use in this turn (after a tool changed it)"""
+    scope = current_turn(tenant_id)
+    if scope is not None:
+        scope.invalidate(plant_id)
+
+
+def plant_info(snapshot: PlantSnapshot, deadlines: int = 5) -> Dict[str, Any]:
+    """Plant description with its registry and next deadlines"""
+    registry = snapshot.registry or {}
+    return {
+        "id": snapshot.plant["id"],
+        "name": snapshot.plant["name"],
+        "type": snapshot.plant["type"],
+        "installed_power": snapshot.plant["power_kw"],
+        "status": snapshot.plant["status"],
+        "municipality": snapshot.plant["municipality"],
+        "province": snapshot.plant["province"],
+        "activation_date": registry.get("operation_date"),
+        "registry": {
+            "censimp_code": registry.get("censimp_code"),
+            "pod": registry.get("pod"),
+            "connection_voltage": registry.get("connection_voltage")
+        },
+        "open_tasks": len(snapshot.open_tasks),
+        "next_deadlines": snapshot.deadlines[:deadlines]
+    }
+
+
+def maintenance_schedule(snapshot: PlantSnapshot, days_ahead: int = 30) -> List[Dict[str, Any]]:
+    """Open maintenances planned within days_ahead (overdue ones included)"""
+    end_date = (datetime.utcnow() + timedelta(days=days_ahead)).isoformat()
+    return [m for m in snapshot.maintenances if m["planned_date"] <= end_date]
+
+
+def compliance_status(snapshot: PlantSnapshot, expiring_days: int = 30) -> Dict[str, Any]:
+    """Checklist score and open compliance issues"""
+    if not snapshot.checklist:
+        return {"compliant": False, "score": 0, "issues": ["No compliance checklist found"]}
+
+    horizon = (datetime.utcnow() + timedelta(days=expiring_days)).isoformat()
+    issues = [message for name, message in CHECKLIST_REQUIREMENTS.items() if not snapshot.checklist[name]]
+    expiring_docs = [
+        doc for doc in snapshot.documents
+        if doc["stato"] == DocumentStatusEnum.VALIDO.value and doc["data_scadenza"] and doc["data_scadenza"] <= horizon
+    ]
+    if expiring_docs:
+        issues.append(f"{len(expiring_docs)} documents expiring soon")
+
+    return {
+        "compliant": not issues,
+        "score": snapshot.checklist["compliance_score"],
+        "last_check": snapshot.checklist["last_update"],
+        "issues": issues,
+        "upcoming_deadlines": [d for d in snapshot.deadlines if d["type"] in ("compliance", "document")][:5]
+    }
@@ -0,0 +1,234 @@
+"""
+Set-based deadline reminder scheduler
+"""
+
+from typing import Optional, List, Dict, Any, Tuple
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, case, exists, update
+import logging
+
+from app.models.notification import (
+    NotificationTemplate, NotificationPriorityEnum, ReminderLedger
+)
+from app.models.user import User
+from app.models.workflow import Workflow, WorkflowTask, TaskStatusEnum
+from app.services.notification_service import NotificationService
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+# threshold -> (template code, priority override, due date format)
+REMINDER_THRESHOLDS = {
+    "urgent": ("task_deadline_urgent", NotificationPriorityEnum.ALTA, "%d/%m/%Y %H:%M"),
+    "upcoming": ("task_deadline_reminder", None, "%d/%m/%Y"),
+}
+
+
+class DeadlineReminderScheduler:
+    """
+    Sends deadline reminders for all tenants in one sweep.
+
+    Each batch is one query joining due tasks to their assignees, a single
+    INSERT ... ON CONFLICT DO NOTHING claiming (task, threshold) rows in the
+    reminder ledger, and bulk creation of the notifications for the rows that
+    were actually claimed. Overlapping or repeated runs never send the same
+    reminder twice.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.notification_service = NotificationService(db)
+
+    async def run_sweep(
+        self,
+        tenant_id: Optional[str] = None,
+        now: Optional[datetime] = None
+    ) -> Dict[str, int]:
+        """
+        Send every reminder that is due and not sent yet
+
+        Args:
+            tenant_id: Limit the sweep to one tenant (all tenants when None)
+            now: Reference time (defaults to the current UTC time)
+
+        Returns:
+            Counters: candidates, sent, skipped (already claimed elsewhere)
+        """
+        now = now or datetime.utcnow()
+        templates = self._load_templates()
+        if not templates:
+            logger.warning("No deadline reminder templates are active, skipping sweep")
+            return {"candidates": 0, "sent": 0, "skipped": 0}
+
+        stats = {"candidates": 0, "sent": 0, "skipped": 0}
+        last_id = 0
+        while True:
+            rows = self._select_candidates(now, tenant_id, last_id)
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            # Thresholds without an active template are skipped
+            candidates = [row for row in rows if row.threshold in templates]
+            stats["candidates"] += len(candidates)
+
+            notifications = self._send_batch(candidates, templates)
+            stats["sent"] += len(notifications)
+            stats["skipped"] += len(candidates) - len(notifications)
+
+            await self.notification_service.push_web_notifications(notifications)
+
+            if len(rows) < settings.REMINDER_BATCH_SIZE:
+                break
+
+        logger.info(
+            f"Deadline reminder sweep: {stats['sent']} sent, "
+            f"{stats['skipped']} already sent, {stats['candidates']} candidates"
+        )
+        return stats
+
+    def _select_candidates(
+        self,
+        now: datetime,
+        tenant_id: Optional[str],
+        last_id: int
+    ) -> List[Any]:
+        """Due tasks with their assignee and pending threshold, keyset-paged by task ID"""
+        urgent_until = now + timedelta(hours=settings.REMINDER_URGENT_HOURS)
+        upcoming_until = now + timedelta(days=settings.REMINDER_UPCOMING_DAYS)
+
+        threshold = case(
+            (WorkflowTask.due_date <= urgent_until, "urgent"),
+            else_="upcoming"
+        ).label("threshold")
+
+        already_sent = exists().where(and_(
+            ReminderLedger.task_id == WorkflowTask.id,
+            ReminderLedger.threshold == threshold.element
+        ))
+
+        query = self.db.query(
+            WorkflowTask.id,
+            WorkflowTask.tenant_id,
+            WorkflowTask.title,
+            WorkflowTask.due_date,
+            WorkflowTask.workflow_id,
+            Workflow.name.label("workflow_name"),
+            Workflow.plant_name,
+            User.id.label("user_id"),
+            threshold
+        ).join(
+            Workflow, Workflow.id == WorkflowTask.workflow_id
+        ).join(
+            User, and_(
+                User.email == WorkflowTask.assignee,
+                User.tenant_id == WorkflowTask.tenant_id
+            )
+        ).filter(
+            WorkflowTask.id > last_id,
+            WorkflowTask.due_date >= now,
+            WorkflowTask.due_date <= upcoming_until,
+            WorkflowTask.status != TaskStatusEnum.COMPLETED,
+            ~already_sent
+        )
+
+        if tenant_id:
+            query = query.filter(WorkflowTask.tenant_id == tenant_id)
+
+        return query.order_by(WorkflowTask.id).limit(settings.REMINDER_BATCH_SIZE).all()
+
+    def _send_batch(self, candidates: List[Any], templates: Dict[str, NotificationTemplate]) -> List[Any]:
+        """Claim ledger rows and create notifications for one batch"""
+        try:
+            claimed = self._claim(candidates)
+            to_send = [row for row in candidates if (row.id, row.threshold) in claimed]
+
+            items = [self._render(row, templates[row.threshold]) for row in to_send]
+            notifications = self.notification_service.create_notifications_bulk(items)
+
+            if notifications:
+                self.db.execute(update(ReminderLedger), [
+                    {"id": claimed[(row.id, row.threshold)], "notification_id": notification.id}
+                    for row, notification in zip(to_send, notifications)
+                ])
+
+            self.db.commit()
+            return notifications
+        except Exception:
+            self.db.rollback()
+            logger.exception("Deadline reminder batch failed, transaction rolled back")
+            raise
+
+    def _claim(self, candidates: List[Any]) -> Dict[Tuple[int, str], int]:
+        """
+        Insert ledger rows, ignoring those another run already inserted
+
+        Returns:
+            Ledger IDs of the rows inserted by this call, by (task_id, threshold)
+        """
+        if not candidates:
+            return {}
+
+        dialect = self.db.get_bind().dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            raise RuntimeError(f"Reminder ledger claiming is not supported on {dialect}")
+
+        now = datetime.utcnow()
+        stmt = dialect_insert(ReminderLedger).on_conflict_do_nothing(
+            index_elements=["task_id", "threshold"]
+        ).returning(ReminderLedger.id, ReminderLedger.task_id, ReminderLedger.threshold)
+
+        result = self.db.execute(stmt, [
+            {
+                "tenant_id": row.tenant_id,
+                "task_id": row.id,
+                "threshold": row.threshold,
+                "due_date": row.due_date,
+                "sent_at": now
+            }
+            for row in candidates
+        ])
+        return {(task_id, threshold): ledger_id for ledger_id, task_id, threshold in result.all()}
+
+    def _render(self, row: Any, template: NotificationTemplate) -> Dict[str, Any]:
+        """Notification item for create_notifications_bulk"""
+        template_code, priority, date_format = REMINDER_THRESHOLDS[row.threshold]
+        variables = {
+            "task_title": row.title,
+            "workflow_name": row.workflow_name,
+            "due_date": row.due_date.strftime(date_format),
+            "impianto_name": row.plant_name or "",
+            "days_remaining": (row.due_date - datetime.utcnow()).days
+        }
+        return {
+            "user_id": row.user_id,
+            "tenant_id": row.tenant_id,
+            "tipo": template.tipo,
+            "titolo": self.notification_service._process_template(template.titolo_template, variables),
+            "messaggio": self.notification_service._process_template(template.messaggio_template, variables),
+            "priorita": priority or template.priorita_default,
+            "workflow_id": row.workflow_id,
+            "link": f"/workflows/{row.workflow_id}/tasks/{row.id}",
+            "force_channels": template.canali_default,
+            "metadata": {"task_id": row.id, "reminder": row.threshold}
+        }
+
+    def _load_templates(self) -> Dict[str, NotificationTemplate]:
+        """Active reminder templates by threshold, loaded with one query"""
+        codes = {code: threshold for threshold, (code, _, _) in REMINDER_THRESHOLDS.items()}
+        templates = self.db.query(NotificationTemplate).filter(
+            NotificationTemplate.codice.in_(codes),
+            NotificationTemplate.attivo == True
+        ).all()
+
+        by_threshold = {codes[template.codice]: template for template in templates}
+        for code, threshold in codes.items():
+            if threshold not in by_threshold:
+                logger.warning(f"Notification template {code} not found")
+        return by_threshold
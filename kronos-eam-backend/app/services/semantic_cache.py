@@ -0,0 +1,270 @@
+"""
+Semantic cache of agent answers, scoped per tenant
+"""
+
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from collections import OrderedDict
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+import unicodedata
+import uuid
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# (tenant_id, agent_type, data generation, context hash): entries are only
+# ever compared within one scope, so answers never cross tenants
+Scope = Tuple[str, str, int, str]
+
+
+def normalize_prompt(text: str) -> str:
+    """Case, accent-composition, punctuation and whitespace insensitive form of a prompt"""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+def _context_hash(context: Optional[Dict[str, Any]]) -> str:
+    if not context:
+        return ""
+    payload = json.dumps(context, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def _unit(vector: List[float]) -> np.ndarray:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm else array
+
+
+class MemoryCacheStore:
+    """
+    Local vector index of cached answers
+
+    Bounded to `max_entries` over all scopes, least-recently-used first.
+    A new data generation of a tenant/agent/context retires the entries of
+    the older generations.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._scopes: Dict[Scope, Dict[str, None]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def search(self, scope: Scope, vector: np.ndarray) -> Optional[Tuple[float, Dict[str, Any]]]:
+        """Most similar live entry of a scope, with its cosine similarity"""
+        now = time.time()
+        with self._lock:
+            ids = list(self._scopes.get(scope, ()))
+            for entry_id in ids:
+                if self._entries[entry_id]["expires_at"] <= now:
+                    self._remove(entry_id)
+            ids = list(self._scopes.get(scope, ()))
+            if not ids:
+                return None
+
+            scores = np.stack([self._entries[entry_id]["vector"] for entry_id in ids]) @ vector
+            best = int(np.argmax(scores))
+            entry = self._entries[ids[best]]
+            self._entries.move_to_end(ids[best])
+            return float(scores[best]), entry
+
+    def add(self, scope: Scope, vector: np.ndarray, response: Dict[str, Any], ttl_seconds: float) -> None:
+        with self._lock:
+            for other in [s for s in self._scopes if s[:2] == scope[:2] and s[3] == scope[3] and s[2] != scope[2]]:
+                for entry_id in list(self._scopes[other]):
+                    self._remove(entry_id)
+
+            entry_id = uuid.uuid4().hex
+            self._entries[entry_id] = {
+                "scope": scope,
+                "vector": vector,
+                "response": response,
+                "expires_at": time.time() + ttl_seconds
+            }
+            self._scopes.setdefault(scope, {})[entry_id] = None
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_tenant(self, tenant_id: str) -> int:
+        with self._lock:
+            ids = [entry_id for entry_id, entry in self._entries.items() if entry["scope"][0] == str(tenant_id)]
+            for entry_id in ids:
+                self._remove(entry_id)
+        return len(ids)
+
+    def _remove(self, entry_id: str) -> None:
+        entry = self._entries.pop(entry_id)
+        scope_ids = self._scopes[entry["scope"]]
+        scope_ids.pop(entry_id, None)
+        if not scope_ids:
+            del self._scopes[entry["scope"]]
+
+
+class RedisCacheStore:
+    """
+    Cached answers in Redis, shared by all workers
+
+    One hash per scope under the tenant prefix, expiring with the TTL;
+    a scope holds at most `max_entries` answers (the oldest are dropped).
+    """
+
+    def __init__(self, client, max_entries: int):
+        self.client = client
+        self.max_entries = max_entries
+
+    def _key(self, scope: Scope) -> str:
+        tenant_id, agent_type, generation, context = scope
+        return f"{settings.get_tenant_redis_prefix(tenant_id)}llm_cache:{agent_type}:{generation}:{context}"
+
+    def search(self, scope: Scope, vector: np.ndarray) -> Optional[Tuple[float, Dict[str, Any]]]:
+        now = time.time()
+        best = None
+        for entry_id, raw in self.client.hgetall(self._key(scope)).items():
+            entry = json.loads(raw)
+            if entry["expires_at"] <= now:
+                self.client.hdel(self._key(scope), entry_id)
+                continue
+            score = float(np.asarray(entry["vector"], dtype=np.float32) @ vector)
+            if best is None or score > best[0]:
+                best = (score, entry)
+        return best
+
+    def add(self, scope: Scope, vector: np.ndarray, response: Dict[str, Any], ttl_seconds: float) -> None:
+        key = self._key(scope)
+        now = time.time()
+        entry = {"vector": vector.tolist(), "response": response, "created_at": now, "expires_at": now + ttl_seconds}
+        if self.client.hlen(key) >= self.max_entries:
+            entries = {entry_id: json.loads(raw) for entry_id, raw in self.client.hgetall(key).items()}
+            oldest = sorted(entries, key=lambda entry_id: entries[entry_id]["created_at"])
+            self.client.hdel(key, *oldest[:len(entries) - self.max_entries + 1])
+        self.client.hset(key, uuid.uuid4().hex, json.dumps(entry, default=str))
+        self.client.expire(key, int(ttl_seconds))
+
+    def invalidate_tenant(self, tenant_id: str) -> int:
+        keys = list(self.client.scan_iter(f"{settings.get_tenant_redis_prefix(tenant_id)}llm_cache:*"))
+        if keys:
+            self.client.delete(*keys)
+        return len(keys)
+
+
+class SemanticCache:
+    """
+    Answers of earlier prompts reused for near-duplicate prompts
+
+    A prompt is looked up by the embedding of its normalized text among
+    the entries with the same tenant, agent type, data generation and
+    context; an entry is a hit when the cosine similarity reaches
+    `threshold`. Bumping the data generation (any committed change of the
+    data the agents read, see app.services.data_generation) makes all
+    earlier answers misses.
+    """
+
+    def __init__(
+        self,
+        embedder,
+        store=None,
+        threshold: Optional[float] = None,
+        ttl_seconds: Optional[float] = None,
+        max_entries: Optional[int] = None
+    ):
+        self.embedder = embedder
+        self.threshold = threshold if threshold is not None else settings.LLM_CACHE_SIMILARITY_THRESHOLD
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.LLM_CACHE_TTL_SECONDS
+        self.store = store if store is not None else MemoryCacheStore(max_entries or settings.LLM_CACHE_MAX_ENTRIES)
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    async def get_or_compute(
+        self,
+        prompt: str,
+        tenant_id: str,
+        agent_type: str,
+        generation: int,
+        compute: Callable[[], Awaitable[Dict[str, Any]]],
+        context: Optional[Dict[str, Any]] = None,
+        cacheable: Callable[[Dict[str, Any]], bool] = lambda response: bool(response.get("success"))
+    ) -> Dict[str, Any]:
+        """
+        Cached answer for a near-duplicate prompt, or compute() stored for next time
+
+        Args:
+            prompt: User message
+            tenant_id: Tenant of the caller; never matched against other tenants
+            agent_type: Agent answering the prompt
+            generation: Data generation stamp of the tenant
+            compute: Produces the answer on a miss
+            context: Request context, must match exactly
+            cacheable: Only answers passing this are stored
+
+        Returns:
+            The answer, with "cached": True when it was served from the cache
+        """
+        scope = (str(tenant_id), str(getattr(agent_type, "value", agent_type)), int(generation), _context_hash(context))
+        try:
+            vector = _unit(await self.embedder.embed_text(normalize_prompt(prompt)))
+            match = self.store.search(scope, vector)
+        except Exception as e:
+            logger.warning(f"Semantic cache lookup failed: {str(e)}")
+            return await compute()
+
+        if match is not None and match[0] >= self.threshold:
+            self.hits += 1
+            return {**match[1]["response"], "cached": True, "similarity": round(match[0], 4)}
+
+        self.misses += 1
+        response = await compute()
+        if cacheable(response):
+            try:
+                self.store.add(scope, vector, _storable(response), self.ttl_seconds)
+            except Exception as e:
+                logger.warning(f"Semantic cache store failed: {str(e)}")
+        return response
+
+    def invalidate_tenant(self, tenant_id: str) -> int:
+        """Drop every cached answer of a tenant"""
+        return self.store.invalidate_tenant(tenant_id)
+
+
+def _storable(response: Dict[str, Any]) -> Dict[str, Any]:
+    """The JSON part of an agent answer (conversation messages are not cached)"""
+    return json.loads(json.dumps(
+        {key: value for key, value in response.items() if key != "messages"}, default=str
+    ))
+
+
+_cache: Optional[SemanticCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_semantic_cache() -> SemanticCache:
+    """Process-wide cache (LLM_CACHE_BACKEND selects the store)"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            from app.rag.embeddings import EmbeddingService
+
+            store = None
+            if settings.LLM_CACHE_BACKEND == "redis":
+                import redis
+                store = RedisCacheStore(redis.from_url(str(settings.REDIS_URL)), settings.LLM_CACHE_MAX_ENTRIES)
+            elif settings.LLM_CACHE_BACKEND != "memory":
+                raise ValueError(f"Unknown LLM cache backend: {settings.LLM_CACHE_BACKEND}")
+            _cache = SemanticCache(EmbeddingService(), store=store)
+        return _cache
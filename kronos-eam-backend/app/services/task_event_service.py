@@ -0,0 +1,190 @@
+"""
+Task timeline projection maintained from task audit entries
+"""
+
+from typing import Optional, Dict, Any, List
+from sqlalchemy.orm import Session
+from sqlalchemy import func, insert
+
+from app.models.workflow import TaskEvent
+from app.models.audit import TipoModificaEnum
+from app.models.user import User
+
+
+DOCUMENT_FIELDS = {"documenti_associati", "associated_documents"}
+
+# Fields with their own timeline event
+TRACKED_FIELDS = {"status", "assignee"} | DOCUMENT_FIELDS
+
+
+class TaskEventService:
+    """
+    Maintains the task_events projection and reads task timelines from it.
+
+    Events are derived from the task's audit entries when those are written,
+    so the timeline is one indexed range query on (task_id, timestamp).
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def project_audit_rows(self, rows: List[Dict[str, Any]]) -> int:
+        """
+        Insert timeline events for the task entries among audit rows
+
+        Joins the caller's transaction; actor emails are resolved with one
+        query for the whole batch.
+
+        Args:
+            rows: AuditLog column values, as written by AuditService
+
+        Returns:
+            Number of events inserted
+        """
+        task_rows = [row for row in rows if row["entity_type"] == "task" and row["entity_id"]]
+        if not task_rows:
+            return 0
+
+        user_ids = {row["utente_id"] for row in task_rows if row.get("utente_id")}
+        emails = dict(
+            self.db.query(User.id, User.email).filter(User.id.in_(user_ids)).all()
+        ) if user_ids else {}
+
+        events = []
+        for row in task_rows:
+            for event in self.events_from_audit(row):
+                event.update({
+                    "task_id": row["entity_id"],
+                    "tenant_id": row["tenant_id"],
+                    "actor_id": row.get("utente_id"),
+                    "actor_email": emails.get(row.get("utente_id")),
+                    "timestamp": row["created_at"]
+                })
+                events.append(event)
+
+        if events:
+            self.db.execute(insert(TaskEvent), events)
+        return len(events)
+
+    @staticmethod
+    def events_from_audit(row: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Map one task audit entry to its timeline events
+
+        Args:
+            row: AuditLog column values
+
+        Returns:
+            Dicts with event_type, old_value, new_value and details
+        """
+        tipo = row["tipo_modifica"]
+        old_values = row.get("old_values") or {}
+        new_values = row.get("new_values") or {}
+        details = row.get("dettaglio_modifica") or {}
+        changed_fields = set(row.get("changed_fields") or [])
+
+        if tipo == TipoModificaEnum.CREAZIONE:
+            return [_event("created", details="Task created")]
+
+        if tipo == TipoModificaEnum.ELIMINAZIONE:
+            return [_event("deleted", details="Task deleted")]
+
+        if tipo == TipoModificaEnum.RESPONSABILE_CAMBIO:
+            old_assignee = details.get("old_assignee", old_values.get("assignee"))
+            new_assignee = details.get("new_assignee", new_values.get("assignee"))
+            return [_event(
+                "assignment_change", old_assignee, new_assignee,
+                f"Assigned from {old_assignee or 'Unassigned'} to {new_assignee}"
+            )]
+
+        events = []
+        if tipo == TipoModificaEnum.STATO_CAMBIO or "status" in changed_fields:
+            old_status = old_values.get("status")
+            new_status = new_values.get("status")
+            if old_status != new_status:
+                events.append(_event(
+                    "status_change", old_status, new_status,
+                    f"Status changed from {old_status} to {new_status}"
+                ))
+
+        if changed_fields & DOCUMENT_FIELDS:
+            events.append(_event("document_update", details="Documents updated"))
+
+        # Assignee changes are recorded by their own RESPONSABILE_CAMBIO entry
+        other_fields = sorted(changed_fields - TRACKED_FIELDS)
+        if other_fields:
+            events.append(_event(
+                "updated", new_value=other_fields,
+                details=f"Updated {', '.join(other_fields)}"[:500]
+            ))
+
+        return events
+
+    def get_events(
+        self,
+        task_id: int,
+        limit: int = 100,
+        offset: int = 0
+    ) -> Dict[str, Any]:
+        """
+        Page through the timeline of a task, oldest first
+
+        Args:
+            task_id: Task ID (tenant access must be checked by the caller)
+            limit: Page size
+            offset: Events to skip
+
+        Returns:
+            Dict with the page of events and the total number of events
+        """
+        rows = self.db.query(
+            TaskEvent,
+            func.count(TaskEvent.id).over().label("total")
+        ).filter(
+            TaskEvent.task_id == task_id
+        ).order_by(
+            TaskEvent.timestamp.asc(), TaskEvent.id.asc()
+        ).offset(offset).limit(limit).all()
+
+        if rows:
+            total = rows[0].total
+        elif offset:
+            total = self.db.query(func.count(TaskEvent.id)).filter(TaskEvent.task_id == task_id).scalar()
+        else:
+            total = 0
+
+        return {
+            "events": [self._event_to_dict(event) for event, _ in rows],
+            "total": total
+        }
+
+    @staticmethod
+    def _event_to_dict(event: TaskEvent) -> Dict[str, Any]:
+        """Timeline event in the TaskTimelineEvent shape"""
+        data = {
+            "timestamp": event.timestamp.isoformat(),
+            "event": event.event_type,
+            "user": event.actor_email or "System",
+            "details": event.details or ""
+        }
+        if event.event_type == "status_change":
+            data["old_status"] = event.old_value
+            data["new_status"] = event.new_value
+        elif event.event_type == "assignment_change":
+            data["old_assignee"] = event.old_value
+            data["new_assignee"] = event.new_value
+        return data
+
+
+def _event(
+    event_type: str,
+    old_value: Optional[Any] = None,
+    new_value: Optional[Any] = None,
+    details: Optional[str] = None
+) -> Dict[str, Any]:
+    return {
+        "event_type": event_type,
+        "old_value": old_value,
+        "new_value": new_value,
+        "details": details
+    }
@@ -0,0 +1,410 @@
+"""
+Per-user task inbox backed by per-assignee counters
+"""
+
+from typing import Optional, List, Dict, Any, Tuple
+from datetime import datetime
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func, event, inspect, insert, delete
+import logging
+
+from app.models.workflow import (
+    WorkflowTask, TaskInboxCounter, TaskStatusEnum, TaskPriorityEnum
+)
+
+
+logger = logging.getLogger(__name__)
+
+# Key under Session.info holding counter deltas waiting for the end of the flush
+INBOX_DELTAS_KEY = "task_inbox_deltas"
+
+# Counter columns, in the order used by delta vectors
+COUNTER_FIELDS = (
+    "task_count", "estimated_count", "estimated_hours_sum",
+    "actual_count", "actual_hours_sum"
+)
+
+# (tenant_id, assignee, status, priority)
+BucketKey = Tuple[str, str, str, str]
+
+
+def _enum_value(value: Any) -> str:
+    """Bucket representation of a status/priority value"""
+    if value is None:
+        return ""
+    return value.value if hasattr(value, "value") else str(value)
+
+
+class TaskInboxService:
+    """
+    "My tasks" inbox for an assignee.
+
+    Totals and status/priority statistics come from task_inbox_counters,
+    which are kept up to date at write time (ORM flushes of WorkflowTask and
+    explicit moves recorded by set-based updates) and rebuilt by reconcile().
+    The task list itself is read through the (assignee, status, due_date)
+    index.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_inbox(
+        self,
+        user_email: str,
+        tenant_id: str,
+        status_filter: Optional[List[TaskStatusEnum]] = None,
+        priority_filter: Optional[List[TaskPriorityEnum]] = None,
+        due_date_start: Optional[datetime] = None,
+        due_date_end: Optional[datetime] = None,
+        include_completed: bool = False,
+        limit: int = 50,
+        offset: int = 0
+    ) -> Dict[str, Any]:
+        """
+        Get a page of the user's tasks with totals and statistics
+
+        Args:
+            user_email: Assignee email
+            tenant_id: Tenant ID
+            status_filter: Only these statuses
+            priority_filter: Only these priorities
+            due_date_start: Only tasks due at or after this date
+            due_date_end: Only tasks due at or before this date
+            include_completed: Include completed tasks when no status filter
+            limit: Page size
+            offset: Tasks to skip
+
+        Returns:
+            Dict with tasks (ORM objects with workflow loaded), total,
+            overdue_count and statistics
+        """
+        statuses = self._resolve_statuses(status_filter, include_completed)
+        priorities = list(priority_filter) if priority_filter else None
+
+        query = self.db.query(WorkflowTask).filter(
+            WorkflowTask.assignee == user_email,
+            WorkflowTask.tenant_id == tenant_id
+        )
+        if statuses is not None:
+            query = query.filter(WorkflowTask.status.in_(statuses))
+        if priorities:
+            query = query.filter(WorkflowTask.priority.in_(priorities))
+        if due_date_start:
+            query = query.filter(WorkflowTask.due_date >= due_date_start)
+        if due_date_end:
+            query = query.filter(WorkflowTask.due_date <= due_date_end)
+
+        if due_date_start or due_date_end:
+            # Counters are not bucketed by date: aggregate the filtered range once
+            buckets = self._aggregate_buckets(query)
+        else:
+            buckets = self._counter_buckets(user_email, tenant_id, statuses, priorities)
+
+        overdue_count = query.filter(
+            WorkflowTask.due_date < datetime.utcnow(),
+            WorkflowTask.status != TaskStatusEnum.COMPLETED
+        ).with_entities(func.count(WorkflowTask.id)).scalar()
+
+        tasks = query.options(
+            joinedload(WorkflowTask.workflow)
+        ).order_by(
+            WorkflowTask.due_date.asc().nulls_last(),
+            WorkflowTask.priority.desc()
+        ).offset(offset).limit(limit).all()
+
+        return {
+            "tasks": tasks,
+            "total": sum(bucket["task_count"] for bucket in buckets),
+            "overdue_count": overdue_count or 0,
+            "statistics": self._statistics(buckets)
+        }
+
+    def get_counters(self, user_email: str, tenant_id: str) -> Dict[str, Any]:
+        """
+        Counters of an assignee by status and priority
+
+        Returns:
+            Dict with total, by_status and by_priority
+        """
+        buckets = self._counter_buckets(user_email, tenant_id, None, None)
+        by_status = {status.value: 0 for status in TaskStatusEnum}
+        by_priority = {priority.value: 0 for priority in TaskPriorityEnum}
+        for bucket in buckets:
+            if bucket["status"] in by_status:
+                by_status[bucket["status"]] += bucket["task_count"]
+            if bucket["priority"] in by_priority:
+                by_priority[bucket["priority"]] += bucket["task_count"]
+        return {
+            "total": sum(bucket["task_count"] for bucket in buckets),
+            "by_status": by_status,
+            "by_priority": by_priority
+        }
+
+    def record_move(
+        self,
+        tenant_id: str,
+        old: Optional[Dict[str, Any]],
+        new: Optional[Dict[str, Any]]
+    ) -> None:
+        """
+        Record a task leaving one bucket and/or entering another
+
+        Deltas accumulate on the session and are written by apply_pending
+        (automatically at the end of every flush).
+
+        Args:
+            tenant_id: Tenant of the task
+            old: assignee, status, priority, estimated_hours, actual_hours
+                before the change (None for a new task)
+            new: Same values after the change (None for a deleted task)
+        """
+        deltas = self.db.info.setdefault(INBOX_DELTAS_KEY, {})
+        for snapshot, sign in ((old, -1), (new, 1)):
+            if not snapshot or not snapshot.get("assignee"):
+                continue
+            key = (
+                str(tenant_id),
+                snapshot["assignee"],
+                _enum_value(snapshot.get("status")),
+                _enum_value(snapshot.get("priority"))
+            )
+            vector = deltas.setdefault(key, [0, 0, 0.0, 0, 0.0])
+            vector[0] += sign
+            if snapshot.get("estimated_hours") is not None:
+                vector[1] += sign
+                vector[2] += sign * snapshot["estimated_hours"]
+            if snapshot.get("actual_hours") is not None:
+                vector[3] += sign
+                vector[4] += sign * snapshot["actual_hours"]
+
+    def apply_pending(self, connection=None) -> int:
+        """
+        Write the recorded deltas, one statement per touched bucket
+
+        Args:
+            connection: Connection to use (defaults to the session's)
+
+        Returns:
+            Number of buckets touched
+        """
+        deltas: Dict[BucketKey, List[float]] = self.db.info.pop(INBOX_DELTAS_KEY, None) or {}
+        connection = connection or self.db.connection()
+        table = TaskInboxCounter.__table__
+        now = datetime.utcnow()
+        touched = 0
+
+        # Atomic upsert: concurrent first writes to a bucket add up instead of
+        # one of them failing on uq_task_inbox_bucket
+        dialect = connection.dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            raise RuntimeError(f"Task inbox counters are not supported on {dialect}")
+
+        for (tenant_id, assignee, status, priority), vector in deltas.items():
+            if not any(vector):
+                continue
+            touched += 1
+            row = dict(zip(COUNTER_FIELDS, vector))
+            row.update({
+                "tenant_id": tenant_id,
+                "assignee": assignee,
+                "status": status,
+                "priority": priority,
+                "updated_at": now
+            })
+            stmt = dialect_insert(table).values(**row)
+            values = {field: table.c[field] + stmt.excluded[field] for field in COUNTER_FIELDS}
+            values["updated_at"] = stmt.excluded.updated_at
+            connection.execute(stmt.on_conflict_do_update(
+                index_elements=["tenant_id", "assignee", "status", "priority"],
+                set_=values
+            ))
+        return touched
+
+    def reconcile(self, tenant_id: Optional[str] = None) -> int:
+        """
+        Rebuild counters from the tasks table with one grouped query
+
+        Args:
+            tenant_id: Limit to one tenant (all tenants when None)
+
+        Returns:
+            Number of buckets written
+        """
+        query = self.db.query(WorkflowTask).filter(WorkflowTask.assignee.isnot(None))
+        if tenant_id:
+            query = query.filter(WorkflowTask.tenant_id == tenant_id)
+
+        rows = []
+        now = datetime.utcnow()
+        for bucket in self._aggregate_buckets(query, by_assignee=True):
+            bucket["updated_at"] = now
+            rows.append(bucket)
+
+        try:
+            stmt = delete(TaskInboxCounter)
+            if tenant_id:
+                stmt = stmt.where(TaskInboxCounter.tenant_id == tenant_id)
+            self.db.execute(stmt.execution_options(synchronize_session=False))
+            if rows:
+                self.db.execute(insert(TaskInboxCounter), rows)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            logger.exception("Task inbox reconciliation failed")
+            raise
+
+        logger.info(f"Reconciled {len(rows)} task inbox buckets" + (f" for tenant {tenant_id}" if tenant_id else ""))
+        return len(rows)
+
+    def _counter_buckets(
+        self,
+        user_email: str,
+        tenant_id: str,
+        statuses: Optional[List[TaskStatusEnum]],
+        priorities: Optional[List[TaskPriorityEnum]]
+    ) -> List[Dict[str, Any]]:
+        """Counter rows of an assignee matching the filters"""
+        query = self.db.query(TaskInboxCounter).filter(
+            TaskInboxCounter.tenant_id == str(tenant_id),
+            TaskInboxCounter.assignee == user_email
+        )
+        if statuses is not None:
+            query = query.filter(TaskInboxCounter.status.in_([_enum_value(s) for s in statuses]))
+        if priorities:
+            query = query.filter(TaskInboxCounter.priority.in_([_enum_value(p) for p in priorities]))
+
+        return [
+            {
+                "status": counter.status,
+                "priority": counter.priority,
+                **{field: getattr(counter, field) for field in COUNTER_FIELDS}
+            }
+            for counter in query.all()
+        ]
+
+    def _aggregate_buckets(self, query, by_assignee: bool = False) -> List[Dict[str, Any]]:
+        """Compute buckets of a task query with one GROUP BY"""
+        group_columns = [WorkflowTask.status, WorkflowTask.priority]
+        if by_assignee:
+            group_columns = [WorkflowTask.tenant_id, WorkflowTask.assignee] + group_columns
+
+        rows = query.with_entities(
+            *group_columns,
+            func.count(WorkflowTask.id),
+            func.count(WorkflowTask.estimated_hours),
+            func.coalesce(func.sum(WorkflowTask.estimated_hours), 0),
+            func.count(WorkflowTask.actual_hours),
+            func.coalesce(func.sum(WorkflowTask.actual_hours), 0)
+        ).order_by(None).group_by(*group_columns).all()
+
+        buckets = []
+        for row in rows:
+            values = list(row)
+            bucket = {}
+            if by_assignee:
+                bucket["tenant_id"] = values.pop(0)
+                bucket["assignee"] = values.pop(0)
+            bucket["status"] = _enum_value(values.pop(0))
+            bucket["priority"] = _enum_value(values.pop(0))
+            bucket.update(zip(COUNTER_FIELDS, values))
+            buckets.append(bucket)
+        return buckets
+
+    @staticmethod
+    def _resolve_statuses(
+        status_filter: Optional[List[TaskStatusEnum]],
+        include_completed: bool
+    ) -> Optional[List[TaskStatusEnum]]:
+        """Statuses included by the filters (None means all)"""
+        if status_filter:
+            return list(status_filter)
+        if not include_completed:
+            return [status for status in TaskStatusEnum if status != TaskStatusEnum.COMPLETED]
+        return None
+
+    @staticmethod
+    def _statistics(buckets: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Distributions and averages from counter buckets"""
+        status_dist = {status.value: 0 for status in TaskStatusEnum}
+        priority_dist = {priority.value: 0 for priority in TaskPriorityEnum}
+        estimated_count = estimated_sum = actual_count = actual_sum = 0
+
+        for bucket in buckets:
+            if bucket["status"] in status_dist:
+                status_dist[bucket["status"]] += bucket["task_count"]
+            if bucket["priority"] in priority_dist:
+                priority_dist[bucket["priority"]] += bucket["task_count"]
+            estimated_count += bucket["estimated_count"]
+            estimated_sum += bucket["estimated_hours_sum"]
+            # Actual hours are averaged over completed tasks only
+            if bucket["status"] == TaskStatusEnum.COMPLETED.value:
+                actual_count += bucket["actual_count"]
+                actual_sum += bucket["actual_hours_sum"]
+
+        return {
+            "status_distribution": status_dist,
+            "priority_distribution": priority_dist,
+            "average_estimated_hours": round(estimated_sum / estimated_count, 2) if estimated_count else 0,
+            "average_actual_hours": round(actual_sum / actual_count, 2) if actual_count else 0
+        }
+
+
+def _task_snapshot(state, before: bool = False) -> Dict[str, Any]:
+    """Bucket-relevant values of a task, as loaded (before) or as modified"""
+    snapshot = {}
+    for key in ("assignee", "status", "priority", "estimated_hours", "actual_hours"):
+        history = state.attrs[key].history
+        if before and history.deleted:
+            # Also set for expired attributes: the bucket columns use active_history
+            value = history.deleted[0]
+        elif before and history.added:
+            # Set on a pending or never loaded attribute: there was no old value
+            value = None
+        else:
+            # Unchanged (loaded again here if it expired)
+            value = state.attrs[key].value
+        snapshot[key] = value
+    return snapshot
+
+
+@event.listens_for(Session, "before_flush")
+def record_task_inbox_moves(session, flush_context, instances):
+    """Turn WorkflowTask inserts, updates and deletes into counter deltas"""
+    service = None
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, WorkflowTask):
+            continue
+        service = service or TaskInboxService(session)
+        state = inspect(obj)
+
+        if obj in session.new:
+            new = _task_snapshot(state)
+            # Column defaults are only applied by the INSERT itself
+            new["status"] = new["status"] or TaskStatusEnum.TO_START
+            new["priority"] = new["priority"] or TaskPriorityEnum.MEDIUM
+            service.record_move(obj.tenant_id, None, new)
+        elif obj in session.deleted:
+            service.record_move(obj.tenant_id, _task_snapshot(state, before=True), None)
+        elif session.is_modified(obj, include_collections=False):
+            old = _task_snapshot(state, before=True)
+            new = _task_snapshot(state)
+            if old != new:
+                service.record_move(obj.tenant_id, old, new)
+
+
+@event.listens_for(Session, "after_flush")
+def apply_task_inbox_moves(session, flush_context):
+    """Write counter deltas in the transaction of the flush"""
+    if session.info.get(INBOX_DELTAS_KEY):
+        TaskInboxService(session).apply_pending(session.connection())
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_task_inbox_moves(session):
+    """Deltas of rolled-back changes must not be written"""
+    session.info.pop(INBOX_DELTAS_KEY, None)
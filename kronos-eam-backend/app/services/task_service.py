@@ -15,6 +15,8 @@ from app.models.user import User
 from app.models.document import Document
 from app.models.audit import TipoModificaEnum
 from app.services.audit_service import AuditService
+from app.services.task_event_service import TaskEventService
+from app.services.task_inbox_service import TaskInboxService
 from app.services.notification_service import NotificationService, NotificationBuilder
 from app.core.config import settings
 
@@ -92,10 +94,9 @@ class TaskService:
         
         # Note: tenant_id is inherited from workflow
         self.db.add(task)
-        self.db.commit()
-        self.db.refresh(task)
+        self.db.flush()
         
-        # Log creation
+        # Log creation in the same transaction
         if audit_enabled:
             self.audit_service.log_change(
                 entity_type="task",
@@ -111,6 +112,9 @@ class TaskService:
                 }
             )
         
+        self.db.commit()
+        self.db.refresh(task)
+        
         # TODO: Send notification if assigned (requires async handling)
         # if assignee:
         #     assigned_by = self.db.query(User).filter(User.id == user_id).first()
@@ -276,10 +280,7 @@ class TaskService:
             "priority": task.priority.value if task.priority else None
         }
         
-        self.db.commit()
-        self.db.refresh(task)
-        
-        # Log update if changes were made
+        # Log update if changes were made, in the same transaction
         if changes_made and task.audit_enabled:
             self.audit_service.log_change(
                 entity_type="task",
@@ -293,6 +294,9 @@ class TaskService:
                 note=note
             )
         
+        self.db.commit()
+        self.db.refresh(task)
+        
         return task
     
     def update_task_status(
@@ -341,9 +345,11 @@ class TaskService:
     def get_task_timeline(
         self,
         task_id: int,
-        tenant_id: int
+        tenant_id: int,
+        limit: int = 100,
+        offset: int = 0
     ) -> Dict[str, Any]:
-        """Get detailed task timeline with audit history"""
+        """Get detailed task timeline from the task_events projection"""
         task = self.db.query(WorkflowTask).join(
             WorkflowTask.workflow
         ).filter(
@@ -354,70 +360,7 @@ class TaskService:
         if not task:
             raise ValueError("Task not found")
         
-        # Get audit history
-        audit_history = self.audit_service.get_entity_history(
-            entity_type="task",
-            entity_id=task_id,
-            tenant_id=tenant_id,
-            limit=100
-        )
-        
-        # Build timeline
-        timeline_events = []
-        
-        # Add creation event
-        creation_event = next(
-            (log for log in audit_history if log.tipo_modifica == TipoModificaEnum.CREAZIONE),
-            None
-        )
-        if creation_event:
-            timeline_events.append({
-                "timestamp": creation_event.created_at.isoformat(),
-                "event": "created",
-                "user": creation_event.utente.email if creation_event.utente else "System",
-                "details": "Task created"
-            })
-        
-        # Add status changes
-        for log in audit_history:
-            if log.tipo_modifica == TipoModificaEnum.STATO_CAMBIO:
-                old_status = log.old_values.get("status") if log.old_values else None
-                new_status = log.new_values.get("status") if log.new_values else None
-                
-                timeline_events.append({
-                    "timestamp": log.created_at.isoformat(),
-                    "event": "status_change",
-                    "user": log.utente.email if log.utente else "System",
-                    "details": f"Status changed from {old_status} to {new_status}",
-                    "old_status": old_status,
-                    "new_status": new_status
-                })
-        
-        # Add assignment changes
-        for log in audit_history:
-            if log.tipo_modifica == TipoModificaEnum.RESPONSABILE_CAMBIO:
-                details = log.dettaglio_modifica or {}
-                timeline_events.append({
-                    "timestamp": log.created_at.isoformat(),
-                    "event": "assignment_change",
-                    "user": log.utente.email if log.utente else "System",
-                    "details": f"Assigned from {details.get('old_assignee', 'Unassigned')} to {details.get('new_assignee')}",
-                    "old_assignee": details.get("old_assignee"),
-                    "new_assignee": details.get("new_assignee")
-                })
-        
-        # Add document associations
-        for log in audit_history:
-            if "documenti_associati" in (log.changed_fields or []):
-                timeline_events.append({
-                    "timestamp": log.created_at.isoformat(),
-                    "event": "document_update",
-                    "user": log.utente.email if log.utente else "System",
-                    "details": "Documents updated"
-                })
-        
-        # Sort by timestamp
-        timeline_events.sort(key=lambda x: x["timestamp"])
+        page = TaskEventService(self.db).get_events(task_id, limit=limit, offset=offset)
         
         return {
             "task_id": task.id,
@@ -425,8 +368,10 @@ class TaskService:
             "current_status": task.status.value if task.status else None,
             "current_assignee": task.assignee,
             "timeline": task.timeline or {},
-            "events": timeline_events,
-            "total_events": len(timeline_events),
+            "events": page["events"],
+            "total_events": page["total"],
+            "limit": limit,
+            "offset": offset,
             "duration": self._calculate_task_duration(task),
             "is_overdue": task.is_overdue
         }
@@ -443,71 +388,49 @@ class TaskService:
         limit: int = 50,
         offset: int = 0
     ) -> Dict[str, Any]:
-        """Get tasks assigned to a user with filters"""
-        query = self.db.query(WorkflowTask).join(
-            WorkflowTask.workflow
-        ).filter(
-            WorkflowTask.assignee == user_email,
-            WorkflowTask.workflow.has(tenant_id=tenant_id)
-        )
+        """Get tasks assigned to a user with filters
         
-        # Apply filters
-        if status_filter:
-            query = query.filter(WorkflowTask.status.in_(status_filter))
-        elif not include_completed:
-            query = query.filter(WorkflowTask.status != TaskStatusEnum.COMPLETED)
-        
-        if priority_filter:
-            query = query.filter(WorkflowTask.priority.in_(priority_filter))
-        
-        if due_date_start:
-            query = query.filter(WorkflowTask.dueDate >= due_date_start)
-        
-        if due_date_end:
-            query = query.filter(WorkflowTask.dueDate <= due_date_end)
-        
-        # Get total count
-        total = query.count()
-        
-        # Get overdue count
-        overdue_count = query.filter(
-            WorkflowTask.dueDate < datetime.utcnow(),
-            WorkflowTask.status != TaskStatusEnum.COMPLETED
-        ).count()
-        
-        # Apply ordering and pagination
-        tasks = query.order_by(
-            WorkflowTask.dueDate.asc().nulls_last(),
-            WorkflowTask.priority.desc()
-        ).offset(offset).limit(limit).all()
+        Totals and statistics come from the per-assignee inbox counters.
+        """
+        inbox = TaskInboxService(self.db).get_inbox(
+            user_email=user_email,
+            tenant_id=tenant_id,
+            status_filter=status_filter,
+            priority_filter=priority_filter,
+            due_date_start=due_date_start,
+            due_date_end=due_date_end,
+            include_completed=include_completed,
+            limit=limit,
+            offset=offset
+        )
         
         # Enhance task data
         enhanced_tasks = []
-        for task in tasks:
+        for task in inbox["tasks"]:
             enhanced_tasks.append({
                 "id": task.id,
                 "title": task.title,
-                "descrizione": task.descrizione,
+                "descrizione": task.description,
                 "status": task.status.value if task.status else None,
                 "priority": task.priority.value if task.priority else None,
-                "dueDate": task.dueDate.isoformat() if task.dueDate else None,
+                "dueDate": task.due_date.isoformat() if task.due_date else None,
                 "is_overdue": task.is_overdue,
                 "workflow": {
                     "id": task.workflow.id,
-                    "nome": task.workflow.nome,
-                    "impianto_nome": task.workflow.impiantoNome
+                    "nome": task.workflow.name,
+                    "impianto_nome": task.workflow.plant_name
                 },
-                "documents_count": len(task.documenti_associati),
+                "documents_count": len(task.associated_documents or []),
                 "completion_percentage": self._calculate_completion_percentage(task)
             })
         
         return {
             "tasks": enhanced_tasks,
-            "total": total,
-            "overdue_count": overdue_count,
+            "total": inbox["total"],
+            "overdue_count": inbox["overdue_count"],
             "limit": limit,
             "offset": offset,
-            "statistics": self._get_task_statistics(query)
+            "statistics": inbox["statistics"]
         }
     
     def bulk_update_tasks(
@@ -521,32 +444,24 @@ class TaskService:
         dueDate: Optional[datetime] = None,
         note: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Bulk update multiple tasks"""
-        updated_count = 0
-        failed_ids = []
-        
-        for task_id in task_ids:
-            try:
-                self.update_task(
-                    task_id=task_id,
-                    user_id=user_id,
-                    tenant_id=tenant_id,
-                    status=status,
-                    priority=priority,
-                    assignee=assignee,
-                    dueDate=dueDate,
-                    note=note or "Bulk update"
-                )
-                updated_count += 1
-            except Exception as e:
-                failed_ids.append(task_id)
+        """
+        Bulk update multiple tasks
         
-        return {
-            "updated_count": updated_count,
-            "failed_count": len(failed_ids),
-            "failed_ids": failed_ids,
-            "success": len(failed_ids) == 0
-        }
+        Delegates to BulkMutationService, which validates the batch up front
+        and applies it with set-based statements in a single transaction.
+        """
+        from app.services.bulk_mutation_service import BulkMutationService
+        
+        return BulkMutationService(self.db).bulk_update_tasks(
+            task_ids=task_ids,
+            user_id=user_id,
+            tenant_id=tenant_id,
+            status=status,
+            priority=priority,
+            assignee=assignee,
+            due_date=dueDate,
+            note=note
+        )
     
     def _calculate_task_duration(self, task: WorkflowTask) -> Optional[float]:
         """Calculate task duration in hours"""
@@ -575,46 +490,13 @@ class TaskService:
             return 0
         elif task.status == TaskStatusEnum.IN_PROGRESS:
             # Estimate based on time if possible
-            if task.timeline and task.estimatedHours:
+            if task.timeline and task.estimated_hours:
                 duration = self._calculate_task_duration(task)
                 if duration:
-                    percentage = min(int((duration / task.estimatedHours) * 100), 90)
+                    percentage = min(int((duration / task.estimated_hours) * 100), 90)
                     return percentage
             return 50  # Default for in-progress
         elif task.status == TaskStatusEnum.BLOCKED:
             return 0
         
         return 0
-    
-    def _get_task_statistics(self, base_query) -> Dict[str, Any]:
-        """Get statistics for a set of tasks"""
-        # Status distribution
-        status_dist = {}
-        for status in TaskStatusEnum:
-            count = base_query.filter(WorkflowTask.status == status).count()
-            status_dist[status.value] = count
-        
-        # Priority distribution
-        priority_dist = {}
-        for priority in TaskPriorityEnum:
-            count = base_query.filter(WorkflowTask.priority == priority).count()
-            priority_dist[priority.value] = count
-        
-        # Average estimated hours
-        avg_estimated = self.db.query(
-            func.avg(WorkflowTask.estimatedHours)
-        ).select_from(base_query.subquery()).scalar() or 0
-        
-        # Average actual hours (for completed tasks)
-        avg_actual = self.db.query(
-            func.avg(WorkflowTask.actualHours)
-        ).select_from(
-            base_query.filter(WorkflowTask.status == TaskStatusEnum.COMPLETED).subquery()
-        ).scalar() or 0
-        
-        return {
-            "status_distribution": status_dist,
-            "priority_distribution": priority_dist,
-            "average_estimated_hours": round(avg_estimated, 2),
-            "average_actual_hours": round(avg_actual, 2)
-        }
\ No newline at end of file
@@ -0,0 +1,281 @@
+"""
+Content-addressed disk cache of synthesized speech, per sentence
+"""
+
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from collections import OrderedDict
+from pathlib import Path
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import threading
+import unicodedata
+import uuid
+import wave
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Abbreviations whose period does not end a sentence
+ABBREVIATIONS = {
+    "sig", "sigg", "dott", "dr", "ing", "avv", "geom", "arch", "prof", "egr", "spett",
+    "es", "ecc", "etc", "n", "nr", "art", "pag", "cfr", "tel", "vs", "mr", "mrs", "st", "kw", "mw"
+}
+_SENTENCE_END = re.compile(r"(?<=[.!?…;])\s+|\n+")
+# Formats whose segments can be joined into one playable file
+JOINABLE_FORMATS = ("mp3", "wav", "linear16", "pcm")
+
+
+def normalize_tts_text(text: str) -> str:
+    """Unicode-composed, whitespace-collapsed text (case and punctuation are spoken, so kept)"""
+    text = unicodedata.normalize("NFKC", text)
+    text = text.replace("’", "'").replace("“", '"').replace("”", '"')
+    return " ".join(text.split())
+
+
+def split_sentences(text: str, max_chars: int = 300) -> List[str]:
+    """
+    Sentences of a text, in order
+
+    Ends at . ! ? … ; and line breaks, except after common abbreviations
+    and between digits (1.200 kW). Sentences longer than max_chars are
+    cut at commas, then at spaces.
+    """
+    sentences: List[str] = []
+    current = ""
+    for piece in _SENTENCE_END.split(text.strip()):
+        piece = piece.strip()
+        if not piece:
+            continue
+        current = f"{current} {piece}" if current else piece
+        last_word = current.rsplit(" ", 1)[-1].rstrip(".").lower()
+        if current.endswith(".") and last_word in ABBREVIATIONS:
+            continue
+        sentences.append(current)
+        current = ""
+    if current:
+        sentences.append(current)
+
+    result: List[str] = []
+    for sentence in sentences:
+        result.extend(_cut(sentence, max_chars))
+    return result
+
+
+def _cut(sentence: str, max_chars: int) -> List[str]:
+    if len(sentence) <= max_chars:
+        return [sentence]
+    for separator in (", ", " "):
+        cut = sentence.rfind(separator, 0, max_chars)
+        if cut > 0:
+            head = sentence[:cut + len(separator.rstrip())]
+            return [head] + _cut(sentence[cut + len(separator):].strip(), max_chars)
+    return [sentence[:max_chars]] + _cut(sentence[max_chars:], max_chars)
+
+
+def join_audio(parts: List[bytes], format: str) -> bytes:
+    """
+    One file from per-sentence audio
+
+    WAV segments are merged under a single header (they must share
+    channels, width and rate); MP3 frames and headerless PCM are
+    concatenated as they are.
+    """
+    if len(parts) == 1:
+        return parts[0]
+    if all(part[:4] == b"RIFF" for part in parts):
+        params = None
+        frames = []
+        for part in parts:
+            with wave.open(io.BytesIO(part), "rb") as segment:
+                segment_params = (segment.getnchannels(), segment.getsampwidth(), segment.getframerate())
+                if params is not None and segment_params != params:
+                    raise ValueError(f"Cannot join WAV segments with different formats: {params} / {segment_params}")
+                params = segment_params
+                frames.append(segment.readframes(segment.getnframes()))
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as joined:
+            joined.setnchannels(params[0])
+            joined.setsampwidth(params[1])
+            joined.setframerate(params[2])
+            joined.writeframes(b"".join(frames))
+        return buffer.getvalue()
+    return b"".join(parts)
+
+
+class PhraseAudioCache:
+    """
+    Audio files on local disk, named by the hash of what produced them
+
+    The key covers provider, normalized text, voice, language, speed and
+    format, so equal sentences share one file. Bounded to `max_bytes`,
+    least-recently-used first; a hit refreshes the file's mtime, so the
+    order survives restarts. Writes are atomic (temp file + rename), so
+    several workers can share the directory; each keeps its own index and
+    treats a file removed by another as a miss.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._load_index()
+
+    @staticmethod
+    def make_key(text: str, **params: Any) -> str:
+        payload = json.dumps({"text": normalize_tts_text(text), **params}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / key
+
+    def _load_index(self) -> None:
+        if not self.directory.exists():
+            return
+        files = []
+        for path in self.directory.glob("??/*"):
+            if path.is_file() and len(path.name) == 64:
+                stat = path.stat()
+                files.append((stat.st_mtime, path.name, stat.st_size))
+        for _, key, size in sorted(files):
+            self._index[key] = size
+            self.total_bytes += size
+        self._evict()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            if key not in self._index:
+                self.misses += 1
+                return None
+            path = self._path(key)
+            try:
+                data = path.read_bytes()
+                os.utime(path)
+            except OSError:
+                # Evicted by another worker
+                self.total_bytes -= self._index.pop(key)
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        with self._lock:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            staging = path.with_name(f".{key}.{uuid.uuid4().hex}")
+            staging.write_bytes(data)
+            os.replace(staging, path)
+            if key in self._index:
+                self.total_bytes -= self._index.pop(key)
+            self._index[key] = len(data)
+            self.total_bytes += len(data)
+            self._evict()
+
+    def _evict(self) -> None:
+        while self.total_bytes > self.max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                self._path(key).unlink()
+            except OSError:
+                pass
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._index):
+                try:
+                    self._path(key).unlink()
+                except OSError:
+                    pass
+            self._index.clear()
+            self.total_bytes = 0
+
+    async def synthesize(
+        self,
+        text: str,
+        synthesize: Callable[[str], Awaitable[bytes]],
+        format: str,
+        split: bool = True,
+        **params: Any
+    ) -> Dict[str, Any]:
+        """
+        Audio of text, reusing cached sentences
+
+        Args:
+            text: Text to speak
+            synthesize: Coroutine function producing the audio of one text
+            format: Audio format (part of the key; decides whether
+                sentences can be joined)
+            split: Cache sentence by sentence (only for joinable formats)
+            **params: Everything else that changes the audio (provider,
+                voice, language, speed...)
+
+        Returns:
+            {"audio_content", "sentences", "cache_hits"}
+        """
+        text = normalize_tts_text(text)
+        if split and format.lower() in JOINABLE_FORMATS:
+            sentences = split_sentences(text, settings.TTS_CACHE_MAX_SENTENCE_CHARS)
+        else:
+            sentences = [text]
+
+        keys = [self.make_key(sentence, format=format, **params) for sentence in sentences]
+        audio: Dict[str, bytes] = {}
+        missing: Dict[str, str] = {}
+        for key, sentence in zip(keys, sentences):
+            if key in audio or key in missing:
+                continue
+            cached = self.get(key)
+            if cached is not None:
+                audio[key] = cached
+            else:
+                missing[key] = sentence
+
+        # Sentences not sent to the provider, repeats within the text included
+        hits = len(keys) - len(missing)
+        if missing:
+            # Cache misses are synthesized concurrently, each sentence once
+            results = await asyncio.gather(*(synthesize(sentence) for sentence in missing.values()))
+            for key, data in zip(missing, results):
+                self.put(key, data)
+                audio[key] = data
+
+        return {
+            "audio_content": join_audio([audio[key] for key in keys], format),
+            "sentences": len(keys),
+            "cache_hits": hits
+        }
+
+
+_cache: Optional[PhraseAudioCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_tts_cache() -> PhraseAudioCache:
+    """Process-wide phrase cache in TTS_CACHE_PATH"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PhraseAudioCache(settings.TTS_CACHE_PATH, settings.TTS_CACHE_MAX_MB * 1024 * 1024)
+        return _cache
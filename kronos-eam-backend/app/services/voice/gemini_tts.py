@@ -13,6 +13,7 @@ import google.generativeai as genai
 from google.generativeai import types
 
 from app.core.config import get_settings
+from app.services.tts_cache import get_tts_cache
 
 logger = logging.getLogger(__name__)
 
@@ -104,12 +105,6 @@ class GeminiTTSService:
             if not voice_name:
                 voice_name = self._select_voice_for_language(language_hint)
             
-            # Build the prompt
-            if style_prompt:
-                prompt = f"{style_prompt}: {text}"
-            else:
-                prompt = text
-            
             # Configure generation
             config = types.GenerateContentConfig(
                 response_modalities=["AUDIO"],
@@ -122,37 +117,61 @@ class GeminiTTSService:
                 )
             )
             
-            # Generate audio
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                lambda: self.client.generate_content(
-                    contents=prompt,
-                    config=config
+            async def synthesize(sentence: str) -> bytes:
+                # Build the prompt
+                if style_prompt:
+                    prompt = f"{style_prompt}: {sentence}"
+                else:
+                    prompt = sentence
+                
+                # Generate audio
+                loop = asyncio.get_event_loop()
+                response = await loop.run_in_executor(
+                    None,
+                    lambda: self.client.generate_content(
+                        contents=prompt,
+                        config=config
+                    )
                 )
-            )
-            
-            # Extract audio data
-            if response.parts and hasattr(response.parts[0], 'data'):
+                
+                # Extract audio data
+                if not (response.parts and hasattr(response.parts[0], 'data')):
+                    raise ValueError("No audio data in response")
                 audio_data = response.parts[0].data
                 
                 # Decode if base64 encoded
                 if isinstance(audio_data, str):
-                    audio_content = base64.b64decode(audio_data)
-                else:
-                    audio_content = audio_data
-                
-                return {
-                    "success": True,
-                    "audio_content": audio_content,
-                    "text_length": len(text),
-                    "voice": voice_name.value,
-                    "model": self.model_name,
-                    "format": "wav",  # Gemini returns WAV format
-                    "style": style_prompt
-                }
+                    return base64.b64decode(audio_data)
+                return audio_data
+            
+            cache_hits = 0
+            if self.settings.TTS_CACHE_ENABLED:
+                # Repeated sentences (greetings, confirmations, deadline phrasing) come from disk
+                cached = await get_tts_cache().synthesize(
+                    text,
+                    synthesize,
+                    "wav",
+                    split=self.settings.TTS_CACHE_SPLIT_SENTENCES,
+                    provider="gemini",
+                    model=self.model_name,
+                    voice=voice_name.value,
+                    style=style_prompt
+                )
+                audio_content = cached["audio_content"]
+                cache_hits = cached["cache_hits"]
             else:
-                raise ValueError("No audio data in response")
+                audio_content = await synthesize(text)
+            
+            return {
+                "success": True,
+                "audio_content": audio_content,
+                "cache_hits": cache_hits,
+                "text_length": len(text),
+                "voice": voice_name.value,
+                "model": self.model_name,
+                "format": "wav",  # Gemini returns WAV format
+                "style": style_prompt
+            }
                 
         except Exception as e:
             logger.error(f"Gemini TTS synthesis error: {str(e)}")
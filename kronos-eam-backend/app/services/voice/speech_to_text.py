@@ -2,19 +2,17 @@
 Speech-to-Text service using Gemma 3n model
 """
 
-import os
 import logging
-from typing import Optional, Dict, Any, Tuple
+from typing import Optional, Dict, Any, List, Tuple
 import numpy as np
-import soundfile as sf
-from pathlib import Path
 import asyncio
-import tempfile
 
 from transformers import AutoProcessor, AutoModelForSpeechSeq2Seq
 import torch
-import librosa
 
+from app.core.audio import load_audio, resample
+from app.core.batching import DynamicBatcher
+from app.core.speech_stream import StreamingTranscriber
 from app.core.config import get_settings
 
 logger = logging.getLogger(__name__)
@@ -29,37 +27,77 @@ class SpeechToTextService:
         self.processor = None
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         self._initialized = False
+        self._init_lock: Optional[asyncio.Lock] = None
         
         # Model configuration
         self.model_name = "google/gemma-3n-2b-pt"  # Placeholder - use actual Gemma 3n model
         self.sample_rate = 16000
         self.max_duration = 30  # seconds
+        
+        # Concurrent requests share forward passes
+        self.batcher = DynamicBatcher(
+            self._transcribe_batch,
+            max_batch_size=self.settings.STT_MAX_BATCH_SIZE,
+            max_wait_ms=self.settings.STT_MAX_BATCH_WAIT_MS,
+            name="stt-batch"
+        )
     
     async def initialize(self):
         """Initialize the STT model"""
         if self._initialized:
             return
+        if self._init_lock is None:
+            self._init_lock = asyncio.Lock()
+        
+        # Concurrent first requests wait for a single load
+        async with self._init_lock:
+            if self._initialized:
+                return
             
+            try:
+                logger.info("Initializing Gemma 3n STT model...")
+                
+                # Loading blocks for seconds: keep the event loop free
+                await asyncio.get_running_loop().run_in_executor(None, self._load_model)
+                
+                self._initialized = True
+                logger.info("STT model initialized successfully")
+                
+            except Exception as e:
+                logger.error(f"Failed to initialize STT model: {str(e)}")
+                # Fallback to Google Cloud Speech-to-Text if Gemma fails
+                logger.info("Falling back to Google Cloud Speech-to-Text")
+                self._initialized = True
+    
+    def _load_model(self):
+        # Load processor and model
+        self.processor = AutoProcessor.from_pretrained(self.model_name)
+        model = AutoModelForSpeechSeq2Seq.from_pretrained(
+            self.model_name,
+            torch_dtype=torch.float16 if self.device == "cuda" else torch.float32,
+            low_cpu_mem_usage=True
+        )
+        model.to(self.device)
+        model.eval()
+        self.model = model
+    
+    async def warm_up(self):
+        """
+        Load the model and run one forward pass on silence
+        
+        Called at startup (STT_WARMUP_ON_STARTUP) so the first user does not
+        pay for the model load, weight paging and kernel selection.
+        """
+        await self.initialize()
+        if not (self.model and self.processor):
+            return
+        
         try:
-            logger.info("Initializing Gemma 3n STT model...")
-            
-            # Load processor and model
-            self.processor = AutoProcessor.from_pretrained(self.model_name)
-            self.model = AutoModelForSpeechSeq2Seq.from_pretrained(
-                self.model_name,
-                torch_dtype=torch.float16 if self.device == "cuda" else torch.float32,
-                low_cpu_mem_usage=True
-            )
-            self.model.to(self.device)
-            
-            self._initialized = True
-            logger.info("STT model initialized successfully")
-            
+            silence = np.zeros(self.sample_rate, dtype=np.float32)
+            await self.batcher.submit((silence, None))
+            logger.info("STT model warmed up")
         except Exception as e:
-            logger.error(f"Failed to initialize STT model: {str(e)}")
-            # Fallback to Google Cloud Speech-to-Text if Gemma fails
-            logger.info("Falling back to Google Cloud Speech-to-Text")
-            self._initialized = True
+            logger.warning(f"STT warm-up failed: {str(e)}")
     
     async def transcribe_audio(
         self,
@@ -81,28 +119,19 @@ class SpeechToTextService:
         try:
             await self.initialize()
             
-            # Save audio to temporary file for processing
-            with tempfile.NamedTemporaryFile(suffix=f".{format}", delete=False) as tmp_file:
-                tmp_file.write(audio_data)
-                tmp_path = tmp_file.name
+            # Use Gemma model if available
+            if self.model and self.processor:
+                # Decoding and resampling run off the event loop
+                audio_array = await asyncio.get_running_loop().run_in_executor(
+                    None, self._preprocess_audio, audio_data, format
+                )
+                result = await self._transcribe_with_gemma(audio_array, language_code)
+            else:
+                # Fallback to Google Cloud Speech
+                result = await self._transcribe_with_google_cloud(audio_data, language_code)
+            
+            return result
             
-            try:
-                # Process audio according to Gemma requirements
-                audio_array = self._preprocess_audio(tmp_path)
-                
-                # Use Gemma model if available
-                if self.model and self.processor:
-                    result = await self._transcribe_with_gemma(audio_array, language_code)
-                else:
-                    # Fallback to Google Cloud Speech
-                    result = await self._transcribe_with_google_cloud(audio_data, language_code)
-                
-                return result
-                
-            finally:
-                # Clean up temporary file
-                os.unlink(tmp_path)
-                
         except Exception as e:
             logger.error(f"Transcription error: {str(e)}")
             return {
@@ -111,36 +140,18 @@ class SpeechToTextService:
                 "transcript": ""
             }
     
-    def _preprocess_audio(self, audio_path: str) -> np.ndarray:
+    def _preprocess_audio(self, audio_data: bytes, format: str = "wav") -> np.ndarray:
         """
         Preprocess audio to match Gemma requirements:
         - 16kHz sample rate
         - Single channel (mono)
         - Float32 in range [-1, 1]
+        - At most max_duration seconds
+        
+        Decoded from memory, without a temporary file.
         """
         try:
-            # Load audio
-            audio, sr = librosa.load(audio_path, sr=None, mono=False)
-            
-            # Convert to mono if stereo
-            if len(audio.shape) > 1:
-                audio = librosa.to_mono(audio)
-            
-            # Resample to 16kHz if needed
-            if sr != self.sample_rate:
-                audio = librosa.resample(audio, orig_sr=sr, target_sr=self.sample_rate)
-            
-            # Ensure float32 and normalize to [-1, 1]
-            audio = audio.astype(np.float32)
-            if audio.max() > 1.0 or audio.min() < -1.0:
-                audio = audio / np.max(np.abs(audio))
-            
-            # Limit duration to 30 seconds
-            max_samples = self.sample_rate * self.max_duration
-            if len(audio) > max_samples:
-                audio = audio[:max_samples]
-            
-            return audio
+            return load_audio(audio_data, format, self.sample_rate, self.max_duration)
             
         except Exception as e:
             logger.error(f"Audio preprocessing error: {str(e)}")
@@ -153,34 +164,8 @@ class SpeechToTextService:
     ) -> Dict[str, Any]:
         """Transcribe using Gemma 3n model"""
         try:
-            # Run in thread pool to avoid blocking
-            loop = asyncio.get_event_loop()
-            
-            def _process():
-                # Process audio with model
-                inputs = self.processor(
-                    audio_array,
-                    sampling_rate=self.sample_rate,
-                    return_tensors="pt"
-                ).to(self.device)
-                
-                # Generate transcription
-                with torch.no_grad():
-                    generated_ids = self.model.generate(
-                        inputs.input_features,
-                        max_length=225,
-                        language=language_code
-                    )
-                
-                # Decode to text
-                transcription = self.processor.batch_decode(
-                    generated_ids,
-                    skip_special_tokens=True
-                )[0]
-                
-                return transcription
-            
-            transcript = await loop.run_in_executor(None, _process)
+            # Batched with concurrent requests, run in the batcher's thread
+            transcript = await self.batcher.submit((audio_array, language_code))
             
             return {
                 "success": True,
@@ -195,6 +180,48 @@ class SpeechToTextService:
             logger.error(f"Gemma transcription error: {str(e)}")
             raise
     
+    def _transcribe_batch(self, items: List[Tuple[np.ndarray, Optional[str]]]) -> List[str]:
+        """
+        One forward pass per language for a batch of requests
+        
+        Args:
+            items: (audio, language_code) pairs
+            
+        Returns:
+            Transcripts, in the order of items
+        """
+        transcripts: List[Optional[str]] = [None] * len(items)
+        by_language: Dict[Optional[str], List[int]] = {}
+        for index, (_, language_code) in enumerate(items):
+            by_language.setdefault(language_code, []).append(index)
+        
+        for language_code, indexes in by_language.items():
+            # Process audio with model; shorter clips are padded
+            inputs = self.processor(
+                [items[i][0] for i in indexes],
+                sampling_rate=self.sample_rate,
+                return_tensors="pt",
+                padding=True
+            ).to(self.device)
+            
+            # Generate transcription
+            with torch.inference_mode():
+                generated_ids = self.model.generate(
+                    inputs.input_features,
+                    max_length=225,
+                    language=language_code
+                )
+            
+            # Decode to text
+            decoded = self.processor.batch_decode(
+                generated_ids,
+                skip_special_tokens=True
+            )
+            for i, text in zip(indexes, decoded):
+                transcripts[i] = text
+        
+        return transcripts
+    
     async def _transcribe_with_google_cloud(
         self,
         audio_data: bytes,
@@ -242,24 +269,69 @@ class SpeechToTextService:
     async def transcribe_stream(
         self,
         audio_stream,
-        language_code: Optional[str] = None
+        language_code: Optional[str] = None,
+        sample_rate: Optional[int] = None
     ):
         """
         Transcribe audio stream in real-time
         
+        Utterances are cut by voice activity detection; partial hypotheses
+        are produced while the user speaks and a final transcript once an
+        utterance is followed by silence.
+        
         Args:
-            audio_stream: Async generator yielding audio chunks
+            audio_stream: Async iterator of 16-bit little-endian mono PCM chunks
             language_code: Optional language hint
+            sample_rate: Sample rate of the PCM (16 kHz by default)
             
         Yields:
-            Partial transcription results
+            speech_start, partial and final events (see StreamingTranscriber)
         """
-        # This would implement streaming transcription
-        # For now, placeholder
-        yield {
-            "partial": True,
-            "transcript": "Streaming transcription not yet implemented"
-        }
+        await self.initialize()
+        source_rate = sample_rate or self.sample_rate
+        events: asyncio.Queue = asyncio.Queue()
+        
+        async def transcribe(audio: np.ndarray) -> str:
+            return await self._transcribe_segment(audio, source_rate, language_code)
+        
+        transcriber = StreamingTranscriber(transcribe, events.put, sample_rate=source_rate)
+        
+        async def pump():
+            try:
+                async for chunk in audio_stream:
+                    await transcriber.feed(chunk)
+                await transcriber.finish()
+            finally:
+                await events.put(None)
+        
+        task = asyncio.create_task(pump())
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                yield event
+            # Surface errors of the audio stream
+            await task
+        finally:
+            if not task.done():
+                task.cancel()
+    
+    async def _transcribe_segment(
+        self,
+        audio: np.ndarray,
+        source_rate: int,
+        language_code: Optional[str] = None
+    ) -> str:
+        """Transcript of one utterance of a stream"""
+        audio = resample(audio, source_rate, self.sample_rate)
+        if self.model and self.processor:
+            return await self.batcher.submit((audio, language_code))
+        
+        # Google Cloud expects LINEAR16 at the service sample rate
+        pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+        result = await self._transcribe_with_google_cloud(pcm, language_code)
+        return result["transcript"]
     
     def get_supported_languages(self) -> Dict[str, str]:
         """Get list of supported languages"""
@@ -12,6 +12,7 @@ from google.cloud import texttospeech
 from google.oauth2 import service_account
 
 from app.core.config import get_settings
+from app.services.tts_cache import get_tts_cache
 
 logger = logging.getLogger(__name__)
 
@@ -89,9 +90,6 @@ class TextToSpeechService:
         try:
             await self.initialize()
             
-            # Prepare synthesis input
-            synthesis_input = texttospeech.SynthesisInput(text=text)
-            
             # Configure voice
             if voice_name:
                 voice = texttospeech.VoiceSelectionParams(
@@ -111,19 +109,42 @@ class TextToSpeechService:
                 pitch=pitch
             )
             
-            # Perform synthesis
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                self.client.synthesize_speech,
-                synthesis_input,
-                voice,
-                audio_config
-            )
+            async def synthesize(sentence: str) -> bytes:
+                # Perform synthesis
+                loop = asyncio.get_event_loop()
+                response = await loop.run_in_executor(
+                    None,
+                    self.client.synthesize_speech,
+                    texttospeech.SynthesisInput(text=sentence),
+                    voice,
+                    audio_config
+                )
+                return response.audio_content
+            
+            cache_hits = 0
+            if self.settings.TTS_CACHE_ENABLED:
+                # Repeated sentences (greetings, confirmations, deadline phrasing) come from disk
+                cached = await get_tts_cache().synthesize(
+                    text,
+                    synthesize,
+                    audio_encoding.value,
+                    split=self.settings.TTS_CACHE_SPLIT_SENTENCES,
+                    provider="google",
+                    voice=voice_name,
+                    language=language_code,
+                    gender=gender.value,
+                    speaking_rate=speaking_rate,
+                    pitch=pitch
+                )
+                audio_content = cached["audio_content"]
+                cache_hits = cached["cache_hits"]
+            else:
+                audio_content = await synthesize(text)
             
             return {
                 "success": True,
-                "audio_content": response.audio_content,
+                "audio_content": audio_content,
+                "cache_hits": cache_hits,
                 "text_length": len(text),
                 "language": language_code,
                 "voice": voice_name or f"{language_code}-{gender.value}",
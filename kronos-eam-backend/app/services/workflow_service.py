@@ -76,12 +76,12 @@ class WorkflowService:
             )
             self._update_task_dependencies(source, task_mapping)
         
+        # Log the copy operation in the same transaction
+        self._log_workflow_copy(copy, source, user_id, tenant_id, copy_tasks, copy_documents, note)
+        
         self.db.commit()
         self.db.refresh(copy)
         
-        # Log the copy operation
-        self._log_workflow_copy(copy, source, user_id, tenant_id, copy_tasks, copy_documents, note)
-        
         return copy
     
     def create_sub_workflow(
@@ -130,11 +130,14 @@ class WorkflowService:
         if template_id:
             self._apply_template_to_workflow(sub_workflow, template_id)
         
+        # Log creation in the same transaction
+        self.db.flush()
+        self._log_sub_workflow_creation(sub_workflow, parent_workflow_id, user_id, tenant_id)
+        
         self.db.commit()
         self.db.refresh(sub_workflow)
         
-        # Log creation and create tracking task
-        self._log_sub_workflow_creation(sub_workflow, parent_workflow_id, user_id, tenant_id)
+        # Create tracking task
         self._create_sub_workflow_tracking_task(
             parent_workflow_id, sub_workflow, nome, user_id, tenant_id
         )
@@ -388,10 +391,7 @@ class WorkflowService:
             # Copy tasks to sub-workflow
             self._copy_tasks_to_workflow(source_workflow, sub_workflow)
         
-        self.db.commit()
-        self.db.refresh(merged)
-        
-        # Log the merge
+        # Log the merge in the same transaction
         self.audit_service.log_change(
             entity_type="workflow",
             entity_id=merged.id,
@@ -406,6 +406,9 @@ class WorkflowService:
             note=f"Merged {len(workflows)} workflows into composite workflow"
         )
         
+        self.db.commit()
+        self.db.refresh(merged)
+        
         return merged
     
     def _adjust_due_date(self, original_date: Optional[datetime]) -> Optional[datetime]:
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Audit Log Archival Job for Kronos EAM
+Creates upcoming monthly audit_logs partitions and moves months older than
+AUDIT_HOT_MONTHS to compressed Parquet files under AUDIT_ARCHIVE_PATH.
+Meant to run daily from cron or a scheduler.
+"""
+
+import sys
+import argparse
+import logging
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.config import settings
+from app.core.database import get_db_context
+from app.services.audit_archive_service import AuditArchiveService
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain and archive audit log partitions")
+    parser.add_argument("--hot-months", type=int, default=settings.AUDIT_HOT_MONTHS,
+                        help="Months to keep in the database")
+    parser.add_argument("--months-ahead", type=int, default=settings.AUDIT_PARTITION_MONTHS_AHEAD,
+                        help="Future monthly partitions to create")
+    parser.add_argument("--skip-archive", action="store_true",
+                        help="Only create partitions")
+    args = parser.parse_args()
+
+    with get_db_context() as db:
+        service = AuditArchiveService(db)
+
+        created = service.ensure_partitions(args.months_ahead)
+        logger.info(f"Partitions created: {len(created)}")
+
+        if args.skip_archive:
+            return
+
+        archives = service.archive_cold_partitions(args.hot_months)
+        for archive in archives:
+            logger.info(
+                f"Archived {archive.period_start:%Y-%m}: {archive.row_count} rows, "
+                f"{archive.size_bytes} bytes -> {archive.file_path}"
+            )
+        logger.info(f"Months archived: {len(archives)}")
+
+
+if __name__ == "__main__":
+    main()
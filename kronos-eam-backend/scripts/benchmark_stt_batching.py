@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+STT Batching Benchmark for Kronos EAM
+Runs the speech-to-text request path (in-memory decode, resampling, dynamic
+batching) on CPU against a tiny stand-in model shaped like an
+encoder-decoder (one encoder pass, then sequential decoder steps whose
+cost barely grows with the batch), and reports throughput and latency
+percentiles at several concurrency levels, unbatched and batched.
+"""
+
+import sys
+import io
+import time
+import wave
+import asyncio
+import argparse
+import logging
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.audio import load_audio
+from app.core.batching import DynamicBatcher
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+
+
+class TinyStandInModel:
+    """Log-energy frames, a dense encoder and `steps` greedy decoder steps"""
+
+    def __init__(self, hidden: int = 1024, steps: int = 96, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.frame = 400  # 25 ms windows
+        self.hop = 640  # 40 ms: 10 ms frames after the usual 4x subsampling
+        self.encoder = (rng.standard_normal((self.frame, hidden)) / np.sqrt(self.frame)).astype(np.float32)
+        self.decoder = (rng.standard_normal((hidden, hidden)) / np.sqrt(hidden)).astype(np.float32)
+        self.steps = steps
+
+    def __call__(self, batch):
+        frames = []
+        for audio, _ in batch:
+            count = 1 + max(0, len(audio) - self.frame) // self.hop
+            index = np.arange(self.frame)[None, :] + self.hop * np.arange(count)[:, None]
+            frames.append(np.log1p(np.abs(np.pad(audio, (0, self.frame))[index])))
+        longest = max(len(f) for f in frames)
+        padded = np.stack([np.pad(f, ((0, longest - len(f)), (0, 0))) for f in frames])
+
+        state = np.tanh(padded @ self.encoder).mean(axis=1)
+        tokens = []
+        for _ in range(self.steps):
+            state = np.tanh(state @ self.decoder)
+            tokens.append(state.argmax(axis=1))
+        return [" ".join(f"t{token}" for token in row) for row in np.stack(tokens, axis=1)]
+
+
+def sample_upload(seconds: float) -> bytes:
+    """Stereo 44.1 kHz WAV, like a browser recording"""
+    t = np.arange(int(44100 * seconds)) / 44100
+    voice = 0.3 * np.sin(2 * np.pi * 220 * t) * (1 + np.sin(2 * np.pi * 3 * t))
+    stereo = (np.stack([voice, voice], axis=1) * 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(2)
+        wav.setsampwidth(2)
+        wav.setframerate(44100)
+        wav.writeframes(stereo.tobytes())
+    return buffer.getvalue()
+
+
+async def run_level(model, upload: bytes, concurrency: int, requests: int, max_batch_size: int, max_wait_ms: float):
+    batcher = DynamicBatcher(model, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    loop = asyncio.get_running_loop()
+    latencies = []
+    pending = iter(range(requests))
+
+    async def client():
+        for _ in pending:
+            start = time.perf_counter()
+            audio = await loop.run_in_executor(None, load_audio, upload, "wav", SAMPLE_RATE, 30)
+            await batcher.submit((audio, "it-IT"))
+            latencies.append(time.perf_counter() - start)
+
+    # Warm-up pass, not measured
+    await batcher.submit((np.zeros(SAMPLE_RATE, dtype=np.float32), None))
+    batcher.batches = batcher.items = 0
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    batcher.executor.shutdown()
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "throughput": requests / elapsed,
+        "p50": float(np.percentile(latencies_ms, 50)),
+        "p99": float(np.percentile(latencies_ms, 99)),
+        "mean_batch": batcher.mean_batch_size,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark STT dynamic batching on CPU with a stand-in model")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--requests", type=int, default=128, help="Requests per level")
+    parser.add_argument("--seconds", type=float, default=4.0, help="Duration of each upload")
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    model = TinyStandInModel()
+    upload = sample_upload(args.seconds)
+
+    print(f"{'mode':<10}{'clients':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'batch':>8}")
+    for concurrency in args.concurrency:
+        for mode, batch_size in (("single", 1), ("batched", args.max_batch_size)):
+            stats = asyncio.run(run_level(model, upload, concurrency, args.requests, batch_size, args.max_wait_ms))
+            print(
+                f"{mode:<10}{concurrency:>8}{stats['throughput']:>10.1f}{stats['p50']:>10.1f}"
+                f"{stats['p99']:>10.1f}{stats['mean_batch']:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
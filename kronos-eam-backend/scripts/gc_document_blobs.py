@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Document Blob Garbage Collection Job for Kronos EAM
+Deletes content-addressed document files no longer referenced by any document
+or version once DOCUMENT_BLOB_GC_GRACE_HOURS have passed. Meant to run
+periodically (e.g. nightly); --reconcile first rebuilds reference counts.
+"""
+
+import sys
+import argparse
+import logging
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.database import get_db_context
+from app.services.document_storage_service import DocumentStorageService
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Garbage-collect unreferenced document blobs")
+    parser.add_argument("--reconcile", action="store_true", help="Rebuild reference counts first")
+    parser.add_argument("--grace-hours", type=int, help="Override DOCUMENT_BLOB_GC_GRACE_HOURS")
+    args = parser.parse_args()
+
+    with get_db_context() as db:
+        service = DocumentStorageService(db)
+        if args.reconcile:
+            corrected = service.reconcile()
+            logger.info(f"Reference counts corrected: {corrected}")
+        stats = service.collect_garbage(grace_hours=args.grace_hours)
+        logger.info(
+            f"Blobs deleted: {stats['blobs_deleted']} ({stats['bytes_freed']} bytes), "
+            f"orphan files: {stats['orphan_files_deleted']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Document Blob Migration Tool for Kronos EAM
+Moves document files stored under per-upload names into the content-addressed
+blob store: identical files collapse into one blob per tenant and documents
+and versions are repointed. Safe to re-run; already migrated rows are skipped.
+Run reconcile afterwards if rows were changed outside the ORM meanwhile.
+"""
+
+import sys
+import argparse
+import logging
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.database import get_db_context
+from app.services.document_storage_service import DocumentStorageService
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate document files to content-addressed storage")
+    parser.add_argument("--tenant", help="Only migrate this tenant")
+    parser.add_argument("--batch-size", type=int, default=100, help="Files per transaction")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be deduplicated")
+    args = parser.parse_args()
+
+    with get_db_context() as db:
+        stats = DocumentStorageService(db).migrate_legacy_files(
+            tenant_id=args.tenant,
+            batch_size=args.batch_size,
+            dry_run=args.dry_run
+        )
+        logger.info(
+            f"Files: {stats['paths']}, rows repointed: {stats['rows']}, "
+            f"duplicates: {stats['deduplicated']} ({stats['bytes_saved']} bytes saved), "
+            f"missing: {stats['missing']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Notification Delivery Worker for Kronos EAM
+Delivers queued email/SMS/push notifications. Any number of workers can run
+against the same database: batches are claimed with FOR UPDATE SKIP LOCKED.
+"""
+
+import sys
+import asyncio
+import argparse
+import logging
+import signal
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.database import SessionLocal
+from app.services.notification_delivery import NotificationDeliveryWorker
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def run(once: bool) -> None:
+    worker = NotificationDeliveryWorker(SessionLocal)
+    try:
+        if once:
+            stats = await worker.drain()
+            logger.info(f"Notification queue drained: {stats}")
+            return
+
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop_event.set)
+
+        logger.info("Notification worker started")
+        await worker.run(stop_event)
+        logger.info("Notification worker stopped")
+    finally:
+        if worker.smtp_pool is not None:
+            await worker.smtp_pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deliver queued notifications")
+    parser.add_argument("--once", action="store_true", help="Drain the queue and exit")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.once))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Change Feed Pruning Job for Kronos EAM
+Deletes change feed events older than CHANGE_FEED_RETENTION_HOURS. Clients
+resuming from a pruned offset receive a reset event and reload their views.
+"""
+
+import sys
+import logging
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.database import get_db_context
+from app.services.change_feed_service import ChangeFeedService
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    with get_db_context() as db:
+        deleted = ChangeFeedService(db).prune()
+        logger.info(f"Pruned {deleted} change feed events")
+
+
+if __name__ == "__main__":
+    main()
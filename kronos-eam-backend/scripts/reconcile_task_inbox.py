@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Task Inbox Reconciliation Job for Kronos EAM
+Rebuilds the per-assignee task inbox counters from the tasks table.
+Meant to run periodically (e.g. nightly) to correct any drift.
+"""
+
+import sys
+import argparse
+import logging
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.database import get_db_context
+from app.services.task_inbox_service import TaskInboxService
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile task inbox counters")
+    parser.add_argument("--tenant", help="Only reconcile this tenant")
+    args = parser.parse_args()
+
+    with get_db_context() as db:
+        buckets = TaskInboxService(db).reconcile(args.tenant)
+        logger.info(f"Buckets written: {buckets}")
+
+
+if __name__ == "__main__":
+    main()
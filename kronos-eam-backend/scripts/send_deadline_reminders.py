@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Deadline Reminder Job for Kronos EAM
+Sends urgent and upcoming deadline reminders for every tenant in one sweep.
+Safe to run frequently and concurrently: each (task, threshold) reminder is
+sent once thanks to the reminder ledger.
+"""
+
+import sys
+import asyncio
+import argparse
+import logging
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.database import get_db_context
+from app.services.reminder_service import DeadlineReminderScheduler
+from app.services import change_feed_service  # noqa: F401  (notification events)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send deadline reminders")
+    parser.add_argument("--tenant", help="Only sweep this tenant")
+    args = parser.parse_args()
+
+    with get_db_context() as db:
+        stats = asyncio.run(DeadlineReminderScheduler(db).run_sweep(tenant_id=args.tenant))
+        logger.info(f"Reminder sweep finished: {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""Shared fixtures: an in-memory database with the full schema."""
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models.base import Base
+
+
+@pytest.fixture
+def engine():
+    # One connection shared by every session, so they all see the same in-memory database
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def expire_on_commit():
+    """Override in a module (or parametrize) to test with instances expired on commit"""
+    return False
+
+
+@pytest.fixture
+def session_factory(engine, expire_on_commit):
+    return sessionmaker(bind=engine, autoflush=False, expire_on_commit=expire_on_commit)
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
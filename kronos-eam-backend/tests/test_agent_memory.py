@@ -0,0 +1,131 @@
+"""Agent memory: bounded LRU/TTL checkpointer, restore from a backing saver, agent pool."""
+
+import gc
+import operator
+import time
+import tracemalloc
+from typing import Annotated, List, TypedDict
+
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import END, StateGraph
+
+from app.core.agent_memory import AgentPool, BoundedMemorySaver
+
+
+class ConversationState(TypedDict):
+    messages: Annotated[List[str], operator.add]
+    turns: Annotated[int, operator.add]
+
+
+def build_graph(checkpointer):
+    def reply(state: ConversationState):
+        return {"messages": [f"risposta {state['turns']}: " + "x" * 512]}
+
+    graph = StateGraph(ConversationState)
+    graph.add_node("reply", reply)
+    graph.set_entry_point("reply")
+    graph.add_edge("reply", END)
+    return graph.compile(checkpointer=checkpointer)
+
+
+def chat(app, thread_id, text="ciao"):
+    config = {"configurable": {"thread_id": thread_id}}
+    return app.invoke({"messages": [text], "turns": 1}, config)
+
+
+def test_thousands_of_conversations_stay_under_the_cap():
+    saver = BoundedMemorySaver(max_threads=200)
+    app = build_graph(saver)
+
+    for n in range(2000):
+        chat(app, f"t{n % 7}:u{n % 50}:maintenance:{n}")
+
+    assert saver.thread_count == 200
+    assert len(saver.storage) <= 200
+    assert {key[0] for key in saver.blobs} <= set(saver.storage)
+    assert {key[0] for key in saver.writes} <= set(saver.storage)
+    assert saver.evictions == 1800
+
+    # 1000 more conversations: memory stays flat (each one holds > 1KB of state,
+    # an unbounded MemorySaver grows by several MB here)
+    tracemalloc.start()
+    for n in range(2000, 2300):
+        # Replace the untraced threads in memory with traced ones first
+        chat(app, f"t1:u{n % 50}:maintenance:{n}")
+    gc.collect()
+    baseline, _ = tracemalloc.get_traced_memory()
+    for n in range(2300, 3300):
+        chat(app, f"t1:u{n % 50}:maintenance:{n}")
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert current - baseline < 256 * 1024
+    assert saver.thread_count == 200
+
+
+def test_recently_used_conversations_survive_eviction():
+    saver = BoundedMemorySaver(max_threads=3)
+    app = build_graph(saver)
+
+    chat(app, "hot")
+    for n in range(10):
+        chat(app, f"cold-{n}")
+        # Touching the hot conversation keeps it at the end of the LRU
+        assert saver.get_tuple({"configurable": {"thread_id": "hot"}}) is not None
+
+    assert chat(app, "hot")["turns"] == 2
+    assert chat(app, "cold-0")["turns"] == 1  # evicted, started over
+
+
+def test_idle_conversations_expire():
+    saver = BoundedMemorySaver(max_threads=100, ttl_seconds=0.05)
+    app = build_graph(saver)
+
+    chat(app, "idle")
+    time.sleep(0.1)
+    chat(app, "active")
+
+    assert saver.thread_count == 1
+    assert chat(app, "idle")["turns"] == 1
+
+
+def test_evicted_conversation_is_restored_from_backing_saver():
+    backing = InMemorySaver()
+    saver = BoundedMemorySaver(max_threads=2, backing=backing)
+    app = build_graph(saver)
+
+    chat(app, "a", "primo")
+    chat(app, "a", "secondo")
+    chat(app, "b")
+    chat(app, "c")
+    assert "a" not in saver.storage
+
+    state = chat(app, "a", "terzo")
+
+    assert saver.restores == 1
+    assert state["turns"] == 3
+    assert [m for m in state["messages"] if not m.startswith("risposta")] == ["primo", "secondo", "terzo"]
+    assert saver.thread_count == 2
+
+
+def test_agent_pool_is_bounded_lru():
+    pool = AgentPool(max_size=64)
+    created = []
+
+    def factory(key):
+        def build():
+            created.append(key)
+            return object()
+        return build
+
+    hot = pool.get(("t1", "u1", "maintenance"), factory(("t1", "u1", "maintenance")))
+    for n in range(5000):
+        key = (f"t{n % 10}", f"u{n}", "compliance")
+        pool.get(key, factory(key))
+        assert pool.get(("t1", "u1", "maintenance"), factory("unexpected")) is hot
+
+    assert len(pool) == 64
+    assert len(created) == 5001
+    assert pool.discard(lambda key: key[0] == "t1") >= 1
+    assert ("t1", "u1", "maintenance") not in pool
@@ -0,0 +1,131 @@
+"""Agent streaming: event order, time to first token, SSE framing."""
+
+import asyncio
+import json
+import time
+from typing import Annotated, Any, AsyncIterator, List, TypedDict
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.tools import tool
+from langgraph.graph import END, StateGraph
+from langgraph.graph.message import add_messages
+from langgraph.prebuilt import ToolNode
+
+from app.services.agent_streaming import format_agent_sse, stream_graph_events
+
+
+TOKEN_DELAY = 0.02
+
+
+class SlowChatModel(BaseChatModel):
+    """Answers with a fixed text, one word every TOKEN_DELAY seconds"""
+
+    answer: str
+
+    @property
+    def _llm_type(self) -> str:
+        return "slow-fake"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.answer))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        for word in self.answer.split(" "):
+            await asyncio.sleep(TOKEN_DELAY)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+@tool
+def stato_impianto(impianto_id: int) -> str:
+    """Stato operativo di un impianto"""
+    return f"Impianto {impianto_id}: in produzione"
+
+
+class State(TypedDict):
+    messages: Annotated[List[BaseMessage], add_messages]
+    result: Any
+
+
+def build_graph(answer: str):
+    llm = SlowChatModel(answer=answer)
+
+    def plan(state: State):
+        call = {"name": "stato_impianto", "args": {"impianto_id": 7}, "id": "call-1"}
+        return {"messages": [AIMessage(content="", tool_calls=[call])]}
+
+    async def respond(state: State):
+        # ainvoke, as the agents do: tokens still reach the event stream
+        reply = await llm.ainvoke(state["messages"])
+        return {"messages": [reply], "result": {"summary": reply.content.strip()}}
+
+    graph = StateGraph(State)
+    graph.add_node("plan", plan)
+    graph.add_node("tools", ToolNode([stato_impianto]))
+    graph.add_node("respond", respond)
+    graph.set_entry_point("plan")
+    graph.add_edge("plan", "tools")
+    graph.add_edge("tools", "respond")
+    graph.add_edge("respond", END)
+    return graph.compile()
+
+
+async def collect(answer: str):
+    app = build_graph(answer)
+    started = time.perf_counter()
+    events = []
+    async for event in stream_graph_events(app, {"messages": [("user", "come va?")]}, {}):
+        events.append((time.perf_counter() - started, event))
+    return events
+
+
+def test_events_arrive_in_graph_order():
+    events = [event for _, event in asyncio.run(collect("tutto regolare oggi"))]
+    kinds = [(e["type"], e.get("node")) for e in events if e["type"] != "token"]
+
+    assert kinds == [
+        ("node_start", "plan"), ("node_end", "plan"),
+        ("node_start", "tools"), ("tool_start", "tools"), ("tool_end", "tools"), ("node_end", "tools"),
+        ("node_start", "respond"), ("node_end", "respond"),
+        ("final", None),
+    ]
+
+    tool_end = next(e for e in events if e["type"] == "tool_end")
+    assert tool_end["tool"] == "stato_impianto"
+    assert tool_end["output"] == "Impianto 7: in produzione"
+
+    tokens = [e for e in events if e["type"] == "token"]
+    assert all(e["node"] == "respond" for e in tokens)
+    assert "".join(e["text"] for e in tokens).strip() == "tutto regolare oggi"
+    # Tokens sit between the start and the end of their node
+    types = [e["type"] for e in events]
+    assert types.index("node_end", types.index("token")) > types.index("token")
+
+    final = events[-1]["state"]
+    assert final["result"] == {"summary": "tutto regolare oggi"}
+
+
+def test_first_token_does_not_wait_for_the_whole_answer():
+    short = asyncio.run(collect("ok"))
+    long = asyncio.run(collect(" ".join(["parola"] * 100)))
+
+    def first_token(events):
+        return next(at for at, e in events if e["type"] == "token")
+
+    # 100 words take ~2s to generate, the first one arrives after one delay
+    assert long[-1][0] > 50 * TOKEN_DELAY
+    assert first_token(long) < 0.5
+    assert first_token(long) < first_token(short) + 0.2
+
+
+def test_sse_frames():
+    frame = format_agent_sse({"type": "token", "node": "respond", "text": "ciao\n"}, 3)
+
+    head, data = frame.rstrip("\n").split("\ndata: ")
+    assert head == "id: 3\nevent: token"
+    assert frame.endswith("\n\n")
+    assert json.loads(data) == {"type": "token", "node": "respond", "text": "ciao\n"}
@@ -0,0 +1,182 @@
+"""Parallel tool node: turn latency, concurrency limit, timeouts and errors."""
+
+import asyncio
+import threading
+import time
+from typing import Any, Dict, List, TypedDict
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.tools import tool
+from langgraph.graph import END, StateGraph
+
+from app.core.agent_tools import ParallelToolNode
+from app.services.agent_streaming import stream_graph_events
+
+
+DELAY = 0.3
+running = {"now": 0, "peak": 0}
+running_lock = threading.Lock()
+
+
+def track(delta):
+    with running_lock:
+        running["now"] += delta
+        running["peak"] = max(running["peak"], running["now"])
+
+
+@tool
+def get_plant_info(plant_id: int, tenant_id: str) -> Dict[str, Any]:
+    """Blocking DB lookup of a plant"""
+    track(1)
+    time.sleep(DELAY)
+    track(-1)
+    return {"id": plant_id, "tenant_id": tenant_id, "nome": "Impianto Nord"}
+
+
+@tool
+def get_maintenance_schedule(impianto_id: int, tenant_id: str, days_ahead: int = 30) -> List[Dict[str, Any]]:
+    """Blocking DB listing of deadlines"""
+    track(1)
+    time.sleep(DELAY)
+    track(-1)
+    return [{"impianto_id": impianto_id, "days_ahead": days_ahead}]
+
+
+@tool
+async def semantic_document_search(query: str, tenant_id: str) -> List[Dict[str, Any]]:
+    """Async RAG search"""
+    track(1)
+    await asyncio.sleep(DELAY)
+    track(-1)
+    return [{"title": f"Risultato per {query}"}]
+
+
+@tool
+async def stuck_tool(query: str) -> str:
+    """Never answers in time"""
+    await asyncio.sleep(10)
+    return "troppo tardi"
+
+
+@tool
+def broken_tool(query: str) -> str:
+    """Always fails"""
+    raise RuntimeError("database non raggiungibile")
+
+
+TOOLS = [get_plant_info, get_maintenance_schedule, semantic_document_search, stuck_tool, broken_tool]
+
+
+def model_turn(*calls):
+    tool_calls = [
+        {"name": name, "args": args, "id": f"call-{n}"} for n, (name, args) in enumerate(calls)
+    ]
+    return {"messages": [HumanMessage(content="stato impianto 7?"), AIMessage(content="", tool_calls=tool_calls)], "context": {}}
+
+
+def run_node(node, state):
+    running.update(now=0, peak=0)
+    started = time.perf_counter()
+    update = asyncio.run(node(state, {}))
+    return update, time.perf_counter() - started
+
+
+def test_turn_latency_is_the_slowest_tool_not_the_sum():
+    node = ParallelToolNode(TOOLS, max_concurrency=4, timeout=5)
+    state = model_turn(
+        ("get_plant_info", {"plant_id": 7, "tenant_id": "t1"}),
+        ("get_maintenance_schedule", {"impianto_id": 7, "tenant_id": "t1"}),
+        ("semantic_document_search", {"query": "inverter", "tenant_id": "t1"}),
+        ("get_plant_info", {"plant_id": 8, "tenant_id": "t1"}),
+    )
+
+    update, elapsed = run_node(node, state)
+
+    # Sequential execution takes 4 * DELAY
+    assert elapsed < 2 * DELAY
+    assert running["peak"] == 4
+    replies = update["messages"][2:]
+    assert [m.tool_call_id for m in replies] == ["call-0", "call-1", "call-2", "call-3"]
+    assert all(isinstance(m, ToolMessage) and m.status == "success" for m in replies)
+    assert '"nome": "Impianto Nord"' in replies[0].content
+
+
+def test_concurrency_limit_per_turn():
+    node = ParallelToolNode(TOOLS, max_concurrency=2, timeout=5)
+    state = model_turn(*[("get_plant_info", {"plant_id": n, "tenant_id": "t1"}) for n in range(4)])
+
+    _, elapsed = run_node(node, state)
+
+    assert running["peak"] == 2
+    assert 2 * DELAY <= elapsed < 3 * DELAY
+
+
+def test_slow_and_failing_tools_do_not_fail_the_turn():
+    node = ParallelToolNode(TOOLS, timeout=DELAY * 2)
+    state = model_turn(
+        ("stuck_tool", {"query": "x"}),
+        ("broken_tool", {"query": "x"}),
+        ("unknown_tool", {}),
+        ("semantic_document_search", {"query": "x", "tenant_id": "t1"}),
+    )
+
+    update, elapsed = run_node(node, state)
+
+    assert elapsed < 3 * DELAY
+    stuck, broken, unknown, ok = update["messages"][2:]
+    assert stuck.status == "error" and "timed out" in stuck.content
+    assert broken.status == "error" and "database non raggiungibile" in broken.content
+    assert unknown.status == "error" and "Unknown tool" in unknown.content
+    assert ok.status == "success"
+
+
+def test_planned_calls_land_in_context():
+    node = ParallelToolNode(TOOLS, timeout=5)
+    state = {
+        "messages": [HumanMessage(content="piano manutenzione")],
+        "context": {"impianto_id": 7, "tool_calls": [
+            {"tool": "get_maintenance_schedule", "args": {"impianto_id": 7, "tenant_id": "t1", "days_ahead": 90}},
+            {"tool": "get_plant_info", "args": {"id": 7, "tenant_id": "t1"}},
+        ]},
+    }
+
+    update, elapsed = run_node(node, state)
+
+    assert elapsed < 2 * DELAY
+    assert "tool_calls" not in update["context"] and update["context"]["impianto_id"] == 7
+    schedule, plant = update["context"]["tool_results"]
+    assert schedule == {
+        "tool_name": "get_maintenance_schedule",
+        "args": {"impianto_id": 7, "tenant_id": "t1", "days_ahead": 90},
+        "output": [{"impianto_id": 7, "days_ahead": 90}],
+    }
+    # Wrong arguments become an error result
+    assert plant["tool_name"] == "get_plant_info" and "error" in plant["output"]
+    assert update["messages"] == state["messages"]
+
+
+class State(TypedDict):
+    messages: List[BaseMessage]
+    context: Dict[str, Any]
+
+
+def test_tool_events_reach_the_stream():
+    graph = StateGraph(State)
+    graph.add_node("tools", ParallelToolNode(TOOLS, timeout=5))
+    graph.set_entry_point("tools")
+    graph.add_edge("tools", END)
+    app = graph.compile()
+    state = model_turn(
+        ("get_plant_info", {"plant_id": 7, "tenant_id": "t1"}),
+        ("semantic_document_search", {"query": "inverter", "tenant_id": "t1"}),
+    )
+
+    async def collect():
+        return [event async for event in stream_graph_events(app, state, {})]
+
+    events = asyncio.run(collect())
+
+    starts = {e["tool"] for e in events if e["type"] == "tool_start"}
+    ends = {e["tool"] for e in events if e["type"] == "tool_end"}
+    assert starts == ends == {"get_plant_info", "semantic_document_search"}
+    assert len(events[-1]["state"]["messages"]) == 4
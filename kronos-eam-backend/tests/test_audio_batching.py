@@ -0,0 +1,143 @@
+"""Speech input path: in-memory decoding, resampling and dynamic batching."""
+
+import asyncio
+import io
+import threading
+import time
+import wave
+
+import numpy as np
+import pytest
+
+from app.core.audio import decode_audio, load_audio, resample
+from app.core.batching import DynamicBatcher
+
+
+def wav_bytes(samples, sample_rate, sample_width=2):
+    """Integer PCM WAV of float samples shaped (frames,) or (frames, channels)"""
+    samples = np.atleast_2d(np.asarray(samples, dtype=np.float64).T).T
+    scale = float(1 << (8 * sample_width - 1)) - 1
+    ints = np.round(samples * scale).astype("<i4")
+    if sample_width == 2:
+        frames = ints.astype("<i2").tobytes()
+    else:
+        frames = b"".join(int(v).to_bytes(3, "little", signed=True) for v in ints.ravel())
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(samples.shape[1])
+        wav.setsampwidth(sample_width)
+        wav.setframerate(sample_rate)
+        wav.writeframes(frames)
+    return buffer.getvalue()
+
+
+def tone(frequency, sample_rate, seconds=1.0, amplitude=0.5):
+    t = np.arange(int(sample_rate * seconds)) / sample_rate
+    return amplitude * np.sin(2 * np.pi * frequency * t)
+
+
+def test_wav_and_raw_pcm_are_decoded_in_memory():
+    stereo = np.stack([tone(440, 44100), -tone(440, 44100)], axis=1)
+    audio, sample_rate = decode_audio(wav_bytes(stereo, 44100), "wav")
+    assert sample_rate == 44100 and audio.shape == (44100, 2) and audio.dtype == np.float32
+    assert np.max(np.abs(audio - stereo)) < 1e-4
+
+    audio, _ = decode_audio(wav_bytes(tone(440, 8000, 0.1), 8000, sample_width=3), "wav")
+    assert np.max(np.abs(audio[:, 0] - tone(440, 8000, 0.1))) < 1e-6
+
+    pcm = (tone(440, 16000) * 32767).astype("<i2").tobytes()
+    audio, sample_rate = decode_audio(pcm, "pcm", raw_sample_rate=16000)
+    assert sample_rate == 16000 and audio.shape == (16000, 1)
+
+    with pytest.raises(ValueError):
+        decode_audio(b"", "wav")
+
+
+@pytest.mark.parametrize("source_rate", [8000, 22050, 44100, 48000])
+def test_resampling_keeps_speech_band_and_removes_aliases(source_rate):
+    resampled = resample(tone(1000, source_rate, amplitude=1.0), source_rate, 16000)
+    expected = tone(1000, 16000, amplitude=1.0)
+
+    assert len(resampled) == 16000
+    # Edges are affected by the filter length only
+    assert np.max(np.abs(resampled[200:-200] - expected[200:-200])) < 1e-3
+
+    if source_rate > 32000:
+        # Above the new Nyquist frequency: filtered out, not folded back
+        aliased = resample(tone(12000, source_rate, amplitude=1.0), source_rate, 16000)
+        assert np.sqrt(np.mean(aliased[200:-200] ** 2)) < 1e-2
+
+
+def test_load_audio_returns_model_input():
+    stereo = np.stack([tone(300, 48000, seconds=3), tone(300, 48000, seconds=3)], axis=1)
+
+    audio = load_audio(wav_bytes(stereo, 48000), "wav", sample_rate=16000, max_duration=2)
+
+    assert audio.dtype == np.float32 and audio.ndim == 1
+    assert len(audio) == 32000
+    assert np.max(np.abs(audio)) <= 1.0
+
+
+class CountingModel:
+    """Batch function with a fixed cost per forward pass"""
+
+    def __init__(self, delay=0.02, fail_on=None):
+        self.delay = delay
+        self.fail_on = fail_on
+        self.batches = []
+        self.threads = set()
+
+    def __call__(self, items):
+        self.threads.add(threading.get_ident())
+        self.batches.append(list(items))
+        time.sleep(self.delay)
+        if self.fail_on in items:
+            raise RuntimeError("out of memory")
+        return [f"testo {item}" for item in items]
+
+
+def test_concurrent_requests_share_forward_passes():
+    model = CountingModel()
+    batcher = DynamicBatcher(model, max_batch_size=8, max_wait_ms=5)
+
+    async def burst():
+        return await asyncio.gather(*(batcher.submit(n) for n in range(32)))
+
+    results = asyncio.run(burst())
+
+    assert results == [f"testo {n}" for n in range(32)]
+    assert len(model.batches) <= 5
+    assert max(len(batch) for batch in model.batches) == 8
+    assert batcher.items == 32 and batcher.mean_batch_size >= 6
+    # Forward passes never overlap
+    assert len(model.threads) == 1
+
+
+def test_a_lone_request_waits_at_most_max_wait():
+    model = CountingModel(delay=0)
+    batcher = DynamicBatcher(model, max_batch_size=8, max_wait_ms=20)
+
+    async def single():
+        start = time.perf_counter()
+        result = await batcher.submit("solo")
+        return result, time.perf_counter() - start
+
+    result, elapsed = asyncio.run(single())
+
+    assert result == "testo solo"
+    assert 0.015 <= elapsed < 0.2
+
+
+def test_a_failing_batch_fails_only_its_requests():
+    model = CountingModel(delay=0.01, fail_on=3)
+    batcher = DynamicBatcher(model, max_batch_size=4, max_wait_ms=5)
+
+    async def burst():
+        first = await asyncio.gather(*(batcher.submit(n) for n in range(4)), return_exceptions=True)
+        second = await asyncio.gather(*(batcher.submit(n) for n in range(10, 14)))
+        return first, second
+
+    first, second = asyncio.run(burst())
+
+    assert all(isinstance(error, RuntimeError) for error in first)
+    assert second == [f"testo {n}" for n in range(10, 14)]
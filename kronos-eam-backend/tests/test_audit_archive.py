@@ -0,0 +1,89 @@
+"""Audit archival: months streamed to Parquet row groups and removed from the database."""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+from app.core.config import settings
+from app.models.audit import AuditLog, AuditLogArchive, TipoModificaEnum
+from app.models.workflow import Workflow
+from app.services.audit_archive_service import AuditArchiveService
+from app.services.audit_service import AuditService
+
+
+@pytest.fixture
+def db(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "AUDIT_ARCHIVE_PATH", str(tmp_path))
+    monkeypatch.setattr(settings, "AUDIT_ARCHIVE_BATCH_SIZE", 3)
+    return db
+
+
+def add_entries(db, month, count, tenant_id="t1"):
+    db.execute(insert(AuditLog), [
+        {
+            "tenant_id": tenant_id, "entity_type": "task", "entity_id": n,
+            "tipo_modifica": TipoModificaEnum.AGGIORNAMENTO, "new_values": {"status": "Completed"},
+            "changed_fields": ["status"], "automatic": 0, "created_at": datetime(2025, month, 1 + n)
+        }
+        for n in range(count)
+    ])
+    db.commit()
+
+
+def test_month_is_written_in_row_groups_and_removed(db, tmp_path):
+    add_entries(db, 3, 7)
+    add_entries(db, 3, 1, tenant_id="t2")
+    add_entries(db, 4, 2)
+    workflow = Workflow(tenant_id="t1", name="Connessione", plant_id=1, progress=0)
+    db.add(workflow)
+    db.commit()
+
+    archive = AuditArchiveService(db).archive_month(datetime(2025, 3, 10))
+
+    assert archive.row_count == 8
+    parquet = pq.ParquetFile(tmp_path / archive.file_path)
+    assert parquet.metadata.num_rows == 8 and parquet.metadata.num_row_groups == 3
+    assert not list(tmp_path.rglob("*.tmp"))
+    # Only the archived month left the table; the caller's objects stay attached
+    assert db.query(AuditLog).count() == 2
+    assert db.query(AuditLogArchive).count() == 1
+    assert workflow in db
+
+    rows = AuditArchiveService(db).read_archived_rows("t1", datetime(2025, 3, 1), datetime(2025, 3, 31))
+    assert [row["entity_id"] for row in rows] == list(range(7))
+    assert rows[0]["new_values"] == {"status": "Completed"} and rows[0]["tipo_modifica"] == "AGGIORNAMENTO"
+
+
+def test_empty_month_writes_no_file(db, tmp_path):
+    assert AuditArchiveService(db).archive_month(datetime(2025, 5, 1)) is None
+    assert not list(tmp_path.rglob("*.parquet*"))
+
+
+def test_audit_reads_continue_into_archived_months(db):
+    add_entries(db, 3, 4)
+    add_entries(db, 4, 3)
+    db.execute(insert(AuditLog), [{
+        "tenant_id": "t1", "entity_type": "document", "entity_id": 1, "utente_id": 7,
+        "tipo_modifica": TipoModificaEnum.ELIMINAZIONE, "changed_fields": [], "automatic": 0,
+        "created_at": datetime(2025, 3, 20)
+    }])
+    db.commit()
+    AuditArchiveService(db).archive_month(datetime(2025, 3, 1))
+    service = AuditService(db)
+
+    # Newest first: April from the table, then March from the archive
+    history = service.get_entity_history("task", 1, "t1")
+    assert [log.created_at for log in history] == [datetime(2025, 4, 2), datetime(2025, 3, 2)]
+    assert history[1].tipo_modifica == TipoModificaEnum.AGGIORNAMENTO and history[1] not in db
+
+    # Pages run across the boundary between table and archive
+    pages = [service.search_audit_logs("t1", {"entity_type": "task", "limit": 2, "offset": n}) for n in (0, 2, 4, 6)]
+    assert [[log.created_at.day for log in page] for page in pages] == [[3, 2], [1, 4], [3, 2], [1]]
+    assert [log.entity_id for log in service.search_audit_logs("t1", {"changed_field": "status", "entity_id": 3})] == [3]
+
+    assert [log.entity_id for log in service.get_user_activity(7, "t1")] == [1]
+    assert [log.entity_type for log in service.get_critical_changes("t1")] == ["document"]
+    assert service.get_user_activity(7, "t1", end_date=datetime(2025, 3, 10)) == []
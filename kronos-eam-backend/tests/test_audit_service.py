@@ -0,0 +1,182 @@
+"""Audit trail: entries written with their unit of work, flush-time diffs and compliance reports."""
+
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.audit_decorator import audit_action
+from app.models.audit import AuditLog, TipoModificaEnum
+from app.models.user import User
+from app.models.workflow import Workflow
+from app.services.audit_service import AuditService, _compliance_report_cache
+
+
+def make_workflow(db, tenant_id="t1"):
+    workflow = Workflow(tenant_id=tenant_id, name="Connessione", plant_id=1, progress=0)
+    db.add(workflow)
+    db.commit()
+    return workflow
+
+
+def audit_count(session_factory):
+    with session_factory() as db:
+        return db.query(AuditLog).count()
+
+
+def test_entries_are_committed_with_the_change(session_factory):
+    with session_factory() as db:
+        workflow = make_workflow(db)
+        workflow.progress = 50
+        AuditService(db).log_change("workflow", workflow.id, TipoModificaEnum.AGGIORNAMENTO, tenant_id="t1")
+        # Buffered until the commit of the change
+        assert audit_count(session_factory) == 0
+        db.commit()
+
+    assert audit_count(session_factory) == 1
+
+    with session_factory() as db:
+        db.get(Workflow, workflow.id).progress = 80
+        AuditService(db).log_change("workflow", workflow.id, TipoModificaEnum.AGGIORNAMENTO, tenant_id="t1")
+        db.rollback()
+        db.commit()
+
+    assert audit_count(session_factory) == 1
+
+
+def test_decorated_handlers_that_commit_keep_their_entry(session_factory):
+    user = SimpleNamespace(id=3, tenant_id="t1")
+
+    @audit_action("workflow", TipoModificaEnum.AGGIORNAMENTO)
+    async def update_workflow(id, db, current_user):
+        db.get(Workflow, id).progress = 90
+        db.commit()
+        return id
+
+    with session_factory() as db:
+        workflow_id = make_workflow(db).id
+
+    with session_factory() as db:
+        asyncio.run(update_workflow(id=workflow_id, db=db, current_user=user))
+
+    with session_factory() as db:
+        entry = db.query(AuditLog).one()
+        assert (entry.entity_id, entry.utente_id) == (workflow_id, 3)
+
+
+def test_tracked_entities_record_only_modified_columns(session_factory):
+    with session_factory() as db:
+        workflow = make_workflow(db)
+        workflow.description = "Pratica"
+        db.commit()
+
+        service = AuditService(db)
+        service.track_entity(Workflow, workflow.id)
+        workflow.progress = 40
+        workflow.name = "Connessione"  # Same value: no history
+        workflow.description = "Pratica GSE"
+        db.flush()
+        workflow.progress = 70
+        workflow.description = "Pratica"  # Back to the original value
+
+        changes = service.pop_entity_changes(Workflow, workflow.id)
+
+    assert changes["changed_fields"] == ["progress"]
+    # Value from before the first flush, latest value after the last one
+    assert changes["old_values"] == {"progress": 0}
+    assert changes["new_values"] == {"progress": 70}
+    assert service.pop_entity_changes(Workflow, workflow.id) is None
+
+
+def test_untracked_entities_are_not_captured(session_factory):
+    with session_factory() as db:
+        tracked, other = make_workflow(db), make_workflow(db)
+        service = AuditService(db)
+        service.track_entity(Workflow, tracked.id)
+        other.progress = 10
+        db.flush()
+
+        assert service.pop_entity_changes(Workflow, tracked.id)["changed_fields"] == []
+
+
+@pytest.fixture
+def report_db(session_factory):
+    _compliance_report_cache.clear()
+    with session_factory() as db:
+        db.add_all([
+            User(id=1, tenant_id="t1", email="anna@example.com", name="Anna", password_hash="x"),
+            User(id=2, tenant_id="t1", email="luca@example.com", name="Luca", password_hash="x"),
+        ])
+        db.commit()
+        yield db
+    _compliance_report_cache.clear()
+
+
+def add_log(db, created_at, entity_type="task", tipo=TipoModificaEnum.AGGIORNAMENTO, user_id=1,
+            automatic=False, tenant_id="t1"):
+    AuditService(db).log_changes_bulk([{
+        "entity_type": entity_type, "entity_id": 1, "tipo_modifica": tipo, "user_id": user_id,
+        "tenant_id": tenant_id, "automatic": automatic, "created_at": created_at
+    }])
+    db.commit()
+
+
+def test_compliance_report_matches_per_row_counts(report_db):
+    start = datetime(2025, 1, 1)
+    kinds = [
+        ("task", TipoModificaEnum.AGGIORNAMENTO, 1, False),
+        ("task", TipoModificaEnum.RESPONSABILE_CAMBIO, 2, False),
+        ("document", TipoModificaEnum.CREAZIONE, 1, True),
+        ("workflow", TipoModificaEnum.ELIMINAZIONE, None, True),
+        ("impianto", TipoModificaEnum.STATO_CAMBIO, 2, False),
+    ]
+    for n in range(20):
+        entity_type, tipo, user_id, automatic = kinds[n % len(kinds)]
+        add_log(report_db, start + timedelta(days=n), entity_type, tipo, user_id, automatic)
+    add_log(report_db, start + timedelta(days=25), user_id=2)
+    add_log(report_db, start + timedelta(days=3), tenant_id="t2")
+    add_log(report_db, start + timedelta(days=40))
+
+    end = start + timedelta(days=30)
+    report = AuditService(report_db).get_compliance_report("t1", start, end)
+
+    rows = report_db.query(AuditLog).filter(
+        AuditLog.tenant_id == "t1", AuditLog.created_at >= start, AuditLog.created_at <= end
+    ).all()
+    assert report["summary"] == {
+        "total_changes": len(rows),
+        "critical_changes": sum(1 for row in rows if row.is_critical_change),
+        "automatic_changes": sum(1 for row in rows if row.automatic),
+        "manual_changes": sum(1 for row in rows if not row.automatic),
+    }
+    assert report["changes_by_type"] == {
+        tipo.value: sum(1 for row in rows if row.tipo_modifica == tipo) for tipo in TipoModificaEnum
+    }
+    assert report["changes_by_entity"] == dict(Counter(row.entity_type for row in rows))
+    assert [(u["user_email"], u["change_count"]) for u in report["most_active_users"]] == [
+        ("luca@example.com", 9), ("anna@example.com", 8)
+    ]
+
+
+def test_closed_periods_are_cached_and_open_ones_recomputed(report_db):
+    closed_start, closed_end = datetime(2025, 1, 1), datetime(2025, 1, 31)
+    add_log(report_db, datetime(2025, 1, 10))
+    service = AuditService(report_db)
+
+    first = service.get_compliance_report("t1", closed_start, closed_end)
+    add_log(report_db, datetime(2025, 1, 11))
+    again = service.get_compliance_report("t1", closed_start, closed_end)
+
+    assert first["summary"]["total_changes"] == again["summary"]["total_changes"] == 1
+    assert again == first
+    # Cached copies are not shared with callers
+    again["summary"]["total_changes"] = 99
+    assert service.get_compliance_report("t1", closed_start, closed_end)["summary"]["total_changes"] == 1
+
+    open_start, open_end = datetime.utcnow() - timedelta(days=1), datetime.utcnow() + timedelta(days=1)
+    add_log(report_db, datetime.utcnow())
+    assert service.get_compliance_report("t1", open_start, open_end)["summary"]["total_changes"] == 1
+    add_log(report_db, datetime.utcnow())
+    assert service.get_compliance_report("t1", open_start, open_end)["summary"]["total_changes"] == 2
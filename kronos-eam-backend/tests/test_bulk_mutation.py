@@ -0,0 +1,135 @@
+"""Set-based bulk mutations: grouped updates, per-row results and audit entries."""
+
+import pytest
+
+from app.models.audit import AuditLog, TipoModificaEnum
+from app.models.plant import Plant, PlantStatusEnum, PlantTypeEnum
+from app.models.user import User
+from app.models.workflow import (
+    Workflow, WorkflowTask, TaskStatusEnum, TaskPriorityEnum, ActionStatusEnum
+)
+from app.services.bulk_mutation_service import BulkMutationService
+
+
+def make_tasks(db, count, tenant_id="t1", **kwargs):
+    workflow = Workflow(tenant_id=tenant_id, name="Connessione", plant_id=1, progress=0)
+    db.add(workflow)
+    db.flush()
+    tasks = [
+        WorkflowTask(
+            tenant_id=tenant_id, workflow_id=workflow.id, title=f"Task {n}",
+            status=TaskStatusEnum.TO_START, priority=TaskPriorityEnum.MEDIUM, **kwargs
+        )
+        for n in range(count)
+    ]
+    db.add_all(tasks)
+    db.commit()
+    return [task.id for task in tasks]
+
+
+def make_plant(db, code, tenant_id="t1", **kwargs):
+    plant = Plant(
+        tenant_id=tenant_id, name=kwargs.pop("name", f"Impianto {code}"), code=code, power="1 MW",
+        power_kw=kwargs.pop("power_kw", 1000.0), status=PlantStatusEnum.IN_OPERATION,
+        type=PlantTypeEnum.PHOTOVOLTAIC, location="Bari", **kwargs
+    )
+    db.add(plant)
+    db.commit()
+    return plant.id
+
+
+def audit_rows(db, entity_type):
+    return db.query(AuditLog).filter(AuditLog.entity_type == entity_type).order_by(AuditLog.id).all()
+
+
+def test_tasks_are_updated_in_one_pass_with_per_row_results(db):
+    db.add(User(tenant_id="t1", email="anna@example.com", name="Anna", password_hash="x"))
+    task_ids = make_tasks(db, 3)
+    other_tenant = make_tasks(db, 1, tenant_id="t2")
+    db.query(WorkflowTask).filter(WorkflowTask.id == task_ids[2]).update(
+        {"status": TaskStatusEnum.COMPLETED, "assignee": "anna@example.com"}
+    )
+    db.commit()
+
+    summary = BulkMutationService(db).bulk_update_tasks(
+        task_ids + other_tenant + [9999], user_id=1, tenant_id="t1",
+        status=TaskStatusEnum.COMPLETED, assignee="anna@example.com", note="Chiusura"
+    )
+
+    assert summary["updated_count"] == 2 and summary["unchanged_count"] == 1
+    assert summary["failed_ids"] == [other_tenant[0], 9999] and not summary["success"]
+    assert [r["status"] for r in summary["results"]] == ["updated", "updated", "unchanged", "not_found", "not_found"]
+    assert summary["results"][0]["changed_fields"] == ["status", "assignee"]
+
+    db.expire_all()
+    first = db.get(WorkflowTask, task_ids[0])
+    assert first.status == TaskStatusEnum.COMPLETED and first.assignee == "anna@example.com"
+    assert first.action_status == ActionStatusEnum.COMPLETED and first.completed_date is not None
+    assert db.get(WorkflowTask, other_tenant[0]).status == TaskStatusEnum.TO_START
+
+    rows = audit_rows(db, "task")
+    # One assignment and one update entry per changed task
+    assert [(row.entity_id, row.tipo_modifica) for row in rows] == [
+        (task_ids[0], TipoModificaEnum.RESPONSABILE_CAMBIO), (task_ids[0], TipoModificaEnum.AGGIORNAMENTO),
+        (task_ids[1], TipoModificaEnum.RESPONSABILE_CAMBIO), (task_ids[1], TipoModificaEnum.AGGIORNAMENTO),
+    ]
+    update_entry = rows[1]
+    assert update_entry.old_values == {"status": "To Start", "priority": "Medium", "assignee": None}
+    assert update_entry.new_values == {"status": "Completed", "priority": "Medium", "assignee": "anna@example.com"}
+    assert update_entry.changed_fields == ["status", "assignee"]
+    assert update_entry.note == "Chiusura" and update_entry.dettaglio_modifica == {"bulk": True}
+
+
+def test_invalid_task_batches_write_nothing(db):
+    task_ids = make_tasks(db, 2)
+    service = BulkMutationService(db)
+
+    with pytest.raises(ValueError):
+        service.bulk_update_tasks(task_ids, user_id=1, tenant_id="t1")
+    with pytest.raises(ValueError):
+        service.bulk_update_tasks(task_ids, user_id=1, tenant_id="t1", assignee="nessuno@example.com")
+
+    assert audit_rows(db, "task") == []
+
+
+def test_plant_updates_record_only_the_fields_that_change(db):
+    first = make_plant(db, "P1", municipality="Bari")
+    second = make_plant(db, "P2", municipality="Lecce")
+    unchanged = make_plant(db, "P3", municipality="Taranto")
+
+    summary = BulkMutationService(db).bulk_update_plants([
+        {"id": first, "update_data": {"municipality": "Bari", "power_kw": 1500.0}},
+        {"id": second, "update_data": {"municipality": "Brindisi", "status": "Decommissioned"}},
+        {"id": unchanged, "update_data": {"municipality": "Taranto"}},
+        {"id": 9999, "update_data": {"municipality": "Foggia"}},
+    ], user_id="7", tenant_id="t1")
+
+    assert [(r["status"], r.get("changed_fields")) for r in summary["results"]] == [
+        ("updated", ["power_kw"]),
+        ("updated", ["municipality", "status"]),
+        ("unchanged", []),
+        ("not_found", None),
+    ]
+
+    db.expire_all()
+    assert db.get(Plant, first).power_kw == 1500.0
+    assert db.get(Plant, second).status == PlantStatusEnum.DECOMMISSIONED
+    assert db.get(Plant, second).updated_by == "7"
+    assert db.get(Plant, unchanged).updated_by is None
+
+    rows = audit_rows(db, "impianto")
+    assert [row.entity_id for row in rows] == [first, second]
+    assert rows[0].changed_fields == ["power_kw"]
+    assert rows[0].old_values == {"power_kw": 1000.0} and rows[0].new_values == {"power_kw": 1500.0}
+    assert rows[1].old_values == {"municipality": "Lecce", "status": "In Operation"}
+    assert rows[1].new_values == {"municipality": "Brindisi", "status": "Decommissioned"}
+    assert rows[1].utente_id == 7
+
+
+def test_plant_batches_reject_protected_fields(db):
+    plant_id = make_plant(db, "P1")
+
+    with pytest.raises(ValueError, match="tenant_id"):
+        BulkMutationService(db).bulk_update_plants(
+            [{"id": plant_id, "update_data": {"tenant_id": "t2"}}], user_id="7", tenant_id="t1"
+        )
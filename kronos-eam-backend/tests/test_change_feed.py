@@ -0,0 +1,219 @@
+"""Change feed: events captured at flush, resume from offset, live streaming."""
+
+import asyncio
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.security import create_access_token, get_current_active_stream_user
+from app.models.change_feed import ChangeEvent
+from app.models.notification import Notification, NotificationTypeEnum
+from app.models.user import User, UserStatusEnum
+from app.models.workflow import Workflow, WorkflowTask, TaskStatusEnum
+from app.services.change_feed_service import (
+    ChangeFeedService, emit_change, format_sse, stream_changes
+)
+
+
+def make_task(session_factory, tenant_id="t1"):
+    with session_factory() as db:
+        workflow = Workflow(tenant_id=tenant_id, name="Connessione", plant_id=1, progress=0)
+        db.add(workflow)
+        db.flush()
+        task = WorkflowTask(
+            tenant_id=tenant_id, workflow_id=workflow.id, title="Invio pratica",
+            status=TaskStatusEnum.TO_START
+        )
+        db.add(task)
+        db.commit()
+        return workflow.id, task.id
+
+
+def test_orm_changes_become_typed_events(session_factory):
+    workflow_id, task_id = make_task(session_factory)
+
+    with session_factory() as db:
+        task = db.get(WorkflowTask, task_id)
+        task.status = TaskStatusEnum.COMPLETED
+        db.get(Workflow, workflow_id).progress = 100
+        db.add_all([
+            Notification(tenant_id="t1", user_id=7, tipo=NotificationTypeEnum.TASK,
+                         titolo=f"N{i}", messaggio="m")
+            for i in range(25)
+        ])
+        db.commit()
+
+        page = ChangeFeedService(db).read("t1", user_id=7, offset=0)
+
+    by_type = {event["type"]: event for event in page["events"]}
+    assert set(by_type) == {"task.status_changed", "workflow.progress", "notification.created"}
+    assert by_type["task.status_changed"]["entity_id"] == task_id
+    assert by_type["task.status_changed"]["data"]["new"] == TaskStatusEnum.COMPLETED.value
+    assert "dashboard.metrics" in by_type["task.status_changed"]["widgets"]
+    assert by_type["workflow.progress"]["data"]["progress"] == 100
+    # Many notifications in one flush produce one event for the user
+    assert by_type["notification.created"]["user_id"] == 7
+
+
+def test_rolled_back_changes_are_not_recorded(session_factory):
+    _, task_id = make_task(session_factory)
+
+    with session_factory() as db:
+        db.get(WorkflowTask, task_id).status = TaskStatusEnum.BLOCKED
+        db.flush()
+        db.rollback()
+        assert db.query(ChangeEvent).count() == 0
+
+
+def test_resume_from_offset_and_user_scoping(session_factory):
+    with session_factory() as db:
+        for n in range(5):
+            emit_change(db, "t1", "document.created", "document", n)
+        emit_change(db, "t1", "notification.created", "notification", user_id=1)
+        emit_change(db, "t1", "notification.created", "notification", user_id=2)
+        emit_change(db, "t2", "document.created", "document", 99)
+        db.commit()
+
+        service = ChangeFeedService(db)
+        first = service.read("t1", user_id=1, offset=0, limit=3)
+        rest = service.read("t1", user_id=1, offset=first["offset"])
+
+    assert [event["entity_id"] for event in first["events"]] == [0, 1, 2]
+    assert [event["entity_id"] for event in rest["events"]] == [3, 4, None]
+    assert [event["user_id"] for event in rest["events"]] == [None, None, 1]
+    assert not rest["reset"]
+
+
+def test_offsets_are_contiguous_per_tenant_in_commit_order(session_factory):
+    with session_factory() as slow, session_factory() as fast:
+        # The slow transaction flushes first, so its event gets the lower ID
+        emit_change(slow, "t1", "document.created", "document", 1)
+        slow.flush()
+        emit_change(fast, "t1", "document.created", "document", 2)
+        emit_change(fast, "t2", "document.created", "document", 3)
+        emit_change(fast, "t1", "document.created", "document", 4)
+        fast.commit()
+
+        service = ChangeFeedService(fast)
+        page = service.read("t1", user_id=None, offset=0)
+        assert [(event["offset"], event["entity_id"]) for event in page["events"]] == [(1, 2), (2, 4)]
+
+        slow.commit()
+        # Resuming after the events already read does not skip the slow commit
+        page = service.read("t1", user_id=None, offset=page["offset"])
+        assert [(event["offset"], event["entity_id"]) for event in page["events"]] == [(3, 1)]
+        assert [event["offset"] for event in service.read("t2", user_id=None, offset=0)["events"]] == [1]
+        assert service.latest_offset("t1") == 3
+
+
+def test_rolled_back_savepoints_take_no_offsets(session_factory):
+    with session_factory() as db:
+        savepoint = db.begin_nested()
+        emit_change(db, "t1", "document.created", "document", 1)
+        db.flush()
+        savepoint.rollback()
+        emit_change(db, "t1", "document.created", "document", 2)
+        db.commit()
+
+        page = ChangeFeedService(db).read("t1", user_id=None, offset=0)
+
+    assert [(event["offset"], event["entity_id"]) for event in page["events"]] == [(1, 2)]
+
+
+def test_reset_only_when_the_tenant_lost_events(session_factory):
+    with session_factory() as db:
+        for tenant_id in ("t2", "t1", "t1", "t1", "t2"):
+            emit_change(db, tenant_id, "document.created", "document")
+            db.commit()
+        db.query(ChangeEvent).filter(ChangeEvent.stream_offset < 3).update(
+            {"created_at": datetime.utcnow() - timedelta(days=30)}
+        )
+        db.commit()
+        service = ChangeFeedService(db)
+
+        # Offsets 1 and 2 of both tenants
+        assert service.prune() == 4
+        # Other tenants' events do not hide the pruning
+        assert service.read("t1", user_id=None, offset=1)["reset"]
+        assert not service.read("t1", user_id=None, offset=2)["reset"]
+        # A tenant with every event pruned is only behind if it had events after the offset
+        assert service.read("t2", user_id=None, offset=1)["reset"]
+        assert not service.read("t2", user_id=None, offset=2)["reset"]
+
+
+def test_pruned_offset_asks_for_reset(session_factory):
+    with session_factory() as db:
+        for n in range(10):
+            emit_change(db, "t1", "document.created", "document", n)
+        db.commit()
+        db.query(ChangeEvent).update({"created_at": datetime.utcnow() - timedelta(days=30)})
+        db.commit()
+        emit_change(db, "t1", "document.created", "document", 10)
+        db.commit()
+
+        service = ChangeFeedService(db)
+        assert service.prune() == 10
+        page = service.read("t1", user_id=None, offset=3)
+
+    assert page["reset"]
+    assert [event["entity_id"] for event in page["events"]] == [10]
+
+
+def test_stream_replays_then_follows_commits(session_factory):
+    @contextmanager
+    def sessions():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    with session_factory() as db:
+        emit_change(db, "t1", "document.created", "document", 1)
+        emit_change(db, "t1", "document.created", "document", 2)
+        db.commit()
+
+    async def scenario():
+        received = []
+        stream = stream_changes(sessions, "t1", user_id=1, offset=1, heartbeat=5)
+
+        async def consume():
+            async for change in stream:
+                if change is not None:
+                    received.append(change)
+                if len(received) == 2:
+                    return
+
+        consumer = asyncio.create_task(consume())
+        await asyncio.sleep(0.1)
+        assert [change["entity_id"] for change in received] == [2]
+
+        # A commit in this process wakes the stream up immediately
+        with session_factory() as db:
+            emit_change(db, "t1", "task.status_changed", "task", 3)
+            db.commit()
+
+        await asyncio.wait_for(consumer, timeout=2)
+        await stream.aclose()
+        return received
+
+    received = asyncio.run(scenario())
+    assert [change["entity_id"] for change in received] == [2, 3]
+    assert format_sse(received[1]).startswith("id: 3\nevent: task.status_changed\ndata: ")
+
+
+def test_stream_accepts_the_token_as_query_parameter(session_factory):
+    with session_factory() as db:
+        db.add(User(id=1, tenant_id="t1", email="anna@example.com", name="Anna", password_hash="x",
+                    status=UserStatusEnum.ACTIVE))
+        db.commit()
+        token = create_access_token({"sub": "1", "tenant_id": "t1", "email": "anna@example.com", "role": "Admin"})
+
+        # EventSource cannot send the Authorization header
+        user = asyncio.run(get_current_active_stream_user(header_token=None, token=token, db=db))
+        assert (user.sub, user.tenant_id) == ("1", "t1")
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(get_current_active_stream_user(header_token=None, token=None, db=db))
+        assert error.value.status_code == 401
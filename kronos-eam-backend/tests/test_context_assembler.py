@@ -0,0 +1,168 @@
+"""Context assembly: prompt size stays bounded over long conversations, chunks fit their budget."""
+
+import asyncio
+from typing import Any, List, TypedDict
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import END, StateGraph
+
+from app.services.context_assembler import (
+    SUMMARY_MESSAGE_NAME, ContextAssembler, PromptSizeStats, estimate_tokens, fit_chunks, generation_input,
+    message_tokens
+)
+
+
+SYSTEM = "Sei l'assistente Kronos EAM. Rispondi in italiano con indicazioni operative."
+
+
+def question(n):
+    return f"Turno {n}: quali sono le scadenze GSE e le manutenzioni previste per l'impianto {n % 7}?"
+
+
+def answer(n):
+    return f"Turno {n}: " + " ".join(["l'inverter richiede una verifica del quadro di campo"] * (3 + n % 5))
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("ciao") == 1
+    assert estimate_tokens("manutenzione") == 3
+    assert estimate_tokens("GSE, TICA.") == 4
+    text = "Quali scadenze GSE ho questo mese per l'impianto fotovoltaico di Brindisi?"
+    # Within the usual 3-5 characters per token of subword tokenizers
+    assert len(text) / 5 <= estimate_tokens(text) <= len(text) / 3
+
+
+def test_prompt_size_stays_bounded_over_hundreds_of_turns():
+    assembler = ContextAssembler(max_tokens=1500, recent_turns=6, summary_tokens=300)
+    history: List[BaseMessage] = []
+    sizes = []
+
+    for n in range(400):
+        context = assembler.assemble(SYSTEM, history, HumanMessage(content=question(n)))
+        sizes.append(context.tokens)
+        assert context.tokens == sum(message_tokens(m) for m in context.messages)
+        assert context.tokens <= 1500
+
+        # What the graph stores for the next turn: the assembled input plus the reply
+        history = context.messages + [AIMessage(content=answer(n))]
+
+    assert max(sizes[100:]) <= max(sizes[:100])
+    # Without a budget the prompt would grow by ~60 tokens per turn
+    assert sum(message_tokens(m) for m in history) < 1600
+
+    messages = context.messages
+    assert messages[0].content == SYSTEM
+    assert messages[-1].content == question(399)
+    summary = messages[1]
+    assert summary.name == SUMMARY_MESSAGE_NAME
+    assert "Turno 392" in summary.content  # the turn just before the verbatim ones
+    assert context.kept_turns <= 6
+    assert [m.content for m in messages[-3:-1]] == [question(398), answer(398)]
+
+
+def test_short_conversations_are_passed_whole():
+    assembler = ContextAssembler(max_tokens=4000, recent_turns=8, summary_tokens=500)
+    history = [SystemMessage(content=SYSTEM)]
+    for n in range(3):
+        history += [HumanMessage(content=question(n)), AIMessage(content=answer(n))]
+
+    context = assembler.assemble(SYSTEM, history, HumanMessage(content=question(3)))
+
+    assert context.kept_turns == 3 and context.summarized_turns == 0 and context.dropped_turns == 0
+    assert [type(m).__name__ for m in context.messages] == ["SystemMessage"] + ["HumanMessage", "AIMessage"] * 3 + ["HumanMessage"]
+
+
+def test_oversized_message_is_truncated():
+    assembler = ContextAssembler(max_tokens=300, recent_turns=4, summary_tokens=50)
+
+    context = assembler.assemble(SYSTEM, [], HumanMessage(content="allegato " * 2000))
+
+    assert context.truncated and context.tokens <= 300
+    assert context.messages[-1].content.endswith("…")
+
+
+class State(TypedDict):
+    messages: List[BaseMessage]
+    turns: Any
+
+
+def test_generating_nodes_send_earlier_turns_with_their_prompt():
+    assembler = ContextAssembler(max_tokens=1500, recent_turns=2, summary_tokens=300)
+    history: List[BaseMessage] = []
+    for n in range(6):
+        history += [HumanMessage(content=question(n)), AIMessage(content=answer(n))]
+    context = assembler.assemble(SYSTEM, history, HumanMessage(content=question(6)))
+
+    messages = generation_input(context.messages, "Dati: manutenzioni\n\nFornisci un piano.")
+
+    # One leading system message carrying the instructions and the summary of older turns
+    assert [type(m).__name__ for m in messages] == ["SystemMessage"] + ["HumanMessage", "AIMessage"] * 2 + ["HumanMessage"]
+    assert messages[0].content.startswith(SYSTEM) and "Riepilogo" in messages[0].content
+    assert [m.content for m in messages[1:5]] == [question(4), answer(4), question(5), answer(5)]
+    assert messages[-1].content == question(6) + "\n\nDati: manutenzioni\n\nFornisci un piano."
+    # The assembled context is left as it was
+    assert context.messages[-1].content == question(6)
+
+
+def test_summary_survives_the_checkpointer():
+    """Same flow as BaseAgent: read the thread, assemble, run, store the reply"""
+    assembler = ContextAssembler(max_tokens=800, recent_turns=3, summary_tokens=200)
+
+    def respond(state):
+        n = len([m for m in state["messages"] if isinstance(m, HumanMessage)])
+        return {"messages": state["messages"] + [AIMessage(content=answer(n))]}
+
+    graph = StateGraph(State)
+    graph.add_node("respond", respond)
+    graph.set_entry_point("respond")
+    graph.add_edge("respond", END)
+    app = graph.compile(checkpointer=InMemorySaver())
+    config = {"configurable": {"thread_id": "t1:u1:MaintenanceAgent:42"}}
+
+    async def conversation():
+        sizes = []
+        for n in range(150):
+            previous = await app.aget_state(config)
+            context = assembler.assemble(SYSTEM, previous.values.get("messages", []), HumanMessage(content=question(n)))
+            sizes.append(context.tokens)
+            await app.ainvoke({"messages": context.messages, "turns": n}, config)
+        return sizes, (await app.aget_state(config)).values["messages"]
+
+    sizes, stored = asyncio.run(conversation())
+
+    assert max(sizes) <= 800
+    assert stored[1].name == SUMMARY_MESSAGE_NAME
+    assert "Turno 145" in stored[1].content
+
+
+def test_chunks_are_trimmed_by_relevance():
+    chunks = [
+        {"id": "c1", "score": 0.41, "content": "parola " * 100},
+        {"id": "c2", "score": 0.93, "content": "convenzione GSE " * 40},
+        {"id": "c3", "score": 0.77, "content": "autorizzazione unica " * 40},
+        {"id": "c4", "score": 0.12, "content": "altro"},
+    ]
+
+    selected = fit_chunks(chunks, max_tokens=450, min_chunk_tokens=32)
+
+    assert [chunk["id"] for chunk, _ in selected] == ["c2", "c3", "c1"]
+    assert sum(estimate_tokens(text) for _, text in selected) <= 450
+    assert selected[0][1] == chunks[1]["content"]
+    assert selected[2][1].endswith("…")
+
+    # Too little room left to be worth a cut chunk
+    assert [c["id"] for c, _ in fit_chunks(chunks, max_tokens=200, min_chunk_tokens=100)] == ["c2"]
+
+
+def test_prompt_size_stats_feed_observers():
+    stats = PromptSizeStats()
+    seen = []
+    stats.add_observer(lambda agent, tokens: seen.append((agent, tokens)))
+
+    for tokens in (120, 900, 450):
+        stats.observe("MaintenanceAgent", tokens)
+
+    assert stats.snapshot() == {"MaintenanceAgent": {"count": 3, "total": 1470, "max": 900, "last": 450}}
+    assert seen[-1] == ("MaintenanceAgent", 450)
@@ -0,0 +1,53 @@
+"""Data generation: bumped by committed changes of agent data, not by notifications."""
+
+from datetime import datetime
+
+import pytest
+
+from app.models.notification import Notification, NotificationTypeEnum
+from app.models.plant import (
+    Plant, Maintenance, MaintenanceTypeEnum, MaintenanceStatusEnum, PlantStatusEnum, PlantTypeEnum
+)
+from app.services.bulk_mutation_service import BulkMutationService
+from app.services.data_generation import current_generation
+
+
+def make_plant(db, tenant_id="t1"):
+    plant = Plant(
+        tenant_id=tenant_id, name="Impianto Bari", code="P1", power="1 MW", power_kw=1000.0,
+        status=PlantStatusEnum.IN_OPERATION, type=PlantTypeEnum.PHOTOVOLTAIC, location="Bari"
+    )
+    db.add(plant)
+    db.commit()
+    return plant
+
+
+def test_agent_data_changes_bump_the_tenant_generation(db):
+    plant = make_plant(db)
+    assert current_generation(db, "t1") == 1 and current_generation(db, "t2") == 0
+
+    db.add(Maintenance(
+        tenant_id="t1", plant_id=plant.id, planned_date=datetime(2025, 6, 1), type=MaintenanceTypeEnum.ORDINARY,
+        status=MaintenanceStatusEnum.PLANNED, description="Pulizia moduli"
+    ))
+    db.commit()
+    assert current_generation(db, "t1") == 2
+
+    plant.location = "Bari"  # Same value: nothing changed
+    db.commit()
+    plant.location = "Brindisi"
+    db.rollback()
+    assert current_generation(db, "t1") == 2
+
+    BulkMutationService(db).bulk_update_plants(
+        [{"id": plant.id, "update_data": {"municipality": "Modugno"}}], user_id="7", tenant_id="t1"
+    )
+    assert current_generation(db, "t1") == 3
+
+
+def test_notifications_leave_the_generation_alone(db):
+    make_plant(db)
+    db.add(Notification(tenant_id="t1", user_id=7, tipo=NotificationTypeEnum.TASK, titolo="N", messaggio="m"))
+    db.commit()
+
+    assert current_generation(db, "t1") == 1
@@ -0,0 +1,87 @@
+"""Deadline reminders: one notification per task and threshold, however often the sweep runs."""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.notification import (
+    Notification, NotificationTemplate, NotificationTypeEnum, ReminderLedger
+)
+from app.models.user import User
+from app.models.workflow import Workflow, WorkflowTask, TaskStatusEnum, TaskPriorityEnum
+from app.services.reminder_service import DeadlineReminderScheduler
+
+
+NOW = datetime(2025, 6, 2, 9, 0)
+
+
+@pytest.fixture
+def db(db):
+    db.add_all([
+        User(id=1, tenant_id="t1", email="anna@example.com", name="Anna", password_hash="x"),
+        NotificationTemplate(
+            tenant_id="t1", codice="task_deadline_reminder", nome="Scadenza",
+            tipo=NotificationTypeEnum.SCADENZA,
+            titolo_template="Scadenza {task_title}", messaggio_template="{task_title} scade il {due_date}",
+            canali_default=["email"]
+        ),
+        NotificationTemplate(
+            tenant_id="t1", codice="task_deadline_urgent", nome="Scadenza urgente",
+            tipo=NotificationTypeEnum.SCADENZA,
+            titolo_template="Urgente: {task_title}", messaggio_template="{task_title} scade il {due_date}",
+            canali_default=["email"]
+        ),
+    ])
+    db.commit()
+    return db
+
+
+def make_tasks(db, *due_dates):
+    workflow = Workflow(tenant_id="t1", name="Connessione", plant_id=1, progress=0)
+    db.add(workflow)
+    db.flush()
+    tasks = [
+        WorkflowTask(
+            tenant_id="t1", workflow_id=workflow.id, title=f"Task {n}", assignee="anna@example.com",
+            status=TaskStatusEnum.TO_START, priority=TaskPriorityEnum.MEDIUM, due_date=due_date
+        )
+        for n, due_date in enumerate(due_dates)
+    ]
+    db.add_all(tasks)
+    db.commit()
+    return [task.id for task in tasks]
+
+
+def sent(db):
+    return sorted(
+        (notification.model_metadata["task_id"], notification.model_metadata["reminder"])
+        for notification in db.query(Notification).all()
+    )
+
+
+def test_repeated_sweeps_send_each_reminder_once(db):
+    urgent, upcoming = make_tasks(db, NOW + timedelta(hours=6), NOW + timedelta(days=3))
+    scheduler = DeadlineReminderScheduler(db)
+
+    first = asyncio.run(scheduler.run_sweep(now=NOW))
+    second = asyncio.run(scheduler.run_sweep(now=NOW))
+
+    assert first == {"candidates": 2, "sent": 2, "skipped": 0}
+    assert second == {"candidates": 0, "sent": 0, "skipped": 0}
+    assert sent(db) == [(urgent, "urgent"), (upcoming, "upcoming")]
+    assert all(entry.notification_id for entry in db.query(ReminderLedger).all())
+
+
+def test_overlapping_runs_claim_each_reminder_once(db):
+    task_id, = make_tasks(db, NOW + timedelta(days=3))
+    first, second = DeadlineReminderScheduler(db), DeadlineReminderScheduler(db)
+    templates = first._load_templates()
+
+    # Both runs select the task before either has claimed it
+    first_rows = first._select_candidates(NOW, None, 0)
+    second_rows = second._select_candidates(NOW, None, 0)
+
+    assert len(first._send_batch(first_rows, templates)) == 1
+    assert second._send_batch(second_rows, templates) == []
+    assert sent(db) == [(task_id, "upcoming")]
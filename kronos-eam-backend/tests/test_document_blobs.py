@@ -0,0 +1,188 @@
+"""Content-addressed document storage: dedup, reference counts, GC and migration."""
+
+import hashlib
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, update
+from sqlalchemy.dialects import postgresql
+
+from app.core.config import settings
+from app.core.storage import StorageBackend
+from app.models.document import (
+    Document, DocumentVersion, DocumentBlob, DocumentCategoryEnum, DocumentTypeEnum
+)
+from app.services.document_storage_service import DocumentStorageService
+
+
+TEMPLATE = b"%PDF-1.4 modulo standard di connessione " * 2000
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_PATH", str(tmp_path))
+    return StorageBackend()
+
+
+def make_document(db, file_path, tenant_id="t1", **kwargs):
+    document = Document(
+        tenant_id=tenant_id, nome=kwargs.pop("nome", "Modulo"), tipo=DocumentTypeEnum.PDF,
+        categoria=DocumentCategoryEnum.TECNICO, file_path=file_path, **kwargs
+    )
+    db.add(document)
+    return document
+
+
+def ref_count(db, blob):
+    db.expire(blob)
+    return db.get(DocumentBlob, blob.id).ref_count
+
+
+def test_identical_content_is_stored_once_per_tenant(db, storage):
+    service = DocumentStorageService(db, storage)
+
+    blobs = [service.store_bytes(TEMPLATE, "t1") for _ in range(50)]
+    for plant_id, blob in enumerate(blobs):
+        make_document(db, blob.file_path, impianto_id=plant_id, checksum=blob.checksum)
+    db.commit()
+
+    assert len({blob.id for blob in blobs}) == 1
+    assert blobs[0].checksum == hashlib.sha256(TEMPLATE).hexdigest()
+    assert ref_count(db, blobs[0]) == 50
+    files = [p for p in storage.base_path.rglob("*") if p.is_file()]
+    assert [str(p.relative_to(storage.base_path)) for p in files] == [blobs[0].file_path]
+    # Staging files of the duplicates were dropped
+    assert list(storage.staging_path.iterdir()) == []
+
+    # Other tenants never share blobs
+    other = service.store_bytes(TEMPLATE, "t2")
+    assert other.id != blobs[0].id and other.file_path.startswith("t2/blobs/")
+
+
+def test_reference_counts_follow_documents_and_versions(db, storage):
+    service = DocumentStorageService(db, storage)
+    first = service.store_bytes(b"versione 1", "t1")
+    document = make_document(db, first.file_path)
+    db.commit()
+
+    # Versioning: the old version keeps pointing at the first blob
+    db.add(DocumentVersion(tenant_id="t1", document_id=document.id, versione=1, file_path=first.file_path))
+    second = service.store_bytes(b"versione 2", "t1")
+    document.file_path = second.file_path
+    db.commit()
+    assert (ref_count(db, first), ref_count(db, second)) == (1, 1)
+
+    # A copy references the same blob instead of duplicating the file
+    copy = make_document(db, second.file_path, nome="Copia di Modulo")
+    db.commit()
+    assert ref_count(db, second) == 2
+
+    db.delete(copy)
+    db.commit()
+    assert ref_count(db, second) == 1
+
+    # Rolled-back changes leave counts alone
+    make_document(db, second.file_path)
+    db.flush()
+    db.rollback()
+    assert ref_count(db, second) == 1
+
+
+def test_garbage_collection_respects_grace_period_and_references(db, storage):
+    service = DocumentStorageService(db, storage)
+    kept = service.store_bytes(b"in uso", "t1")
+    garbage = service.store_bytes(b"non piu referenziato", "t1")
+    fresh = service.store_bytes(b"appena caricato", "t1")
+    make_document(db, kept.file_path)
+    document = make_document(db, garbage.file_path)
+    db.commit()
+    db.delete(document)
+    db.commit()
+
+    old = datetime.utcnow() - timedelta(hours=48)
+    db.execute(update(DocumentBlob).values(last_used_at=old).where(DocumentBlob.id != fresh.id))
+    db.commit()
+
+    # An orphan file left by a rolled-back upload
+    orphan = storage.base_path / "t1" / "blobs" / "ff" / ("f" * 64)
+    orphan.parent.mkdir(parents=True)
+    orphan.write_bytes(b"x")
+    os.utime(orphan, (time.time() - 48 * 3600,) * 2)
+
+    stats = service.collect_garbage(grace_hours=24, batch_size=1)
+
+    assert stats == {"blobs_deleted": 1, "bytes_freed": garbage.file_size, "orphan_files_deleted": 1}
+    assert {blob.id for blob in db.query(DocumentBlob)} == {kept.id, fresh.id}
+    assert not storage.file_exists(garbage.file_path) and not orphan.exists()
+    assert storage.file_exists(kept.file_path) and storage.file_exists(fresh.file_path)
+
+
+def test_reused_blobs_are_locked_and_kept_by_garbage_collection(db, storage):
+    service = DocumentStorageService(db, storage)
+    blob = service.store_bytes(TEMPLATE, "t1")
+    db.commit()
+    db.execute(update(DocumentBlob).values(last_used_at=datetime.utcnow() - timedelta(hours=48)))
+    db.commit()
+
+    lookups = []
+    event.listen(db, "do_orm_execute", lambda state: lookups.append(state.statement) if state.is_select else None)
+    reused = service.store_bytes(TEMPLATE, "t1")
+    make_document(db, reused.file_path)
+    db.commit()
+
+    # The row stays locked until the referencing document is committed
+    assert reused.id == blob.id
+    assert lookups and all("FOR UPDATE" in str(lookup.compile(dialect=postgresql.dialect())) for lookup in lookups)
+    assert service.collect_garbage(grace_hours=24)["blobs_deleted"] == 0
+    assert ref_count(db, blob) == 1 and storage.file_exists(blob.file_path)
+
+
+def test_reconcile_rebuilds_drifted_counts(db, storage):
+    service = DocumentStorageService(db, storage)
+    blob = service.store_bytes(TEMPLATE, "t1")
+    for _ in range(3):
+        make_document(db, blob.file_path)
+    db.commit()
+
+    db.execute(update(DocumentBlob).values(ref_count=42))
+    db.commit()
+
+    assert service.reconcile() == 1
+    assert ref_count(db, blob) == 3
+    assert service.reconcile() == 0
+
+
+def test_migration_moves_legacy_files_into_blobs(db, storage):
+    service = DocumentStorageService(db, storage)
+    # Pre-existing layout: one physical file per upload/copy/version
+    legacy = [
+        storage.store_file(TEMPLATE, f"modulo_{n}.pdf", tenant_id="t1", subfolder="documents/tecnico")
+        for n in range(5)
+    ]
+    unique = storage.store_file(b"unico", "altro.pdf", tenant_id="t1", subfolder="documents/tecnico")
+    documents = [make_document(db, path) for path in legacy + [unique]]
+    db.flush()
+    db.add(DocumentVersion(tenant_id="t1", document_id=documents[0].id, versione=1, file_path=legacy[0]))
+    make_document(db, "t1/documents/tecnico/missing.pdf")
+    db.commit()
+
+    dry = service.migrate_legacy_files(batch_size=2, dry_run=True)
+    assert dry == {"paths": 6, "rows": 0, "deduplicated": 4, "bytes_saved": 4 * len(TEMPLATE), "missing": 1}
+    assert all(storage.file_exists(path) for path in legacy)
+
+    stats = service.migrate_legacy_files(batch_size=2)
+    assert stats["rows"] == 7 and stats["deduplicated"] == 4 and stats["missing"] == 1
+
+    db.expire_all()
+    template_blob = db.query(DocumentBlob).filter_by(checksum=hashlib.sha256(TEMPLATE).hexdigest()).one()
+    assert template_blob.ref_count == 6
+    assert {d.file_path for d in documents[:5]} == {template_blob.file_path}
+    assert db.query(DocumentVersion).one().file_path == template_blob.file_path
+    assert documents[0].checksum == template_blob.checksum
+    assert not any(storage.file_exists(path) for path in legacy + [unique])
+    assert storage.retrieve_file(template_blob.file_path) == TEMPLATE
+
+    # Re-running only finds the file that is still missing
+    assert service.migrate_legacy_files()["paths"] == 0
@@ -0,0 +1,156 @@
+"""Document downloads: Range, ETag/304, If-Range and cache headers."""
+
+import asyncio
+import hashlib
+import os
+from email.utils import formatdate
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+
+from app.core.config import settings
+from app.core.downloads import file_response
+from app.core.storage import StorageBackend
+
+
+CONTENT = bytes(range(256)) * 4096  # 1MB
+CHECKSUM = hashlib.sha256(CONTENT).hexdigest()
+ETAG = f'"{CHECKSUM}"'
+
+
+class Client:
+    """Synchronous wrapper over httpx's in-process ASGI transport"""
+
+    def __init__(self, app):
+        self.app = app
+
+    def request(self, method, url, headers=None):
+        async def send():
+            transport = httpx.ASGITransport(app=self.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.request(method, url, headers=headers)
+        return asyncio.run(send())
+
+    def get(self, url, headers=None):
+        return self.request("GET", url, headers)
+
+    def head(self, url, headers=None):
+        return self.request("HEAD", url, headers)
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_PATH", str(tmp_path))
+    monkeypatch.setattr(settings, "DOWNLOAD_CHUNK_SIZE", 64 * 1024)
+    storage = StorageBackend()
+    stored = storage.store_file(CONTENT, "Relazione tecnica è.pdf", tenant_id="t1")
+
+    app = FastAPI()
+
+    @app.api_route("/download", methods=["GET", "HEAD"])
+    async def download(request: Request, inline: bool = False, with_checksum: bool = True):
+        return file_response(
+            request,
+            storage.local_path(stored),
+            media_type="application/pdf",
+            filename="Relazione tecnica è.pdf",
+            checksum=CHECKSUM if with_checksum else None,
+            inline=inline
+        )
+
+    return Client(app)
+
+
+def test_full_download_carries_validators(client):
+    response = client.get("/download")
+
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["etag"] == ETAG
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["content-length"] == str(len(CONTENT))
+    assert response.headers["cache-control"].startswith("private")
+    assert "last-modified" in response.headers
+    assert response.headers["content-disposition"] == (
+        "attachment; filename=\"Relazione tecnica .pdf\"; "
+        "filename*=UTF-8''Relazione%20tecnica%20%C3%A8.pdf"
+    )
+
+    assert client.get("/download?inline=true").headers["content-disposition"].startswith("inline;")
+
+
+def test_range_requests(client):
+    response = client.get("/download", headers={"Range": "bytes=1000-1999"})
+    assert response.status_code == 206
+    assert response.content == CONTENT[1000:2000]
+    assert response.headers["content-range"] == f"bytes 1000-1999/{len(CONTENT)}"
+    assert response.headers["content-length"] == "1000"
+
+    # Open-ended and suffix ranges (PDF viewers read the trailer first)
+    assert client.get("/download", headers={"Range": "bytes=1048000-"}).content == CONTENT[1048000:]
+    assert client.get("/download", headers={"Range": "bytes=-500"}).content == CONTENT[-500:]
+
+    # End past the file is clamped; start past it is unsatisfiable
+    clamped = client.get("/download", headers={"Range": "bytes=1048500-9999999"})
+    assert clamped.status_code == 206 and clamped.content == CONTENT[1048500:]
+    unsatisfiable = client.get("/download", headers={"Range": f"bytes={len(CONTENT)}-"})
+    assert unsatisfiable.status_code == 416
+    assert unsatisfiable.headers["content-range"] == f"bytes */{len(CONTENT)}"
+
+    # Malformed and multiple ranges fall back to the full body
+    for header in ("bytes=abc", "bytes=0-1,5-6", "items=0-1"):
+        response = client.get("/download", headers={"Range": header})
+        assert response.status_code == 200 and response.content == CONTENT
+
+
+def test_conditional_get(client):
+    assert client.get("/download", headers={"If-None-Match": ETAG}).status_code == 304
+    assert client.get("/download", headers={"If-None-Match": f'"other", W/{ETAG}'}).status_code == 304
+    assert client.get("/download", headers={"If-None-Match": '"other"'}).status_code == 200
+
+    not_modified = client.get("/download", headers={"If-None-Match": ETAG})
+    assert not_modified.content == b""
+    assert not_modified.headers["etag"] == ETAG
+
+    last_modified = client.get("/download").headers["last-modified"]
+    assert client.get("/download", headers={"If-Modified-Since": last_modified}).status_code == 304
+    assert client.get("/download", headers={"If-Modified-Since": formatdate(0, usegmt=True)}).status_code == 200
+    # If-None-Match takes precedence over If-Modified-Since
+    assert client.get("/download", headers={
+        "If-None-Match": '"other"', "If-Modified-Since": last_modified
+    }).status_code == 200
+
+
+def test_if_range(client):
+    matching = client.get("/download", headers={"Range": "bytes=0-9", "If-Range": ETAG})
+    assert matching.status_code == 206 and matching.content == CONTENT[:10]
+
+    # The client's copy is stale: send the whole current file
+    stale = client.get("/download", headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert stale.status_code == 200 and stale.content == CONTENT
+
+
+def test_head_and_weak_etag_without_checksum(client):
+    head = client.head("/download", headers={"Range": "bytes=0-99"})
+    assert head.status_code == 206
+    assert head.headers["content-length"] == "100"
+    assert head.content == b""
+
+    response = client.get("/download?with_checksum=false")
+    assert response.headers["etag"].startswith('W/"')
+    assert client.get(
+        "/download?with_checksum=false", headers={"If-None-Match": response.headers["etag"]}
+    ).status_code == 304
+
+
+def test_local_path_stays_inside_storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_PATH", str(tmp_path / "uploads"))
+    storage = StorageBackend()
+    (tmp_path / "secret.txt").write_text("x")
+
+    with pytest.raises(FileNotFoundError):
+        storage.local_path("../secret.txt")
+    with pytest.raises(FileNotFoundError):
+        storage.local_path("t1/missing.pdf")
+    assert os.path.isdir(storage.base_path)
@@ -0,0 +1,239 @@
+"""Notification delivery workers against a local SMTP stand-in."""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.notification import (
+    Notification, NotificationQueue, NotificationChannelEnum, NotificationTypeEnum
+)
+from app.services.notification_delivery import NotificationDeliveryWorker, SMTPConnectionPool
+
+
+class SMTPStandIn:
+    """Minimal SMTP server: counts connections and accepted messages, rejects chosen recipients"""
+
+    def __init__(self, reject=()):
+        self.reject = set(reject)
+        self.connections = 0
+        self.messages = []
+        self.server = None
+
+    async def start(self) -> int:
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+
+        def reply(line):
+            writer.write(f"{line}\r\n".encode())
+
+        reply("220 stand-in ESMTP")
+        recipients = []
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            command = line.decode().strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                reply("250 stand-in")
+            elif verb == "MAIL":
+                recipients = []
+                reply("250 OK")
+            elif verb == "RCPT":
+                address = command.split(":", 1)[1].strip().strip("<>")
+                if address in self.reject:
+                    reply("550 Mailbox unavailable")
+                else:
+                    recipients.append(address)
+                    reply("250 OK")
+            elif verb == "DATA":
+                reply("354 End data with <CR><LF>.<CR><LF>")
+                while (await reader.readline()) not in (b".\r\n", b""):
+                    pass
+                self.messages.extend(recipients)
+                reply("250 Queued")
+            elif verb in ("RSET", "NOOP"):
+                reply("250 OK")
+            elif verb == "QUIT":
+                reply("221 Bye")
+                await writer.drain()
+                break
+            else:
+                reply("502 Not implemented")
+            await writer.drain()
+        writer.close()
+
+
+def queue_emails(session_factory, recipients, channel=NotificationChannelEnum.EMAIL):
+    with session_factory() as db:
+        for recipient in recipients:
+            notification = Notification(
+                tenant_id="t1", user_id=1, tipo=NotificationTypeEnum.TASK,
+                titolo="Task assegnato", messaggio="Nuovo task", link="/tasks/1"
+            )
+            db.add(notification)
+            db.flush()
+            db.add(NotificationQueue(
+                tenant_id="t1", notification_id=notification.id, canale=channel,
+                destinatario=recipient, stato="pending",
+                programmata_per=datetime.utcnow() - timedelta(seconds=1)
+            ))
+        db.commit()
+
+
+def queue_rows(session_factory):
+    with session_factory() as db:
+        return {row.destinatario: row for row in db.query(NotificationQueue).all()}
+
+
+def run_worker(session_factory, smtp, pool_size=3, **kwargs):
+    async def scenario():
+        port = await smtp.start()
+        pool = SMTPConnectionPool("127.0.0.1", port, use_tls=False, size=pool_size, timeout=5)
+        worker = NotificationDeliveryWorker(session_factory, smtp_pool=pool, **kwargs)
+        try:
+            return await worker.drain(), pool
+        finally:
+            await pool.close()
+            await smtp.stop()
+
+    return asyncio.run(scenario())
+
+
+def test_emails_are_sent_over_pooled_connections(session_factory):
+    recipients = [f"user{i}@example.com" for i in range(40)]
+    queue_emails(session_factory, recipients)
+    smtp = SMTPStandIn()
+
+    stats, pool = run_worker(session_factory, smtp, pool_size=3, batch_size=15)
+
+    assert stats == {"sent": 40, "retry": 0, "failed": 0}
+    assert sorted(smtp.messages) == sorted(recipients)
+    # Connections are reused across messages and batches
+    assert smtp.connections == pool.connections_opened <= 3
+    rows = queue_rows(session_factory)
+    assert all(row.stato == "sent" and row.inviata_il for row in rows.values())
+
+
+def test_rejected_recipient_is_retried_with_backoff(session_factory):
+    queue_emails(session_factory, ["ok@example.com", "bounce@example.com"])
+    smtp = SMTPStandIn(reject={"bounce@example.com"})
+
+    before = datetime.utcnow()
+    stats, _ = run_worker(session_factory, smtp, pool_size=1)
+
+    assert stats == {"sent": 1, "retry": 1, "failed": 0}
+    bounced = queue_rows(session_factory)["bounce@example.com"]
+    assert bounced.stato == "pending"
+    assert bounced.tentativi == 1
+    assert "550" in bounced.ultimo_errore
+    assert bounced.programmata_per >= before + timedelta(minutes=10)
+    # The rejection does not cost the pooled connection
+    assert smtp.connections == 1
+
+
+def test_delivery_fails_after_max_attempts(session_factory):
+    queue_emails(session_factory, ["bounce@example.com"])
+    with session_factory() as db:
+        db.query(NotificationQueue).update({"tentativi": 2, "max_tentativi": 3})
+        db.commit()
+
+    stats, _ = run_worker(session_factory, SMTPStandIn(reject={"bounce@example.com"}))
+
+    assert stats == {"sent": 0, "retry": 0, "failed": 1}
+    row = queue_rows(session_factory)["bounce@example.com"]
+    assert row.stato == "failed"
+    assert row.tentativi == 3
+
+
+def test_claimed_batches_do_not_overlap(session_factory):
+    queue_emails(session_factory, [f"user{i}@example.com" for i in range(10)], NotificationChannelEnum.SMS)
+    first = NotificationDeliveryWorker(session_factory, batch_size=6)
+    second = NotificationDeliveryWorker(session_factory, batch_size=6)
+
+    claimed_first = {item["id"] for item in first._claim_batch()}
+    claimed_second = {item["id"] for item in second._claim_batch()}
+
+    assert len(claimed_first) == 6
+    assert len(claimed_second) == 4
+    assert not claimed_first & claimed_second
+    assert second._claim_batch() == []
+
+
+def test_expired_lease_is_claimed_again(session_factory):
+    queue_emails(session_factory, ["user@example.com"], NotificationChannelEnum.PUSH)
+    crashed = NotificationDeliveryWorker(session_factory, lease_seconds=1)
+    assert len(crashed._claim_batch()) == 1
+
+    with session_factory() as db:
+        db.query(NotificationQueue).update(
+            {"programmata_per": datetime.utcnow() - timedelta(seconds=1)}
+        )
+        db.commit()
+
+    stats = asyncio.run(NotificationDeliveryWorker(session_factory).drain())
+    assert stats == {"sent": 1, "retry": 0, "failed": 0}
+
+
+def test_digest_coalesces_held_rows_per_user_and_channel(session_factory):
+    from app.models.notification import NotificationPreference, NotificationPriorityEnum
+    from app.models.user import User
+    from app.services.notification_service import NotificationService
+
+    with session_factory() as db:
+        db.add_all([
+            User(id=1, tenant_id="t1", name="Digest", email="digest@example.com", password_hash="x"),
+            User(id=2, tenant_id="t1", name="Instant", email="instant@example.com", password_hash="x"),
+            NotificationPreference(
+                tenant_id="t1", user_id=1, email_enabled=True, push_enabled=False,
+                digest_enabled=True, digest_frequency="hourly"
+            ),
+            NotificationPreference(tenant_id="t1", user_id=2, email_enabled=True, push_enabled=False),
+        ])
+        db.commit()
+
+        service = NotificationService(db)
+        service.create_notifications_bulk([
+            {"user_id": user_id, "tenant_id": "t1", "tipo": NotificationTypeEnum.TASK,
+             "titolo": "Task assegnato", "messaggio": f"Task {i}"}
+            for user_id in (1, 2) for i in range(30)
+        ] + [
+            {"user_id": 1, "tenant_id": "t1", "tipo": NotificationTypeEnum.TASK,
+             "titolo": "Scadenza urgente", "messaggio": "Entro oggi",
+             "priorita": NotificationPriorityEnum.ALTA}
+        ])
+        db.commit()
+
+        held = db.query(NotificationQueue).filter(NotificationQueue.stato == "digest").all()
+        assert len(held) == 30
+        due_at = held[0].programmata_per
+
+        # Nothing is flushed before the window closes
+        assert service.flush_digests(now=due_at - timedelta(minutes=1))["flushed"] == 0
+        stats = service.flush_digests(now=due_at)
+        assert stats == {"flushed": 30, "digests": 1, "released": 0}
+
+        digest = db.query(NotificationQueue).filter(NotificationQueue.notification_id.is_(None)).one()
+        assert digest.destinatario == "digest@example.com"
+        assert digest.stato == "pending"
+        assert digest.titolo == "Kronos EAM: 30 nuove notifiche"
+        assert digest.messaggio == "- Task assegnato (30)"
+        assert db.query(NotificationQueue).filter(
+            NotificationQueue.digest_id == digest.id, NotificationQueue.stato == "digested"
+        ).count() == 30
+
+    smtp = SMTPStandIn()
+    stats, _ = run_worker(session_factory, smtp)
+
+    # 30 immediate emails, 1 urgent email bypassing the digest, 1 digest
+    assert stats == {"sent": 32, "retry": 0, "failed": 0}
+    assert smtp.messages.count("digest@example.com") == 2
+    assert smtp.messages.count("instant@example.com") == 30
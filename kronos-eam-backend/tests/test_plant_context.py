@@ -0,0 +1,205 @@
+"""Agent tool data access: snapshots loaded once per turn, tool queries on sessions of their own."""
+
+import asyncio
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app.core.agent_tools import ParallelToolNode
+from app.models.document import Document, DocumentCategoryEnum, DocumentStatusEnum, DocumentTypeEnum
+from app.models.plant import (
+    ComplianceChecklist, Maintenance, MaintenanceStatusEnum, MaintenanceTypeEnum, Plant, PlantRegistry,
+    PlantStatusEnum, PlantTypeEnum
+)
+from app.models.workflow import Workflow, WorkflowTask, TaskStatusEnum
+from app.services.plant_context import (
+    agent_turn, compliance_status, get_plant_snapshot, invalidate_plant_snapshot, load_plant_snapshot,
+    maintenance_schedule, plant_info, tool_session
+)
+
+
+class Database:
+    def __init__(self, engine, session_factory):
+        self.engine = engine
+        self.Session = session_factory
+        self.queries = []
+        self.sessions = 0
+        self._sessions_lock = threading.Lock()
+        event.listen(self.engine, "before_cursor_execute", self._count)
+
+    def _count(self, conn, cursor, statement, parameters, context, executemany):
+        self.queries.append(statement)
+
+    @contextmanager
+    def session_context(self):
+        with self._sessions_lock:
+            self.sessions += 1
+        session = self.Session()
+        try:
+            yield session
+            session.commit()
+        finally:
+            session.close()
+
+
+@pytest.fixture
+def db(engine, session_factory):
+    database = Database(engine, session_factory)
+    now = datetime.utcnow()
+    session = database.Session()
+
+    registry = PlantRegistry(tenant_id="t1", pod="IT001E12345678", censimp="IM_123", operation_date=datetime(2019, 6, 1))
+    plant = Plant(
+        tenant_id="t1", name="Impianto Brindisi", code="BR-01", power="1 MW", power_kw=1000.0,
+        status=PlantStatusEnum.IN_OPERATION, type=PlantTypeEnum.PHOTOVOLTAIC, location="Brindisi",
+        registry=registry, next_deadline=now + timedelta(days=45), next_deadline_type="Dichiarazione consumi"
+    )
+    session.add(plant)
+    session.flush()
+    session.add(ComplianceChecklist(
+        tenant_id="t1", plant_id=plant.id, dso_connection=True, gse_activation=True, terna_registration=False,
+        compliance_score=72, antimafia_expiry=now + timedelta(days=20)
+    ))
+    for days, status in [(5, MaintenanceStatusEnum.PLANNED), (60, MaintenanceStatusEnum.PLANNED),
+                         (-3, MaintenanceStatusEnum.IN_PROGRESS), (-30, MaintenanceStatusEnum.COMPLETED)]:
+        session.add(Maintenance(
+            tenant_id="t1", plant_id=plant.id, planned_date=now + timedelta(days=days), status=status,
+            type=MaintenanceTypeEnum.ORDINARY, description=f"Pulizia moduli ({days} giorni)"
+        ))
+    workflow = Workflow(tenant_id="t1", name="Rinnovo convenzione GSE", plant_id=plant.id)
+    session.add(workflow)
+    session.flush()
+    for n, status in enumerate([TaskStatusEnum.TO_START, TaskStatusEnum.DELAYED, TaskStatusEnum.COMPLETED]):
+        session.add(WorkflowTask(
+            tenant_id="t1", workflow_id=workflow.id, title=f"Passo {n}", status=status, due_date=now + timedelta(days=n * 10)
+        ))
+    for n, (days, stato) in enumerate([(10, DocumentStatusEnum.VALIDO), (200, DocumentStatusEnum.VALIDO),
+                                       (5, DocumentStatusEnum.ARCHIVIATO)]):
+        session.add(Document(
+            tenant_id="t1", impianto_id=plant.id, nome=f"Documento {n}", tipo=DocumentTypeEnum.PDF,
+            categoria=DocumentCategoryEnum.TECNICO, file_path=f"t1/doc{n}.pdf", stato=stato,
+            data_scadenza=now + timedelta(days=days)
+        ))
+    # Another tenant's plant
+    session.add(Plant(
+        tenant_id="t2", name="Altro", code="XX-01", power="1 MW", power_kw=1000.0,
+        status=PlantStatusEnum.IN_OPERATION, type=PlantTypeEnum.WIND, location="Foggia"
+    ))
+    session.commit()
+    session.close()
+
+    database.plant_id = plant.id
+    database.queries.clear()
+    return database
+
+
+def use_tools(plant_id, calls):
+    """What the plant tools of app.agents.tools do, `calls` times"""
+    results = []
+    for n in range(calls):
+        snapshot = get_plant_snapshot(plant_id, "t1")
+        results.append([plant_info(snapshot), maintenance_schedule(snapshot, 30 + n), compliance_status(snapshot)][n % 3])
+    return results
+
+
+def test_query_count_per_turn_does_not_grow_with_tool_calls(db):
+    counts = []
+    for calls in (1, 3, 12):
+        db.queries.clear()
+        with agent_turn("t1", db.session_context) as turn:
+            use_tools(db.plant_id, calls)
+        counts.append(len(db.queries))
+        assert turn.sessions_opened == 1
+
+    assert counts == [4, 4, 4]
+    assert db.sessions == 3
+
+    # Without a turn every tool loads the plant on its own
+    db.queries.clear()
+    with db.session_context() as session:
+        for _ in range(3):
+            load_plant_snapshot(session, db.plant_id, "t1")
+    assert len(db.queries) == 12
+
+
+def test_snapshot_content(db):
+    with agent_turn("t1", db.session_context):
+        snapshot = get_plant_snapshot(db.plant_id, "t1")
+        info = plant_info(snapshot)
+        schedule = maintenance_schedule(snapshot, days_ahead=30)
+        compliance = compliance_status(snapshot)
+
+    assert info["name"] == "Impianto Brindisi" and info["type"] == "Photovoltaic"
+    assert info["registry"]["pod"] == "IT001E12345678" and info["activation_date"].startswith("2019-06-01")
+    assert info["open_tasks"] == 2
+    # Overdue and upcoming open maintenances; completed and far ones are left out
+    assert [m["status"] for m in schedule] == ["In Progress", "Planned"]
+    assert [d["type"] for d in snapshot.deadlines][:3] == ["maintenance", "task", "maintenance"]
+    assert [d["date"] for d in snapshot.deadlines] == sorted(d["date"] for d in snapshot.deadlines)
+    assert {doc["nome"] for doc in snapshot.documents} == {"Documento 0", "Documento 1"}
+    assert compliance["score"] == 72 and not compliance["compliant"]
+    assert compliance["issues"] == ["Missing Terna registration", "1 documents expiring soon"]
+
+
+def test_snapshots_are_scoped_to_the_tenant(db):
+    with agent_turn("t2", db.session_context):
+        assert get_plant_snapshot(db.plant_id, "t2") is None
+
+
+def test_concurrent_tools_share_snapshots_but_not_sessions(db):
+    """Tools run by ParallelToolNode in the executor threads see the turn without waiting for each other"""
+    from langchain_core.tools import tool
+
+    # Only passed when four tools hold their sessions at the same time
+    together = threading.Barrier(4, timeout=5)
+
+    @tool
+    def plant_tool(plant_id: int, days_ahead: int) -> dict:
+        """Maintenance of a plant"""
+        snapshot = get_plant_snapshot(plant_id, "t1")
+        with tool_session("t1") as session:
+            together.wait()
+            session_id = id(session)
+        return {"maintenances": len(maintenance_schedule(snapshot, days_ahead)), "session": session_id}
+
+    node = ParallelToolNode([plant_tool], max_concurrency=8)
+    state = {"messages": [], "context": {"tool_calls": [
+        {"tool": "plant_tool", "args": {"plant_id": db.plant_id, "days_ahead": 30 + n}} for n in range(16)
+    ]}}
+
+    async def turn():
+        with agent_turn("t1", db.session_context) as scope:
+            return scope, await node(state, {})
+
+    scope, update = asyncio.run(turn())
+    outputs = [result["output"] for result in update["context"]["tool_results"]]
+
+    assert all(output["maintenances"] == 2 for output in outputs)
+    assert len({output["session"] for output in outputs}) > 1
+    # One snapshot load on the turn session, sixteen tool sessions
+    assert scope.sessions_opened == 1 and len(db.queries) == 4
+    assert db.sessions == 17
+
+
+def test_writes_invalidate_the_snapshot(db):
+    with agent_turn("t1", db.session_context):
+        assert len(get_plant_snapshot(db.plant_id, "t1").maintenances) == 3
+        with tool_session("t1") as session:
+            session.add(Maintenance(
+                tenant_id="t1", plant_id=db.plant_id, planned_date=datetime.utcnow() + timedelta(days=2),
+                status=MaintenanceStatusEnum.PLANNED, type=MaintenanceTypeEnum.CORRECTIVE, description="Inverter"
+            ))
+            session.commit()
+        invalidate_plant_snapshot(db.plant_id, "t1")
+        assert len(get_plant_snapshot(db.plant_id, "t1").maintenances) == 4
+
+        # A failing tool only rolls back its own session
+        with pytest.raises(RuntimeError):
+            with tool_session("t1") as session:
+                session.add(Maintenance(tenant_id="t1", plant_id=db.plant_id))
+                raise RuntimeError("dati non validi")
+        with tool_session("t1") as session:
+            assert session.query(Maintenance).count() == 5
@@ -0,0 +1,137 @@
+"""Semantic LLM cache: hit rate on near-duplicates, tenant isolation, invalidation and bounds."""
+
+import asyncio
+import hashlib
+import time
+
+import numpy as np
+
+from app.services.semantic_cache import MemoryCacheStore, SemanticCache, normalize_prompt
+
+
+class FakeEmbedder:
+    """Deterministic bag-of-words embedding"""
+
+    def __init__(self, dimension=512):
+        self.dimension = dimension
+        self.calls = 0
+
+    async def embed_text(self, text):
+        self.calls += 1
+        vector = np.zeros(self.dimension)
+        for word in text.split():
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % self.dimension] += 1
+        return vector.tolist()
+
+
+class FakeAgent:
+    def __init__(self):
+        self.calls = []
+
+    def answer(self, tenant_id, prompt, success=True):
+        async def compute():
+            self.calls.append((tenant_id, prompt))
+            return {
+                "success": success,
+                "result": {"summary": f"{tenant_id}: risposta a '{prompt}'"},
+                "messages": ["non serializzabile"],
+            }
+        return compute
+
+
+def ask(cache, agent, prompt, tenant_id="t1", agent_type="compliance", generation=1, context=None, **kwargs):
+    return asyncio.run(cache.get_or_compute(
+        prompt, tenant_id, agent_type, generation, agent.answer(tenant_id, prompt, **kwargs), context=context
+    ))
+
+
+VARIANTS = [
+    "Quali scadenze GSE ho questo mese?",
+    "quali scadenze gse ho questo mese",
+    "Quali  scadenze GSE ho, questo mese?!",
+    "QUALI SCADENZE GSE HO QUESTO MESE",
+    "quali scadenze GSE ho questo mese ?",
+]
+
+
+def test_normalization():
+    assert {normalize_prompt(v) for v in VARIANTS} == {"quali scadenze gse ho questo mese"}
+
+
+def test_near_duplicates_hit_within_a_tenant():
+    cache = SemanticCache(FakeEmbedder(), threshold=0.85, ttl_seconds=60, max_entries=100)
+    agent = FakeAgent()
+
+    first = ask(cache, agent, VARIANTS[0])
+    assert "cached" not in first
+
+    for n in range(40):
+        answer = ask(cache, agent, VARIANTS[n % len(VARIANTS)])
+        assert answer["cached"] is True
+        assert answer["result"] == first["result"]
+        assert "messages" not in answer
+
+    # Close rewording still hits, an unrelated question does not
+    assert ask(cache, agent, "quali scadenze GSE ho io questo mese")["cached"]
+    assert "cached" not in ask(cache, agent, "stato manutenzioni inverter impianto nord")
+
+    assert len(agent.calls) == 2
+    assert cache.hits == 41 and cache.misses == 2
+    assert cache.hit_rate > 0.95
+
+
+def test_answers_never_cross_tenants():
+    cache = SemanticCache(FakeEmbedder(), threshold=0.5, ttl_seconds=60, max_entries=100)
+    agent = FakeAgent()
+
+    for tenant in ["t1", "t2", "t3"]:
+        assert "cached" not in ask(cache, agent, VARIANTS[0], tenant_id=tenant)
+    for n in range(30):
+        tenant = f"t{n % 3 + 1}"
+        answer = ask(cache, agent, VARIANTS[n % len(VARIANTS)], tenant_id=tenant)
+        assert answer["cached"] and answer["result"]["summary"].startswith(f"{tenant}:")
+
+    assert [tenant for tenant, _ in agent.calls] == ["t1", "t2", "t3"]
+
+    # Same tenant, other agent or other context: separate entries too
+    assert "cached" not in ask(cache, agent, VARIANTS[0], agent_type="maintenance")
+    assert "cached" not in ask(cache, agent, VARIANTS[0], context={"impianto_id": 7})
+    assert ask(cache, agent, VARIANTS[1], context={"impianto_id": 7})["cached"]
+
+    assert cache.invalidate_tenant("t1") == 3
+    assert "cached" not in ask(cache, agent, VARIANTS[0], tenant_id="t1")
+    assert ask(cache, agent, VARIANTS[0], tenant_id="t2")["cached"]
+
+
+def test_data_changes_invalidate_answers():
+    store = MemoryCacheStore(max_entries=100)
+    cache = SemanticCache(FakeEmbedder(), store=store, threshold=0.85, ttl_seconds=60)
+    agent = FakeAgent()
+
+    ask(cache, agent, VARIANTS[0], generation=41)
+    assert ask(cache, agent, VARIANTS[1], generation=41)["cached"]
+
+    # A change feed event moved the tenant's data generation
+    assert "cached" not in ask(cache, agent, VARIANTS[1], generation=42)
+    assert ask(cache, agent, VARIANTS[2], generation=42)["cached"]
+    assert len(store) == 1  # the generation 41 entry was retired
+
+
+def test_ttl_size_bound_and_failures():
+    store = MemoryCacheStore(max_entries=10)
+    cache = SemanticCache(FakeEmbedder(), store=store, threshold=0.85, ttl_seconds=0.05)
+    agent = FakeAgent()
+
+    ask(cache, agent, VARIANTS[0])
+    time.sleep(0.1)
+    assert "cached" not in ask(cache, agent, VARIANTS[0])
+
+    cache.ttl_seconds = 60
+    for n in range(50):
+        ask(cache, agent, f"domanda numero {n} su impianto {n * 7}", tenant_id=f"t{n % 5}")
+    assert len(store) == 10
+
+    # Failed answers are never reused
+    assert not ask(cache, agent, "rapporto annuale", success=False)["success"]
+    assert "cached" not in ask(cache, agent, "rapporto annuale")
+    assert ask(cache, agent, "rapporto annuale")["cached"]
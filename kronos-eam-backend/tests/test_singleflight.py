@@ -0,0 +1,198 @@
+"""Singleflight: identical concurrent LLM and search calls share one backend call."""
+
+import asyncio
+from typing import TypedDict
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langgraph.graph import END, StateGraph
+
+from app.core.singleflight import CoalescingLLM, SingleFlight, make_key
+
+
+class CountingLLM:
+    temperature = 0.7
+    model = "gemini-test"
+
+    def __init__(self, delay=0.05, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("quota esaurita")
+        return AIMessage(content=f"risposta {self.calls}")
+
+
+def tenant(tenant_id):
+    return {"configurable": {"tenant_id": tenant_id}}
+
+
+PROMPT = [SystemMessage(content="Sei un assistente EAM."), HumanMessage(content="Quali scadenze GSE ho questo mese?")]
+
+
+def test_fifty_identical_prompts_make_one_model_call():
+    backend = CountingLLM()
+    llm = CoalescingLLM(backend, flight=SingleFlight())
+
+    async def burst():
+        return await asyncio.gather(*(llm.ainvoke(PROMPT, tenant("t1")) for _ in range(50)))
+
+    answers = asyncio.run(burst())
+
+    assert backend.calls == 1
+    assert {answer.content for answer in answers} == {"risposta 1"}
+    assert llm.flight.calls == 1 and llm.flight.coalesced == 49
+    assert len(llm.flight) == 0
+
+    # Once the call is over the next prompt goes to the model again
+    asyncio.run(llm.ainvoke(PROMPT, tenant("t1")))
+    assert backend.calls == 2
+
+
+def test_only_identical_requests_of_one_tenant_are_coalesced():
+    backend = CountingLLM()
+    llm = CoalescingLLM(backend, flight=SingleFlight())
+    reworded = [PROMPT[0], HumanMessage(content="  Quali scadenze GSE\nho questo   mese?")]
+
+    async def burst():
+        await asyncio.gather(
+            *(llm.ainvoke(PROMPT, tenant("t1")) for _ in range(10)),
+            *(llm.ainvoke(reworded, tenant("t1")) for _ in range(10)),  # same after normalization
+            *(llm.ainvoke(PROMPT, tenant("t2")) for _ in range(10)),
+            *(llm.ainvoke(PROMPT, tenant("t1"), stop=["\n"]) for _ in range(10)),
+            llm.ainvoke([HumanMessage(content="Altra domanda")], tenant("t1")),
+            # Outside a tenant run nothing is shared
+            llm.ainvoke(PROMPT),
+            llm.ainvoke(PROMPT),
+        )
+
+    asyncio.run(burst())
+
+    assert backend.calls == 6
+
+
+def test_failures_are_shared_and_not_remembered():
+    backend = CountingLLM(fail=True)
+    llm = CoalescingLLM(backend, flight=SingleFlight())
+
+    async def burst():
+        return await asyncio.gather(*(llm.ainvoke(PROMPT, tenant("t1")) for _ in range(20)), return_exceptions=True)
+
+    errors = asyncio.run(burst())
+
+    assert backend.calls == 1
+    assert all(isinstance(error, RuntimeError) for error in errors)
+    backend.fail = False
+    assert asyncio.run(llm.ainvoke(PROMPT, tenant("t1"))).content == "risposta 2"
+
+
+def test_a_caller_giving_up_does_not_cancel_the_others():
+    backend = CountingLLM(delay=0.1)
+    llm = CoalescingLLM(backend, flight=SingleFlight())
+
+    async def scenario():
+        impatient = asyncio.create_task(llm.ainvoke(PROMPT, tenant("t1")))
+        patient = [asyncio.create_task(llm.ainvoke(PROMPT, tenant("t1"))) for _ in range(5)]
+        await asyncio.sleep(0.02)
+        impatient.cancel()
+        return await asyncio.gather(*patient), impatient
+
+    answers, impatient = asyncio.run(scenario())
+
+    assert impatient.cancelled()
+    assert [answer.content for answer in answers] == ["risposta 1"] * 5
+    assert backend.calls == 1
+
+
+def test_agent_graph_runs_are_scoped_by_tenant():
+    backend = CountingLLM()
+    llm = CoalescingLLM(backend, flight=SingleFlight())
+
+    class State(TypedDict):
+        answer: str
+
+    async def respond(state):
+        reply = await llm.ainvoke(PROMPT)
+        return {"answer": reply.content}
+
+    graph = StateGraph(State)
+    graph.add_node("respond", respond)
+    graph.set_entry_point("respond")
+    graph.add_edge("respond", END)
+    app = graph.compile()
+
+    async def burst():
+        return await asyncio.gather(*(
+            app.ainvoke({"answer": ""}, {"configurable": {"tenant_id": f"t{n % 2}"}}) for n in range(50)
+        ))
+
+    asyncio.run(burst())
+
+    assert backend.calls == 2
+
+
+def test_streamed_runs_are_not_coalesced():
+    backend = CountingLLM()
+    llm = CoalescingLLM(backend, flight=SingleFlight())
+
+    class State(TypedDict):
+        answer: str
+
+    async def respond(state):
+        reply = await llm.ainvoke(PROMPT)
+        return {"answer": reply.content}
+
+    graph = StateGraph(State)
+    graph.add_node("respond", respond)
+    graph.set_entry_point("respond")
+    graph.add_edge("respond", END)
+    app = graph.compile()
+
+    async def stream():
+        return [event async for event in app.astream_events({"answer": ""}, tenant("t1"), version="v2")]
+
+    async def burst():
+        # Every stream needs the token events of its own model call
+        await asyncio.gather(*(stream() for _ in range(5)))
+
+    asyncio.run(burst())
+
+    assert backend.calls == 5
+    assert llm.flight.calls == 0
+
+
+def test_fifty_identical_searches_make_one_store_query():
+    flight = SingleFlight()
+    queries = []
+
+    async def search(embedding, tenant_id, top_k):
+        queries.append(tenant_id)
+        await asyncio.sleep(0.05)
+        return [{"id": "doc-1", "score": 0.92}]
+
+    async def coalesced_search(embedding, tenant_id, top_k=5, filters=None):
+        key = make_key("qdrant", "kronos_documents", tenant_id, embedding, top_k, filters)
+        return list(await flight.do(key, lambda: search(embedding, tenant_id, top_k)))
+
+    async def burst():
+        return await asyncio.gather(
+            *(coalesced_search([0.1, 0.2, 0.3], "t1", filters={"a": 1, "b": 2}) for _ in range(25)),
+            *(coalesced_search([0.1, 0.2, 0.3], "t1", filters={"b": 2, "a": 1}) for _ in range(25)),
+        )
+
+    results = asyncio.run(burst())
+
+    assert queries == ["t1"]
+    assert all(result == [{"id": "doc-1", "score": 0.92}] for result in results)
+    # Each caller owns its list
+    assert len({id(result) for result in results}) == 50
+
+
+@pytest.mark.parametrize("parts", [("t1", {"a": 1, "b": 2}), ("t1", [1.0, 2.0])])
+def test_keys_are_stable(parts):
+    assert make_key(*parts) == make_key(*parts)
+    assert make_key("t2", *parts[1:]) != make_key(*parts)
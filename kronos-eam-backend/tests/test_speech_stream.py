@@ -0,0 +1,174 @@
+"""Streaming transcription: VAD segmentation, partial hypotheses and final latency on synthetic PCM."""
+
+import asyncio
+import time
+
+import numpy as np
+
+from app.core.speech_stream import EnergyVAD, StreamingTranscriber
+
+RATE = 16000
+
+
+def noise(seconds, level_db, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal(int(RATE * seconds)) * 10 ** (level_db / 20)
+
+
+def speech(seconds, level_db=-20, seed=1):
+    """Voiced-like signal: harmonics with a syllable-rate envelope"""
+    t = np.arange(int(RATE * seconds)) / RATE
+    voiced = sum(np.sin(2 * np.pi * f * t) / n for n, f in enumerate((180, 360, 540, 900), start=1))
+    envelope = 0.6 + 0.4 * np.sin(2 * np.pi * 4 * t)
+    signal = voiced * envelope
+    return signal / np.sqrt(np.mean(signal ** 2)) * 10 ** (level_db / 20) + noise(seconds, -60, seed)
+
+
+def pcm(signal):
+    return (np.clip(signal, -1, 1) * 32767).astype("<i2").tobytes()
+
+
+def chunks(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class FakeModel:
+    """Transcribes audio as its duration; records every call"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+
+    async def transcribe(self, audio):
+        self.calls.append(len(audio) / RATE)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return f"{len(audio) / RATE:.2f}s"
+
+
+class Recorder:
+    def __init__(self):
+        self.events = []
+        self.positions = []
+        self.transcriber = None
+
+    async def emit(self, event):
+        self.events.append(event)
+        self.positions.append(self.transcriber.position)
+
+    def of(self, kind):
+        return [e for e in self.events if e["type"] == kind]
+
+
+def stream(signal, model, chunk_bytes=1234, **kwargs):
+    recorder = Recorder()
+    kwargs.setdefault("end_silence_ms", 400)
+    kwargs.setdefault("partial_interval_ms", 300)
+    kwargs.setdefault("partial_window", 1.0)
+    kwargs.setdefault("max_segment_seconds", 20)
+    kwargs.setdefault("max_final_latency_ms", 700)
+
+    async def run():
+        recorder.transcriber = StreamingTranscriber(model.transcribe, recorder.emit, sample_rate=RATE, **kwargs)
+        for chunk in chunks(pcm(signal), chunk_bytes):
+            await recorder.transcriber.feed(chunk)
+            # Give background partials a chance to run, as a socket read would
+            await asyncio.sleep(0)
+        await recorder.transcriber.finish()
+
+    asyncio.run(run())
+    return recorder
+
+
+def test_vad_ignores_steady_noise():
+    vad = EnergyVAD(margin_db=12)
+    frames = noise(2, -35).reshape(-1, 320)
+    assert sum(vad.is_speech(frame) for frame in frames) <= 2
+    assert [vad.is_speech(frame) for frame in speech(0.2, -10).reshape(-1, 320)].count(True) >= 9
+
+
+def test_segments_are_cut_at_silences():
+    signal = np.concatenate([noise(0.5, -55), speech(1.5), noise(0.8, -55, 2), speech(1.0, seed=3), noise(1.0, -55, 4)])
+
+    recorder = stream(signal, FakeModel())
+
+    starts, finals = recorder.of("speech_start"), recorder.of("final")
+    assert [e["segment"] for e in starts] == [0, 1] and [e["segment"] for e in finals] == [0, 1]
+    # Start: 60 ms of speech confirm it, the 200 ms before are kept as pre-roll
+    assert abs(starts[0]["start"] - 0.36) <= 0.02 and abs(starts[1]["start"] - 2.66) <= 0.02
+    assert abs(finals[0]["end"] - 2.0) <= 0.04 and abs(finals[1]["end"] - 3.8) <= 0.04
+    # Finals are emitted as soon as the end silence has been seen
+    final_positions = [p for e, p in zip(recorder.events, recorder.positions) if e["type"] == "final"]
+    assert abs(final_positions[0] - 2.4) <= 0.04 and abs(final_positions[1] - 4.2) <= 0.04
+    # Whole utterance with 200 ms of margin on both sides, trailing silence trimmed
+    assert finals[0]["transcript"] == "1.84s"
+    assert all(e["latency_ms"] <= 700 for e in finals)
+
+
+def test_partials_follow_the_speech_on_a_sliding_window():
+    signal = np.concatenate([noise(0.3, -55), speech(2.4), noise(0.6, -55, 2)])
+
+    recorder = stream(signal, FakeModel())
+
+    partials = recorder.of("partial")
+    assert len(partials) >= 6
+    assert all(e["segment"] == 0 for e in partials)
+    ends = [e["end"] for e in partials]
+    assert ends == sorted(ends) and ends[-1] <= 2.75
+    # Never more than the window, however long the utterance
+    assert max(float(e["transcript"][:-1]) for e in partials) == 1.0
+    # Partials come before the final
+    assert recorder.events.index(partials[-1]) < recorder.events.index(recorder.of("final")[0])
+
+
+def test_stale_partials_are_dropped_by_the_final():
+    signal = np.concatenate([noise(0.3, -55), speech(0.8), noise(0.6, -55, 2)])
+    model = FakeModel(delay=0.5)
+
+    recorder = stream(signal, model, chunk_bytes=640)
+
+    assert recorder.of("partial") == []
+    assert [e["transcript"] for e in recorder.of("final")] == ["1.14s"]
+
+
+def test_long_speech_is_finalized_in_pieces_and_flushed_at_the_end():
+    signal = np.concatenate([noise(0.2, -55), speech(3.5)])
+
+    recorder = stream(signal, FakeModel(), max_segment_seconds=1.0)
+
+    finals = recorder.of("final")
+    assert len(finals) == 4
+    assert all(float(e["transcript"][:-1]) <= 1.0 for e in finals)
+    # The last piece was still open when the stream ended
+    assert finals[-1]["end"] >= 3.6
+
+
+def test_final_latency_after_end_of_speech_in_real_time():
+    """Audio fed at its real pace, decoding takes 80 ms"""
+    bound_ms = 400 + 250
+    signal = np.concatenate([noise(0.3, -55), speech(0.8), noise(0.8, -55, 2)])
+    speech_end = 1.1
+    model = FakeModel(delay=0.08)
+    received = {}
+
+    async def emit(event):
+        if event["type"] == "final":
+            received["at"] = time.perf_counter()
+            received["event"] = event
+
+    async def run():
+        transcriber = StreamingTranscriber(
+            model.transcribe, emit, sample_rate=RATE, end_silence_ms=400, partial_interval_ms=300,
+            partial_window=1.0, max_final_latency_ms=bound_ms
+        )
+        started = time.perf_counter()
+        for n, chunk in enumerate(chunks(pcm(signal), 640)):  # 20 ms chunks
+            await asyncio.sleep(max(0.0, started + n * 0.02 - time.perf_counter()))
+            await transcriber.feed(chunk)
+        return started
+
+    started = asyncio.run(run())
+
+    wall_latency_ms = (received["at"] - (started + speech_end)) * 1000
+    assert received["event"]["latency_ms"] <= bound_ms
+    assert wall_latency_ms <= bound_ms
@@ -0,0 +1,96 @@
+"""Streaming uploads: chunked staging, incremental checksum, size limit, atomic commit."""
+
+import asyncio
+import hashlib
+import io
+import tracemalloc
+
+import pytest
+
+from app.core.config import settings
+from app.core.storage import FileTooLargeError, StorageBackend
+
+
+class FakeUpload:
+    """UploadFile stand-in generating `size` bytes without holding them"""
+
+    def __init__(self, size: int, filename: str = "drawing.pdf"):
+        self.remaining = size
+        self.filename = filename
+        self.reads = 0
+
+    async def read(self, size: int = -1) -> bytes:
+        self.reads += 1
+        n = min(size, self.remaining)
+        self.remaining -= n
+        return bytes([self.reads % 251]) * n
+
+
+def expected_checksum(size: int, chunk_size: int) -> str:
+    digest = hashlib.sha256()
+    read = 0
+    while size:
+        read += 1
+        n = min(chunk_size, size)
+        digest.update(bytes([read % 251]) * n)
+        size -= n
+    return digest.hexdigest()
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_PATH", str(tmp_path))
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 256 * 1024)
+    return StorageBackend()
+
+
+def test_large_upload_is_staged_in_bounded_memory(storage):
+    size = 64 * 1024 * 1024 + 123
+    upload = FakeUpload(size)
+
+    tracemalloc.start()
+    staged = asyncio.run(storage.stage_upload(upload, max_size=100 * 1024 * 1024))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert staged.size == size
+    assert staged.checksum == expected_checksum(size, settings.UPLOAD_CHUNK_SIZE)
+    assert peak < 8 * 1024 * 1024
+
+    path = storage.commit_staged(staged, "drawing.pdf", tenant_id="t1", subfolder="documents/tecnici")
+    stored = storage.base_path / path
+    assert stored.stat().st_size == size
+    assert path.startswith("t1/documents/tecnici/") and path.endswith("_drawing.pdf")
+    assert not staged.temp_path.exists()
+    assert list(storage.staging_path.iterdir()) == []
+
+
+def test_oversized_upload_is_rejected_while_streaming(storage):
+    upload = FakeUpload(10 * 1024 * 1024)
+
+    with pytest.raises(FileTooLargeError):
+        asyncio.run(storage.stage_upload(upload, max_size=1024 * 1024))
+
+    # Reading stopped at the limit and nothing is left behind
+    assert upload.remaining > 8 * 1024 * 1024
+    assert list(storage.staging_path.iterdir()) == []
+
+
+def test_store_file_accepts_bytes_and_file_objects(storage):
+    content = b"kronos" * 100_000
+
+    from_bytes = storage.store_file(content, "a.pdf", tenant_id="t1")
+    from_file = storage.store_file(io.BytesIO(content), "a.pdf", tenant_id="t1")
+
+    # Same-second uploads with the same name do not overwrite each other
+    assert from_bytes != from_file
+    assert storage.retrieve_file(from_bytes) == storage.retrieve_file(from_file) == content
+
+
+def test_discarding_a_staged_file(storage):
+    staged = storage.stage_chunks([b"abc", b"def"])
+    assert staged.checksum == hashlib.sha256(b"abcdef").hexdigest()
+
+    storage.discard_staged(staged)
+    storage.discard_staged(staged)
+    assert list(storage.staging_path.iterdir()) == []
@@ -0,0 +1,104 @@
+"""Task timeline: events projected from task audit entries and read back in order."""
+
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.api import deps
+from app.api.v1.endpoints import tasks
+from app.models.audit import TipoModificaEnum
+from app.models.user import User
+from app.models.workflow import Workflow, WorkflowTask, TaskEvent, TaskStatusEnum, TaskPriorityEnum
+from app.services.audit_service import AuditService
+from app.services.bulk_mutation_service import BulkMutationService
+from app.services.task_service import TaskService
+
+
+@pytest.fixture
+def db(db):
+    db.add_all([
+        User(id=1, tenant_id="t1", email="anna@example.com", name="Anna", password_hash="x"),
+        User(id=2, tenant_id="t1", email="luca@example.com", name="Luca", password_hash="x"),
+    ])
+    db.commit()
+    return db
+
+
+def make_task(db, tenant_id="t1"):
+    workflow = Workflow(tenant_id=tenant_id, name="Connessione", plant_id=1, progress=0)
+    db.add(workflow)
+    db.flush()
+    task = WorkflowTask(
+        tenant_id=tenant_id, workflow_id=workflow.id, title="Invio pratica",
+        status=TaskStatusEnum.TO_START, priority=TaskPriorityEnum.MEDIUM
+    )
+    db.add(task)
+    db.flush()
+    AuditService(db).log_change("task", task.id, TipoModificaEnum.CREAZIONE, user_id=1, tenant_id=tenant_id)
+    db.commit()
+    return task.id
+
+
+def get_timeline(db, task_id, **params):
+    app = FastAPI()
+    app.include_router(tasks.router, prefix="/tasks")
+    app.dependency_overrides[deps.get_db] = lambda: db
+    app.dependency_overrides[deps.get_current_active_user] = lambda: SimpleNamespace(id=1, tenant_id="t1")
+
+    async def send():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(f"/tasks/{task_id}/timeline", params=params)
+    return asyncio.run(send())
+
+
+def test_task_mutations_append_timeline_events(db):
+    task_id = make_task(db)
+    service = TaskService(db)
+
+    service.update_task(task_id, user_id=1, tenant_id="t1", status=TaskStatusEnum.IN_PROGRESS)
+    service.update_task(task_id, user_id=2, tenant_id="t1", assignee="luca@example.com")
+    service.update_task(task_id, user_id=2, tenant_id="t1", title="Invio pratica GSE")
+    BulkMutationService(db).bulk_update_tasks([task_id], user_id=2, tenant_id="t1", status=TaskStatusEnum.BLOCKED)
+
+    events = db.query(TaskEvent).filter(TaskEvent.task_id == task_id).order_by(TaskEvent.id).all()
+    assert [(e.event_type, e.old_value, e.new_value) for e in events] == [
+        ("created", None, None),
+        ("status_change", "To Start", "In Progress"),
+        ("assignment_change", None, "luca@example.com"),
+        ("updated", None, ["title"]),
+        ("status_change", "In Progress", "Blocked"),
+    ]
+    assert [e.actor_email for e in events] == [
+        "anna@example.com", "anna@example.com", "luca@example.com", "luca@example.com", "luca@example.com"
+    ]
+
+
+def test_timeline_endpoint_pages_events_in_order(db):
+    task_id = make_task(db)
+    service = TaskService(db)
+    service.update_task(task_id, user_id=1, tenant_id="t1", status=TaskStatusEnum.IN_PROGRESS)
+    service.update_task(task_id, user_id=1, tenant_id="t1", assignee="luca@example.com")
+
+    response = get_timeline(db, task_id)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["total_events"] == 3 and body["current_status"] == "In Progress"
+    assert [event["event"] for event in body["events"]] == ["created", "status_change", "assignment_change"]
+    assert body["events"][1]["old_status"] == "To Start" and body["events"][1]["new_status"] == "In Progress"
+    assert body["events"][2]["new_assignee"] == "luca@example.com"
+    timestamps = [event["timestamp"] for event in body["events"]]
+    assert timestamps == sorted(timestamps)
+
+    page = get_timeline(db, task_id, limit=1, offset=2).json()
+    assert page["total_events"] == 3 and [event["event"] for event in page["events"]] == ["assignment_change"]
+
+
+def test_timeline_of_another_tenant_is_not_found(db):
+    task_id = make_task(db, tenant_id="t2")
+
+    assert get_timeline(db, task_id).status_code == 404
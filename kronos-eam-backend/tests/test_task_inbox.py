@@ -0,0 +1,111 @@
+"""Task inbox counters: deltas upserted per bucket and kept in step with task writes."""
+
+import pytest
+from sqlalchemy import event
+
+from app.models.workflow import (
+    Workflow, WorkflowTask, TaskInboxCounter, TaskStatusEnum, TaskPriorityEnum
+)
+from app.services.task_inbox_service import TaskInboxService
+
+
+def snapshot(status=TaskStatusEnum.TO_START, estimated_hours=None):
+    return {
+        "assignee": "anna@example.com", "status": status, "priority": TaskPriorityEnum.HIGH,
+        "estimated_hours": estimated_hours, "actual_hours": None
+    }
+
+
+def counters(session_factory):
+    with session_factory() as db:
+        return {
+            (row.status, row.priority): (row.task_count, row.estimated_count, row.estimated_hours_sum)
+            for row in db.query(TaskInboxCounter).all()
+        }
+
+
+def test_two_deltas_to_a_new_bucket_add_up(engine, session_factory):
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, sql, *args: statements.append(sql))
+
+    # Both transactions record their move before either bucket row exists
+    first, second = session_factory(), session_factory()
+    TaskInboxService(first).record_move("t1", None, snapshot(estimated_hours=2.0))
+    TaskInboxService(second).record_move("t1", None, snapshot(estimated_hours=3.5))
+
+    assert TaskInboxService(first).apply_pending() == 1
+    assert TaskInboxService(second).apply_pending() == 1
+    first.commit()
+    second.commit()
+
+    assert counters(session_factory) == {("To Start", "High"): (2, 2, 5.5)}
+    # One atomic upsert per bucket: no UPDATE-then-INSERT window for a second writer to race into
+    writes = [sql for sql in statements if "task_inbox_counters" in sql and not sql.startswith("SELECT")]
+    assert len(writes) == 2 and all(sql.startswith("INSERT") and "ON CONFLICT" in sql for sql in writes)
+
+
+def test_moves_leave_one_bucket_and_enter_another(session_factory):
+    with session_factory() as db:
+        service = TaskInboxService(db)
+        service.record_move("t1", None, snapshot())
+        service.apply_pending()
+        service.record_move("t1", snapshot(), snapshot(status=TaskStatusEnum.IN_PROGRESS))
+        # Deltas that cancel out touch nothing
+        service.record_move("t1", snapshot(status=TaskStatusEnum.BLOCKED), None)
+        service.record_move("t1", None, snapshot(status=TaskStatusEnum.BLOCKED))
+        assert service.apply_pending() == 2
+        db.commit()
+
+    assert counters(session_factory) == {("To Start", "High"): (0, 0, 0), ("In Progress", "High"): (1, 0, 0)}
+
+
+def test_orm_task_writes_update_the_counters(session_factory):
+    with session_factory() as db:
+        workflow = Workflow(tenant_id="t1", name="Connessione", plant_id=1, progress=0)
+        db.add(workflow)
+        db.flush()
+        tasks = [
+            WorkflowTask(
+                tenant_id="t1", workflow_id=workflow.id, title=f"Task {n}", assignee="anna@example.com",
+                priority=TaskPriorityEnum.HIGH, estimated_hours=4.0
+            )
+            for n in range(3)
+        ]
+        db.add_all(tasks)
+        db.commit()
+
+        tasks[0].status = TaskStatusEnum.COMPLETED
+        db.delete(tasks[1])
+        db.commit()
+
+        assert TaskInboxService(db).get_counters("anna@example.com", "t1")["by_status"]["To Start"] == 1
+
+    assert counters(session_factory) == {("To Start", "High"): (1, 1, 4.0), ("Completed", "High"): (1, 1, 4.0)}
+
+
+@pytest.mark.parametrize("expire_on_commit", [True])
+def test_writes_to_expired_tasks_leave_the_old_bucket(session_factory):
+    with session_factory() as db:
+        workflow = Workflow(tenant_id="t1", name="Connessione", plant_id=1, progress=0)
+        db.add(workflow)
+        db.flush()
+        tasks = [
+            WorkflowTask(
+                tenant_id="t1", workflow_id=workflow.id, title=f"Task {n}", assignee="anna@example.com",
+                priority=TaskPriorityEnum.HIGH, estimated_hours=4.0
+            )
+            for n in range(3)
+        ]
+        db.add_all(tasks)
+        db.commit()
+
+        # Expired by the commit: the old values are loaded when the attributes change
+        tasks[0].status = TaskStatusEnum.COMPLETED
+        db.commit()
+        db.expire(tasks[1])
+        tasks[1].estimated_hours = 6.0
+        db.expire(tasks[2])
+        db.delete(tasks[2])
+        db.commit()
+
+    assert counters(session_factory) == {("To Start", "High"): (1, 1, 6.0), ("Completed", "High"): (1, 1, 4.0)}
@@ -0,0 +1,161 @@
+"""Synthesized speech cache: sentence splitting, reuse across replies, joining and eviction."""
+
+import asyncio
+import hashlib
+import io
+import wave
+
+import pytest
+
+from app.services.tts_cache import PhraseAudioCache, join_audio, split_sentences
+
+RATE = 24000
+
+
+def wav_of(text):
+    """Deterministic mono WAV whose length and content depend on the text"""
+    digest = hashlib.sha256(text.encode()).digest()
+    frames = (digest * (len(text) * 4 // len(digest) + 1))[:len(text) * 4]
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(RATE)
+        wav.writeframes(frames)
+    return buffer.getvalue()
+
+
+def frames_of(data):
+    with wave.open(io.BytesIO(data), "rb") as wav:
+        return wav.readframes(wav.getnframes())
+
+
+class CountingSynthesizer:
+    """Stands in for the TTS provider; records every request"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, text):
+        self.calls.append(text)
+        await asyncio.sleep(0)
+        return wav_of(text)
+
+
+def speak(cache, synthesizer, text, format="wav", **params):
+    params.setdefault("provider", "test")
+    params.setdefault("voice", "it-IT-A")
+    return asyncio.run(cache.synthesize(text, synthesizer, format, **params))
+
+
+def test_sentences_are_split_outside_abbreviations_and_numbers():
+    text = "Buongiorno Sig. Rossi. L'impianto da 1.200 kW è in esercizio! Scadenza n. 3 entro il 30/06; confermo?"
+
+    assert split_sentences(text) == [
+        "Buongiorno Sig. Rossi.",
+        "L'impianto da 1.200 kW è in esercizio!",
+        "Scadenza n. 3 entro il 30/06;",
+        "confermo?",
+    ]
+
+    long_sentence = "Verifica inverter, " * 30 + "fine."
+    pieces = split_sentences(long_sentence, max_chars=100)
+    assert all(len(piece) <= 100 for piece in pieces)
+    assert " ".join(pieces) == long_sentence.strip()
+
+
+def test_wav_segments_are_joined_under_one_header():
+    parts = [wav_of("uno"), wav_of("due"), wav_of("tre")]
+
+    joined = join_audio(parts, "wav")
+
+    assert frames_of(joined) == b"".join(frames_of(part) for part in parts)
+    assert join_audio([b"ID3a", b"bc"], "mp3") == b"ID3abc"
+
+
+def test_recurring_sentences_are_synthesized_once(tmp_path):
+    cache = PhraseAudioCache(str(tmp_path), max_bytes=10 * 1024 * 1024)
+    synthesizer = CountingSynthesizer()
+    replies = [
+        "Buongiorno. Ho trovato 2 scadenze per l'impianto Solare Nord. Vuoi che le pianifichi?",
+        "Buongiorno. La manutenzione dell'inverter è prevista per il 12 marzo. Vuoi che le pianifichi?",
+        "Fatto, attività registrata. Posso aiutarti in altro?",
+        "Buongiorno. Ho trovato 2 scadenze per l'impianto Solare Nord. Vuoi che le pianifichi?",
+        "Fatto, attività registrata. Posso aiutarti in altro?",
+    ]
+
+    results = [speak(cache, synthesizer, reply) for reply in replies]
+
+    # 13 sentences spoken, 6 distinct
+    assert sum(r["sentences"] for r in results) == 13
+    assert len(synthesizer.calls) == 6
+    assert [r["cache_hits"] for r in results] == [0, 2, 0, 3, 2]
+    assert cache.hit_rate == pytest.approx(7 / 13)
+    # A repeated reply is byte for byte the audio of the first one
+    assert results[3]["audio_content"] == results[0]["audio_content"]
+
+
+def test_equal_sentences_in_one_text_are_requested_once(tmp_path):
+    cache = PhraseAudioCache(str(tmp_path), max_bytes=1024 * 1024)
+    synthesizer = CountingSynthesizer()
+
+    result = speak(cache, synthesizer, "Confermato. Procedo. Confermato.")
+
+    assert sorted(synthesizer.calls) == ["Confermato.", "Procedo."]
+    assert result["cache_hits"] == 1
+    assert frames_of(result["audio_content"]) == b"".join(
+        frames_of(wav_of(s)) for s in ("Confermato.", "Procedo.", "Confermato.")
+    )
+
+
+def test_voice_speed_and_format_are_part_of_the_key(tmp_path):
+    cache = PhraseAudioCache(str(tmp_path), max_bytes=1024 * 1024)
+    synthesizer = CountingSynthesizer()
+
+    speak(cache, synthesizer, "Buongiorno.")
+    speak(cache, synthesizer, "Buongiorno.", voice="it-IT-B")
+    speak(cache, synthesizer, "Buongiorno.", speaking_rate=1.2)
+    speak(cache, synthesizer, "Buongiorno.", format="mp3")
+    # Whitespace differences are not
+    speak(cache, synthesizer, "  Buongiorno. ")
+
+    assert len(synthesizer.calls) == 4
+
+
+def test_formats_that_cannot_be_joined_are_cached_whole(tmp_path):
+    cache = PhraseAudioCache(str(tmp_path), max_bytes=1024 * 1024)
+    synthesizer = CountingSynthesizer()
+
+    result = speak(cache, synthesizer, "Uno. Due.", format="OGG_OPUS")
+
+    assert synthesizer.calls == ["Uno. Due."] and result["sentences"] == 1
+
+
+def test_cache_survives_restarts(tmp_path):
+    first = CountingSynthesizer()
+    speak(PhraseAudioCache(str(tmp_path), max_bytes=1024 * 1024), first, "Buongiorno. Come posso aiutarti?")
+
+    second = CountingSynthesizer()
+    cache = PhraseAudioCache(str(tmp_path), max_bytes=1024 * 1024)
+    result = speak(cache, second, "Buongiorno. Come posso aiutarti?")
+
+    assert len(cache) == 2 and second.calls == []
+    assert result["cache_hits"] == 2
+
+
+def test_size_cap_evicts_least_recently_used(tmp_path):
+    size = len(wav_of("Frase 0."))
+    cache = PhraseAudioCache(str(tmp_path), max_bytes=3 * size)
+    synthesizer = CountingSynthesizer()
+
+    for n in range(3):
+        speak(cache, synthesizer, f"Frase {n}.")
+    speak(cache, synthesizer, "Frase 0.")  # Refreshes the oldest
+    speak(cache, synthesizer, "Frase 3.")  # Evicts "Frase 1."
+
+    assert cache.total_bytes <= 3 * size and len(cache) == 3
+    assert sum(1 for path in tmp_path.glob("??/*")) == 3
+    synthesizer.calls.clear()
+    speak(cache, synthesizer, "Frase 0.")
+    speak(cache, synthesizer, "Frase 1.")
+    assert synthesizer.calls == ["Frase 1."]
@@ -0,0 +1,151 @@
+"""WebSocket hub: indexed delivery, slow consumers and cross-worker fan-out."""
+
+import asyncio
+import json
+import time
+
+from app.core.websocket import ConnectionManager, InMemoryPubSub, SLOW_CONSUMER_CLOSE_CODE
+
+
+class FakeWebSocket:
+    """Records sent frames; each send takes `delay` seconds"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.sent = []
+        self.closed_with = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.sent.append(json.loads(text))
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_send_to_user_reaches_only_that_users_connections():
+    async def scenario():
+        hub = ConnectionManager(backplane=InMemoryPubSub())
+        await hub.start()
+        alice_phone, alice_laptop, bob = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+        await hub.connect(alice_phone, "t1", 1)
+        await hub.connect(alice_laptop, "t1", "1")
+        await hub.connect(bob, "t1", 2)
+
+        await hub.send_to_user("t1", 1, {"n": 1})
+        await hub.broadcast_to_tenant("t1", {"n": 2})
+        await settle()
+
+        assert alice_phone.sent == alice_laptop.sent == [{"n": 1}, {"n": 2}]
+        assert bob.sent == [{"n": 2}]
+
+        hub.disconnect(alice_phone)
+        assert len(hub.user_connections[("t1", "1")]) == 1
+        hub.disconnect(alice_laptop)
+        assert ("t1", "1") not in hub.user_connections
+        await hub.stop()
+
+    asyncio.run(scenario())
+
+
+def test_messages_fan_out_across_workers():
+    async def scenario():
+        backplane = InMemoryPubSub()
+        worker_a = ConnectionManager(backplane=backplane)
+        worker_b = ConnectionManager(backplane=backplane)
+        await worker_a.start()
+        await worker_b.start()
+
+        on_a, on_b, other_tenant = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+        await worker_a.connect(on_a, "t1", 1)
+        await worker_b.connect(on_b, "t1", 1)
+        await worker_b.connect(other_tenant, "t2", 1)
+
+        await worker_a.send_to_user("t1", 1, {"hello": "world"})
+        await settle()
+
+        # Delivered once on each worker, never to another tenant
+        assert on_a.sent == [{"hello": "world"}]
+        assert on_b.sent == [{"hello": "world"}]
+        assert other_tenant.sent == []
+        await worker_a.stop()
+        await worker_b.stop()
+
+    asyncio.run(scenario())
+
+
+def test_slow_consumer_is_closed_without_stalling_others():
+    async def scenario():
+        hub = ConnectionManager(backplane=InMemoryPubSub(), queue_size=5, send_timeout=5)
+        await hub.start()
+        fast = [FakeWebSocket() for _ in range(50)]
+        slow = FakeWebSocket(delay=10)
+        for websocket in fast + [slow]:
+            await hub.connect(websocket, "t1", id(websocket))
+
+        started = time.perf_counter()
+        for n in range(20):
+            await hub.broadcast_to_tenant("t1", {"n": n})
+            await asyncio.sleep(0.001)
+        await settle()
+        elapsed = time.perf_counter() - started
+
+        assert elapsed < 1
+        assert all(len(websocket.sent) == 20 for websocket in fast)
+        assert slow.closed_with == SLOW_CONSUMER_CLOSE_CODE
+        assert slow not in hub.connections
+        assert len(hub.tenant_connections["t1"]) == 50
+        await hub.stop()
+
+    asyncio.run(scenario())
+
+
+def test_drop_policy_keeps_slow_consumer_connected():
+    async def scenario():
+        hub = ConnectionManager(
+            backplane=InMemoryPubSub(), queue_size=2, slow_consumer_policy="drop"
+        )
+        await hub.start()
+        slow = FakeWebSocket(delay=0.05)
+        await hub.connect(slow, "t1", 1)
+
+        for n in range(10):
+            await hub.send_to_user("t1", 1, {"n": n})
+        await asyncio.sleep(0.3)
+
+        assert slow.closed_with is None
+        assert hub.connections[slow].dropped > 0
+        assert 0 < len(slow.sent) < 10
+        await hub.stop()
+
+    asyncio.run(scenario())
+
+
+def test_failed_send_removes_connection():
+    class BrokenWebSocket(FakeWebSocket):
+        async def send_text(self, text):
+            raise RuntimeError("connection reset")
+
+    async def scenario():
+        hub = ConnectionManager(backplane=InMemoryPubSub())
+        await hub.start()
+        broken = BrokenWebSocket()
+        await hub.connect(broken, "t1", 1)
+
+        await hub.send_to_user("t1", 1, {"n": 1})
+        await settle()
+
+        assert broken not in hub.connections
+        assert "t1" not in hub.tenant_connections
+        await hub.stop()
+
+    asyncio.run(scenario())